@@ -1,5 +1,6 @@
 """Flask web application for Connact.ai."""
 
+import json
 import os
 import tempfile
 from pathlib import Path
@@ -7,7 +8,7 @@ from functools import wraps
 from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 from typing import Optional
 
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, Response, render_template, request, jsonify, session, redirect, url_for, stream_with_context
 
 # Google OAuth
 try:
@@ -37,10 +38,27 @@ from src.email_agent import (
     generate_next_target_question,
     build_profile_from_answers,
     find_target_recommendations,
+    find_more_recommendations,
+    open_recommendation_cursor,
     regenerate_email_with_style,
     enrich_receiver_with_deep_search,
+    stream_email,
 )
 from src.web_scraper import extract_person_profile_from_web
+from src.services.llm_cache import llm_cache
+from src.services.prompt_layout import prompt_accounting
+from src.services.circuit_breaker import stage_breakers
+from src.services.hedging import hedge_policy
+from src.services.metrics import llm_metrics
+from src.services.model_router import model_router
+from src.services.people_index import people_index
+from src.services.rate_limiter import rate_limiter
+from src.services.recommendation_cursor import recommendation_cursors, search_key
+from src.services.retry_policy import retry_policy
+from src.services.serpapi_cache import serpapi_cache
+from src.services.serpapi_client import serpapi_client
+from src.services.single_flight import single_flight_stats
+from config import ADMIN_EMAILS, METRICS_TOKEN
 
 # Prompt 数据收集
 try:
@@ -115,6 +133,18 @@ def login_required(f):
     return decorated_function
 
 
+def admin_required(f):
+    """Decorator to restrict operational endpoints to ADMIN_EMAILS."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not session.get('user_id'):
+            return jsonify({'error': 'Authentication required'}), 401
+        if (session.get('user_email') or '').strip().lower() not in ADMIN_EMAILS:
+            return jsonify({'error': 'Admin access required'}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
+
 def _safe_redirect_url(url: Optional[str]) -> Optional[str]:
     url = (url or "").strip()
     if not url or not url.startswith("/"):
@@ -939,6 +969,69 @@ def search_receiver():
         return jsonify({'error': str(e)}), 500
 
 
+def _parse_generate_email_payload(data: dict) -> tuple[SenderProfile, ReceiverProfile, str, str]:
+    """Build (sender, receiver, receiver_position, receiver_linkedin) from a generate-email payload."""
+    # Get sender profile
+    sender_data = data.get('sender', {})
+    sender = SenderProfile(
+        name=sender_data.get('name', ''),
+        raw_text=sender_data.get('raw_text', ''),
+        education=sender_data.get('education', []),
+        experiences=sender_data.get('experiences', []),
+        skills=sender_data.get('skills', []),
+        projects=sender_data.get('projects', []),
+        motivation=sender_data.get('motivation', ''),
+        ask=sender_data.get('ask', ''),
+    )
+    
+    # Get receiver profile
+    receiver_data = data.get('receiver', {})
+    receiver_context = (receiver_data.get('context') or '').strip()
+
+    extra_context_lines = []
+    receiver_position = (receiver_data.get('position') or '').strip()
+    if receiver_position:
+        extra_context_lines.append(f"Current role: {receiver_position}")
+    receiver_linkedin = (receiver_data.get('linkedin_url') or '').strip()
+    if receiver_linkedin:
+        extra_context_lines.append(f"LinkedIn: {receiver_linkedin}")
+
+    evidence = receiver_data.get('evidence')
+    if isinstance(evidence, list):
+        evidence_lines = [str(e).strip() for e in evidence if isinstance(e, (str, int, float)) and str(e).strip()]
+        if evidence_lines:
+            extra_context_lines.append("Evidence snippets:")
+            extra_context_lines.extend([f"- {e}" for e in evidence_lines[:2]])
+
+    if extra_context_lines:
+        extra_context = "\n".join(extra_context_lines)
+        receiver_context = f"{receiver_context}\n\n{extra_context}".strip() if receiver_context else extra_context
+
+    sources_value = receiver_data.get('sources', None)
+    receiver_sources = None
+    if isinstance(sources_value, list):
+        receiver_sources = [str(s).strip() for s in sources_value if isinstance(s, str) and s.strip()]
+    elif isinstance(sources_value, str) and sources_value.strip():
+        receiver_sources = [sources_value.strip()]
+
+    if receiver_linkedin:
+        receiver_sources = receiver_sources or []
+        if receiver_linkedin not in receiver_sources:
+            receiver_sources.append(receiver_linkedin)
+
+    receiver = ReceiverProfile(
+        name=receiver_data.get('name', ''),
+        raw_text=receiver_data.get('raw_text', ''),
+        education=receiver_data.get('education', []),
+        experiences=receiver_data.get('experiences', []),
+        skills=receiver_data.get('skills', []),
+        projects=receiver_data.get('projects', []),
+        context=receiver_context or None,
+        sources=receiver_sources,
+    )
+    return sender, receiver, receiver_position, receiver_linkedin
+
+
 @app.route('/api/generate-email', methods=['POST'])
 @login_required
 def api_generate_email():
@@ -953,64 +1046,7 @@ def api_generate_email():
     session_id = data.get('session_id') or session.get('prompt_session_id')
     
     try:
-        # Get sender profile
-        sender_data = data.get('sender', {})
-        sender = SenderProfile(
-            name=sender_data.get('name', ''),
-            raw_text=sender_data.get('raw_text', ''),
-            education=sender_data.get('education', []),
-            experiences=sender_data.get('experiences', []),
-            skills=sender_data.get('skills', []),
-            projects=sender_data.get('projects', []),
-            motivation=sender_data.get('motivation', ''),
-            ask=sender_data.get('ask', ''),
-        )
-        
-        # Get receiver profile
-        receiver_data = data.get('receiver', {})
-        receiver_context = (receiver_data.get('context') or '').strip()
-
-        extra_context_lines = []
-        receiver_position = (receiver_data.get('position') or '').strip()
-        if receiver_position:
-            extra_context_lines.append(f"Current role: {receiver_position}")
-        receiver_linkedin = (receiver_data.get('linkedin_url') or '').strip()
-        if receiver_linkedin:
-            extra_context_lines.append(f"LinkedIn: {receiver_linkedin}")
-
-        evidence = receiver_data.get('evidence')
-        if isinstance(evidence, list):
-            evidence_lines = [str(e).strip() for e in evidence if isinstance(e, (str, int, float)) and str(e).strip()]
-            if evidence_lines:
-                extra_context_lines.append("Evidence snippets:")
-                extra_context_lines.extend([f"- {e}" for e in evidence_lines[:2]])
-
-        if extra_context_lines:
-            extra_context = "\n".join(extra_context_lines)
-            receiver_context = f"{receiver_context}\n\n{extra_context}".strip() if receiver_context else extra_context
-
-        sources_value = receiver_data.get('sources', None)
-        receiver_sources = None
-        if isinstance(sources_value, list):
-            receiver_sources = [str(s).strip() for s in sources_value if isinstance(s, str) and s.strip()]
-        elif isinstance(sources_value, str) and sources_value.strip():
-            receiver_sources = [sources_value.strip()]
-
-        if receiver_linkedin:
-            receiver_sources = receiver_sources or []
-            if receiver_linkedin not in receiver_sources:
-                receiver_sources.append(receiver_linkedin)
-
-        receiver = ReceiverProfile(
-            name=receiver_data.get('name', ''),
-            raw_text=receiver_data.get('raw_text', ''),
-            education=receiver_data.get('education', []),
-            experiences=receiver_data.get('experiences', []),
-            skills=receiver_data.get('skills', []),
-            projects=receiver_data.get('projects', []),
-            context=receiver_context or None,
-            sources=receiver_sources,
-        )
+        sender, receiver, receiver_position, receiver_linkedin = _parse_generate_email_payload(data)
         
         # 深度搜索：在生成邮件前搜索目标人物的更多信息
         deep_search_result = None
@@ -1052,6 +1088,91 @@ def api_generate_email():
         return jsonify({'error': str(e)}), 500
 
 
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route('/api/generate-email/stream', methods=['POST'])
+@login_required
+def api_generate_email_stream():
+    """
+    Streaming variant of /api/generate-email (Server-Sent Events).
+
+    Events, in order: `started`, `deep_search_started` / `deep_search_done` (when
+    enabled), `generation_started`, one `token` per model chunk ({"text": ...}),
+    then `done` ({"email", "data_saved", "deep_search"}) or `error` ({"error"}).
+    """
+    data = request.get_json() or {}
+    template = data.get('template') or None
+    enable_deep_search = data.get('enable_deep_search', True)
+    goal = data.get('goal', '')
+    if not goal:
+        return jsonify({'error': 'Goal is required'}), 400
+
+    try:
+        sender, receiver, receiver_position, receiver_linkedin = _parse_generate_email_payload(data)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+    session_id = data.get('session_id') or session.get('prompt_session_id')
+
+    def generate():
+        nonlocal receiver
+        yield _sse('started', {})
+
+        deep_search_result = None
+        if enable_deep_search and receiver.name:
+            yield _sse('deep_search_started', {'name': receiver.name})
+            try:
+                print(f"[API] Starting deep search for: {receiver.name}")
+                receiver = enrich_receiver_with_deep_search(
+                    receiver=receiver,
+                    position=receiver_position,
+                    linkedin_url=receiver_linkedin,
+                )
+                deep_search_result = "success"
+            except Exception as e:
+                print(f"[API] Deep search failed (continuing without): {e}")
+                deep_search_result = f"failed: {str(e)}"
+            yield _sse('deep_search_done', {'result': deep_search_result})
+
+        yield _sse('generation_started', {})
+        parts = []
+        try:
+            for chunk in stream_email(sender, receiver, goal, template=template, session_id=session_id):
+                parts.append(chunk)
+                yield _sse('token', {'text': chunk})
+        except Exception as e:
+            print(f"[API] Email stream failed: {e}")
+            yield _sse('error', {'error': str(e)})
+            return
+
+        saved_path = None
+        if PROMPT_COLLECTOR_ENABLED and session_id:
+            saved_path = end_prompt_session(session_id)
+
+        yield _sse('done', {
+            'email': "".join(parts).strip(),
+            'data_saved': saved_path is not None,
+            'deep_search': deep_search_result,
+        })
+
+    # 与 JSON 接口不同，这里不清理 session 中的 prompt_session_id：
+    # - 流式响应的 cookie 在生成前就已发出，generate() 里的 session.pop 不会被保存；
+    # - 在返回前清理又会让失败的流无法用同一个 session_id 重试。
+    # 成功后残留的 id 已被 end_prompt_session 结束，prompt collector 会忽略它，
+    # 下一次 /api/find-recommendations 会覆盖它。
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',  # 关闭 nginx 缓冲，保证逐条推送
+        },
+    )
+
+
 @app.route('/api/generate-questionnaire', methods=['POST'])
 @login_required
 def api_generate_questionnaire():
@@ -1168,19 +1289,51 @@ def api_profile_from_questionnaire():
 @app.route('/api/find-recommendations', methods=['POST'])
 @login_required
 def api_find_recommendations():
-    """Find recommended target contacts based on user profile and goals."""
+    """
+    Find recommended target contacts based on user profile and goals.
+
+    Pass the `cursor` from a previous response (with the same purpose, field
+    and preferences) to load the next page of people for that search.
+    """
     data = request.get_json()
     
     purpose = data.get('purpose', '').strip()
     field = data.get('field', '').strip()
     sender_profile = data.get('sender_profile', {})
     preferences = data.get('preferences', {}) or {}
+    cursor_id = str(data.get('cursor', '') or '').strip()
     
     if not purpose or not field:
         return jsonify({'error': 'Purpose and field are required'}), 400
 
-    # Persist latest preferences to user profile (best-effort)
     user_id = session.get("user_id", "")
+
+    # 加载更多：按游标继续同一个搜索
+    if cursor_id:
+        cursor = recommendation_cursors.get(cursor_id, user_id, search_key(purpose, field, preferences))
+        if cursor is None:
+            return jsonify({'error': 'Cursor expired or does not match this search'}), 404
+        try:
+            recommendations = find_more_recommendations(
+                purpose,
+                field,
+                sender_profile,
+                preferences=preferences,
+                cursor=cursor,
+            )
+            if not recommendation_cursors.save(cursor):
+                # 另一个"加载更多"请求先推进了游标，丢弃本页避免重复
+                return jsonify({'error': 'Cursor was advanced by another request, please retry'}), 409
+            return jsonify({
+                'success': True,
+                'recommendations': recommendations,
+                'cursor': cursor.cursor_id,
+                'has_more': cursor.has_more,
+            })
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    # Persist latest preferences to user profile (best-effort)
     if user_id and isinstance(preferences, dict):
         auth_service.update_user_profile(user_id=user_id, preferences=preferences)
     
@@ -1200,24 +1353,32 @@ def api_find_recommendations():
         session['prompt_session_id'] = session_id
     
     try:
+        serpapi_paging: dict = {}
         recommendations = find_target_recommendations(
             purpose,
             field,
             sender_profile,
             preferences=preferences,
             session_id=session_id,
+            serpapi_paging=serpapi_paging,
         )
         
         # ===== 找人成功后立即保存 =====
         saved_path = None
         if PROMPT_COLLECTOR_ENABLED and session_id and recommendations:
             saved_path = save_find_target_results(session_id, recommendations)
+
+        cursor = open_recommendation_cursor(
+            user_id, purpose, field, preferences, recommendations, serpapi_paging=serpapi_paging
+        )
         
         return jsonify({
             'success': True,
             'recommendations': recommendations,
             'session_id': session_id,  # 返回给前端，供后续调用
             'data_saved': saved_path is not None,  # 告知前端数据已保存
+            'cursor': cursor.cursor_id,  # "加载更多"时传回
+            'has_more': cursor.has_more,
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1335,6 +1496,93 @@ def api_save_targets():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/admin/llm-cache', methods=['GET'])
+@admin_required
+def api_admin_llm_cache():
+    """Return LLM response cache hit/miss counters for this worker."""
+    return jsonify({'success': True, 'cache': llm_cache.stats()})
+
+
+@app.route('/api/admin/prompt-report', methods=['GET'])
+@admin_required
+def api_admin_prompt_report():
+    """Per prompt builder: cacheable prefix vs per-request suffix (chars/tokens) for this worker."""
+    return jsonify({'success': True, 'builders': prompt_accounting.report()})
+
+
+@app.route('/api/admin/single-flight', methods=['GET'])
+@admin_required
+def api_admin_single_flight():
+    """Return request-coalescing counters (leaders / coalesced / timeouts) for this worker."""
+    return jsonify({'success': True, 'flights': single_flight_stats()})
+
+
+@app.route('/api/admin/model-router', methods=['GET'])
+@admin_required
+def api_admin_model_router():
+    """Return task routes, demoted tasks, live per-model p50/p95 latency and hedging counters for this worker."""
+    return jsonify({'success': True, 'router': model_router.snapshot(), 'hedging': hedge_policy.stats()})
+
+
+@app.route('/api/admin/circuit-breakers', methods=['GET'])
+@admin_required
+def api_admin_circuit_breakers():
+    """Return per-stage circuit breaker state for the find-target cascade (this worker)."""
+    return jsonify({'success': True, 'breakers': stage_breakers.snapshot()})
+
+
+@app.route('/api/admin/circuit-breakers/reset', methods=['POST'])
+@admin_required
+def api_admin_circuit_breakers_reset():
+    """Close one stage's breaker (JSON body {"stage": ...}) or all of them."""
+    data = request.get_json(silent=True) or {}
+    stage_breakers.reset(data.get('stage') or None)
+    return jsonify({'success': True, 'breakers': stage_breakers.snapshot()})
+
+
+@app.route('/api/admin/rate-limits', methods=['GET'])
+@admin_required
+def api_admin_rate_limits():
+    """Return provider rate limits, shared bucket levels and this worker's queue depth / wait times."""
+    return jsonify({'success': True, 'rate_limits': rate_limiter.snapshot()})
+
+
+@app.route('/api/admin/retries', methods=['GET'])
+@admin_required
+def api_admin_retries():
+    """Return per-operation retry counters (attempts, retries, errors by kind, time slept) for this worker."""
+    return jsonify({'success': True, 'retries': retry_policy.stats()})
+
+
+@app.route('/api/admin/serpapi-cache', methods=['GET'])
+@admin_required
+def api_admin_serpapi_cache():
+    """Return SerpAPI cache hit rates (by query type, incl. negative hits), live entry counts and connection pool usage."""
+    return jsonify({'success': True, 'cache': serpapi_cache.stats(), 'pool': serpapi_client.stats()})
+
+
+@app.route('/api/admin/people-index', methods=['GET'])
+@admin_required
+def api_admin_people_index():
+    """Return local people index size (total / fresh profiles) and how often it filled a search on its own."""
+    return jsonify({'success': True, 'people_index': people_index.stats()})
+
+
+@app.route('/api/admin/recommendation-cursors', methods=['GET'])
+@admin_required
+def api_admin_recommendation_cursors():
+    """Return "Load more" cursor counters (created / resumed / missing) and active cursors on disk."""
+    return jsonify({'success': True, 'cursors': recommendation_cursors.stats()})
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint: LLM call metrics summed over all gunicorn workers."""
+    if METRICS_TOKEN and request.headers.get('Authorization', '') != f'Bearer {METRICS_TOKEN}':
+        return Response('unauthorized\n', status=401, mimetype='text/plain')
+    return Response(llm_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 if __name__ == '__main__':
     # Make sure GEMINI_API_KEY is set
     if not os.environ.get('GEMINI_API_KEY') and not os.environ.get('GOOGLE_API_KEY'):
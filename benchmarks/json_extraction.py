@@ -0,0 +1,135 @@
+"""Microbenchmarks for JSON extraction from LLM output.
+
+Compares the previous regex + brace-scan `_extract_json_from_text` with
+`src.services.json_extract.extract_json` on large synthetic responses, and
+measures `ArrayItemParser` on a streamed recommendations payload. `same` is
+False for `prose_then_json` because the old scanner anchored every candidate at
+the first brace in the prose and never reached the JSON.
+
+    python benchmarks/json_extraction.py [--repeat 5] [--items 500]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.services.json_extract import ArrayItemParser, extract_json  # noqa: E402
+
+
+def legacy_extract_json(text: str) -> str:
+    """`_extract_json_from_text` before the single-pass scanner (kept for comparison)."""
+    json_block_pattern = r'```(?:json)?\s*\n?([\s\S]*?)\n?```'
+    for match in re.findall(json_block_pattern, text):
+        try:
+            json.loads(match.strip())
+            return match.strip()
+        except json.JSONDecodeError:
+            continue
+    brace_start = text.find('{')
+    if brace_start != -1:
+        depth = 0
+        for i, char in enumerate(text[brace_start:], brace_start):
+            if char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+                if depth == 0:
+                    try:
+                        candidate = text[brace_start:i + 1]
+                        json.loads(candidate)
+                        return candidate
+                    except json.JSONDecodeError:
+                        continue
+    return text
+
+
+def _recommendations(items: int) -> dict:
+    return {
+        "recommendations": [
+            {
+                "name": f"Person {i}",
+                "position": "Partner {Investments}",
+                "linkedin_url": f"https://www.linkedin.com/in/person-{i}",
+                "match_reason": "Worked on {AI} infra; said \"ship it}\" often. " * 3,
+            }
+            for i in range(items)
+        ]
+    }
+
+
+def synthetic_inputs(items: int) -> dict[str, str]:
+    payload = json.dumps(_recommendations(items), indent=2)
+    prose = "According to the search results, {name} at {company} focused on growth. " * (items * 4)
+    return {
+        "bare_json": payload,
+        "fenced_json": f"Here are the results:\n```json\n{payload}\n```\n",
+        # Grounded answer: long prose with template-like braces before the JSON
+        "prose_then_json": f"{prose}\n\n{payload}",
+        # "}{" inside strings drops the old depth counter to 0 over and over
+        "braces_in_strings": "Result: " + json.dumps(
+            {"notes": [f"closed }}{{ reopened {i}" for i in range(items * 4)]}
+        ),
+    }
+
+
+def _best_of(func: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_extract(inputs: dict[str, str], repeat: int) -> None:
+    print(f"{'input':<18}{'size':>10}{'legacy ms':>12}{'new ms':>10}{'speedup':>10}  same")
+    for name, text in inputs.items():
+        legacy = _best_of(lambda: legacy_extract_json(text), repeat)
+        new = _best_of(lambda: extract_json(text), repeat)
+        same = legacy_extract_json(text) == extract_json(text)
+        print(f"{name:<18}{len(text):>10,}{legacy * 1000:>12.2f}{new * 1000:>10.2f}{legacy / new:>9.1f}x  {same}")
+
+
+def bench_stream(items: int, repeat: int, chunk_size: int = 40) -> None:
+    text = "```json\n" + json.dumps(_recommendations(items), indent=2) + "\n```"
+    chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+
+    def run() -> tuple[int, int]:
+        parser = ArrayItemParser("recommendations")
+        first_at = -1
+        count = 0
+        for index, chunk in enumerate(chunks):
+            got = parser.feed(chunk)
+            if got and first_at < 0:
+                first_at = index
+            count += len(got)
+        return first_at, count
+
+    elapsed = _best_of(run, repeat)
+    first_at, count = run()
+    print(
+        f"\nstream: {len(text):,} chars in {len(chunks):,} chunks -> {count} items, "
+        f"first item after chunk {first_at + 1}/{len(chunks)}, "
+        f"{elapsed * 1000:.2f} ms total ({elapsed / len(text) * 1e9:.0f} ns/char)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--items", type=int, default=500)
+    args = parser.parse_args()
+    bench_extract(synthetic_inputs(args.items), args.repeat)
+    bench_stream(args.items, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -30,6 +30,13 @@ if _invite_required_for_login_raw is None:
 else:
     INVITE_REQUIRED_FOR_LOGIN = _invite_required_for_login_raw.lower() in ("1", "true", "yes")
 
+# Admin 账号（逗号分隔的邮箱），可访问 /api/admin/* 运维接口
+ADMIN_EMAILS = [
+    e.strip().lower()
+    for e in os.environ.get("ADMIN_EMAILS", "").split(",")
+    if e.strip()
+]
+
 # Email verification token 有效期（小时）
 try:
     EMAIL_VERIFY_TTL_HOURS = int(os.environ.get("EMAIL_VERIFY_TTL_HOURS", "24"))
@@ -49,6 +56,9 @@ OPENAI_EMAIL_MODEL = os.environ.get("OPENAI_EMAIL_MODEL", "gpt-4o")
 # OpenAI 通用模型（用于 profile 解析、问卷生成等）
 OPENAI_DEFAULT_MODEL = os.environ.get("OPENAI_DEFAULT_MODEL", "gpt-4o")
 
+# OpenAI 快速模型（用于问卷、简单抽取等低难度、对延迟敏感的任务，见 src/services/model_router.py）
+OPENAI_FAST_MODEL = os.environ.get("OPENAI_FAST_MODEL", "gpt-4o-mini")
+
 # Default Gemini model (can be overridden via env)
 DEFAULT_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.0-flash")
 
@@ -67,3 +77,166 @@ USE_OPENAI_WEB_SEARCH = os.environ.get("USE_OPENAI_WEB_SEARCH", "false").lower()
 
 # Toggle using OpenAI for recommendations at all (fallback uses Gemini)
 USE_OPENAI_RECOMMENDATIONS = os.environ.get("USE_OPENAI_RECOMMENDATIONS", "true").lower() in ("1", "true", "yes")
+
+# ============== LLM 响应缓存 ==============
+# 对完全相同的 prompt 复用响应（内存 LRU + DATA_DIR 下的 SQLite）
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+LLM_CACHE_DB_PATH = Path(os.environ.get("LLM_CACHE_DB_PATH", str(DATA_DIR / "llm_cache.db")))
+
+try:
+    LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "512"))
+except ValueError:
+    LLM_CACHE_MAX_ENTRIES = 512
+
+# 按函数覆盖 TTL（秒），例如 "generate_questionnaire=3600,parse_text_to_profile=0"（0 表示不缓存）
+LLM_CACHE_TTLS = os.environ.get("LLM_CACHE_TTLS", "")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, str(default)))
+    except ValueError:
+        return default
+
+
+# ============== 并发控制 ==============
+# 每个 worker 进程内同时进行的 provider 调用上限
+PROVIDER_CONCURRENCY = {
+    "openai": _env_int("OPENAI_MAX_CONCURRENCY", 8),
+    "gemini": _env_int("GEMINI_MAX_CONCURRENCY", 4),
+    "serpapi": _env_int("SERPAPI_MAX_CONCURRENCY", 4),
+    "web": _env_int("WEB_SCRAPE_MAX_CONCURRENCY", 4),
+}
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, str(default)))
+    except ValueError:
+        return default
+
+
+# 相同的并发请求合并为一次调用（single-flight）时，共享调用的超时（秒，0 表示不限）
+LLM_SINGLE_FLIGHT_TIMEOUT = _env_float("LLM_SINGLE_FLIGHT_TIMEOUT", 120.0)
+SERPAPI_SINGLE_FLIGHT_TIMEOUT = _env_float("SERPAPI_SINGLE_FLIGHT_TIMEOUT", 30.0)
+
+# ============== 模型路由 ==============
+# 按任务覆盖路由（JSON），例如 '{"questionnaire": {"model": "gpt-4o-mini", "fallback_model": "gpt-4o", "latency_budget_s": 4}}'
+MODEL_ROUTES = os.environ.get("MODEL_ROUTES", "")
+# 每个 (任务, 模型) 保留的最近延迟样本数；样本数达到下限后才会判断是否降级
+MODEL_ROUTER_WINDOW = _env_int("MODEL_ROUTER_WINDOW", 200)
+MODEL_ROUTER_MIN_SAMPLES = _env_int("MODEL_ROUTER_MIN_SAMPLES", 20)
+# p95 超出预算后降级到 fallback 的时长（秒），到期后重新试用主模型
+MODEL_ROUTER_DEMOTION_SECONDS = _env_float("MODEL_ROUTER_DEMOTION_SECONDS", 600.0)
+
+# ============== 对冲请求（hedging） ==============
+# 主 provider 超过其观测 p90 仍未返回时，向另一 provider 发送相同 prompt，先返回的有效结果胜出
+LLM_HEDGING_ENABLED = os.environ.get("LLM_HEDGING_ENABLED", "false").lower() in ("1", "true", "yes")
+# 每个任务最近窗口内允许对冲的最大比例
+LLM_HEDGE_MAX_RATE = _env_float("LLM_HEDGE_MAX_RATE", 0.1)
+LLM_HEDGE_WINDOW = _env_int("LLM_HEDGE_WINDOW", 100)
+# 对冲前的最短等待（秒），避免样本不足时过早对冲
+LLM_HEDGE_MIN_DELAY = _env_float("LLM_HEDGE_MIN_DELAY", 0.5)
+# 对冲使用的备用模型（按主模型所属 provider 选择另一侧）
+LLM_HEDGE_GEMINI_MODEL = os.environ.get("LLM_HEDGE_GEMINI_MODEL", DEFAULT_MODEL)
+LLM_HEDGE_OPENAI_MODEL = os.environ.get("LLM_HEDGE_OPENAI_MODEL", OPENAI_FAST_MODEL)
+
+# ============== 熔断（find-target 各阶段） ==============
+# 每个阶段保留最近 N 次结果；至少 MIN_CALLS 次且失败率达到阈值时熔断
+CIRCUIT_BREAKER_WINDOW = _env_int("CIRCUIT_BREAKER_WINDOW", 20)
+CIRCUIT_BREAKER_MIN_CALLS = _env_int("CIRCUIT_BREAKER_MIN_CALLS", 5)
+CIRCUIT_BREAKER_FAILURE_RATE = _env_float("CIRCUIT_BREAKER_FAILURE_RATE", 0.5)
+# 熔断后跳过该阶段的时长（秒），之后进入半开状态放行少量探测请求
+CIRCUIT_BREAKER_COOLDOWN = _env_float("CIRCUIT_BREAKER_COOLDOWN", 60.0)
+CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS = _env_int("CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS", 1)
+# 失败率超过该值（但未熔断）的阶段排到健康阶段之后
+CIRCUIT_BREAKER_DEGRADED_RATE = _env_float("CIRCUIT_BREAKER_DEGRADED_RATE", 0.25)
+
+# ============== 跨 worker 限流（令牌桶） ==============
+# gunicorn 多个 worker 共享 DATA_DIR 下的 SQLite 令牌桶，按 provider + 模型限制每分钟请求数 / token 数
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_DB_PATH = Path(os.environ.get("RATE_LIMIT_DB_PATH", str(DATA_DIR / "rate_limits.db")))
+# 覆盖默认限额（JSON），键为 provider 或 "provider:model"，例如 '{"openai": {"rpm": 500, "tpm": 200000}, "openai:gpt-4o": {"tpm": 30000}}'
+RATE_LIMITS = os.environ.get("RATE_LIMITS", "")
+# 取不到令牌时最多排队等待的时长（秒），超时后报错
+RATE_LIMIT_MAX_WAIT = _env_float("RATE_LIMIT_MAX_WAIT", 10.0)
+# 估算 token 用量时为输出预留的 token 数（输入按 ~4 字符/token 估算）
+RATE_LIMIT_OUTPUT_TOKENS = _env_int("RATE_LIMIT_OUTPUT_TOKENS", 512)
+
+# ============== 重试（provider 调用） ==============
+# 仅重试临时错误（429 / 5xx / 连接错误 / 超时）；指数退避 + 随机抖动，优先遵循服务端 Retry-After
+RETRY_MAX_ATTEMPTS = _env_int("RETRY_MAX_ATTEMPTS", 3)
+RETRY_BASE_DELAY = _env_float("RETRY_BASE_DELAY", 0.5)
+RETRY_MAX_DELAY = _env_float("RETRY_MAX_DELAY", 8.0)
+# 一次调用（含所有重试和等待）的总时限（秒）
+RETRY_DEADLINE = _env_float("RETRY_DEADLINE", 45.0)
+
+# ============== 调用指标（/metrics） ==============
+# 各 worker 定期把累计指标写入 DATA_DIR 下的 SQLite，/metrics 汇总所有 worker
+METRICS_DB_PATH = Path(os.environ.get("METRICS_DB_PATH", str(DATA_DIR / "metrics.db")))
+METRICS_FLUSH_INTERVAL = _env_float("METRICS_FLUSH_INTERVAL", 10.0)
+# 设置后 /metrics 需要 "Authorization: Bearer <token>"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+# 覆盖模型单价（JSON，美元 / 百万 token，[prompt, completion]），例如 '{"gpt-4o": [2.5, 10]}'
+MODEL_PRICES = os.environ.get("MODEL_PRICES", "")
+
+# ============== 录制 / 回放（离线基准测试） ==============
+# off | record | replay：record 把 OpenAI / Gemini / SerpAPI / 网页抓取的每次网络交互写入 CASSETTE_DIR，
+# replay 从磁盘回放（不走网络，未录制的请求直接报错）
+CASSETTE_MODE = os.environ.get("CASSETTE_MODE", "off").lower()
+CASSETTE_DIR = Path(os.environ.get("CASSETTE_DIR", str(DATA_DIR / "cassettes")))
+# 回放时每次交互注入的延迟：固定毫秒数 + 录制时实际耗时 x 倍数（0 = 不模拟 provider 耗时）
+CASSETTE_LATENCY_MS = _env_float("CASSETTE_LATENCY_MS", 0.0)
+CASSETTE_LATENCY_SCALE = _env_float("CASSETTE_LATENCY_SCALE", 0.0)
+
+# ============== SerpAPI 结果缓存 ==============
+# 相同查询（规范化后）跨用户、跨 worker 复用 SerpAPI 响应（DATA_DIR 下的 SQLite）
+SERPAPI_CACHE_ENABLED = os.environ.get("SERPAPI_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SERPAPI_CACHE_DB_PATH = Path(os.environ.get("SERPAPI_CACHE_DB_PATH", str(DATA_DIR / "serpapi_cache.db")))
+# 按查询类型覆盖 TTL（秒），类型：linkedin_profile / news / google / default，例如 "linkedin_profile=86400,news=0"
+SERPAPI_CACHE_TTLS = os.environ.get("SERPAPI_CACHE_TTLS", "")
+# 无结果（如"找不到 LinkedIn 主页"）的负缓存时长（秒）
+SERPAPI_CACHE_NEGATIVE_TTL = _env_int("SERPAPI_CACHE_NEGATIVE_TTL", 6 * 3600)
+
+# ============== 收件人深度搜索 ==============
+# 深度搜索的查询并发执行，共享一个总时限（秒）；超时未返回的查询直接放弃
+DEEP_SEARCH_DEADLINE = _env_float("DEEP_SEARCH_DEADLINE", 12.0)
+# 去重后的结果达到该数量即开始 LLM 提取，不再等待较慢的查询（0 = 等待全部查询）
+DEEP_SEARCH_MIN_RESULTS = _env_int("DEEP_SEARCH_MIN_RESULTS", 10)
+
+# ============== SerpAPI 连接池 ==============
+# 每个 worker 一个 keep-alive 连接池，复用 TCP+TLS 连接
+SERPAPI_POOL_SIZE = _env_int("SERPAPI_POOL_SIZE", 10)
+# 连接超时与读取超时分开设置（秒）：连不上快速失败，慢查询仍有完整的读取时间
+SERPAPI_CONNECT_TIMEOUT = _env_float("SERPAPI_CONNECT_TIMEOUT", 3.05)
+SERPAPI_READ_TIMEOUT = _env_float("SERPAPI_READ_TIMEOUT", 15.0)
+
+# ============== 本地人物索引 ==============
+# 所有搜索路径发现的 LinkedIn 主页写入 DATA_DIR 下的 SQLite FTS5 索引；找人时先查本地，不够再调 SerpAPI
+PEOPLE_INDEX_ENABLED = os.environ.get("PEOPLE_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+PEOPLE_INDEX_DB_PATH = Path(os.environ.get("PEOPLE_INDEX_DB_PATH", str(DATA_DIR / "people_index.db")))
+# 只使用最近 N 天内被搜索结果再次确认过的人（职位/公司会变化）
+PEOPLE_INDEX_FRESH_DAYS = _env_float("PEOPLE_INDEX_FRESH_DAYS", 30.0)
+
+# ============== 候选人预排序与评分 ==============
+# SerpAPI 候选人先用 BM25 本地排序，只有前 K 个交给 LLM 评分，其余使用本地分数（0 = 全部交给 LLM）
+PRERANK_TOP_K = _env_int("PRERANK_TOP_K", 8)
+# 候选人分批并发评分：每批人数（0 = 一次调用评全部）和每批超时（秒，超时的批次使用默认分数）
+SCORING_BATCH_SIZE = _env_int("SCORING_BATCH_SIZE", 5)
+SCORING_BATCH_TIMEOUT = _env_float("SCORING_BATCH_TIMEOUT", 30.0)
+
+# ============== LinkedIn 搜索查询规划 ==============
+# 组合查询之外再生成互补查询（按机构 / 职位 / 去掉地区），并发执行，凑够人数即停止
+SERPAPI_PLANNER_MAX_QUERIES = _env_int("SERPAPI_PLANNER_MAX_QUERIES", 6)
+SERPAPI_PLANNER_CONCURRENCY = _env_int("SERPAPI_PLANNER_CONCURRENCY", 3)
+
+# ============== 推荐结果分页（加载更多） ==============
+# 游标保存在 DATA_DIR 下的 SQLite：已评分但未展示的候选人、SerpAPI 翻页位置、已展示的人
+RECOMMENDATION_CURSOR_DB_PATH = Path(
+    os.environ.get("RECOMMENDATION_CURSOR_DB_PATH", str(DATA_DIR / "recommendation_cursors.db"))
+)
+# 游标有效期（秒），过期后"加载更多"需要重新搜索
+RECOMMENDATION_CURSOR_TTL = _env_int("RECOMMENDATION_CURSOR_TTL", 6 * 3600)
+# 每次"加载更多"最多请求的 SerpAPI 页数
+RECOMMENDATION_CURSOR_MAX_PAGES = _env_int("RECOMMENDATION_CURSOR_MAX_PAGES", 2)
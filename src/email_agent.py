@@ -1,10 +1,15 @@
 from __future__ import annotations
 
+import asyncio
+import concurrent.futures
+import copy
+import itertools
 import json
 import os
+import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Iterator
 
 # Optional Google/Gemini dependencies (keep import-time light for tests/CI)
 try:
@@ -18,7 +23,7 @@ try:
 except ModuleNotFoundError:  # pragma: no cover
     genai_new = None  # type: ignore
     genai_types = None  # type: ignore
-from openai import OpenAI
+from openai import AsyncOpenAI
 from PyPDF2 import PdfReader
 
 from config import (
@@ -32,6 +37,48 @@ from config import (
     OPENAI_EMAIL_MODEL,
     USE_OPENAI_AS_PRIMARY,
     OPENAI_DEFAULT_MODEL,
+    PROVIDER_CONCURRENCY,
+    DEEP_SEARCH_DEADLINE,
+    DEEP_SEARCH_MIN_RESULTS,
+    PRERANK_TOP_K,
+    SCORING_BATCH_SIZE,
+    SCORING_BATCH_TIMEOUT,
+    SERPAPI_PLANNER_CONCURRENCY,
+    SERPAPI_PLANNER_MAX_QUERIES,
+    RECOMMENDATION_CURSOR_MAX_PAGES,
+)
+
+from src.services.async_runtime import async_runtime, iterate_sync, run_sync
+from src.services.cassette import cassette
+from src.services.circuit_breaker import is_provider_failure, stage_breakers
+from src.services.llm_cache import llm_cache
+from src.services.llm_clients import llm_clients
+from src.services.metrics import llm_metrics, record_usage
+from src.services.prompt_layout import PromptPrefix, prompt_accounting
+from src.services.rate_limiter import rate_limiter
+from src.services.retry_policy import retry_policy
+from src.services.serpapi_client import SerpAPIError, raise_for_error, serpapi_client, serpapi_key
+from src.services.hedging import hedge_policy
+from src.services.json_extract import extract_json
+from src.services.model_router import model_router, provider_for_model
+from src.services.people_index import normalize_profile_url, people_index
+from src.services.prerank import local_match_score, prerank
+from src.services.recommendation_cursor import (
+    RecommendationCursor,
+    candidate_keys,
+    recommendation_cursors,
+    search_key,
+)
+from src.services.single_flight import llm_flight, make_flight_key, serpapi_flight
+from src.services.structured_output import (
+    DEEP_SEARCH,
+    PROFILE,
+    QUESTIONNAIRE,
+    RECOMMENDATIONS,
+    SCORED_CANDIDATES,
+    SchemaError,
+    cache_validator,
+    structured_output,
 )
 
 # Prompt 数据收集 (可选)
@@ -292,8 +339,8 @@ def _profile_from_dict(profile_data: dict[str, Any], *, raw_text: str) -> Profil
     )
 
 
-def _configure_gemini() -> None:
-    """Configure Gemini API with the API key from environment."""
+def _gemini_api_key() -> str:
+    """Return the Gemini API key from environment."""
     if genai is None:
         raise ModuleNotFoundError(
             "google-generativeai is not installed. Install dependencies with `python -m pip install -r requirements.txt`."
@@ -303,103 +350,242 @@ def _configure_gemini() -> None:
         raise ValueError(
             "Gemini API key not found. Please set GEMINI_API_KEY or GOOGLE_API_KEY environment variable."
         )
-    genai.configure(api_key=api_key)
+    return api_key
 
 
-def _call_gemini(prompt: str, *, model: str = DEFAULT_MODEL, json_mode: bool = False) -> str:
-    """Call Gemini API and return the response text."""
-    _configure_gemini()
-    
-    generation_config = {}
-    if json_mode:
-        generation_config["response_mime_type"] = "application/json"
-    
-    gemini_model = genai.GenerativeModel(model, generation_config=generation_config or None)
-    response = gemini_model.generate_content(prompt)
+async def _acoalesced_llm_call(
+    caller: str | None,
+    *,
+    provider: str,
+    model: str,
+    temperature: float | None,
+    json_mode: bool,
+    prompt: str | list[str],
+    call: Callable[[], Awaitable[str]],
+) -> str:
+    """
+    Response cache + single-flight around one provider request.
+
+    Identical concurrent requests (same provider/model/temperature/json_mode/prompt)
+    share a single cache lookup and network call. Transient errors are retried
+    (`retry_policy`); each attempt takes rate-limit capacity, and per-attempt
+    network latency (not cache hits or queueing) feeds the model router.
+    Wall time, cache status, outcome and token usage go to `llm_metrics`.
+    JSON replies are cached only if they fit the caller's schema (`cache_validator`).
+    """
+    async def _attempt() -> str:
+        await rate_limiter.aacquire(provider, model=model, tokens=rate_limiter.estimate_cost(prompt))
+        start = time.perf_counter()
+        try:
+            result = await cassette.acall(
+                "llm",
+                {"provider": provider, "model": model, "temperature": temperature, "json_mode": json_mode, "prompt": prompt},
+                call,
+            )
+        except Exception:
+            model_router.record(caller, model, time.perf_counter() - start, ok=False)
+            raise
+        model_router.record(caller, model, time.perf_counter() - start)
+        return result
+
+    key = llm_cache.make_key(
+        provider=provider, model=model, temperature=temperature, json_mode=json_mode, prompt=prompt
+    )
+    task = model_router.task_for(caller) or caller or "other"
+    # Stays "coalesced" unless this caller leads the flight (then "hit" or "miss")
+    with llm_metrics.track(task, provider, model, cache="coalesced") as metrics_call:
+        async def _timed_call() -> str:
+            metrics_call.cache = "miss"
+            return await retry_policy.acall(provider, _attempt)
+
+        async def _lookup() -> str:
+            metrics_call.cache = "hit"
+            return await llm_cache.aget_or_call(
+                caller,
+                provider=provider,
+                model=model,
+                temperature=temperature,
+                json_mode=json_mode,
+                prompt=prompt,
+                call=_timed_call,
+                validate=cache_validator(caller, json_mode),
+            )
+
+        return await llm_flight.ado(key, _lookup)
+
+
+async def _acall_gemini(prompt: str, *, model: str = DEFAULT_MODEL, json_mode: bool = False) -> str:
+    """Call Gemini API asynchronously and return the response text."""
+    gemini_model = llm_clients.gemini_model(_gemini_api_key(), model, json_mode=json_mode)
+    response = await async_runtime.limited("gemini", lambda: gemini_model.generate_content_async(prompt))
+    record_usage(getattr(response, "usage_metadata", None))
     
     if not response.text:
         raise RuntimeError("Gemini response did not contain any content")
     return response.text
 
 
-def _call_llm(prompt: str, *, json_mode: bool = False, model: str | None = None) -> str:
+async def _astream_gemini(prompt: str, *, model: str = DEFAULT_MODEL) -> AsyncIterator[str]:
+    """Stream a Gemini completion, yielding text chunks as they arrive (never cached)."""
+    gemini_model = llm_clients.gemini_model(_gemini_api_key(), model)
+
+    async def _open_stream():
+        await rate_limiter.aacquire("gemini", model=model, tokens=rate_limiter.estimate_cost(prompt))
+        return await gemini_model.generate_content_async(prompt, stream=True)
+
+    async def _texts() -> AsyncIterator[str]:
+        usage = None
+        async with async_runtime.semaphore("gemini"):
+            # Only opening the stream is retried; nothing is replayed once tokens flow
+            response = await retry_policy.acall("gemini_stream", _open_stream)
+            async for chunk in response:
+                # usage_metadata is cumulative; the last chunk carries the totals
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. safety/finish metadata)
+                    continue
+                if text:
+                    yield text
+        record_usage(usage)
+
+    request = {"provider": "gemini", "model": model, "prompt": prompt}
+    with llm_metrics.track("email", "gemini", model, cache="bypass"):
+        async for text in cassette.astream("llm_stream", request, _texts):
+            yield text
+
+
+def _call_gemini(prompt: str, *, model: str = DEFAULT_MODEL, json_mode: bool = False) -> str:
+    """Call Gemini API and return the response text."""
+    return run_sync(_acall_gemini(prompt, model=model, json_mode=json_mode))
+
+
+async def _acall_llm_with_model(prompt: str, *, json_mode: bool, model: str, caller: str | None) -> str:
+    """Dispatch one call to the provider that serves `model`."""
+    if provider_for_model(model) == "openai":
+        if json_mode:
+            return await _acall_openai_json(prompt, model=model, caller=caller)
+        # For non-JSON mode, use chat with a generic system prompt
+        return await _acall_openai_chat(
+            "You are a helpful assistant.",
+            prompt,
+            model=model,
+            temperature=0.7,
+            caller=caller,
+        )
+    return await _acoalesced_llm_call(
+        caller,
+        provider="gemini",
+        model=model,
+        temperature=None,
+        json_mode=json_mode,
+        prompt=prompt,
+        call=lambda: _acall_gemini(prompt, model=model, json_mode=json_mode),
+    )
+
+
+def _is_valid_llm_response(text: str, *, json_mode: bool) -> bool:
+    """Whether a (hedged) response is usable: non-empty, and parseable JSON in JSON mode."""
+    if not text or not text.strip():
+        return False
+    if not json_mode:
+        return True
+    try:
+        json.loads(_extract_json_from_text(text))
+    except (json.JSONDecodeError, TypeError):
+        return False
+    return True
+
+
+async def _ahedged_llm_call(prompt: str, *, json_mode: bool, model: str, caller: str | None) -> str:
+    """
+    Call `model`; with hedging enabled (LLM_HEDGING_ENABLED), also fire the prompt at the
+    other provider if `model` has not answered by its observed p90 for this task.
+    """
+    task = model_router.task_for(caller)
+    hedge_model = hedge_policy.secondary_model(provider_for_model(model)) if task else None
+    if not task or not hedge_model or hedge_model == model:
+        return await _acall_llm_with_model(prompt, json_mode=json_mode, model=model, caller=caller)
+
+    route = model_router.route(task)
+    delay = hedge_policy.delay(
+        model_router.percentile(caller, model, 90),
+        route.latency_budget_s if route else None,
+    )
+    return await hedge_policy.race(
+        task,
+        lambda: _acall_llm_with_model(prompt, json_mode=json_mode, model=model, caller=caller),
+        lambda: _acall_llm_with_model(prompt, json_mode=json_mode, model=hedge_model, caller=caller),
+        delay=delay,
+        is_valid=lambda text: _is_valid_llm_response(text, json_mode=json_mode),
+    )
+
+
+async def _acall_llm(
+    prompt: str,
+    *,
+    json_mode: bool = False,
+    model: str | None = None,
+    caller: str | None = None,
+) -> str:
     """
-    Unified LLM call function that routes to OpenAI or Gemini based on configuration.
+    Unified LLM call function that routes to OpenAI or Gemini.
+
+    Without an explicit `model`, the model comes from the task router
+    (src.services.model_router) for `caller`, and a failed call is retried once on
+    the task's fallback model. Unrouted callers use the configured provider default.
+    Routed calls may additionally be hedged across providers (see src.services.hedging).
     
     Args:
         prompt: The prompt to send to the LLM
         json_mode: Whether to request JSON response
-        model: Optional model override (if None, uses default based on provider)
+        model: Optional model override (bypasses routing and fallback)
+        caller: Name of the calling function; selects the cache policy and task route
         
     Returns:
         The LLM response text
     """
-    if USE_OPENAI_AS_PRIMARY:
-        # Use OpenAI
-        actual_model = model or OPENAI_DEFAULT_MODEL
-        if json_mode:
-            return _call_openai_json(prompt, model=actual_model)
-        else:
-            # For non-JSON mode, use chat with a generic system prompt
-            client = _get_openai_client()
-            response = client.chat.completions.create(
-                model=actual_model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.7,
-            )
-            content = response.choices[0].message.content
-            if not content:
-                raise RuntimeError("OpenAI response did not contain any content")
-            return content
-    else:
-        # Use Gemini
-        actual_model = model or DEFAULT_MODEL
-        return _call_gemini(prompt, model=actual_model, json_mode=json_mode)
+    if model:
+        return await _acall_llm_with_model(prompt, json_mode=json_mode, model=model, caller=caller)
+
+    default_model = OPENAI_DEFAULT_MODEL if USE_OPENAI_AS_PRIMARY else DEFAULT_MODEL
+    actual_model = model_router.model_for(caller, default=default_model) or default_model
+    try:
+        return await _ahedged_llm_call(prompt, json_mode=json_mode, model=actual_model, caller=caller)
+    except (ValueError, ModuleNotFoundError):
+        # Missing API keys / packages: a different model will not help
+        raise
+    except Exception as e:
+        fallback_model = model_router.fallback_for(caller, actual_model)
+        if not fallback_model:
+            raise
+        print(f"[ModelRouter] {actual_model} failed for {caller} ({e}); retrying with {fallback_model}")
+        return await _acall_llm_with_model(prompt, json_mode=json_mode, model=fallback_model, caller=caller)
+
+
+def _call_llm(
+    prompt: str,
+    *,
+    json_mode: bool = False,
+    model: str | None = None,
+    caller: str | None = None,
+) -> str:
+    """Blocking wrapper over `_acall_llm` for synchronous callers."""
+    return run_sync(_acall_llm(prompt, json_mode=json_mode, model=model, caller=caller))
 
 
 def _extract_json_from_text(text: str) -> str:
     """
     Extract JSON from text that may contain markdown code blocks or other content.
+
+    Single string-aware pass (see src.services.json_extract); returns `text`
+    unchanged if no JSON is found.
     """
-    import re
-    
-    # Try to find JSON in markdown code blocks
-    json_block_pattern = r'```(?:json)?\s*\n?([\s\S]*?)\n?```'
-    matches = re.findall(json_block_pattern, text)
-    if matches:
-        for match in matches:
-            try:
-                json.loads(match.strip())
-                return match.strip()
-            except json.JSONDecodeError:
-                continue
-    
-    # Try to find raw JSON object
-    # Look for outermost { ... }
-    brace_start = text.find('{')
-    if brace_start != -1:
-        depth = 0
-        for i, char in enumerate(text[brace_start:], brace_start):
-            if char == '{':
-                depth += 1
-            elif char == '}':
-                depth -= 1
-                if depth == 0:
-                    try:
-                        candidate = text[brace_start:i+1]
-                        json.loads(candidate)
-                        return candidate
-                    except json.JSONDecodeError:
-                        continue
-    
-    # Return original text if no JSON found
-    return text
+    return extract_json(text)
 
 
-def _call_gemini_with_search(prompt: str, *, model: str = GEMINI_SEARCH_MODEL, json_mode: bool = False, return_grounding_urls: bool = False) -> str | tuple[str, list[str]]:
+async def _acall_gemini_with_search(prompt: str, *, model: str = GEMINI_SEARCH_MODEL, json_mode: bool = False, return_grounding_urls: bool = False) -> str | tuple[str, list[str]]:
     """
     Call Gemini API with Google Search grounding enabled using the new google-genai package.
     This allows the model to search the web for real-time information.
@@ -426,74 +612,106 @@ def _call_gemini_with_search(prompt: str, *, model: str = GEMINI_SEARCH_MODEL, j
     if not api_key:
         raise ValueError("GEMINI_API_KEY or GOOGLE_API_KEY environment variable is required")
     
-    client = genai_new.Client(api_key=api_key)
+    client = llm_clients.async_genai_client(api_key)
     
     # Create GoogleSearch tool
     google_search_tool = genai_types.Tool(
         google_search=genai_types.GoogleSearch()
     )
     
-    # Generate content with search
-    response = client.models.generate_content(
-        model=model,
-        contents=prompt,
-        config=genai_types.GenerateContentConfig(
-            tools=[google_search_tool]
+    async def _send() -> list:
+        response = await async_runtime.limited(
+            "gemini",
+            lambda: client.models.generate_content(
+                model=model,
+                contents=prompt,
+                config=genai_types.GenerateContentConfig(
+                    tools=[google_search_tool]
+                ),
+            ),
         )
-    )
+        record_usage(getattr(response, "usage_metadata", None))
+        # Plain [text, grounding URLs] so the result can be recorded / replayed
+        return [response.text, _extract_grounding_urls(response)]
+
+    async def _attempt() -> list:
+        await rate_limiter.aacquire("gemini", model=model, tokens=rate_limiter.estimate_cost(prompt))
+        return await cassette.acall("gemini_search", {"model": model, "prompt": prompt}, _send)
+
+    # Generate content with search
+    with llm_metrics.track("recommendation_search", "gemini", model, cache="coalesced") as metrics_call:
+        async def _request():
+            metrics_call.cache = "miss"
+            return await retry_policy.acall("gemini_search", _attempt)
+
+        response_text, grounding_urls = await llm_flight.ado(make_flight_key("gemini_search", model, prompt), _request)
     
-    if not response.text:
+    if not response_text:
         raise RuntimeError("Gemini response with search did not contain any content")
     
     # Extract JSON if requested
-    result_text = response.text
+    result_text = response_text
     if json_mode:
-        result_text = _extract_json_from_text(response.text)
+        result_text = _extract_json_from_text(response_text)
     
     if return_grounding_urls:
-        grounding_urls = []
-        try:
-            # Extract grounding metadata from response (new API structure)
-            if hasattr(response, 'candidates') and response.candidates:
-                candidate = response.candidates[0]
-                if hasattr(candidate, 'grounding_metadata') and candidate.grounding_metadata:
-                    metadata = candidate.grounding_metadata
-                    # Try to get grounding chunks/sources
-                    if hasattr(metadata, 'grounding_chunks') and metadata.grounding_chunks:
-                        for chunk in metadata.grounding_chunks:
-                            if hasattr(chunk, 'web') and chunk.web:
-                                if hasattr(chunk.web, 'uri') and chunk.web.uri:
-                                    grounding_urls.append(chunk.web.uri)
-                    # Try grounding_supports
-                    if hasattr(metadata, 'grounding_supports') and metadata.grounding_supports:
-                        for support in metadata.grounding_supports:
-                            if hasattr(support, 'grounding_chunk_indices'):
-                                pass  # These reference the chunks above
-                    # Try web_search_queries to see what was searched
-                    if hasattr(metadata, 'web_search_queries') and metadata.web_search_queries:
-                        print(f"[Grounding] Search queries: {metadata.web_search_queries}")
-        except Exception as e:
-            print(f"[Grounding] Could not extract grounding URLs: {e}")
-        
-        print(f"[Grounding] Found {len(grounding_urls)} source URLs from search")
-        return result_text, grounding_urls
+        return result_text, list(grounding_urls)
     
     return result_text
 
 
-def _get_openai_client() -> OpenAI:
+def _call_gemini_with_search(prompt: str, *, model: str = GEMINI_SEARCH_MODEL, json_mode: bool = False, return_grounding_urls: bool = False) -> str | tuple[str, list[str]]:
+    """Blocking wrapper over `_acall_gemini_with_search`."""
+    return run_sync(
+        _acall_gemini_with_search(
+            prompt,
+            model=model,
+            json_mode=json_mode,
+            return_grounding_urls=return_grounding_urls,
+        )
+    )
+
+
+def _extract_grounding_urls(response: Any) -> list[str]:
+    """Collect grounding source URLs from a google-genai search response."""
+    grounding_urls: list[str] = []
+    try:
+        # Extract grounding metadata from response (new API structure)
+        if hasattr(response, 'candidates') and response.candidates:
+            candidate = response.candidates[0]
+            if hasattr(candidate, 'grounding_metadata') and candidate.grounding_metadata:
+                metadata = candidate.grounding_metadata
+                # Try to get grounding chunks/sources
+                if hasattr(metadata, 'grounding_chunks') and metadata.grounding_chunks:
+                    for chunk in metadata.grounding_chunks:
+                        if hasattr(chunk, 'web') and chunk.web:
+                            if hasattr(chunk.web, 'uri') and chunk.web.uri:
+                                grounding_urls.append(chunk.web.uri)
+                # Try web_search_queries to see what was searched
+                if hasattr(metadata, 'web_search_queries') and metadata.web_search_queries:
+                    print(f"[Grounding] Search queries: {metadata.web_search_queries}")
+    except Exception as e:
+        print(f"[Grounding] Could not extract grounding URLs: {e}")
+    
+    print(f"[Grounding] Found {len(grounding_urls)} source URLs from search")
+    return grounding_urls
+
+
+def _get_async_openai_client() -> AsyncOpenAI:
     api_key = os.environ.get("OPENAI_API_KEY")
     if not api_key:
         raise ValueError("OPENAI_API_KEY environment variable is required for OpenAI models")
-    return OpenAI(api_key=api_key)
+    return llm_clients.async_openai(api_key)
 
 
-def _call_openai_chat(
+async def _acall_openai_chat(
     system_content: str,
     user_content: str,
     *,
     model: str = OPENAI_EMAIL_MODEL,
     temperature: float = 0.7,
+    caller: str | None = None,
+    prefix: PromptPrefix | None = None,
 ) -> str:
     """
     Call OpenAI chat completion for email generation.
@@ -503,67 +721,206 @@ def _call_openai_chat(
         user_content: User message content  
         model: OpenAI model to use (default: gpt-4o)
         temperature: Sampling temperature
+        caller: Name of the calling function; selects the response-cache policy
+        prefix: Static prompt prefix of `system_content`, if any (enables provider
+            prompt-cache routing and cached-token accounting)
         
     Returns:
         Generated text response
     """
-    client = _get_openai_client()
-    response = client.chat.completions.create(
+    async def _request() -> str:
+        client = _get_async_openai_client()
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_content},
+                {"role": "user", "content": user_content},
+            ],
+            temperature=temperature,
+            **_openai_cache_kwargs(prefix),
+        )
+        _record_openai_usage(prefix, getattr(response, "usage", None))
+        record_usage(getattr(response, "usage", None))
+        content = response.choices[0].message.content
+        if not content:
+            raise RuntimeError("OpenAI response did not contain any content")
+        return content
+
+    return await _acoalesced_llm_call(
+        caller,
+        provider="openai",
         model=model,
-        messages=[
-            {"role": "system", "content": system_content},
-            {"role": "user", "content": user_content},
-        ],
         temperature=temperature,
+        json_mode=False,
+        prompt=[system_content, user_content],
+        call=lambda: async_runtime.limited("openai", _request),
     )
-    content = response.choices[0].message.content
-    if not content:
-        raise RuntimeError("OpenAI response did not contain any content")
-    return content
 
 
-def _call_openai_json(prompt: str, *, model: str) -> str:
+def _call_openai_chat(
+    system_content: str,
+    user_content: str,
+    *,
+    model: str = OPENAI_EMAIL_MODEL,
+    temperature: float = 0.7,
+    caller: str | None = None,
+    prefix: PromptPrefix | None = None,
+) -> str:
+    """Blocking wrapper over `_acall_openai_chat`."""
+    return run_sync(
+        _acall_openai_chat(
+            system_content, user_content, model=model, temperature=temperature, caller=caller, prefix=prefix
+        )
+    )
+
+
+def _openai_cache_kwargs(prefix: PromptPrefix | None) -> dict[str, Any]:
+    """Route requests sharing a static prefix to the same provider prompt cache."""
+    if prefix is None:
+        return {}
+    # extra_body keeps this working on SDK versions without the typed parameter
+    return {"extra_body": {"prompt_cache_key": prefix.cache_key}}
+
+
+def _record_openai_usage(prefix: PromptPrefix | None, usage: Any) -> None:
+    if prefix is None or usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    prompt_accounting.record_usage(
+        prefix.name,
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        cached_tokens=getattr(details, "cached_tokens", 0) or 0,
+    )
+
+
+async def _astream_openai_chat(
+    system_content: str,
+    user_content: str,
+    *,
+    model: str = OPENAI_EMAIL_MODEL,
+    temperature: float = 0.7,
+    prefix: PromptPrefix | None = None,
+) -> AsyncIterator[str]:
+    """Stream an OpenAI chat completion, yielding text deltas as they arrive (never cached)."""
+    client = _get_async_openai_client()
+
+    async def _open_stream():
+        await rate_limiter.aacquire(
+            "openai", model=model, tokens=rate_limiter.estimate_cost([system_content, user_content])
+        )
+        return await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_content},
+                {"role": "user", "content": user_content},
+            ],
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+            **_openai_cache_kwargs(prefix),
+        )
+
+    async def _deltas() -> AsyncIterator[str]:
+        async with async_runtime.semaphore("openai"):
+            # Only opening the stream is retried; nothing is replayed once tokens flow
+            stream = await retry_policy.acall("openai_stream", _open_stream)
+            async for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    _record_openai_usage(prefix, chunk.usage)
+                    record_usage(chunk.usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+
+    request = {
+        "provider": "openai",
+        "model": model,
+        "temperature": temperature,
+        "prompt": [system_content, user_content],
+    }
+    with llm_metrics.track("email", "openai", model, cache="bypass"):
+        async for delta in cassette.astream("llm_stream", request, _deltas):
+            yield delta
+
+
+async def _acall_openai_json(prompt: str, *, model: str, caller: str | None = None) -> str:
     """Call OpenAI chat completion and return the response text."""
-    client = _get_openai_client()
-    response = client.chat.completions.create(
+    async def _request() -> str:
+        client = _get_async_openai_client()
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are a concise assistant that returns strict JSON only."},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.4,
+            response_format={"type": "json_object"},
+        )
+        record_usage(getattr(response, "usage", None))
+        content = response.choices[0].message.content
+        if not content:
+            raise RuntimeError("OpenAI response did not contain any content")
+        return content
+
+    return await _acoalesced_llm_call(
+        caller,
+        provider="openai",
         model=model,
-        messages=[
-            {"role": "system", "content": "You are a concise assistant that returns strict JSON only."},
-            {"role": "user", "content": prompt},
-        ],
         temperature=0.4,
-        response_format={"type": "json_object"},
+        json_mode=True,
+        prompt=prompt,
+        call=lambda: async_runtime.limited("openai", _request),
     )
-    content = response.choices[0].message.content
-    if not content:
-        raise RuntimeError("OpenAI response did not contain any content")
-    return content
 
 
-def _call_openai_json_with_web_search(prompt: str, *, model: str) -> str:
+def _call_openai_json(prompt: str, *, model: str, caller: str | None = None) -> str:
+    """Blocking wrapper over `_acall_openai_json`."""
+    return run_sync(_acall_openai_json(prompt, model=model, caller=caller))
+
+
+async def _acall_openai_json_with_web_search(prompt: str, *, model: str) -> str:
     """
     Call OpenAI chat completion with built-in web_search tool support.
     """
-    client = _get_openai_client()
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are a concise research assistant. "
-                    "Use the web_search tool to gather real names and facts before answering. "
-                    "Respond with strict JSON only."
-                ),
-            },
-            {"role": "user", "content": prompt},
-        ],
-        tools=[{"type": "web_search"}],
-        tool_choice="auto",
-        temperature=0.4,
-        response_format={"type": "json_object"},
-    )
-    content = response.choices[0].message.content
+    client = _get_async_openai_client()
+
+    async def _send() -> str | None:
+        response = await async_runtime.limited(
+            "openai",
+            lambda: client.chat.completions.create(
+                model=model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": (
+                            "You are a concise research assistant. "
+                            "Use the web_search tool to gather real names and facts before answering. "
+                            "Respond with strict JSON only."
+                        ),
+                    },
+                    {"role": "user", "content": prompt},
+                ],
+                tools=[{"type": "web_search"}],
+                tool_choice="auto",
+                temperature=0.4,
+                response_format={"type": "json_object"},
+            ),
+        )
+        record_usage(getattr(response, "usage", None))
+        return response.choices[0].message.content
+
+    async def _attempt() -> str | None:
+        await rate_limiter.aacquire("openai", model=model, tokens=rate_limiter.estimate_cost(prompt))
+        return await cassette.acall("openai_web_search", {"model": model, "prompt": prompt}, _send)
+
+    with llm_metrics.track("recommendation_search", "openai", model, cache="coalesced") as metrics_call:
+        async def _request():
+            metrics_call.cache = "miss"
+            return await retry_policy.acall("openai_web_search", _attempt)
+
+        content = await llm_flight.ado(make_flight_key("openai_web_search", model, prompt), _request)
     if not content:
         raise RuntimeError("OpenAI response did not contain any content")
     return content
@@ -583,11 +940,11 @@ def extract_profile_from_text(
         f"Resume text:\n{cleaned_text}\n\nReturn JSON only."
     )
 
-    content = _call_llm(prompt, json_mode=True)
+    content = _call_llm(prompt, json_mode=True, caller="extract_profile_from_text")
     
     try:
-        profile_data = json.loads(content)
-    except json.JSONDecodeError as exc:
+        profile_data = structured_output.parse(content, PROFILE)
+    except SchemaError as exc:
         raise RuntimeError(f"Failed to parse profile extraction response as JSON: {exc}") from exc
 
     return _profile_from_dict(profile_data, raw_text=cleaned_text)
@@ -600,24 +957,11 @@ def extract_profile_from_pdf(
     return extract_profile_from_text(pdf_text, model=model)
 
 
-def build_prompt(
-    sender: SenderProfile,
-    receiver: ReceiverProfile,
-    goal: str,
-    template: str | None = None,
-) -> list[dict[str, str]]:
-    goal_text = goal.strip()
-    if not goal_text:
-        raise ValueError("Goal must be a non-empty string")
-
-    def _format_section(title: str, items: list[str]) -> str:
-        if not items:
-            return f"- {title}: (not specified)\n"
-        bullet_points = "\n".join(f"  • {item}" for item in items)
-        return f"- {title}:\n{bullet_points}\n"
+# Static prompt prefixes (see src.services.prompt_layout): keep these byte-stable and
+# bump the version on any edit so provider-side prompt caching is not silently lost.
 
-    # Style guide based on successful cold email templates
-    style_guide = """
+# Style guide based on successful cold email templates
+_EMAIL_STYLE_GUIDE = """
 ## Email Style Guide (based on proven templates)
 
 ### Structure (follow this order):
@@ -651,8 +995,10 @@ def build_prompt(
 - Vague asks (always specify time: "15-20 minute call")
 """
 
-    # Base system instruction
-    system_content = (
+EMAIL_SYSTEM_PREFIX = PromptPrefix(
+    name="build_prompt",
+    version="v2",
+    text=(
         "You craft sincere, concise first-contact cold emails that help two people build a genuine connection. "
         "Use only facts present in the sender/receiver details or explicitly provided evidence; do not invent relationships, meetings, achievements, or affiliations. "
         "If information is missing, keep it generic rather than guessing. "
@@ -667,20 +1013,41 @@ def build_prompt(
         "[Email body...]\n\n"
         "Best regards,\n"
         "[Sender Name]\n\n"
-        + style_guide
-    )
+        + _EMAIL_STYLE_GUIDE
+        # Always present (not only with a template) so the system message stays identical
+        + "\n\nWhen a user-provided email template is included, you must use it as the primary structure and tone: "
+        "keep its overall flow and key phrases where reasonable, but adapt and fill in details using the sender "
+        "and receiver information so the result is a polished, ready-to-send cold email."
+    ),
+)
 
-    # If a user template is provided, tell the model how to use it
-    if template and template.strip():
-        system_content += (
-            "\n\nWhen a user-provided email template is included, you must use it as the primary structure and tone: "
-            "keep its overall flow and key phrases where reasonable, but adapt and fill in details using the sender "
-            "and receiver information so the result is a polished, ready-to-send cold email."
-        )
+
+def build_prompt(
+    sender: SenderProfile,
+    receiver: ReceiverProfile,
+    goal: str,
+    template: str | None = None,
+) -> list[dict[str, str]]:
+    """
+    Build [system, user] messages for an email.
+
+    The system message is always `EMAIL_SYSTEM_PREFIX.text` (byte-identical across
+    requests, so the provider can cache it); everything request-specific lives in
+    the user message.
+    """
+    goal_text = goal.strip()
+    if not goal_text:
+        raise ValueError("Goal must be a non-empty string")
+
+    def _format_section(title: str, items: list[str]) -> str:
+        if not items:
+            return f"- {title}: (not specified)\n"
+        bullet_points = "\n".join(f"  • {item}" for item in items)
+        return f"- {title}:\n{bullet_points}\n"
 
     system_message = {
         "role": "system",
-        "content": system_content,
+        "content": EMAIL_SYSTEM_PREFIX.text,
     }
 
     # Core content describing profiles and goal
@@ -736,10 +1103,50 @@ def build_prompt(
         "content": user_content,
     }
 
+    prompt_accounting.record(EMAIL_SYSTEM_PREFIX, user_content)
     return [system_message, user_message]
 
 
-def generate_email(
+def _email_request(
+    sender: SenderProfile,
+    receiver: ReceiverProfile,
+    goal: str,
+    *,
+    model: str | None,
+    template: str | None,
+) -> tuple[bool, str, str, str]:
+    """Resolve provider/model and prompt for an email: (use_openai, model, system, user)."""
+    messages = build_prompt(sender, receiver, goal, template=template)
+    system_content = messages[0]["content"]
+    user_content = messages[1]["content"]
+    # 按任务路由选择模型（provider 由模型名决定）
+    default_model = OPENAI_EMAIL_MODEL if USE_OPENAI_FOR_EMAIL else DEFAULT_MODEL
+    actual_model = model or model_router.model_for("generate_email", default=default_model) or default_model
+    use_openai = provider_for_model(actual_model) == "openai"
+    return use_openai, actual_model, system_content, user_content
+
+
+def _record_generate_email(
+    session_id: str | None,
+    *,
+    use_openai: bool,
+    actual_model: str,
+    system_content: str,
+    user_content: str,
+    goal: str,
+    result: str,
+) -> None:
+    # 收集 prompt 数据
+    if PROMPT_COLLECTOR_AVAILABLE and prompt_collector and session_id:
+        prompt_collector.record_generate_email(
+            session_id=session_id,
+            prompt=f"[{actual_model}] System: {system_content}\n\nUser: {user_content}",
+            output=result,
+            metadata={"model": actual_model, "goal": goal, "use_openai": use_openai}
+        )
+
+
+async def agenerate_email(
     sender: SenderProfile,
     receiver: ReceiverProfile,
     goal: str,
@@ -748,46 +1155,117 @@ def generate_email(
     template: str | None = None,
     session_id: str | None = None,  # 用于数据收集
 ) -> str:
-    messages = build_prompt(sender, receiver, goal, template=template)
-    system_content = messages[0]["content"]
-    user_content = messages[1]["content"]
-    
-    # 根据配置选择模型
-    use_openai = USE_OPENAI_FOR_EMAIL
+    """Async core of `generate_email`."""
+    use_openai, actual_model, system_content, user_content = _email_request(
+        sender, receiver, goal, model=model, template=template
+    )
     
     if use_openai:
         # 使用 OpenAI GPT-4o
-        actual_model = model or OPENAI_EMAIL_MODEL
-        result = _call_openai_chat(
+        result = await _acall_openai_chat(
             system_content=system_content,
             user_content=user_content,
             model=actual_model,
-            temperature=0.7
+            temperature=0.7,
+            caller="generate_email",
+            prefix=EMAIL_SYSTEM_PREFIX,
         )
     else:
         # 使用 Gemini (fallback)
-        actual_model = model or DEFAULT_MODEL
         prompt = f"System instruction: {system_content}\n\nUser request:\n{user_content}"
-        result = _call_llm(prompt, model=actual_model)
+        result = await _acall_llm(prompt, model=actual_model, caller="generate_email")
     
     result = result.strip()
-    
-    # 收集 prompt 数据
-    if PROMPT_COLLECTOR_AVAILABLE and prompt_collector and session_id:
-        prompt_collector.record_generate_email(
-            session_id=session_id,
-            prompt=f"[{actual_model}] System: {system_content}\n\nUser: {user_content}",
-            output=result,
-            metadata={"model": actual_model, "goal": goal, "use_openai": use_openai}
-        )
-    
+    _record_generate_email(
+        session_id,
+        use_openai=use_openai,
+        actual_model=actual_model,
+        system_content=system_content,
+        user_content=user_content,
+        goal=goal,
+        result=result,
+    )
     return result
 
 
-def generate_questionnaire(purpose: str, field: str, *, model: str = DEFAULT_MODEL) -> list[dict]:
+def generate_email(
+    sender: SenderProfile,
+    receiver: ReceiverProfile,
+    goal: str,
+    *,
+    model: str | None = None,
+    template: str | None = None,
+    session_id: str | None = None,  # 用于数据收集
+) -> str:
+    return run_sync(
+        agenerate_email(sender, receiver, goal, model=model, template=template, session_id=session_id)
+    )
+
+
+async def astream_email(
+    sender: SenderProfile,
+    receiver: ReceiverProfile,
+    goal: str,
+    *,
+    model: str | None = None,
+    template: str | None = None,
+    session_id: str | None = None,  # 用于数据收集
+) -> AsyncIterator[str]:
     """
-    Generate 5 questionnaire questions to quickly build a user profile.
-    Each question has 4 options, with the last option being a custom input.
+    Streaming variant of `agenerate_email`: yields text chunks as the provider emits them.
+
+    The concatenated chunks equal the (unstripped) email text; the stripped text is
+    recorded to prompt_collector once the stream completes.
+    """
+    use_openai, actual_model, system_content, user_content = _email_request(
+        sender, receiver, goal, model=model, template=template
+    )
+    if use_openai:
+        chunks = _astream_openai_chat(
+            system_content, user_content, model=actual_model, temperature=0.7, prefix=EMAIL_SYSTEM_PREFIX
+        )
+    else:
+        prompt = f"System instruction: {system_content}\n\nUser request:\n{user_content}"
+        chunks = _astream_gemini(prompt, model=actual_model)
+
+    parts: list[str] = []
+    async for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+
+    result = "".join(parts).strip()
+    if not result:
+        raise RuntimeError("Email stream did not contain any content")
+    _record_generate_email(
+        session_id,
+        use_openai=use_openai,
+        actual_model=actual_model,
+        system_content=system_content,
+        user_content=user_content,
+        goal=goal,
+        result=result,
+    )
+
+
+def stream_email(
+    sender: SenderProfile,
+    receiver: ReceiverProfile,
+    goal: str,
+    *,
+    model: str | None = None,
+    template: str | None = None,
+    session_id: str | None = None,  # 用于数据收集
+) -> Iterator[str]:
+    """Blocking iterator over `astream_email` chunks (for Flask streaming responses)."""
+    return iterate_sync(
+        astream_email(sender, receiver, goal, model=model, template=template, session_id=session_id)
+    )
+
+
+def generate_questionnaire(purpose: str, field: str, *, model: str = DEFAULT_MODEL) -> list[dict]:
+    """
+    Generate 5 questionnaire questions to quickly build a user profile.
+    Each question has 4 options, with the last option being a custom input.
     
     Args:
         purpose: The user's purpose (academic, job seeking, coffee chat, etc.)
@@ -823,13 +1301,12 @@ Return a JSON array with this exact structure:
 
 Return JSON only, no other text."""
 
-    content = _call_llm(prompt, json_mode=True)
+    content = _call_llm(prompt, json_mode=True, caller="generate_questionnaire")
     
     try:
-        questions = json.loads(content)
-        return questions
-    except json.JSONDecodeError:
-        # Return default questions if parsing fails
+        return structured_output.parse(content, QUESTIONNAIRE)
+    except SchemaError:
+        # Return default questions if the response cannot be repaired
         return [
             {
                 "question": "What is your highest level of education?",
@@ -944,7 +1421,7 @@ If you want to ask another question:
 
 Return JSON only, with no additional text."""
 
-    content = _call_llm(prompt, json_mode=True)
+    content = _call_llm(prompt, json_mode=True, caller="generate_next_question")
     try:
         data = json.loads(content)
         if not isinstance(data, dict):
@@ -1062,7 +1539,7 @@ If you want to ask another question:
 
 Return JSON only, with no additional text."""
 
-    content = _call_llm(prompt, json_mode=True)
+    content = _call_llm(prompt, json_mode=True, caller="generate_next_target_question")
     try:
         data = json.loads(content)
         if not isinstance(data, dict):
@@ -1128,11 +1605,11 @@ Return a JSON object with:
 Infer reasonable details from the answers. Be professional and concise.
 Return JSON only."""
 
-    content = _call_llm(prompt, json_mode=True)
+    content = _call_llm(prompt, json_mode=True, caller="build_profile_from_answers")
     
     try:
-        return json.loads(content)
-    except json.JSONDecodeError:
+        return structured_output.parse(content, PROFILE)
+    except SchemaError:
         return {
             "name": "User",
             "summary": f"Professional interested in {field} for {purpose}",
@@ -1289,6 +1766,7 @@ def _build_recommendation_prompt(
     sources: list[str] | None = None,
     include_web_section: bool = True,
     require_tool_use: bool = False,
+    exclude_names: list[str] | None = None,
 ) -> str:
     source_block = ""
     if include_web_section and web_text:
@@ -1305,12 +1783,17 @@ def _build_recommendation_prompt(
             "Do not rely only on prior knowledge; prefer names that appear in search results."
         )
 
+    # 前面的阶段已经找到的人（增量补足时不要重复）
+    exclude_hint = ""
+    if exclude_names:
+        exclude_hint = "\nAlready found (do NOT include these people again): " + "; ".join(exclude_names[:30])
+
     return f"""You are a networking advisor helping someone find the best people to reach out to.
 
 Purpose: {purpose}
 Field: {field}
 {profile_context}
-{pref_context}{source_block}{tool_hint}
+{pref_context}{source_block}{tool_hint}{exclude_hint}
 
 Return a JSON object with key "recommendations" containing a list of {count} people. Each item must have:
 - name (string)
@@ -1377,10 +1860,7 @@ def _lookup_linkedin_via_serpapi(name: str, company: str = "", additional_contex
     Requires:
         SERPAPI_KEY environment variable to be set
     """
-    import urllib.request
-    import urllib.parse
-    
-    api_key = os.environ.get("SERPAPI_KEY") or os.environ.get("SERP_API_KEY")
+    api_key = serpapi_key()
     if not api_key:
         print(f"[SerpAPI] No API key found, skipping LinkedIn lookup for: {name}")
         return None
@@ -1396,67 +1876,117 @@ def _lookup_linkedin_via_serpapi(name: str, company: str = "", additional_contex
     
     query = " ".join(query_parts)
     
-    params = urllib.parse.urlencode({
-        "engine": "google",
-        "q": query,
-        "api_key": api_key,
-        "num": 3,  # Only need top few results
-    })
-    
-    url = f"https://serpapi.com/search.json?{params}"
-    
-    try:
-        with urllib.request.urlopen(url, timeout=10) as response:
-            data = json.loads(response.read().decode())
-        
-        if "organic_results" not in data or not data["organic_results"]:
-            print(f"[SerpAPI] No results found for: {name}")
+    def _fetch() -> str | None:
+        try:
+            data = serpapi_client.search(
+                {
+                    "engine": "google",
+                    "q": query,
+                    "api_key": api_key,
+                    "num": 3,  # Only need top few results
+                },
+                timeout=10,
+            )
+
+            if "organic_results" not in data or not data["organic_results"]:
+                print(f"[SerpAPI] No results found for: {name}")
+                return None
+
+            # Look through results for a valid LinkedIn profile URL
+            for result in data["organic_results"]:
+                link = result.get("link", "")
+                if not link:
+                    continue
+
+                # Verify it's a LinkedIn personal profile URL
+                if "/in/" in link and ("linkedin.com/in/" in link.lower()):
+                    # Clean up the URL (remove tracking params)
+                    clean_url = link.split("?")[0].rstrip("/")
+
+                    # Validate format
+                    if _validate_linkedin_url(clean_url):
+                        # CRITICAL: Verify the name appears in the result title
+                        # This prevents returning URLs for completely different people
+                        title = result.get("title", "").lower()
+                        name_parts = name.lower().split()
+
+                        # Check if at least first name OR last name appears in the title
+                        # (for names with 2+ parts, at least one meaningful part should match)
+                        matching_parts = [part for part in name_parts if len(part) > 2 and part in title]
+
+                        if matching_parts:
+                            print(f"[SerpAPI] Found LinkedIn URL for {name}: {clean_url} (matched: {matching_parts})")
+                            title_name, title_position = _parse_linkedin_title(result.get("title", ""))
+                            people_index.add(
+                                [{
+                                    "name": title_name or name,
+                                    "position": title_position,
+                                    "linkedin_url": clean_url,
+                                    "snippet": result.get("snippet", ""),
+                                }],
+                                source="serpapi_lookup",
+                                query=query,
+                            )
+                            return clean_url
+                        else:
+                            # Name doesn't match - skip this result
+                            print(f"[SerpAPI] Skipping {clean_url} - name '{name}' not found in title: '{title[:50]}'")
+                            continue
+
+            print(f"[SerpAPI] No matching LinkedIn profile found for: {name}")
             return None
-        
-        # Look through results for a valid LinkedIn profile URL
-        for result in data["organic_results"]:
-            link = result.get("link", "")
-            if not link:
-                continue
-            
-            # Verify it's a LinkedIn personal profile URL
-            if "/in/" in link and ("linkedin.com/in/" in link.lower()):
-                # Clean up the URL (remove tracking params)
-                clean_url = link.split("?")[0].rstrip("/")
-                
-                # Validate format
-                if _validate_linkedin_url(clean_url):
-                    # CRITICAL: Verify the name appears in the result title
-                    # This prevents returning URLs for completely different people
-                    title = result.get("title", "").lower()
-                    name_parts = name.lower().split()
-                    
-                    # Check if at least first name OR last name appears in the title
-                    # (for names with 2+ parts, at least one meaningful part should match)
-                    matching_parts = [part for part in name_parts if len(part) > 2 and part in title]
-                    
-                    if matching_parts:
-                        print(f"[SerpAPI] Found LinkedIn URL for {name}: {clean_url} (matched: {matching_parts})")
-                        return clean_url
-                    else:
-                        # Name doesn't match - skip this result
-                        print(f"[SerpAPI] Skipping {clean_url} - name '{name}' not found in title: '{title[:50]}'")
-                        continue
-        
-        print(f"[SerpAPI] No matching LinkedIn profile found for: {name}")
-        return None
-        
-    except urllib.error.URLError as e:
-        print(f"[SerpAPI] Network error: {e}")
-        return None
-    except json.JSONDecodeError as e:
-        print(f"[SerpAPI] JSON parse error: {e}")
-        return None
-    except Exception as e:
-        print(f"[SerpAPI] Unexpected error: {e}")
+
+        except OSError as e:
+            # requests.RequestException (connection errors, timeouts, HTTP errors)
+            print(f"[SerpAPI] Network error: {e}")
+            return None
+        except json.JSONDecodeError as e:
+            print(f"[SerpAPI] JSON parse error: {e}")
+            return None
+        except Exception as e:
+            print(f"[SerpAPI] Unexpected error: {e}")
+            return None
+
+    try:
+        return copy.deepcopy(serpapi_flight.do(make_flight_key("linkedin_lookup", query), _fetch))
+    except TimeoutError as e:
+        print(f"[SerpAPI] {e}")
         return None
 
 
+def _lookup_linkedin_batch(lookups: list[tuple[str, str, str]]) -> list[str | None]:
+    """
+    Resolve many (name, company, additional_context) lookups concurrently.
+
+    Identical lookups (same name / company / context, ignoring case and spacing)
+    hit SerpAPI once. The pool is capped at the SerpAPI concurrency limit, and each
+    call still goes through the shared rate limiter in `serpapi_client.search`.
+    Results come back in input order; None where no profile was found.
+    """
+    unique: dict[tuple[str, str, str], tuple[str, str, str]] = {}
+    for lookup in lookups:
+        unique.setdefault(tuple(" ".join(part.split()).lower() for part in lookup), lookup)
+    if not unique:
+        return []
+    if not serpapi_key():
+        print(f"[SerpAPI] No API key found, skipping {len(unique)} LinkedIn lookups")
+        return [None] * len(lookups)
+
+    workers = max(1, min(len(unique), PROVIDER_CONCURRENCY.get("serpapi", 4)))
+    if len(unique) > 1:
+        print(f"[SerpAPI] Resolving {len(unique)} LinkedIn lookups ({len(lookups)} requested) with {workers} workers")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="linkedin-lookup") as pool:
+        futures = {key: pool.submit(_lookup_linkedin_via_serpapi, *lookup) for key, lookup in unique.items()}
+        resolved: dict[tuple[str, str, str], str | None] = {}
+        for key, future in futures.items():
+            try:
+                resolved[key] = future.result()
+            except Exception as e:
+                print(f"[SerpAPI] LinkedIn lookup failed for {unique[key][0]}: {e}")
+                resolved[key] = None
+    return [resolved[tuple(" ".join(part.split()).lower() for part in lookup)] for lookup in lookups]
+
+
 # ============================================================================
 # Receiver Deep Search - 在生成邮件前对目标人物进行深度搜索
 # ============================================================================
@@ -1472,7 +2002,7 @@ class ReceiverDeepSearchResult:
     raw_search_results: str  # 原始搜索结果（用于调试）
 
 
-def search_receiver_deep_context(
+async def asearch_receiver_deep_context(
     name: str,
     position: str = "",
     company: str = "",
@@ -1484,7 +2014,7 @@ def search_receiver_deep_context(
     """
     对目标人物进行深度搜索，获取近期项目和主要经历。
     
-    使用 SerpAPI 搜索，然后用 LLM 提取和验证信息。
+    使用 SerpAPI 搜索（多个查询并发执行），然后用 LLM 提取和验证信息。
     关键原则：只返回有明确来源的信息，杜绝 LLM 杜撰。
     
     Args:
@@ -1498,63 +2028,15 @@ def search_receiver_deep_context(
     Returns:
         ReceiverDeepSearchResult 或 None（如果搜索失败）
     """
-    import urllib.request
-    import urllib.parse
-    
-    api_key = os.environ.get("SERPAPI_KEY") or os.environ.get("SERP_API_KEY")
+    api_key = serpapi_key()
     if not api_key:
         print("[DeepSearch] No SerpAPI key configured, skipping deep search")
         return None
     
-    # 构建搜索查询
+    # 构建搜索查询（全部并发执行，共享时限，总耗时约等于最慢的一个查询）
     search_queries = _build_deep_search_queries(name, position, company)
-    
-    all_results: list[dict] = []
-    all_sources: list[str] = []
-    
-    for query in search_queries[:2]:  # 最多执行2个查询以控制API调用
-        try:
-            params = urllib.parse.urlencode({
-                "engine": "google",
-                "q": query,
-                "api_key": api_key,
-                "num": max_results,
-                "hl": "en",
-            })
-            
-            url = f"https://serpapi.com/search.json?{params}"
-            print(f"[DeepSearch] Searching: {query}")
-            
-            with urllib.request.urlopen(url, timeout=15) as response:
-                data = json.loads(response.read().decode())
-            
-            if "organic_results" in data:
-                for result in data["organic_results"]:
-                    all_results.append({
-                        "title": result.get("title", ""),
-                        "snippet": result.get("snippet", ""),
-                        "link": result.get("link", ""),
-                        "date": result.get("date", ""),
-                    })
-                    if result.get("link"):
-                        all_sources.append(result["link"])
-            
-            # 也检查 news_results
-            if "news_results" in data:
-                for result in data["news_results"]:
-                    all_results.append({
-                        "title": result.get("title", ""),
-                        "snippet": result.get("snippet", ""),
-                        "link": result.get("link", ""),
-                        "date": result.get("date", ""),
-                        "is_news": True,
-                    })
-                    if result.get("link"):
-                        all_sources.append(result["link"])
-                        
-        except Exception as e:
-            print(f"[DeepSearch] Search error for '{query}': {e}")
-            continue
+    all_results = await _agather_deep_search_results(search_queries, api_key, max_results)
+    all_sources = [result["link"] for result in all_results if result.get("link")]
     
     if not all_results:
         print("[DeepSearch] No search results found")
@@ -1562,7 +2044,7 @@ def search_receiver_deep_context(
     
     # 用 LLM 提取和验证信息
     raw_results_text = _format_search_results_for_llm(all_results)
-    extracted = _extract_verified_info_from_search(
+    extracted = await _aextract_verified_info_from_search(
         name=name,
         position=position,
         company=company,
@@ -1571,13 +2053,143 @@ def search_receiver_deep_context(
     )
     
     if extracted:
-        extracted.sources = list(set(all_sources))[:10]  # 去重并限制数量
+        extracted.sources = all_sources[:10]  # 已按链接去重，限制数量
         extracted.raw_search_results = raw_results_text[:5000]  # 保存原始结果用于调试
         return extracted
     
     return None
 
 
+def search_receiver_deep_context(
+    name: str,
+    position: str = "",
+    company: str = "",
+    linkedin_url: str = "",
+    existing_context: str = "",
+    *,
+    max_results: int = 5,
+) -> ReceiverDeepSearchResult | None:
+    """Blocking wrapper over `asearch_receiver_deep_context`."""
+    return run_sync(
+        asearch_receiver_deep_context(
+            name,
+            position,
+            company,
+            linkedin_url,
+            existing_context,
+            max_results=max_results,
+        )
+    )
+
+
+def _deep_search_result_key(result: dict) -> str:
+    """结果去重键：规范化后的链接（无链接时退回到标题）"""
+    link = (result.get("link") or "").split("#", 1)[0].rstrip("/").lower()
+    link = link.replace("://www.", "://", 1)
+    return link or f"title:{(result.get('title') or '').strip().lower()}"
+
+
+async def _agather_deep_search_results(
+    queries: list[str],
+    api_key: str,
+    max_results: int,
+    *,
+    deadline: float = DEEP_SEARCH_DEADLINE,
+    min_results: int = DEEP_SEARCH_MIN_RESULTS,
+) -> list[dict]:
+    """
+    并发执行深度搜索查询，结果到达即按链接合并去重（organic 与 news 之间也去重）。
+
+    去重后的结果达到 `min_results` 条、或共享时限 `deadline` 到期时立即返回，
+    未完成的查询被放弃（其 SerpAPI 请求仍会在线程里跑完并写入 serpapi_cache，
+    跑完之前一直占用 serpapi 的并发名额，见 `async_runtime.to_thread`）。
+    返回的结果按查询顺序 + 原始排名排列，与到达顺序无关，因此相同的结果集
+    生成相同的提取 prompt（可命中 LLM 缓存）。
+    """
+    loop = asyncio.get_running_loop()
+    stop_at = loop.time() + deadline
+    tasks = {
+        # 相同查询并发时（如多个用户同时写给同一人）只发一次请求
+        asyncio.ensure_future(
+            serpapi_flight.ado(
+                make_flight_key("deep_search", query, max_results),
+                lambda query=query: async_runtime.to_thread(
+                    "serpapi", _fetch_deep_search_results, query, api_key, max_results
+                ),
+            )
+        ): index
+        for index, query in enumerate(queries)
+    }
+    merged: dict[str, tuple[int, int, dict]] = {}
+    pending = set(tasks)
+    try:
+        while pending:
+            remaining = stop_at - loop.time()
+            if remaining <= 0:
+                print(f"[DeepSearch] Deadline reached, {len(pending)} of {len(queries)} queries abandoned")
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = tasks[task]
+                if task.exception() is not None:
+                    print(f"[DeepSearch] Search error for '{queries[index]}': {task.exception()}")
+                    continue
+                for rank, result in enumerate(task.result()):
+                    key = _deep_search_result_key(result)
+                    previous = merged.get(key)
+                    if previous is None or (index, rank) < previous[:2]:
+                        merged[key] = (index, rank, result)
+            if pending and min_results > 0 and len(merged) >= min_results:
+                print(f"[DeepSearch] {len(merged)} results in, not waiting for {len(pending)} slower queries")
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+    return [result for _, _, result in sorted(merged.values(), key=lambda item: item[:2])]
+
+
+def _fetch_deep_search_results(query: str, api_key: str, max_results: int) -> list[dict]:
+    """
+    执行单个深度搜索查询，返回 organic + news 结果（阻塞调用，在线程中运行）
+    """
+    print(f"[DeepSearch] Searching: {query}")
+    
+    # 深度搜索找的是此人的近期动态（含 news_results），按新闻的 TTL 缓存
+    data = serpapi_client.search(
+        {
+            "engine": "google",
+            "q": query,
+            "api_key": api_key,
+            "num": max_results,
+            "hl": "en",
+        },
+        kind="news",
+    )
+    
+    results: list[dict] = []
+    if "organic_results" in data:
+        for result in data["organic_results"]:
+            results.append({
+                "title": result.get("title", ""),
+                "snippet": result.get("snippet", ""),
+                "link": result.get("link", ""),
+                "date": result.get("date", ""),
+            })
+    
+    # 也检查 news_results
+    if "news_results" in data:
+        for result in data["news_results"]:
+            results.append({
+                "title": result.get("title", ""),
+                "snippet": result.get("snippet", ""),
+                "link": result.get("link", ""),
+                "date": result.get("date", ""),
+                "is_news": True,
+            })
+    
+    return results
+
+
 def _build_deep_search_queries(name: str, position: str = "", company: str = "") -> list[str]:
     """
     构建多个搜索查询以获取更全面的信息
@@ -1628,7 +2240,7 @@ def _format_search_results_for_llm(results: list[dict]) -> str:
     return "\n\n".join(formatted_parts)
 
 
-def _extract_verified_info_from_search(
+async def _aextract_verified_info_from_search(
     name: str,
     position: str,
     company: str,
@@ -1707,15 +2319,15 @@ If the search results are not about this person or contain no useful information
 Return JSON only, no other text."""
 
     try:
-        content = _call_llm(prompt, json_mode=True)
+        content = await _acall_llm(prompt, json_mode=True, caller="_extract_verified_info_from_search")
         
         if not content:
             return None
         
-        data = json.loads(content)
+        data = structured_output.parse(content, DEEP_SEARCH)
         
         # 如果 LLM 确认搜索结果不是关于目标人物，返回 None
-        if not data.get("person_confirmed", False):
+        if not data["person_confirmed"]:
             print(f"[DeepSearch] Search results not confirmed for {name}")
             return None
         
@@ -1741,7 +2353,7 @@ Return JSON only, no other text."""
         
         return None
         
-    except json.JSONDecodeError as e:
+    except SchemaError as e:
         print(f"[DeepSearch] JSON parse error: {e}")
         return None
     except Exception as e:
@@ -1749,6 +2361,25 @@ Return JSON only, no other text."""
         return None
 
 
+def _extract_verified_info_from_search(
+    name: str,
+    position: str,
+    company: str,
+    search_results: str,
+    existing_context: str = "",
+) -> ReceiverDeepSearchResult | None:
+    """Blocking wrapper over `_aextract_verified_info_from_search`."""
+    return run_sync(
+        _aextract_verified_info_from_search(
+            name=name,
+            position=position,
+            company=company,
+            search_results=search_results,
+            existing_context=existing_context,
+        )
+    )
+
+
 def enrich_receiver_with_deep_search(
     receiver: ReceiverProfile,
     position: str = "",
@@ -1843,6 +2474,16 @@ def enrich_receiver_with_deep_search(
     return enhanced_receiver
 
 
+# bank_tier（finance 决策树）→ 代表性机构
+_BANK_TIER_FIRMS: dict[str, list[str]] = {
+    "bb": ["Goldman Sachs", "Morgan Stanley", "J.P. Morgan", "Citigroup", "Bank of America"],
+    "eb": ["Evercore", "Lazard", "Moelis", "PJT", "Centerview"],
+    "mm": ["Jefferies", "William Blair", "Piper Sandler", "Raymond James", "Houlihan Lokey"],
+    "regional": ["RBC", "HSBC", "Wells Fargo", "BMO", "TD Securities"],
+    "boutique": ["Lazard", "Evercore", "Moelis", "PJT", "Rothschild"],
+}
+
+
 def _build_serpapi_search_query(
     preferences: dict | None = None,
     field: str = "",
@@ -1927,14 +2568,7 @@ def _build_serpapi_search_query(
     else:
         # 优先用结构化 bank_tier（来自 finance 决策树），再回退到 org_type
         if bank_tier:
-            tier_map: dict[str, list[str]] = {
-                "bb": ["Goldman Sachs", "Morgan Stanley", "J.P. Morgan", "Citigroup", "Bank of America"],
-                "eb": ["Evercore", "Lazard", "Moelis", "PJT", "Centerview"],
-                "mm": ["Jefferies", "William Blair", "Piper Sandler", "Raymond James", "Houlihan Lokey"],
-                "regional": ["RBC", "HSBC", "Wells Fargo", "BMO", "TD Securities"],
-                "boutique": ["Lazard", "Evercore", "Moelis", "PJT", "Rothschild"],
-            }
-            firms = tier_map.get(bank_tier.strip().lower(), [])
+            firms = _BANK_TIER_FIRMS.get(bank_tier.strip().lower(), [])
             if firms:
                 _add_or_terms(firms[:3])
 
@@ -1994,11 +2628,25 @@ def _build_serpapi_search_query(
     return " ".join(parts)
 
 
+# SerpAPI 单次搜索最多请求的结果数
+_SERPAPI_MAX_NUM = 20
+
+
+def _serpapi_num(count: int) -> int:
+    """找 `count` 个人时请求的 Google 结果数（也是下一页的 `start` 偏移）"""
+    return min(count * 2, _SERPAPI_MAX_NUM)
+
+
 def _search_linkedin_via_serpapi(
     preferences: dict | None = None,
     field: str = "",
     purpose: str = "",
     count: int = 10,
+    *,
+    query: str | None = None,
+    start: int = 0,
+    paging: dict[str, int] | None = None,
+    raise_errors: bool = False,
 ) -> list[dict[str, Any]]:
     """
     直接使用 SerpAPI 搜索 LinkedIn 找到符合条件的真实的人
@@ -2010,95 +2658,293 @@ def _search_linkedin_via_serpapi(
         field: 领域
         purpose: 目的
         count: 需要返回的人数
+        query: 直接使用的搜索词（查询规划器生成）；默认由 preferences 构建
+        start: Google 结果偏移量（"加载更多"翻页用）
+        paging: 输出参数；SerpAPI 请求完成时写入 {"start": 下一页偏移, "organic": 本页 Google 结果条数}
+            （没有 API key 或请求出错时不写入）
+        raise_errors: 网络/超时/响应解析错误和 SerpAPI 错误响应（额度用完、key 无效等）时
+            抛出而不是返回 []（供熔断器统计失败）；"没有结果"不算错误
         
     Returns:
         包含真实 LinkedIn 用户信息的列表
     """
-    import urllib.request
-    import urllib.parse
-    
-    api_key = os.environ.get("SERPAPI_KEY") or os.environ.get("SERP_API_KEY")
+    api_key = serpapi_key()
     if not api_key:
         print("[SerpAPI Search] No API key configured")
         return []
     
     # 构建搜索词
-    query = _build_serpapi_search_query(preferences, field, purpose)
+    query = query or _build_serpapi_search_query(preferences, field, purpose)
     print(f"[SerpAPI Search] Query: {query}")
     
-    params = urllib.parse.urlencode({
-        "engine": "google",
-        "q": query,
-        "api_key": api_key,
-        "num": min(count * 2, 20),  # 搜索多一些，因为可能有些结果不是个人主页
-    })
+    def _fetch() -> dict[str, Any]:
+        params = {
+            "engine": "google",
+            "q": query,
+            "api_key": api_key,
+            "num": _serpapi_num(count),  # 搜索多一些，因为可能有些结果不是个人主页
+        }
+        if start:
+            params["start"] = start
+        try:
+            data = serpapi_client.search(params)
+
+            if "organic_results" not in data or not data["organic_results"]:
+                raise_for_error(data)
+                print(f"[SerpAPI Search] No results found")
+                return {"results": [], "organic": 0}
+
+            results = []
+            discovered: list[dict[str, str]] = []
+            for result in data["organic_results"]:
+                link = result.get("link", "")
+                title = result.get("title", "")
+                snippet = result.get("snippet", "")
+
+                # 验证是 LinkedIn 个人主页
+                if not link or "/in/" not in link or "linkedin.com/in/" not in link.lower():
+                    continue
+
+                # 清理 URL
+                clean_url = link.split("?")[0].rstrip("/")
+                if not _validate_linkedin_url(clean_url):
+                    continue
+
+                # 从标题中提取姓名和职位
+                # LinkedIn 标题格式通常是: "Name - Title at Company | LinkedIn"
+                # 或: "Name - Title - Company | LinkedIn"
+                name, position = _parse_linkedin_title(title)
+
+                if not name:
+                    continue
+
+                # 所有解析出的主页都写入本地人物索引（包括超出 count 的部分）
+                discovered.append({"name": name, "position": position, "linkedin_url": clean_url, "snippet": snippet})
+                if len(results) >= count:
+                    continue
+
+                # 从 snippet 中提取更多信息
+                evidence = []
+                if snippet:
+                    evidence.append(snippet[:200])
+
+                results.append({
+                    "name": name,
+                    "position": position,
+                    "field": field,
+                    "linkedin_url": clean_url,
+                    "match_score": 75,  # 默认分数，后续可以用 AI 评分
+                    "match_reason": f"Found via LinkedIn search for {field}",
+                    "common_interests": "",
+                    "evidence": evidence,
+                    "sources": [clean_url],
+                    "uncertainty": "low",  # 真实存在的人
+                })
+
+            people_index.add(discovered, source="serpapi_search", query=query)
+            print(f"[SerpAPI Search] Found {len(results)} real LinkedIn profiles")
+            return {"results": results, "organic": len(data["organic_results"])}
+
+        except OSError as e:
+            # URLError / socket timeout: provider-level failure, surfaced to the caller
+            print(f"[SerpAPI Search] Network error: {e}")
+            raise
+        except json.JSONDecodeError as e:
+            print(f"[SerpAPI Search] JSON parse error: {e}")
+            raise
+        except SerpAPIError as e:
+            print(f"[SerpAPI Search] Error response: {e}")
+            raise
+        except Exception as e:
+            print(f"[SerpAPI Search] Unexpected error: {e}")
+            raise
+
+    try:
+        page = copy.deepcopy(serpapi_flight.do(make_flight_key("linkedin_search", query, count, field, start), _fetch))
+    except Exception as e:
+        # OSError includes TimeoutError from the single-flight wait
+        if isinstance(e, TimeoutError):
+            print(f"[SerpAPI Search] {e}")
+        if raise_errors:
+            raise
+        return []
+    if paging is not None:
+        paging.update(start=start + _serpapi_num(count), organic=page["organic"])
+    return page["results"]
+
+
+def _plan_serpapi_search_queries(
+    preferences: dict | None = None,
+    field: str = "",
+    purpose: str = "",
+    *,
+    max_queries: int = SERPAPI_PLANNER_MAX_QUERIES,
+) -> list[str]:
+    """
+    把偏好拆成一组互补的 LinkedIn 搜索词（第一个始终是原来的组合查询）
     
-    url = f"https://serpapi.com/search.json?{params}"
+    组合查询要求所有条件同时出现，偏好较窄时经常不到 3 个结果。补充查询：
+    - bank_tier 对应的每家机构单独一个查询
+    - 每个 target_role_titles 单独一个查询
+    - 去掉地区限制
+    """
+    prefs = dict(preferences or {})
+    variants: list[dict] = [prefs]
+
+    bank_tier = str(prefs.get("bank_tier", "") or "").strip().lower()
+    if bank_tier and not str(prefs.get("must_have", "") or "").strip():
+        # must_have 中的机构名会替代 bank_tier 的 OR 组
+        variants.extend({**prefs, "must_have": firm} for firm in _BANK_TIER_FIRMS.get(bank_tier, [])[:3])
+
+    titles = prefs.get("target_role_titles")
+    if isinstance(titles, str):
+        titles = [t.strip() for t in titles.replace(";", ",").split(",") if t.strip()]
+    if isinstance(titles, list) and len(titles) > 1:
+        variants.extend({**prefs, "target_role_titles": [title]} for title in titles[:3])
+
+    if str(prefs.get("location", "") or "").strip():
+        variants.append({**prefs, "location": ""})
+
+    queries: list[str] = []
+    for variant in variants:
+        query = _build_serpapi_search_query(variant, field, purpose)
+        if query not in queries:
+            queries.append(query)
+    return queries[:max(1, max_queries)]
+
+
+def _search_linkedin_planned(
+    preferences: dict | None = None,
+    field: str = "",
+    purpose: str = "",
+    count: int = 10,
+    *,
+    paging: dict[str, int] | None = None,
+    raise_errors: bool = False,
+) -> list[dict[str, Any]]:
+    """
+    按查询规划并发搜索 LinkedIn，按主页 URL 合并去重
     
+    最多 SERPAPI_PLANNER_CONCURRENCY 个查询同时进行；去重后凑够 `count` 人即不再
+    发出新的查询。结果按查询顺序 + 原始排名排列（与完成顺序无关）。
+    `paging` 只记录主查询（第一个查询）的翻页位置，见 `_search_linkedin_via_serpapi`；
+    主查询在提前结束前没有完成时保持为空（它在后台跑完也不会再写入）。
+    """
+    queries = _plan_serpapi_search_queries(preferences, field, purpose)
+    if len(queries) == 1:
+        return _search_linkedin_via_serpapi(
+            preferences, field, purpose, count, paging=paging, raise_errors=raise_errors
+        )
+
+    print(f"[SerpAPI Search] Planned {len(queries)} queries")
+    merged: dict[str, tuple[int, int, dict[str, Any]]] = {}
+    errors: list[Exception] = []
+    pending = iter(enumerate(queries))
+    workers = max(1, min(len(queries), SERPAPI_PLANNER_CONCURRENCY))
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="linkedin-search")
+
+    def _search(query: str) -> tuple[list[dict[str, Any]], dict[str, int]]:
+        # 每个查询的翻页位置随结果一起返回，后台线程不写调用方的 dict
+        query_paging: dict[str, int] = {}
+        results = _search_linkedin_via_serpapi(
+            preferences, field, purpose, count, query=query, paging=query_paging, raise_errors=True
+        )
+        return results, query_paging
+
+    def _submit(n: int) -> dict[concurrent.futures.Future, int]:
+        return {pool.submit(_search, query): index for index, query in itertools.islice(pending, n)}
+
     try:
-        with urllib.request.urlopen(url, timeout=15) as response:
-            data = json.loads(response.read().decode())
-        
-        if "organic_results" not in data or not data["organic_results"]:
-            print(f"[SerpAPI Search] No results found")
-            return []
-        
-        results = []
-        for result in data["organic_results"]:
-            link = result.get("link", "")
-            title = result.get("title", "")
-            snippet = result.get("snippet", "")
-            
-            # 验证是 LinkedIn 个人主页
-            if not link or "/in/" not in link or "linkedin.com/in/" not in link.lower():
-                continue
-            
-            # 清理 URL
-            clean_url = link.split("?")[0].rstrip("/")
-            if not _validate_linkedin_url(clean_url):
-                continue
-            
-            # 从标题中提取姓名和职位
-            # LinkedIn 标题格式通常是: "Name - Title at Company | LinkedIn"
-            # 或: "Name - Title - Company | LinkedIn"
-            name, position = _parse_linkedin_title(title)
-            
-            if not name:
-                continue
-            
-            # 从 snippet 中提取更多信息
-            evidence = []
-            if snippet:
-                evidence.append(snippet[:200])
-            
-            results.append({
-                "name": name,
-                "position": position,
-                "field": field,
-                "linkedin_url": clean_url,
-                "match_score": 75,  # 默认分数，后续可以用 AI 评分
-                "match_reason": f"Found via LinkedIn search for {field}",
-                "common_interests": "",
-                "evidence": evidence,
-                "sources": [clean_url],
-                "uncertainty": "low",  # 真实存在的人
-            })
-            
-            if len(results) >= count:
+        inflight = _submit(workers)
+        while inflight:
+            done, _ = concurrent.futures.wait(inflight, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                index = inflight.pop(future)
+                try:
+                    results, query_paging = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                if index == 0 and paging is not None:
+                    paging.update(query_paging)
+                for rank, candidate in enumerate(results):
+                    key = normalize_profile_url(candidate.get("linkedin_url", "")) or candidate.get("linkedin_url", "")
+                    if key not in merged or (index, rank) < merged[key][:2]:
+                        merged[key] = (index, rank, candidate)
+            if len(merged) >= count:
+                print(f"[SerpAPI Search] {len(merged)} distinct profiles found, skipping remaining queries")
                 break
-        
-        print(f"[SerpAPI Search] Found {len(results)} real LinkedIn profiles")
-        return results
-        
-    except urllib.error.URLError as e:
-        print(f"[SerpAPI Search] Network error: {e}")
-        return []
-    except json.JSONDecodeError as e:
-        print(f"[SerpAPI Search] JSON parse error: {e}")
-        return []
-    except Exception as e:
-        print(f"[SerpAPI Search] Unexpected error: {e}")
-        return []
+            inflight.update(_submit(len(done)))
+    finally:
+        # 已发出的查询在后台跑完（结果写入 serpapi_cache），未发出的直接取消
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if not merged and errors and raise_errors:
+        raise errors[0]
+    return [candidate for _, _, candidate in sorted(merged.values(), key=lambda item: item[:2])][:count]
+
+
+def _indexed_person_to_candidate(person: dict[str, Any], field: str) -> dict[str, Any]:
+    """本地人物索引的一行 → 与 `_search_linkedin_via_serpapi` 相同格式的候选人"""
+    position = person["title"]
+    if person["company"]:
+        position = f"{position} at {person['company']}" if position else person["company"]
+    return {
+        "name": person["name"],
+        "position": position,
+        "field": field,
+        "linkedin_url": person["url"],
+        "match_score": 75,
+        "match_reason": f"Found via LinkedIn search for {field}",
+        "common_interests": "",
+        "evidence": [person["snippet"][:200]] if person["snippet"] else [],
+        "sources": [person["url"]],
+        "uncertainty": "low",
+    }
+
+
+def _find_linkedin_candidates(
+    preferences: dict | None = None,
+    field: str = "",
+    purpose: str = "",
+    count: int = 10,
+    *,
+    paging: dict[str, int] | None = None,
+    raise_errors: bool = False,
+) -> list[dict[str, Any]]:
+    """
+    先查本地人物索引，凑不满 `count` 个近期确认过的候选人时才调用 SerpAPI
+    
+    SerpAPI 的结果与本地索引中的其他人合并（按主页 URL 去重），两条路径都按同一个
+    本地预排序分数（`prerank`，与偏好的 BM25 匹配度）排序后再截取 `count` 个，
+    所以名额给匹配度最高的人，而不是先到的查询。
+    本地索引已经足够时不请求 SerpAPI，`paging` 保持为空。
+    """
+    query = _build_serpapi_search_query(preferences, field, purpose)
+    local = [_indexed_person_to_candidate(p, field) for p in people_index.search(query, limit=count)]
+    if len(local) >= count:
+        print(f"[PeopleIndex] Served {len(local)} candidates locally, skipping SerpAPI")
+        return _prerank_order(local, preferences)[:count]
+    if local:
+        print(f"[PeopleIndex] Only {len(local)}/{count} fresh candidates locally, querying SerpAPI")
+
+    try:
+        remote = _search_linkedin_planned(
+            preferences, field, purpose, count, paging=paging, raise_errors=raise_errors
+        )
+    except Exception:
+        if not local:
+            raise
+        print(f"[PeopleIndex] SerpAPI failed, using {len(local)} local candidates")
+        return local
+    seen = {normalize_profile_url(c["linkedin_url"]) for c in remote}
+    extra = [c for c in local if normalize_profile_url(c["linkedin_url"]) not in seen]
+    return _prerank_order(remote + extra, preferences)[:count]
+
+
+def _prerank_order(candidates: list[dict[str, Any]], preferences: dict | None) -> list[dict[str, Any]]:
+    """候选人按本地预排序分数从高到低排列（同分保持原顺序：SerpAPI 查询顺序 + 排名在前）"""
+    return [candidates[r.index] for r in prerank(candidates, preferences)]
 
 
 def _parse_linkedin_title(title: str) -> tuple[str, str]:
@@ -2144,7 +2990,7 @@ def _parse_linkedin_title(title: str) -> tuple[str, str]:
     return title.strip(), ""
 
 
-def _ai_score_and_analyze_candidates(
+async def _aai_score_and_analyze_candidates(
     candidates: list[dict[str, Any]],
     sender_profile: dict | None = None,
     preferences: dict | None = None,
@@ -2169,6 +3015,28 @@ def _ai_score_and_analyze_candidates(
     if not candidates:
         return candidates
     
+    # 本地 BM25 预排序：只有前 PRERANK_TOP_K 个交给 LLM，其余直接使用本地分数
+    local_only: list[dict[str, Any]] = []
+    if PRERANK_TOP_K > 0 and len(candidates) > PRERANK_TOP_K:
+        ranked = prerank(candidates, preferences, sender_profile)
+        best = ranked[0].score
+        for r in ranked[PRERANK_TOP_K:]:
+            candidate = candidates[r.index]
+            candidate["match_score"] = local_match_score(r.score, best)
+            candidate["match_reason"] = (
+                f"Matches {', '.join(r.matched[:4])} (ranked locally)"
+                if r.matched
+                else "Few matches with your preferences (ranked locally)"
+            )
+            candidate["id"] = _generate_recommendation_id(
+                candidate.get("name", ""), candidate.get("position", ""), candidate.get("linkedin_url", "")
+            )
+            local_only.append(candidate)
+        local_only.sort(key=lambda x: x.get("match_score", 0), reverse=True)
+        # LLM 评分的候选人保持原搜索顺序
+        candidates = [candidates[i] for i in sorted(r.index for r in ranked[:PRERANK_TOP_K])]
+        print(f"[PreRank] Sending top {len(candidates)} of {len(candidates) + len(local_only)} candidates to the LLM")
+    
     # 构建发送者信息
     sender_info = ""
     if sender_profile:
@@ -2241,18 +3109,8 @@ def _ai_score_and_analyze_candidates(
         if pref_parts:
             pref_info = "\n".join(pref_parts)
     
-    # 构建候选人列表
-    candidates_text = ""
-    for i, c in enumerate(candidates, 1):
-        candidates_text += f"""
-{i}. {c.get('name', 'Unknown')}
-   Position: {c.get('position', 'N/A')}
-   LinkedIn: {c.get('linkedin_url', 'N/A')}
-   Evidence: {'; '.join(c.get('evidence', [])[:2]) if c.get('evidence') else 'N/A'}
-"""
-    
-    # 构建 AI 评分 prompt
-    prompt = f"""You are a networking advisor. Analyze and score these LinkedIn candidates for a cold outreach.
+    # 共享前缀：所有批次相同（说明 + 发送者 + 偏好），候选人放在最后，便于 provider 前缀缓存
+    shared_prefix = f"""You are a networking advisor. Analyze and score LinkedIn candidates for a cold outreach.
 
 PURPOSE: {purpose}
 FIELD: {field}
@@ -2263,9 +3121,6 @@ SENDER PROFILE:
 PREFERENCES:
 {pref_info if pref_info else "Not provided"}
 
-CANDIDATES:
-{candidates_text}
-
 For each candidate, provide:
 1. match_score (60-95): How well they match the sender's goals and preferences
 2. match_reason (1-2 sentences): Why they are a good/poor match
@@ -2273,54 +3128,110 @@ For each candidate, provide:
 4. outreach_angle (1 sentence): Suggested angle for cold email
 5. response_likelihood (low/medium/high): How likely they are to respond
 
-Return a JSON object with key "scored_candidates" containing a list in the same order as input.
-Each item should have: name, match_score, match_reason, common_interests, outreach_angle, response_likelihood.
+Return a JSON object with key "scored_candidates" containing one item per candidate.
+Each item should have: id (copied exactly from the candidate), name, match_score, match_reason, common_interests, outreach_angle, response_likelihood.
 
 Focus on:
 - Seniority alignment (not too senior, not too junior)
 - Industry/sector relevance
 - Potential shared background (education, previous companies)
 - Accessibility (people who are active and might respond)
+"""
 
-Return JSON only."""
+    ids = {id(c): f"c{i}" for i, c in enumerate(candidates, 1)}
 
-    try:
-        content = _call_llm(prompt, json_mode=True)
-        result = json.loads(content)
-        scored_list = result.get("scored_candidates", [])
-        
-        # 合并 AI 分析结果到原始候选人
-        for i, candidate in enumerate(candidates):
-            if i < len(scored_list):
-                scored = scored_list[i]
-                candidate["match_score"] = scored.get("match_score", 75)
-                candidate["match_reason"] = scored.get("match_reason", "")
-                candidate["common_interests"] = scored.get("common_interests", "")
-                candidate["outreach_angle"] = scored.get("outreach_angle", "")
-                candidate["response_likelihood"] = scored.get("response_likelihood", "medium")
-        
-        # 为每个候选人生成唯一 ID
-        for candidate in candidates:
-            name = candidate.get("name", "")
-            position = candidate.get("position", "")
-            linkedin_url = candidate.get("linkedin_url", "")
-            candidate["id"] = _generate_recommendation_id(name, position, linkedin_url)
-        
+    def _batch_prompt(batch: list[dict[str, Any]]) -> str:
+        candidates_text = ""
+        for c in batch:
+            candidates_text += f"""
+[id: {ids[id(c)]}] {c.get('name', 'Unknown')}
+   Position: {c.get('position', 'N/A')}
+   LinkedIn: {c.get('linkedin_url', 'N/A')}
+   Evidence: {'; '.join(c.get('evidence', [])[:2]) if c.get('evidence') else 'N/A'}
+"""
+        return f"{shared_prefix}\nCANDIDATES:\n{candidates_text}\nReturn JSON only."
+
+    async def _score_batch(batch: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        try:
+            content = await asyncio.wait_for(
+                _acall_llm(_batch_prompt(batch), json_mode=True, caller="_ai_score_and_analyze_candidates"),
+                timeout=SCORING_BATCH_TIMEOUT,
+            )
+            return structured_output.parse(content, SCORED_CANDIDATES)["scored_candidates"]
+        except asyncio.TimeoutError:
+            print(f"[AI Scoring] Batch of {len(batch)} timed out after {SCORING_BATCH_TIMEOUT:.0f}s, using default scores")
+        except Exception as e:
+            print(f"[AI Scoring] Error: {e}")
+        return []
+
+    # 分批并发评分：输出延迟取决于最大的一批，而不是候选人总数
+    size = SCORING_BATCH_SIZE if SCORING_BATCH_SIZE > 0 else len(candidates)
+    batches = [candidates[i:i + size] for i in range(0, len(candidates), size)]
+    if len(batches) > 1:
+        print(f"[AI Scoring] Scoring {len(candidates)} candidates in {len(batches)} parallel batches")
+    scored_batches = await asyncio.gather(*(_score_batch(batch) for batch in batches))
+
+    # 按 id（其次 LinkedIn URL、姓名）合并，不依赖模型返回的顺序；缺失的候选人保留默认分数
+    def _merge_keys(item: dict[str, Any]) -> list[str]:
+        url = str(item.get("linkedin_url") or "").strip()
+        name = str(item.get("name") or "").strip().lower()
+        keys = [str(item.get("id") or "").strip()]
+        keys.append(f"url:{normalize_profile_url(url) or url}" if url else "")
+        keys.append(f"name:{name}" if name else "")
+        return [k for k in keys if k]
+
+    by_key: dict[str, dict[str, Any]] = {}
+    for c in candidates:
+        for key in [ids[id(c)], *_merge_keys({**c, "id": ""})]:
+            by_key.setdefault(key, c)
+    merged: set[int] = set()
+    for scored in (item for batch in scored_batches for item in batch):
+        candidate = next(
+            (by_key[k] for k in _merge_keys(scored) if k in by_key and id(by_key[k]) not in merged), None
+        )
+        if candidate is None:
+            continue
+        merged.add(id(candidate))
+        candidate["match_score"] = scored.get("match_score", 75)
+        candidate["match_reason"] = scored.get("match_reason", "")
+        candidate["common_interests"] = scored.get("common_interests", "")
+        candidate["outreach_angle"] = scored.get("outreach_angle", "")
+        candidate["response_likelihood"] = scored.get("response_likelihood", "medium")
+
+    # 为每个候选人生成唯一 ID
+    for candidate in candidates:
+        name = candidate.get("name", "")
+        position = candidate.get("position", "")
+        linkedin_url = candidate.get("linkedin_url", "")
+        candidate["id"] = _generate_recommendation_id(name, position, linkedin_url)
+
+    if merged:
         # 按分数排序
         candidates.sort(key=lambda x: x.get("match_score", 0), reverse=True)
-        
-        print(f"[AI Scoring] Successfully scored {len(candidates)} candidates")
-        return candidates
-        
-    except Exception as e:
-        print(f"[AI Scoring] Error: {e}")
-        # 返回原始列表，使用默认分数，但仍需添加 ID
-        for candidate in candidates:
-            name = candidate.get("name", "")
-            position = candidate.get("position", "")
-            linkedin_url = candidate.get("linkedin_url", "")
-            candidate["id"] = _generate_recommendation_id(name, position, linkedin_url)
-        return candidates
+    missing = len(candidates) - len(merged)
+    print(f"[AI Scoring] Scored {len(merged)} candidates" + (f", {missing} kept default scores" if missing else ""))
+    return candidates + local_only
+
+
+def _ai_score_and_analyze_candidates(
+    candidates: list[dict[str, Any]],
+    sender_profile: dict | None = None,
+    preferences: dict | None = None,
+    purpose: str = "",
+    field: str = "",
+    model: str = DEFAULT_MODEL,
+) -> list[dict[str, Any]]:
+    """Blocking wrapper over `_aai_score_and_analyze_candidates`."""
+    return run_sync(
+        _aai_score_and_analyze_candidates(
+            candidates=candidates,
+            sender_profile=sender_profile,
+            preferences=preferences,
+            purpose=purpose,
+            field=field,
+            model=model,
+        )
+    )
 
 
 def _generate_recommendation_id(name: str, position: str, linkedin_url: str) -> str:
@@ -2346,6 +3257,7 @@ def _normalize_recommendations(items: Any, grounding_urls: list[str] | None = No
         return []
 
     normalized: list[dict[str, Any]] = []
+    lookups: list[tuple[str, str, str]] = []  # (name, company, field) per normalized item
     for item in items:
         if not isinstance(item, dict):
             continue
@@ -2399,26 +3311,10 @@ def _normalize_recommendations(items: Any, grounding_urls: list[str] | None = No
                     company = position.split(keyword)[-1].strip()
                     break
         
-        # If no valid LinkedIn URL from model, try SerpAPI to find the real profile URL
-        if not linkedin_url:
-            # Try SerpAPI lookup (returns None if SERPAPI_KEY not set or search fails)
-            serpapi_url = _lookup_linkedin_via_serpapi(name, company, field)
-            if serpapi_url:
-                linkedin_url = serpapi_url
-        
-        # If still no valid LinkedIn URL, fall back to search URL
-        if not linkedin_url:
-            linkedin_url = _generate_linkedin_search_url(name, company)
-
-        # Generate unique ID for this recommendation
-        final_position = position or field
-        rec_id = _generate_recommendation_id(name, final_position, linkedin_url)
-
         normalized.append(
             {
-                "id": rec_id,  # Unique identifier for frontend matching
                 "name": name,
-                "position": final_position,
+                "position": position or field,
                 "field": field or position,
                 "linkedin_url": linkedin_url,  # Either validated profile URL or search URL
                 "match_score": match_score or 70,
@@ -2429,11 +3325,28 @@ def _normalize_recommendations(items: Any, grounding_urls: list[str] | None = No
                 "uncertainty": uncertainty,
             }
         )
+        lookups.append((name, company, field))
+
+    # If no valid LinkedIn URL from model, try SerpAPI to find the real profile URL
+    # (all unresolved items at once; returns None if SERPAPI_KEY not set or search fails)
+    unresolved = [i for i, rec in enumerate(normalized) if not rec["linkedin_url"]]
+    found = _lookup_linkedin_batch([lookups[i] for i in unresolved])
+    for i, serpapi_url in zip(unresolved, found):
+        normalized[i]["linkedin_url"] = serpapi_url
+
+    for i, (name, company, _) in enumerate(lookups):
+        rec = normalized[i]
+        # If still no valid LinkedIn URL, fall back to search URL
+        if not rec["linkedin_url"]:
+            rec["linkedin_url"] = _generate_linkedin_search_url(name, company)
+        # Generate unique ID for this recommendation
+        rec_id = _generate_recommendation_id(name, rec["position"], rec["linkedin_url"])
+        normalized[i] = {"id": rec_id, **rec}  # Unique identifier for frontend matching
 
     return normalized
 
 
-def _gather_recommendation_web_context(
+async def _agather_recommendation_web_context(
     field: str,
     purpose: str,
     preferences: dict | None,
@@ -2441,6 +3354,9 @@ def _gather_recommendation_web_context(
 ) -> tuple[str, list[str]]:
     """
     Light web scrape to ground recommendations; uses DuckDuckGo/Bing HTML paths via WebScraper.
+
+    Pages are fetched concurrently in waves of up to `max_pages`; the next wave only
+    runs if earlier pages came back empty.
     """
     try:
         from .web_scraper import WebScraper
@@ -2461,7 +3377,9 @@ def _gather_recommendation_web_context(
     query_field_parts = [purpose, field, track, must_have, location, seniority, org_type]
     query_field = " ".join(part.strip() for part in query_field_parts if isinstance(part, str) and part.strip())
 
-    search_results = scraper.search_person(query_name, query_field, max_results=max_pages + 2)
+    search_results = await async_runtime.to_thread(
+        "web", scraper.search_person, query_name, query_field, max_results=max_pages + 2
+    )
     if not search_results:
         return "", []
 
@@ -2476,21 +3394,71 @@ def _gather_recommendation_web_context(
     if snippet_text:
         all_text.append(f"Search snippets:\n{snippet_text}")
 
-    pages_fetched = 0
-    for result in search_results:
-        if pages_fetched >= max_pages:
-            break
-        content = scraper.fetch_page_content(result.url)
-        if content and len(content) > 200:
-            all_text.append(f"--- Source: {result.url} ---\n{content[:4000]}")
-            sources.append(result.url)
-            pages_fetched += 1
+    pending = list(search_results)
+    while pending and len(sources) < max_pages:
+        wave = pending[: max_pages - len(sources)]
+        pending = pending[len(wave):]
+        contents = await asyncio.gather(
+            *(async_runtime.to_thread("web", scraper.fetch_page_content, result.url) for result in wave)
+        )
+        for result, content in zip(wave, contents):
+            if content and len(content) > 200:
+                all_text.append(f"--- Source: {result.url} ---\n{content[:4000]}")
+                sources.append(result.url)
 
     combined_text = "\n\n".join(all_text)
     return combined_text, sources
 
 
-def find_target_recommendations(
+def _gather_recommendation_web_context(
+    field: str,
+    purpose: str,
+    preferences: dict | None,
+    max_pages: int = 3,
+) -> tuple[str, list[str]]:
+    """Blocking wrapper over `_agather_recommendation_web_context`."""
+    return run_sync(_agather_recommendation_web_context(field, purpose, preferences, max_pages=max_pages))
+
+
+def _person_key(name: str) -> str:
+    """姓名去重键（忽略大小写和多余空格）"""
+    return " ".join(str(name or "").split()).lower()
+
+
+async def _arun_find_target_stage(
+    name: str,
+    stage: Callable[[], Awaitable[list[dict] | None]],
+    *,
+    bypass_breaker: bool = False,
+) -> list[dict] | None:
+    """
+    Run one find-target stage behind its circuit breaker; errors become None.
+
+    Only provider failures count against the breaker (a malformed answer does not).
+    `bypass_breaker` runs the stage even while its breaker is open (the last resort).
+    """
+    breaker = stage_breakers.get(name)
+    if not bypass_breaker and not breaker.allow():
+        print(f"[FindTarget] Skipping stage '{name}' (circuit {breaker.state})")
+        return None
+    start = time.perf_counter()
+    try:
+        result = await stage()
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+    except Exception as e:
+        if is_provider_failure(e):
+            breaker.record_failure(e)
+        else:
+            breaker.release()
+        print(f"[FindTarget] Stage '{name}' failed after {time.perf_counter() - start:.2f}s: {e}")
+        return None
+    breaker.record_success()
+    return result
+
+
+async def afind_target_recommendations(
     purpose: str,
     field: str,
     sender_profile: dict | None = None,
@@ -2499,6 +3467,7 @@ def find_target_recommendations(
     model: str = DEFAULT_MODEL,
     count: int = 10,
     session_id: str | None = None,  # 用于数据收集
+    serpapi_paging: dict[str, int] | None = None,
 ) -> list[dict]:
     """
     Find recommended target contacts based on user's purpose, field, and profile.
@@ -2511,6 +3480,8 @@ def find_target_recommendations(
         count: Number of recommendations to generate
         preferences: Optional targeting preferences (seniority, org type, outreach goal, prominence)
         session_id: Optional session ID for prompt data collection
+        serpapi_paging: Optional output dict; filled with the primary LinkedIn query's
+            next SerpAPI offset when the SerpAPI stage fetched it (for "load more")
         
     Returns:
         List of recommendation dictionaries
@@ -2518,226 +3489,219 @@ def find_target_recommendations(
     pref_context = _build_preference_context(preferences)
     profile_context = _build_sender_context(sender_profile)
     
-    # 用于数据收集的变量
-    collected_prompt = ""
-    collected_output = ""
-
     # ============================================================
+    # 各阶段按质量顺序定义；每个阶段有自己的熔断器（src/services/circuit_breaker.py）
+    # - 熔断中的阶段直接跳过，不再等待其超时
+    # - 健康阶段保持原顺序，失败率偏高的阶段排到后面
+    # 阶段抛出异常 = 失败；返回空结果 = 服务可用但没有结果（记为成功）
+    # - 增量补足：阶段结果不足 count 时全部保留，下一阶段只补差额（并排除已找到的人）
+    # ============================================================
+    serpapi_api_key = serpapi_key()
+
     # PRIMARY: SerpAPI 直接搜索 LinkedIn 找真实的人
     # 不依赖 AI 生成名字，直接从搜索结果中提取真实存在的用户
-    # ============================================================
-    serpapi_key = os.environ.get("SERPAPI_KEY") or os.environ.get("SERP_API_KEY")
-    if serpapi_key:
-        try:
-            print("[SerpAPI Search] Using SerpAPI to find real LinkedIn profiles...")
-            serpapi_results = _search_linkedin_via_serpapi(
-                preferences=preferences,
-                field=field,
-                purpose=purpose,
-                count=count,
+    async def _serpapi_stage(need: int, exclude: list[str]) -> list[dict] | None:
+        print("[SerpAPI Search] Using SerpAPI to find real LinkedIn profiles...")
+        serpapi_results = await async_runtime.to_thread(
+            "serpapi",
+            _find_linkedin_candidates,
+            preferences=preferences,
+            field=field,
+            purpose=purpose,
+            count=need + len(exclude),  # 搜索无法排除已找到的人，多取一些再过滤
+            paging=serpapi_paging,
+            raise_errors=True,
+        )
+        excluded = {_person_key(name) for name in exclude}
+        serpapi_results = [r for r in serpapi_results or [] if _person_key(r.get("name", "")) not in excluded][:need]
+
+        if not serpapi_results:
+            print("[SerpAPI Search] No new profiles found, falling back")
+            return None
+
+        # 找到的真实用户全部保留（不足的部分由后续阶段补足）
+        print(f"[SerpAPI Search] Found {len(serpapi_results)} real profiles")
+
+        # 使用 AI 进行评分和匹配度分析
+        print("[AI Scoring] Analyzing candidates with AI...")
+        scored_results = await _aai_score_and_analyze_candidates(
+            candidates=serpapi_results,
+            sender_profile=sender_profile,
+            preferences=preferences,
+            purpose=purpose,
+            field=field,
+            model=model,
+        )
+
+        # 保存收集的数据
+        if PROMPT_COLLECTOR_AVAILABLE and prompt_collector and session_id:
+            search_query = _build_serpapi_search_query(preferences, field, purpose)
+            prompt_collector.record_find_target(
+                session_id=session_id,
+                prompt=f"SerpAPI Search: {search_query}",
+                output=json.dumps(scored_results, ensure_ascii=False),
+                metadata={"method": "serpapi_direct_with_ai_scoring", "count": len(scored_results)}
             )
-            
-            if serpapi_results and len(serpapi_results) >= 3:
-                # 成功找到足够的真实用户
-                print(f"[SerpAPI Search] Successfully found {len(serpapi_results)} real profiles")
-                
-                # 使用 AI 进行评分和匹配度分析
-                print("[AI Scoring] Analyzing candidates with AI...")
-                scored_results = _ai_score_and_analyze_candidates(
-                    candidates=serpapi_results,
-                    sender_profile=sender_profile,
-                    preferences=preferences,
-                    purpose=purpose,
-                    field=field,
-                    model=model,
-                )
-                
-                # 保存收集的数据
-                if PROMPT_COLLECTOR_AVAILABLE and prompt_collector and session_id:
-                    search_query = _build_serpapi_search_query(preferences, field, purpose)
-                    prompt_collector.record_find_target(
-                        session_id=session_id,
-                        prompt=f"SerpAPI Search: {search_query}",
-                        output=json.dumps(scored_results, ensure_ascii=False),
-                        metadata={"method": "serpapi_direct_with_ai_scoring", "count": len(scored_results)}
-                    )
-                
-                return scored_results[:count]
-            else:
-                print(f"[SerpAPI Search] Only found {len(serpapi_results) if serpapi_results else 0} results, falling back to Gemini")
-        except Exception as e:
-            print(f"[SerpAPI Search] Error: {e}, falling back to Gemini")
+        return scored_results
 
-    # ============================================================
     # FALLBACK: Gemini with Google Search grounding
-    # 当 SerpAPI 不可用或结果不足时使用
-    # ============================================================
-    if USE_GEMINI_SEARCH:
-        try:
-            prompt = _build_recommendation_prompt(
-                purpose=purpose,
-                field=field,
-                profile_context=profile_context,
-                pref_context=pref_context,
-                count=count,
-                web_text="",
-                sources=[],
-                include_web_section=False,
-            )
-            # Add instruction for real-time search - DO NOT ask for LinkedIn URLs
-            # because the model will fabricate them instead of finding real ones
-            search_prompt = (
-                f"{prompt}\n\n"
-                "CRITICAL SEARCH INSTRUCTIONS:\n"
-                "1. Use Google Search to find REAL professionals currently working in this field.\n"
-                "2. Search for each person to verify they actually exist and work at the company.\n"
-                "3. DO NOT include linkedin_url - leave it as empty string. Users will search LinkedIn themselves.\n"
-                "4. Include the sources field with actual news/company/article URLs where you found information.\n"
-                "5. Focus on finding people with verifiable public information (news articles, company pages, etc.).\n"
-                "6. For Finance/Banking, search for professionals at major institutions like Goldman Sachs, Morgan Stanley, JPMorgan, BlackRock, etc.\n"
-                "\n"
-                "IMPORTANT: Only include people you can verify exist. Each person MUST have evidence from search results.\n"
-                "DO NOT make up or guess LinkedIn profile URLs - the linkedin_url field should always be empty string."
-            )
-            # Get response with grounding URLs for logging
-            result = _call_gemini_with_search(search_prompt, model=GEMINI_SEARCH_MODEL, json_mode=True, return_grounding_urls=True)
-            content, grounding_urls = result
-            
-            print(f"[Search] Retrieved {len(grounding_urls)} grounding source URLs")
-            
-            # 收集数据
-            collected_prompt = search_prompt
-            collected_output = content
-            
-            raw_items = json.loads(content).get("recommendations", [])
-            # Normalize and generate LinkedIn search URLs (not profile URLs)
-            recommendations = _normalize_recommendations(raw_items, grounding_urls=grounding_urls)
-            recommendations.sort(key=lambda x: _safe_int(x.get("match_score", 0), default=0), reverse=True)
-            if recommendations:
-                print(f"Gemini Search found {len(recommendations)} recommendations")
-                # 保存收集的数据
-                if PROMPT_COLLECTOR_AVAILABLE and prompt_collector and session_id:
-                    prompt_collector.record_find_target(
-                        session_id=session_id,
-                        prompt=collected_prompt,
-                        output=collected_output,
-                        metadata={"model": GEMINI_SEARCH_MODEL, "method": "gemini_search", "count": len(recommendations)}
-                    )
-                return recommendations[:count]
-        except Exception as e:
-            print(f"Gemini Search recommendation error: {e}")
+    async def _gemini_search_stage(need: int, exclude: list[str]) -> list[dict] | None:
+        prompt = _build_recommendation_prompt(
+            purpose=purpose,
+            field=field,
+            profile_context=profile_context,
+            pref_context=pref_context,
+            count=need,
+            exclude_names=exclude,
+            web_text="",
+            sources=[],
+            include_web_section=False,
+        )
+        # Add instruction for real-time search - DO NOT ask for LinkedIn URLs
+        # because the model will fabricate them instead of finding real ones
+        search_prompt = (
+            f"{prompt}\n\n"
+            "CRITICAL SEARCH INSTRUCTIONS:\n"
+            "1. Use Google Search to find REAL professionals currently working in this field.\n"
+            "2. Search for each person to verify they actually exist and work at the company.\n"
+            "3. DO NOT include linkedin_url - leave it as empty string. Users will search LinkedIn themselves.\n"
+            "4. Include the sources field with actual news/company/article URLs where you found information.\n"
+            "5. Focus on finding people with verifiable public information (news articles, company pages, etc.).\n"
+            "6. For Finance/Banking, search for professionals at major institutions like Goldman Sachs, Morgan Stanley, JPMorgan, BlackRock, etc.\n"
+            "\n"
+            "IMPORTANT: Only include people you can verify exist. Each person MUST have evidence from search results.\n"
+            "DO NOT make up or guess LinkedIn profile URLs - the linkedin_url field should always be empty string."
+        )
+        # Get response with grounding URLs for logging
+        result = await _acall_gemini_with_search(search_prompt, model=GEMINI_SEARCH_MODEL, json_mode=True, return_grounding_urls=True)
+        content, grounding_urls = result
+
+        print(f"[Search] Retrieved {len(grounding_urls)} grounding source URLs")
+
+        raw_items = structured_output.parse(content, RECOMMENDATIONS)["recommendations"]
+        # Normalize and generate LinkedIn search URLs (not profile URLs)
+        recommendations = await asyncio.to_thread(_normalize_recommendations, raw_items, grounding_urls=grounding_urls)
+        recommendations.sort(key=lambda x: _safe_int(x.get("match_score", 0), default=0), reverse=True)
+        if recommendations:
+            print(f"Gemini Search found {len(recommendations)} recommendations")
+            # 保存收集的数据
+            if PROMPT_COLLECTOR_AVAILABLE and prompt_collector and session_id:
+                prompt_collector.record_find_target(
+                    session_id=session_id,
+                    prompt=search_prompt,
+                    output=content,
+                    metadata={"model": GEMINI_SEARCH_MODEL, "method": "gemini_search", "count": len(recommendations)}
+                )
+        return recommendations
 
     # Fallback 1: OpenAI (gpt-5.1) with built-in web_search tool - DISABLED by default
-    if USE_OPENAI_WEB_SEARCH and USE_OPENAI_RECOMMENDATIONS:
-        try:
-            fallback_prompt = _build_recommendation_prompt(
-                purpose=purpose,
-                field=field,
-                profile_context=profile_context,
-                pref_context=pref_context,
-                count=count,
-                include_web_section=False,
-                require_tool_use=True,
-            )
-            content = _call_openai_json_with_web_search(fallback_prompt, model=RECOMMENDATION_MODEL)
-            
-            # 收集数据
-            collected_prompt = fallback_prompt
-            collected_output = content
-            
-            raw_items = json.loads(content).get("recommendations", [])
-            recommendations = _normalize_recommendations(raw_items)
-            recommendations.sort(key=lambda x: _safe_int(x.get("match_score", 0), default=0), reverse=True)
-            if recommendations:
-                # 保存收集的数据
-                if PROMPT_COLLECTOR_AVAILABLE and prompt_collector and session_id:
-                    prompt_collector.record_find_target(
-                        session_id=session_id,
-                        prompt=collected_prompt,
-                        output=collected_output,
-                        metadata={"model": RECOMMENDATION_MODEL, "method": "openai_web_search", "count": len(recommendations)}
-                    )
-                return recommendations[:count]
-        except Exception as e:
-            print(f"OpenAI recommendation (web_search) error: {e}")
+    async def _openai_web_search_stage(need: int, exclude: list[str]) -> list[dict] | None:
+        fallback_prompt = _build_recommendation_prompt(
+            purpose=purpose,
+            field=field,
+            profile_context=profile_context,
+            pref_context=pref_context,
+            count=need,
+            exclude_names=exclude,
+            include_web_section=False,
+            require_tool_use=True,
+        )
+        content = await _acall_openai_json_with_web_search(fallback_prompt, model=RECOMMENDATION_MODEL)
 
-    # Fallback 1: our own web scrape + OpenAI - DISABLED by default
-    if USE_OPENAI_RECOMMENDATIONS:
-        try:
-            web_text, web_sources = _gather_recommendation_web_context(field, purpose, preferences, max_pages=3)
-            content = _call_openai_json(
-                _build_recommendation_prompt(
-                    purpose=purpose,
-                    field=field,
-                    profile_context=profile_context,
-                    pref_context=pref_context,
-                    count=count,
-                    web_text=web_text,
-                    sources=web_sources,
-                    include_web_section=True,
-                    require_tool_use=False,
-                ),
-                model=RECOMMENDATION_MODEL,
-            )
-            raw_items = json.loads(content).get("recommendations", [])
-            recommendations = _normalize_recommendations(raw_items)
-            recommendations.sort(key=lambda x: _safe_int(x.get("match_score", 0), default=0), reverse=True)
-            if recommendations:
-                return recommendations[:count]
-        except Exception as e:
-            print(f"OpenAI recommendation (scrape fallback) error: {e}")
+        raw_items = structured_output.parse(content, RECOMMENDATIONS)["recommendations"]
+        recommendations = await asyncio.to_thread(_normalize_recommendations, raw_items)
+        recommendations.sort(key=lambda x: _safe_int(x.get("match_score", 0), default=0), reverse=True)
+        if recommendations:
+            # 保存收集的数据
+            if PROMPT_COLLECTOR_AVAILABLE and prompt_collector and session_id:
+                prompt_collector.record_find_target(
+                    session_id=session_id,
+                    prompt=fallback_prompt,
+                    output=content,
+                    metadata={"model": RECOMMENDATION_MODEL, "method": "openai_web_search", "count": len(recommendations)}
+                )
+        return recommendations
 
-    # Fallback 2: lightweight web scrape + Gemini (keeps evidence grounded even without Gemini Search)
-    try:
-        web_text, web_sources = _gather_recommendation_web_context(field, purpose, preferences, max_pages=1)
-        if web_text or web_sources:
-            fallback_prompt = _build_recommendation_prompt(
+    # Fallback 1: our own web scrape + OpenAI - DISABLED by default
+    async def _scrape_openai_stage(need: int, exclude: list[str]) -> list[dict] | None:
+        web_text, web_sources = await _agather_recommendation_web_context(field, purpose, preferences, max_pages=3)
+        content = await _acall_openai_json(
+            _build_recommendation_prompt(
                 purpose=purpose,
                 field=field,
                 profile_context=profile_context,
                 pref_context=pref_context,
-                count=count,
+                count=need,
+                exclude_names=exclude,
                 web_text=web_text,
                 sources=web_sources,
                 include_web_section=True,
                 require_tool_use=False,
-            )
-            content = _call_llm(
-                fallback_prompt,
-                json_mode=True,
-            )
-            raw_items = json.loads(content).get("recommendations", [])
-            recommendations = _normalize_recommendations(raw_items)
-            recommendations.sort(key=lambda x: _safe_int(x.get("match_score", 0), default=0), reverse=True)
-            if recommendations:
-                # 保存收集的数据（scrape + Gemini fallback）
-                if PROMPT_COLLECTOR_AVAILABLE and prompt_collector and session_id:
-                    prompt_collector.record_find_target(
-                        session_id=session_id,
-                        prompt=fallback_prompt,
-                        output=content,
-                        metadata={"model": model, "method": "gemini_scrape_fallback", "count": len(recommendations)}
-                    )
-                return recommendations[:count]
-    except Exception as e:
-        print(f"Gemini recommendation (scrape fallback) error: {e}")
-
-    # Default: Gemini text-only generation (fast and reliable)
-    prompt = _build_recommendation_prompt(
-        purpose=purpose,
-        field=field,
-        profile_context=profile_context,
-        pref_context=pref_context,
-        count=count,
-        web_text="",
-        sources=[],
-        include_web_section=False,
-    )
-    content = _call_llm(prompt, json_mode=True)
-    
-    try:
-        raw_items = json.loads(content).get("recommendations", [])
-        recommendations = _normalize_recommendations(raw_items)
+            ),
+            model=RECOMMENDATION_MODEL,
+            caller="find_target_recommendations",
+        )
+        raw_items = structured_output.parse(content, RECOMMENDATIONS)["recommendations"]
+        recommendations = await asyncio.to_thread(_normalize_recommendations, raw_items)
+        recommendations.sort(key=lambda x: _safe_int(x.get("match_score", 0), default=0), reverse=True)
+        return recommendations
+
+    # Fallback 2: lightweight web scrape + Gemini (keeps evidence grounded even without Gemini Search)
+    async def _scrape_gemini_stage(need: int, exclude: list[str]) -> list[dict] | None:
+        web_text, web_sources = await _agather_recommendation_web_context(field, purpose, preferences, max_pages=1)
+        if not (web_text or web_sources):
+            return None
+        fallback_prompt = _build_recommendation_prompt(
+            purpose=purpose,
+            field=field,
+            profile_context=profile_context,
+            pref_context=pref_context,
+            count=need,
+            exclude_names=exclude,
+            web_text=web_text,
+            sources=web_sources,
+            include_web_section=True,
+            require_tool_use=False,
+        )
+        content = await _acall_llm(
+            fallback_prompt,
+            json_mode=True,
+            caller="find_target_recommendations",
+        )
+        raw_items = structured_output.parse(content, RECOMMENDATIONS)["recommendations"]
+        recommendations = await asyncio.to_thread(_normalize_recommendations, raw_items)
+        recommendations.sort(key=lambda x: _safe_int(x.get("match_score", 0), default=0), reverse=True)
+        if recommendations:
+            # 保存收集的数据（scrape + Gemini fallback）
+            if PROMPT_COLLECTOR_AVAILABLE and prompt_collector and session_id:
+                prompt_collector.record_find_target(
+                    session_id=session_id,
+                    prompt=fallback_prompt,
+                    output=content,
+                    metadata={"model": model, "method": "gemini_scrape_fallback", "count": len(recommendations)}
+                )
+        return recommendations
+
+    # Default: Gemini text-only generation (fast and reliable) - always tried last
+    async def _text_only_stage(need: int, exclude: list[str]) -> list[dict] | None:
+        prompt = _build_recommendation_prompt(
+            purpose=purpose,
+            field=field,
+            profile_context=profile_context,
+            pref_context=pref_context,
+            count=need,
+            exclude_names=exclude,
+            web_text="",
+            sources=[],
+            include_web_section=False,
+        )
+        content = await _acall_llm(prompt, json_mode=True, caller="find_target_recommendations")
+
+        try:
+            raw_items = structured_output.parse(content, RECOMMENDATIONS)["recommendations"]
+        except SchemaError:
+            return None
+        recommendations = await asyncio.to_thread(_normalize_recommendations, raw_items)
         recommendations.sort(key=lambda x: _safe_int(x.get("match_score", 0), default=0), reverse=True)
         if recommendations:
             # 保存收集的数据（default fallback）
@@ -2748,9 +3712,41 @@ def find_target_recommendations(
                     output=content,
                     metadata={"model": model, "method": "gemini_text_only", "count": len(recommendations)}
                 )
-            return recommendations[:count]
-    except json.JSONDecodeError:
-        pass
+        return recommendations
+
+    stages: dict[str, Callable[[int, list[str]], Awaitable[list[dict] | None]]] = {}
+    if serpapi_api_key or people_index.enabled:
+        stages["serpapi"] = _serpapi_stage
+    if USE_GEMINI_SEARCH:
+        stages["gemini_search"] = _gemini_search_stage
+    if USE_OPENAI_WEB_SEARCH and USE_OPENAI_RECOMMENDATIONS:
+        stages["openai_web_search"] = _openai_web_search_stage
+    if USE_OPENAI_RECOMMENDATIONS:
+        stages["scrape_openai"] = _scrape_openai_stage
+    stages["scrape_gemini"] = _scrape_gemini_stage
+
+    # text_only is the last resort: stays last regardless of health and runs even if its breaker is open
+    collected: list[dict] = []
+    seen: set[str] = set()
+    for stage_name in [*stage_breakers.order(list(stages)), "text_only"]:
+        stage = stages.get(stage_name, _text_only_stage)
+        need = count - len(collected)
+        exclude = [r.get("name", "") for r in collected]
+        recommendations = await _arun_find_target_stage(
+            stage_name, lambda: stage(need, exclude), bypass_breaker=stage_name == "text_only"
+        )
+        for rec in recommendations or []:
+            keys = {_person_key(rec.get("name", "")), normalize_profile_url(rec.get("linkedin_url") or "")} - {""}
+            if not keys or keys & seen:
+                continue
+            seen |= keys
+            collected.append(rec)
+        if len(collected) >= count:
+            break
+        if collected:
+            print(f"[FindTarget] {len(collected)}/{count} recommendations after stage '{stage_name}', topping up")
+    if collected:
+        return collected[:count]
 
     # Final fallback
     fallback_name = "Contact in " + field
@@ -2771,6 +3767,164 @@ def find_target_recommendations(
     ]
 
 
+def find_target_recommendations(
+    purpose: str,
+    field: str,
+    sender_profile: dict | None = None,
+    preferences: dict | None = None,
+    *,
+    model: str = DEFAULT_MODEL,
+    count: int = 10,
+    session_id: str | None = None,  # 用于数据收集
+    serpapi_paging: dict[str, int] | None = None,
+) -> list[dict]:
+    """Blocking wrapper over `afind_target_recommendations` (see its docstring)."""
+    return run_sync(
+        afind_target_recommendations(
+            purpose,
+            field,
+            sender_profile,
+            preferences,
+            model=model,
+            count=count,
+            session_id=session_id,
+            serpapi_paging=serpapi_paging,
+        )
+    )
+
+
+def open_recommendation_cursor(
+    user_id: str,
+    purpose: str,
+    field: str,
+    preferences: dict | None,
+    recommendations: list[dict],
+    *,
+    serpapi_paging: dict[str, int] | None = None,
+) -> RecommendationCursor:
+    """
+    为第一页推荐创建"加载更多"游标并保存
+    
+    `serpapi_paging` 是第一页搜索填入的主查询翻页位置，只在主查询完成并计入第一页时才有；
+    第一页没有用到主查询（本地人物索引、补充查询或 LLM 阶段给出的结果）时下一页从 0 开始。
+    """
+    paging = serpapi_paging or {}
+    start = paging["start"] if "start" in paging and "organic" in paging else 0
+    cursor = recommendation_cursors.create(user_id, search_key(purpose, field, preferences), start=start)
+    cursor.mark_shown(recommendations)
+    recommendation_cursors.save(cursor)
+    return cursor
+
+
+async def afind_more_recommendations(
+    purpose: str,
+    field: str,
+    sender_profile: dict | None = None,
+    preferences: dict | None = None,
+    *,
+    cursor: RecommendationCursor,
+    model: str = DEFAULT_MODEL,
+    count: int = 10,
+) -> list[dict]:
+    """
+    "加载更多"：按游标继续同一个搜索，不重新跑整个流程
+    
+    1. 先返回游标中已评分但尚未展示的候选人（不调用 LLM）
+    2. 不够时查本地人物索引，再从游标的 `start` 请求 SerpAPI 的下一页
+       （每次最多 RECOMMENDATION_CURSOR_MAX_PAGES 页）
+    3. 已向该用户展示过的人在评分前排除，只给新候选人评分；多出来的留在游标里
+    
+    `cursor` 在原地更新（start / pending / shown / exhausted），由调用方保存。
+    """
+    page = [c for c in cursor.pending if not cursor.is_shown(c)]
+    cursor.pending = []
+    seen = set(cursor.shown)
+    for candidate in page:
+        seen.update(candidate_keys(candidate))
+
+    def _unseen(candidates: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        fresh = []
+        for candidate in candidates:
+            keys = candidate_keys(candidate)
+            if keys and not keys & seen:
+                seen.update(keys)
+                fresh.append(candidate)
+        return fresh
+
+    new: list[dict[str, Any]] = []
+    if len(page) < count:
+        query = _build_serpapi_search_query(preferences, field, purpose)
+        indexed = await asyncio.to_thread(people_index.search, query, limit=count + len(cursor.shown))
+        new = _unseen([_indexed_person_to_candidate(p, field) for p in indexed])[: count - len(page)]
+
+    pages = 0
+    while len(page) + len(new) < count and not cursor.exhausted and pages < RECOMMENDATION_CURSOR_MAX_PAGES:
+        pages += 1
+        paging: dict[str, int] = {}
+        try:
+            results = await async_runtime.to_thread(
+                "serpapi",
+                _search_linkedin_via_serpapi,
+                preferences,
+                field,
+                purpose,
+                _SERPAPI_MAX_NUM,
+                start=cursor.start,
+                paging=paging,
+                raise_errors=True,
+            )
+        except Exception as e:
+            # 网络错误、限流超时、SerpAPI 错误响应：不移动偏移量，下次"加载更多"重试这一页
+            print(f"[FindMore] SerpAPI page at start={cursor.start} failed: {e}")
+            break
+        if not paging:
+            # 没有 API key：同上，不移动偏移量
+            print(f"[FindMore] SerpAPI page at start={cursor.start} not fetched")
+            break
+        if not paging["organic"]:
+            # 只有 Google 本身没有更多结果时才算翻到底
+            cursor.exhausted = True
+            break
+        # 本页可能没有可解析的个人主页，仍然继续翻页
+        cursor.start = paging["start"]
+        new.extend(_unseen(results))
+
+    if new:
+        print(f"[FindMore] Scoring {len(new)} new candidates ({len(page)} already scored)")
+        page.extend(
+            await _aai_score_and_analyze_candidates(
+                candidates=new,
+                sender_profile=sender_profile,
+                preferences=preferences,
+                purpose=purpose,
+                field=field,
+                model=model,
+            )
+        )
+    page.sort(key=lambda c: _safe_int(c.get("match_score", 0), default=0), reverse=True)
+    cursor.pending = page[count:]
+    cursor.mark_shown(page[:count])
+    return page[:count]
+
+
+def find_more_recommendations(
+    purpose: str,
+    field: str,
+    sender_profile: dict | None = None,
+    preferences: dict | None = None,
+    *,
+    cursor: RecommendationCursor,
+    model: str = DEFAULT_MODEL,
+    count: int = 10,
+) -> list[dict]:
+    """Blocking wrapper over `afind_more_recommendations` (see its docstring)."""
+    return run_sync(
+        afind_more_recommendations(
+            purpose, field, sender_profile, preferences, cursor=cursor, model=model, count=count
+        )
+    )
+
+
 def parse_text_to_profile(
     text_content: str,
     name: str = "",
@@ -2813,10 +3967,10 @@ Return a JSON object with this structure:
 
 Extract as much relevant information as possible. Return JSON only."""
 
-    content = _call_llm(prompt, json_mode=True)
+    content = _call_llm(prompt, json_mode=True, caller="parse_text_to_profile")
     
     try:
-        profile = json.loads(content)
+        profile = structured_output.parse(content, PROFILE)
         # Ensure required fields
         profile.setdefault('name', name or 'Unknown')
         profile.setdefault('field', field)
@@ -2827,7 +3981,7 @@ Extract as much relevant information as possible. Return JSON only."""
         profile.setdefault('projects', [])
         profile.setdefault('sources', ['Uploaded document'])
         return profile
-    except json.JSONDecodeError:
+    except SchemaError:
         return {
             "name": name or "Unknown",
             "field": field,
@@ -2840,6 +3994,32 @@ Extract as much relevant information as possible. Return JSON only."""
         }
 
 
+RESTYLE_SYSTEM_PREFIX = PromptPrefix(
+    name="regenerate_email_with_style",
+    version="v2",
+    text="""You are an expert email editor. Your task is to adjust ONLY the tone/style of emails while preserving ALL original content exactly.
+
+CRITICAL RULES:
+1. ONLY change the tone/style - do NOT change the substance
+2. PRESERVE ALL original information exactly:
+   - All names (sender, receiver, companies, people mentioned)
+   - All specific details (dates, numbers, facts, achievements)
+   - All credentials and experiences mentioned
+   - The specific ask/request
+   - Any shared connections or references
+3. DO NOT add new information that wasn't in the original
+4. DO NOT remove any factual content
+5. Keep the same email structure (Subject, greeting, body paragraphs, closing)
+
+Your job is like adjusting the "volume" of formality - the content stays the same, only the delivery changes.
+
+OUTPUT FORMAT (IMPORTANT):
+- Plain text only, NO Markdown (no **, no ##, no *)
+- Start with "Subject: " followed by the subject text
+- Then a blank line, then the email body""",
+)
+
+
 def regenerate_email_with_style(
     original_email: str,
     style_instruction: str,
@@ -2867,8 +4047,6 @@ def regenerate_email_with_style(
     if receiver_info:
         context += f"\nReceiver: {receiver_info.get('name', 'Unknown')}"
     
-    system_prompt = """You are an expert email editor. Your task is to adjust ONLY the tone/style of emails while preserving ALL original content exactly."""
-    
     user_prompt = f"""Adjust the tone of the following cold email according to the style instruction.
 
 Original email:
@@ -2877,41 +4055,27 @@ Original email:
 Style instruction: {style_instruction}
 {context}
 
-CRITICAL RULES:
-1. ONLY change the tone/style - do NOT change the substance
-2. PRESERVE ALL original information exactly:
-   - All names (sender, receiver, companies, people mentioned)
-   - All specific details (dates, numbers, facts, achievements)
-   - All credentials and experiences mentioned
-   - The specific ask/request
-   - Any shared connections or references
-3. DO NOT add new information that wasn't in the original
-4. DO NOT remove any factual content
-5. Keep the same email structure (Subject, greeting, body paragraphs, closing)
-
-Your job is like adjusting the "volume" of formality - the content stays the same, only the delivery changes.
-
-OUTPUT FORMAT (IMPORTANT):
-- Plain text only, NO Markdown (no **, no ##, no *)
-- Start with "Subject: " followed by the subject text
-- Then a blank line, then the email body
-
 Return only the adjusted email. No explanations."""
+    prompt_accounting.record(RESTYLE_SYSTEM_PREFIX, user_prompt)
+    system_prompt = RESTYLE_SYSTEM_PREFIX.text
 
-    # 根据配置选择模型
-    use_openai = USE_OPENAI_FOR_EMAIL
+    # 按任务路由选择模型（provider 由模型名决定）
+    default_model = OPENAI_EMAIL_MODEL if USE_OPENAI_FOR_EMAIL else DEFAULT_MODEL
+    actual_model = (
+        model or model_router.model_for("regenerate_email_with_style", default=default_model) or default_model
+    )
     
-    if use_openai:
-        actual_model = model or OPENAI_EMAIL_MODEL
+    if provider_for_model(actual_model) == "openai":
         result = _call_openai_chat(
             system_content=system_prompt,
             user_content=user_prompt,
             model=actual_model,
-            temperature=0.7
+            temperature=0.7,
+            caller="regenerate_email_with_style",
+            prefix=RESTYLE_SYSTEM_PREFIX,
         )
     else:
-        actual_model = model or DEFAULT_MODEL
         prompt = f"System instruction: {system_prompt}\n\nUser request:\n{user_prompt}"
-        result = _call_llm(prompt, model=actual_model)
+        result = _call_llm(prompt, model=actual_model, caller="regenerate_email_with_style")
     
     return result.strip()
@@ -0,0 +1,180 @@
+"""Shared asyncio runtime for sync callers.
+
+Flask/gunicorn request threads are synchronous, but the LLM/HTTP layer in
+`src.email_agent` is async so independent network steps can overlap. Rather
+than `asyncio.run()` per call (which would throw away every pooled async
+client together with its loop), each worker process owns one background event
+loop thread; sync wrappers submit coroutines to it with `run_sync()` and
+drain async generators (e.g. streamed tokens) with `iterate_sync()`.
+
+Per-provider semaphores bound how many calls to OpenAI / Gemini / SerpAPI are
+in flight at once from this worker (limits in config.PROVIDER_CONCURRENCY).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import queue
+import threading
+import weakref
+from typing import Any, AsyncIterator, Awaitable, Callable, Coroutine, Iterator, TypeVar
+
+from config import PROVIDER_CONCURRENCY
+
+T = TypeVar("T")
+
+DEFAULT_PROVIDER_CONCURRENCY = 4
+
+
+class AsyncRuntime:
+    """One background event loop per worker process (fork-aware)."""
+
+    def __init__(self, concurrency: dict[str, int] | None = None) -> None:
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._pid = os.getpid()
+        self._concurrency = dict(PROVIDER_CONCURRENCY if concurrency is None else concurrency)
+        # loop -> {provider: Semaphore}; semaphores are bound to the loop that uses them
+        self._semaphores: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[str, asyncio.Semaphore]
+        ] = weakref.WeakKeyDictionary()
+
+    def _reset_after_fork(self) -> None:
+        # The loop thread does not survive fork; start a fresh one lazily
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._pid = os.getpid()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+        loop = self._loop
+        if loop is not None and self._thread is not None and self._thread.is_alive():
+            return loop
+        with self._lock:
+            if self._loop is None or self._thread is None or not self._thread.is_alive():
+                new_loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=new_loop.run_forever,
+                    name="connact-async-runtime",
+                    daemon=True,
+                )
+                thread.start()
+                self._loop = new_loop
+                self._thread = thread
+            return self._loop
+
+    def in_runtime_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def run(self, coro: Coroutine[Any, Any, T], *, timeout: float | None = None) -> T:
+        """Run `coro` on the background loop and block the calling thread for its result."""
+        if self.in_runtime_thread():
+            coro.close()
+            raise RuntimeError("run_sync() called from the async runtime thread; await the coroutine instead")
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def iterate(self, agen: AsyncIterator[T], *, timeout: float | None = None) -> Iterator[T]:
+        """Drive async generator `agen` on the background loop and yield its items here.
+
+        `timeout` bounds the wait for each next item. Closing the returned iterator
+        early (e.g. the HTTP client disconnected) cancels the producer.
+        """
+        if self.in_runtime_thread():
+            raise RuntimeError("iterate_sync() called from the async runtime thread; use `async for` instead")
+        items: queue.Queue[tuple[str, Any]] = queue.Queue()
+
+        async def pump() -> None:
+            try:
+                async for item in agen:
+                    items.put(("item", item))
+            except Exception as e:
+                items.put(("error", e))
+            else:
+                items.put(("done", None))
+            finally:
+                aclose = getattr(agen, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self.loop)
+        try:
+            while True:
+                try:
+                    kind, value = items.get(timeout=timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"No stream item within {timeout}s") from None
+                if kind == "item":
+                    yield value
+                elif kind == "error":
+                    raise value
+                else:
+                    return
+        finally:
+            future.cancel()
+
+    def semaphore(self, provider: str) -> asyncio.Semaphore:
+        """Concurrency gate for `provider` on the currently running loop."""
+        loop = asyncio.get_running_loop()
+        per_loop = self._semaphores.get(loop)
+        if per_loop is None:
+            per_loop = {}
+            self._semaphores[loop] = per_loop
+        sem = per_loop.get(provider)
+        if sem is None:
+            limit = self._concurrency.get(provider, DEFAULT_PROVIDER_CONCURRENCY)
+            sem = asyncio.Semaphore(max(1, int(limit)))
+            per_loop[provider] = sem
+        return sem
+
+    async def limited(self, provider: str, call: Callable[[], Awaitable[T]]) -> T:
+        """Await `call()` while holding the provider's semaphore."""
+        async with self.semaphore(provider):
+            return await call()
+
+    async def to_thread(self, provider: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run blocking `func` in a worker thread, bounded by the provider's semaphore.
+
+        A thread cannot be interrupted, so the slot is held until `func` returns even
+        when the caller is cancelled (e.g. a deadline); otherwise abandoned calls would
+        let later callers exceed the provider's concurrency limit.
+        """
+        sem = self.semaphore(provider)
+        await sem.acquire()
+        try:
+            future = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+        except BaseException:
+            sem.release()
+            raise
+
+        def _release(done: asyncio.Future) -> None:
+            sem.release()
+            if not done.cancelled():
+                done.exception()  # retrieved here when the caller has gone away
+
+        future.add_done_callback(_release)
+        return await asyncio.shield(future)
+
+
+# 全局单例（每个 worker 进程一份）
+async_runtime = AsyncRuntime()
+
+
+def run_sync(coro: Coroutine[Any, Any, T], *, timeout: float | None = None) -> T:
+    """Blocking bridge used by the synchronous public API."""
+    return async_runtime.run(coro, timeout=timeout)
+
+
+def iterate_sync(agen: AsyncIterator[T], *, timeout: float | None = None) -> Iterator[T]:
+    """Blocking iterator over an async generator (used for streaming responses)."""
+    return async_runtime.iterate(agen, timeout=timeout)
@@ -0,0 +1,329 @@
+"""Record / replay of provider interactions for offline benchmarks and CI.
+
+With `CASSETTE_MODE=record`, every network interaction below our own call
+layers (cache, single-flight, retries, rate limiting) is written to
+`CASSETTE_DIR` as one JSON file per distinct request:
+
+    llm          OpenAI / Gemini completions (`_acoalesced_llm_call`, web_scraper, LLMService)
+    llm_stream   streamed email completions (text deltas + arrival offsets)
+    gemini_search / openai_web_search   search-grounded completions
+    serpapi      SerpAPI JSON responses (`api_key` is stripped from the key)
+    http         `WebScraper.session` responses (via a transport adapter)
+
+With `CASSETTE_MODE=replay` the same requests are answered from disk and
+nothing goes to the network; a request that was never recorded raises
+`CassetteMiss`. Replay injects `CASSETTE_LATENCY_MS` plus
+`CASSETTE_LATENCY_SCALE` x the recorded latency per interaction, so
+`find_target_recommendations` / `api_generate_email` can be run many times to
+measure our own overhead with or without realistic provider latency.
+
+Provider keys still gate which stages run, so replay needs them set (any value).
+There are no `urllib.request` calls left: SerpAPI goes through `serpapi_client`
+(a `requests` session) and page fetches through `WebScraper.session`, so these
+hooks cover every outbound request.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, TypeVar
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from config import CASSETTE_DIR, CASSETTE_LATENCY_MS, CASSETTE_LATENCY_SCALE, CASSETTE_MODE
+from src.services.metrics import current_call, record_usage
+
+T = TypeVar("T")
+
+OFF = "off"
+RECORD = "record"
+REPLAY = "replay"
+MODES = (OFF, RECORD, REPLAY)
+
+# Query parameters never written to a cassette (nor used in its key)
+_SECRET_PARAMS = frozenset({"api_key", "key", "access_token"})
+
+
+class CassetteMiss(RuntimeError):
+    """Replay mode got a request that was never recorded."""
+
+
+def redact_url(url: str) -> str:
+    """`url` without credential query parameters."""
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in _SECRET_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _usage_snapshot() -> tuple[int, int] | None:
+    call = current_call()
+    return (call.prompt_tokens, call.completion_tokens) if call is not None else None
+
+
+class _Usage:
+    """Recorded token counts, shaped like an OpenAI `usage` for `record_usage`."""
+
+    def __init__(self, prompt_tokens: int, completion_tokens: int) -> None:
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+
+class Cassette:
+    """Per-request JSON recordings under one directory - 线程安全"""
+
+    def __init__(
+        self,
+        directory: Path | str = CASSETTE_DIR,
+        *,
+        mode: str = CASSETTE_MODE,
+        latency_ms: float = CASSETTE_LATENCY_MS,
+        latency_scale: float = CASSETTE_LATENCY_SCALE,
+    ) -> None:
+        mode = (mode or OFF).lower()
+        if mode not in MODES:
+            print(f"[Cassette] Unknown CASSETTE_MODE '{mode}', recording disabled")
+            mode = OFF
+        self.mode = mode
+        self.directory = Path(directory)
+        self._latency = max(0.0, float(latency_ms)) / 1000
+        self._latency_scale = max(0.0, float(latency_scale))
+        self._lock = threading.Lock()
+        self._stats: dict[str, Counter] = {}
+        if mode != OFF:
+            print(f"[Cassette] {mode} mode, cassettes in {self.directory}")
+
+    @property
+    def active(self) -> bool:
+        return self.mode != OFF
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def make_key(kind: str, request: dict[str, Any]) -> str:
+        payload = json.dumps([kind, request], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def _path(self, kind: str, key: str) -> Path:
+        return self.directory / kind / f"{key}.json"
+
+    def _count(self, kind: str, event: str) -> None:
+        with self._lock:
+            self._stats.setdefault(kind, Counter())[event] += 1
+
+    def load(self, kind: str, request: dict[str, Any]) -> dict[str, Any]:
+        path = self._path(kind, self.make_key(kind, request))
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            self._count(kind, "misses")
+            raise CassetteMiss(f"No {kind} recording for {path.name}: {json.dumps(request, default=str)[:200]}") from None
+        self._count(kind, "replayed")
+        return entry
+
+    def save(self, kind: str, request: dict[str, Any], response: Any, **extra: Any) -> None:
+        path = self._path(kind, self.make_key(kind, request))
+        entry = {"kind": kind, "request": request, "response": response, "recorded_at": time.time(), **extra}
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.parent / f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+            tmp.write_text(json.dumps(entry, ensure_ascii=False, default=str, indent=1), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[Cassette] Could not write {path}: {e}")
+            return
+        self._count(kind, "recorded")
+
+    def delay_for(self, entry: dict[str, Any]) -> float:
+        """Injected replay latency for a recorded interaction."""
+        return self._latency + self._latency_scale * float(entry.get("latency_s") or 0.0)
+
+    @staticmethod
+    def _replay_usage(entry: dict[str, Any]) -> None:
+        usage = entry.get("usage")
+        if usage:
+            record_usage(_Usage(int(usage[0]), int(usage[1])))
+
+    @staticmethod
+    def _usage_delta(before: tuple[int, int] | None) -> list[int] | None:
+        after = _usage_snapshot()
+        if before is None or after is None:
+            return None
+        return [after[0] - before[0], after[1] - before[1]]
+
+    # ------------------------------------------------------------------
+    # Call wrappers
+    # ------------------------------------------------------------------
+
+    def call(self, kind: str, request: dict[str, Any], func: Callable[[], T]) -> T:
+        """Run blocking `func` (record) or answer from the cassette (replay)."""
+        if self.mode == OFF:
+            return func()
+        if self.mode == REPLAY:
+            entry = self.load(kind, request)
+            delay = self.delay_for(entry)
+            if delay:
+                time.sleep(delay)
+            self._replay_usage(entry)
+            return entry["response"]
+
+        before = _usage_snapshot()
+        start = time.perf_counter()
+        result = func()
+        self.save(
+            kind, request, result,
+            latency_s=round(time.perf_counter() - start, 4),
+            usage=self._usage_delta(before),
+        )
+        return result
+
+    async def acall(self, kind: str, request: dict[str, Any], func: Callable[[], Awaitable[T]]) -> T:
+        """Await `func()` (record) or answer from the cassette (replay)."""
+        if self.mode == OFF:
+            return await func()
+        if self.mode == REPLAY:
+            entry = self.load(kind, request)
+            delay = self.delay_for(entry)
+            if delay:
+                await asyncio.sleep(delay)
+            self._replay_usage(entry)
+            return entry["response"]
+
+        before = _usage_snapshot()
+        start = time.perf_counter()
+        result = await func()
+        self.save(
+            kind, request, result,
+            latency_s=round(time.perf_counter() - start, 4),
+            usage=self._usage_delta(before),
+        )
+        return result
+
+    async def astream(
+        self, kind: str, request: dict[str, Any], stream: Callable[[], AsyncIterator[str]]
+    ) -> AsyncIterator[str]:
+        """Pass through (record) or re-emit (replay) a text stream with its chunk timing."""
+        if self.mode == OFF:
+            async for chunk in stream():
+                yield chunk
+            return
+        if self.mode == REPLAY:
+            entry = self.load(kind, request)
+            if self._latency:
+                await asyncio.sleep(self._latency)
+            elapsed = 0.0
+            for chunk, offset in zip(entry["response"], entry.get("offsets") or []):
+                wait = self._latency_scale * (float(offset) - elapsed)
+                elapsed = float(offset)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                yield chunk
+            self._replay_usage(entry)
+            return
+
+        before = _usage_snapshot()
+        start = time.perf_counter()
+        chunks: list[str] = []
+        offsets: list[float] = []
+        async for chunk in stream():
+            chunks.append(chunk)
+            offsets.append(round(time.perf_counter() - start, 4))
+            yield chunk
+        # Only complete streams are recorded
+        self.save(
+            kind, request, chunks,
+            offsets=offsets,
+            latency_s=offsets[-1] if offsets else 0.0,
+            usage=self._usage_delta(before),
+        )
+
+    # ------------------------------------------------------------------
+    # requests transport
+    # ------------------------------------------------------------------
+
+    def mount(self, session: requests.Session) -> requests.Session:
+        """Route `session`'s HTTP(S) traffic through the cassette (no-op when off)."""
+        if self.mode != OFF:
+            adapter = CassetteAdapter(self)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        return session
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "directory": str(self.directory),
+                "kinds": {kind: dict(counts) for kind, counts in sorted(self._stats.items())},
+            }
+
+
+class CassetteAdapter(HTTPAdapter):
+    """requests transport adapter that records / replays whole HTTP responses."""
+
+    def __init__(self, cassette: Cassette, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._cassette = cassette
+
+    @staticmethod
+    def _request_key(request: requests.PreparedRequest) -> dict[str, Any]:
+        body = request.body
+        if isinstance(body, bytes):
+            body = body.decode("utf-8", errors="replace")
+        return {"method": request.method, "url": redact_url(request.url or ""), "body": body}
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        key = self._request_key(request)
+        if self._cassette.mode == REPLAY:
+            entry = self._cassette.load("http", key)
+            delay = self._cassette.delay_for(entry)
+            if delay:
+                time.sleep(delay)
+            return self._build_response(request, entry["response"])
+
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        if self._cassette.mode == RECORD:
+            self._cassette.save(
+                "http", key,
+                {
+                    "status": response.status_code,
+                    "reason": response.reason,
+                    "url": response.url,
+                    "headers": dict(response.headers),
+                    "encoding": response.encoding,
+                    "body_b64": base64.b64encode(response.content).decode("ascii"),
+                },
+                latency_s=round(time.perf_counter() - start, 4),
+            )
+        return response
+
+    def _build_response(self, request: requests.PreparedRequest, data: dict[str, Any]) -> requests.Response:
+        response = requests.Response()
+        response.status_code = int(data["status"])
+        response.reason = data.get("reason") or ""
+        response.url = data.get("url") or request.url
+        response.headers = CaseInsensitiveDict(data.get("headers") or {})
+        response.encoding = data.get("encoding")
+        response._content = base64.b64decode(data.get("body_b64") or "")
+        response.request = request
+        response.connection = self
+        return response
+
+
+# 全局单例（每个 worker 进程一份）
+cassette = Cassette()
@@ -0,0 +1,239 @@
+"""Per-stage circuit breakers for the find-target cascade.
+
+`afind_target_recommendations` tries several sources in turn (SerpAPI, Gemini
+search, OpenAI web_search, scrape + LLM, text-only LLM). Without breakers a
+dead provider costs every request its full timeout before the next stage runs.
+
+Each stage gets a breaker with a sliding window of the last `window` outcomes:
+
+    closed     normal; opens once the window holds >= `min_calls` outcomes and
+               the failure rate reaches `failure_rate`
+    open       stage is skipped instantly until `cooldown` seconds have passed
+    half_open  up to `half_open_max_calls` probe requests go through; a probe
+               success closes the breaker (fresh window), a failure re-opens it
+
+`BreakerRegistry.order()` ranks stages by health: healthy/probing stages keep
+their configured order, degraded ones (failure rate above `degraded_rate` but
+not yet open) move behind them, and open ones go last (and are skipped).
+
+Only provider failures (transport errors, HTTP errors, timeouts, SDK errors)
+count against a breaker; see `is_provider_failure`. A provider that answered
+with malformed content is up, so it must not be cut off.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Sequence
+
+from config import (
+    CIRCUIT_BREAKER_COOLDOWN,
+    CIRCUIT_BREAKER_DEGRADED_RATE,
+    CIRCUIT_BREAKER_FAILURE_RATE,
+    CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS,
+    CIRCUIT_BREAKER_MIN_CALLS,
+    CIRCUIT_BREAKER_WINDOW,
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def is_provider_failure(exc: BaseException) -> bool:
+    """
+    Whether `exc` means the provider itself failed (vs. a bad answer or a local bug).
+
+    Sockets / `requests` errors (all OSError, including requests' JSONDecodeError
+    for a garbled body) are provider failures; ValueError (SchemaError,
+    JSONDecodeError), TypeError, KeyError and missing modules are not. Anything
+    else (SDK API errors, RateLimitTimeout, ...) counts as a provider failure.
+    """
+    if isinstance(exc, OSError):
+        return True
+    return not isinstance(exc, (ValueError, TypeError, KeyError, ImportError))
+
+
+@dataclass
+class BreakerStats:
+    successes: int = 0
+    failures: int = 0
+    rejected: int = 0
+    opened: int = 0
+
+
+class CircuitBreaker:
+    """Failure-rate breaker with half-open probing - 线程安全"""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        window: int = CIRCUIT_BREAKER_WINDOW,
+        min_calls: int = CIRCUIT_BREAKER_MIN_CALLS,
+        failure_rate: float = CIRCUIT_BREAKER_FAILURE_RATE,
+        cooldown: float = CIRCUIT_BREAKER_COOLDOWN,
+        half_open_max_calls: int = CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS,
+        degraded_rate: float = CIRCUIT_BREAKER_DEGRADED_RATE,
+    ) -> None:
+        self.name = name
+        self._min_calls = max(1, int(min_calls))
+        self._failure_rate = float(failure_rate)
+        self._cooldown = max(0.0, float(cooldown))
+        self._half_open_max_calls = max(1, int(half_open_max_calls))
+        self._degraded_rate = float(degraded_rate)
+        self._lock = threading.Lock()
+        self._outcomes: deque[bool] = deque(maxlen=max(1, int(window)))
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._last_error = ""
+        self._stats = BreakerStats()
+
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+
+    def _refresh_locked(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self._cooldown:
+            self._state = HALF_OPEN
+            self._probes = 0
+            print(f"[CircuitBreaker] {self.name}: cooldown over, half-open")
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._refresh_locked()
+
+    def _failure_rate_locked(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for ok in self._outcomes if not ok) / len(self._outcomes)
+
+    def _open_locked(self, reason: str) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probes = 0
+        self._stats.opened += 1
+        print(f"[CircuitBreaker] {self.name}: open for {self._cooldown:.0f}s ({reason})")
+
+    def rank(self) -> int:
+        """0 = healthy or probing, 1 = degraded, 2 = open."""
+        with self._lock:
+            state = self._refresh_locked()
+            if state == OPEN:
+                return 2
+            if state == CLOSED and len(self._outcomes) >= self._min_calls:
+                if self._failure_rate_locked() >= self._degraded_rate:
+                    return 1
+            return 0
+
+    # ------------------------------------------------------------------
+    # Calls
+    # ------------------------------------------------------------------
+
+    def allow(self) -> bool:
+        """Whether a call may go through now (takes a probe slot while half-open)."""
+        with self._lock:
+            state = self._refresh_locked()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._probes < self._half_open_max_calls:
+                self._probes += 1
+                return True
+            self._stats.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._stats.successes += 1
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+                self._outcomes.clear()
+                self._probes = 0
+                print(f"[CircuitBreaker] {self.name}: probe succeeded, closed")
+            self._outcomes.append(True)
+
+    def record_failure(self, error: BaseException | str | None = None) -> None:
+        with self._lock:
+            self._stats.failures += 1
+            if error is not None:
+                self._last_error = str(error)[:200]
+            if self._state == HALF_OPEN:
+                self._open_locked("probe failed")
+                return
+            self._outcomes.append(False)
+            if self._state == CLOSED and len(self._outcomes) >= self._min_calls:
+                rate = self._failure_rate_locked()
+                if rate >= self._failure_rate:
+                    self._open_locked(f"failure rate {rate:.0%} over last {len(self._outcomes)} calls")
+
+    def release(self) -> None:
+        """Give back a half-open probe slot without an outcome (e.g. the request was cancelled)."""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._outcomes.clear()
+            self._probes = 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            state = self._refresh_locked()
+            data: dict = {
+                "state": state,
+                "window_calls": len(self._outcomes),
+                "failure_rate": round(self._failure_rate_locked(), 4),
+                "last_error": self._last_error,
+                **asdict(self._stats),
+            }
+            if state == OPEN:
+                data["retry_in_s"] = round(max(0.0, self._cooldown - (time.monotonic() - self._opened_at)), 1)
+            return data
+
+
+class BreakerRegistry:
+    """One breaker per stage name, created on first use - 线程安全"""
+
+    def __init__(self, **breaker_kwargs) -> None:
+        self._breaker_kwargs = breaker_kwargs
+        self._lock = threading.Lock()
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name, **self._breaker_kwargs)
+                self._breakers[name] = breaker
+            return breaker
+
+    def order(self, names: Sequence[str]) -> list[str]:
+        """`names` sorted by health; ties keep the configured (quality) order."""
+        ranks = {name: self.get(name).rank() for name in names}
+        return sorted(names, key=lambda name: ranks[name])
+
+    def reset(self, name: str | None = None) -> None:
+        with self._lock:
+            if name is None:
+                breakers = list(self._breakers.values())
+            else:
+                breakers = [self._breakers[name]] if name in self._breakers else []
+        for breaker in breakers:
+            breaker.reset()
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            breakers = sorted(self._breakers.items())
+        return {name: breaker.snapshot() for name, breaker in breakers}
+
+
+# 全局单例（每个 worker 进程一份）
+stage_breakers = BreakerRegistry()
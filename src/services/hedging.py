@@ -0,0 +1,181 @@
+"""Hedged LLM requests for tail-latency control.
+
+If the primary provider has not answered by its observed p90 for the task,
+the same prompt is sent to the other provider (OpenAI <-> Gemini). The first
+*valid* response wins and the other request is cancelled.
+
+Hedging is capped per task: among the last `window` calls at most
+`max_rate * window` may hedge, so a provider-wide slowdown cannot double the
+bill. Counters per task record how often a hedge fired, how often the hedge
+won (i.e. saved time) and how often it was suppressed by the cap. The time
+saved itself is not measurable (the losing primary is cancelled), so
+`hedge_win_latency_seconds` sums the end-to-end latency of the calls the hedge
+won instead.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, TypeVar
+
+from config import (
+    LLM_HEDGE_GEMINI_MODEL,
+    LLM_HEDGE_MAX_RATE,
+    LLM_HEDGE_MIN_DELAY,
+    LLM_HEDGE_OPENAI_MODEL,
+    LLM_HEDGE_WINDOW,
+    LLM_HEDGING_ENABLED,
+)
+
+T = TypeVar("T")
+
+
+@dataclass
+class HedgeStats:
+    calls: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+    primary_wins: int = 0
+    suppressed: int = 0
+    both_failed: int = 0
+    hedge_win_latency_seconds: float = 0.0  # total wall time of calls won by the hedge
+
+    def to_dict(self) -> dict[str, int | float]:
+        data: dict[str, int | float] = asdict(self)
+        data["hedge_rate"] = round(self.hedged / self.calls, 4) if self.calls else 0.0
+        data["hedge_win_rate"] = round(self.hedge_wins / self.hedged, 4) if self.hedged else 0.0
+        data["hedge_win_latency_seconds"] = round(self.hedge_win_latency_seconds, 3)
+        return data
+
+
+class HedgePolicy:
+    """Per-task hedge rate cap + counters - 线程安全"""
+
+    def __init__(
+        self,
+        *,
+        enabled: bool = LLM_HEDGING_ENABLED,
+        max_rate: float = LLM_HEDGE_MAX_RATE,
+        window: int = LLM_HEDGE_WINDOW,
+        min_delay: float = LLM_HEDGE_MIN_DELAY,
+        secondary_models: dict[str, str] | None = None,
+    ) -> None:
+        self.enabled = enabled
+        self._max_rate = max(0.0, float(max_rate))
+        self._window = max(1, int(window))
+        self._min_delay = max(0.0, float(min_delay))
+        # primary provider -> model to hedge with on the other provider
+        self._secondary_models = dict(
+            secondary_models
+            if secondary_models is not None
+            else {"openai": LLM_HEDGE_GEMINI_MODEL, "gemini": LLM_HEDGE_OPENAI_MODEL}
+        )
+        self._lock = threading.Lock()
+        self._recent: dict[str, deque[bool]] = {}
+        self._stats: dict[str, HedgeStats] = {}
+
+    def secondary_model(self, primary_provider: str) -> str | None:
+        return self._secondary_models.get(primary_provider) if self.enabled else None
+
+    def delay(self, observed_p90: float | None, budget: float | None = None) -> float:
+        """Hedge trigger delay: observed p90, else the task budget, never below min_delay."""
+        base = observed_p90 if observed_p90 is not None else budget
+        return max(self._min_delay, base or 0.0)
+
+    def _task_stats(self, task: str) -> HedgeStats:
+        stats = self._stats.get(task)
+        if stats is None:
+            stats = HedgeStats()
+            self._stats[task] = stats
+        return stats
+
+    def _note_call(self, task: str, hedged: bool) -> None:
+        recent = self._recent.get(task)
+        if recent is None:
+            recent = deque(maxlen=self._window)
+            self._recent[task] = recent
+        recent.append(hedged)
+
+    def _allow_hedge(self, task: str) -> bool:
+        with self._lock:
+            recent = self._recent.get(task) or ()
+            hedged = sum(1 for h in recent if h)
+            # At most max_rate * window hedges among the last `window` calls
+            allowed = hedged + 1 <= self._max_rate * self._window
+            if not allowed:
+                self._task_stats(task).suppressed += 1
+            return allowed
+
+    async def race(
+        self,
+        task: str,
+        primary: Callable[[], Awaitable[T]],
+        secondary: Callable[[], Awaitable[T]],
+        *,
+        delay: float,
+        is_valid: Callable[[T], bool] = bool,
+    ) -> T:
+        """Run `primary`; start `secondary` if it is still pending after `delay` seconds."""
+        start = time.perf_counter()
+        primary_task = asyncio.ensure_future(primary())
+        tasks = {primary_task}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or not self._allow_hedge(task):
+                result = await primary_task
+                with self._lock:
+                    self._task_stats(task).calls += 1
+                    self._note_call(task, False)
+                return result
+
+            secondary_task = asyncio.ensure_future(secondary())
+            tasks.add(secondary_task)
+            pending = set(tasks)
+            first_error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for finished in done:
+                    error = finished.exception()
+                    if error is None and is_valid(finished.result()):
+                        won_by_hedge = finished is secondary_task
+                        with self._lock:
+                            stats = self._task_stats(task)
+                            stats.calls += 1
+                            stats.hedged += 1
+                            if won_by_hedge:
+                                stats.hedge_wins += 1
+                                stats.hedge_win_latency_seconds += time.perf_counter() - start
+                            else:
+                                stats.primary_wins += 1
+                            self._note_call(task, True)
+                        if won_by_hedge:
+                            print(f"[Hedge] Secondary won for task '{task}' after {time.perf_counter() - start:.2f}s")
+                        return finished.result()
+                    if first_error is None:
+                        first_error = error or ValueError("LLM response failed validation")
+
+            with self._lock:
+                stats = self._task_stats(task)
+                stats.calls += 1
+                stats.hedged += 1
+                stats.both_failed += 1
+                self._note_call(task, True)
+            assert first_error is not None
+            raise first_error
+        finally:
+            # Loser (or everything, if we were cancelled) stops here
+            for t in tasks:
+                if not t.done():
+                    t.cancel()
+
+    def stats(self) -> dict[str, dict[str, int | float]]:
+        with self._lock:
+            return {task: stats.to_dict() for task, stats in sorted(self._stats.items())}
+
+
+# 全局单例（每个 worker 进程一份）
+hedge_policy = HedgePolicy()
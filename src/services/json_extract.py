@@ -0,0 +1,246 @@
+"""Linear-time JSON extraction from LLM output, plus an incremental array parser.
+
+Model answers wrap JSON in prose and markdown fences (grounded Gemini answers
+can be long). `extract_json()` finds the JSON in one pass:
+
+1. fenced ```json blocks whose whole content parses win (as before);
+2. otherwise the first balanced `{ ... }` that parses. Brackets inside JSON
+   strings are ignored, and each candidate is parsed once; a candidate that
+   fails is skipped as a whole, so total work stays O(n).
+
+`ArrayItemParser` consumes streamed output chunk by chunk and returns each
+element of the target array (e.g. `recommendations`) as soon as it closes.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Iterable, Iterator
+
+_FENCE = "```"
+# Next structural character / next character that can end a JSON string
+_STRUCTURAL = re.compile(r'[{}\[\]"]')
+_STRING_END = re.compile(r'["\\]')
+_WHITESPACE = " \t\r\n"
+_OBJECT_START = re.compile(r'\{\s*["}]')
+
+
+def _fenced_blocks(text: str) -> Iterator[str]:
+    """Contents of ``` fenced blocks (an optional `json` tag is dropped)."""
+    pos = 0
+    while True:
+        start = text.find(_FENCE, pos)
+        if start == -1:
+            return
+        end = text.find(_FENCE, start + len(_FENCE))
+        if end == -1:
+            return
+        block = text[start + len(_FENCE):end]
+        if block.startswith("json"):
+            block = block[len("json"):]
+        yield block.strip()
+        pos = end + len(_FENCE)
+
+
+def balanced_end(text: str, start: int) -> int | None:
+    """
+    Index just past the object/array opening at `text[start]`, skipping brackets
+    inside strings; None if it is not closed within `text`.
+    """
+    depth = 0
+    pos = start
+    while True:
+        match = _STRUCTURAL.search(text, pos)
+        if match is None:
+            return None
+        char = match.group()
+        pos = match.end()
+        if char == '"':
+            while True:
+                match = _STRING_END.search(text, pos)
+                if match is None:
+                    return None
+                pos = match.end()
+                if match.group() == "\\":
+                    pos += 1  # skip the escaped character
+                    continue
+                break
+        elif char in "{[":
+            depth += 1
+        else:
+            depth -= 1
+            if depth <= 0:
+                return pos
+
+
+def extract_json(text: str) -> str:
+    """The JSON embedded in `text` (see module docstring); `text` itself if none is found."""
+    stripped = text.strip()
+    if stripped.startswith("{") and stripped.endswith("}"):
+        # Common case (JSON mode): the whole answer is the object
+        try:
+            json.loads(stripped)
+            return stripped
+        except json.JSONDecodeError:
+            pass
+
+    for block in _fenced_blocks(text):
+        try:
+            json.loads(block)
+            return block
+        except json.JSONDecodeError:
+            continue
+
+    pos = 0
+    while True:
+        start = text.find("{", pos)
+        if start == -1:
+            break
+        match = _OBJECT_START.match(text, start)
+        if match is None:
+            # `{name}`-style prose: an object must open with a key or close at once
+            pos = start + 1
+            continue
+        end = balanced_end(text, start)
+        if end is None:
+            break
+        candidate = text[start:end]
+        try:
+            json.loads(candidate)
+            return candidate
+        except json.JSONDecodeError:
+            pos = end
+    return text
+
+
+class ArrayItemParser:
+    """
+    Incremental parser for streamed JSON: `feed()` returns the elements of the
+    target array completed by that chunk.
+
+    The target is the value of `key` in the top-level object, or the top-level
+    array itself when `key` is None. Text before the first `{` / `[` (prose,
+    code fences) is skipped; elements that fail to parse are dropped. Only the
+    unconsumed tail (the item or string in progress) is buffered, so a long
+    stream costs O(n) overall.
+    """
+
+    def __init__(self, key: str | None = "recommendations") -> None:
+        self.key = key
+        self.done = False
+        self._text = ""
+        self._pos = 0
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: str | None = None
+        self._current_key: str | None = None
+        # Stack depth inside the target array (None = not reached, -1 = finished)
+        self._array_depth: int | None = None
+        self._item_start: int | None = None
+
+    def _emit(self, end: int, items: list[Any]) -> None:
+        raw = self._text[self._item_start:end].strip()
+        self._item_start = None
+        if not raw:
+            return
+        try:
+            items.append(json.loads(raw))
+        except json.JSONDecodeError:
+            print(f"[JSONStream] Skipping unparseable array item: {raw[:80]}")
+
+    def _trim(self) -> None:
+        keep = self._pos
+        if self._item_start is not None:
+            keep = min(keep, self._item_start)
+        if self._in_string:
+            keep = min(keep, self._string_start)
+        if keep:
+            self._text = self._text[keep:]
+            self._pos -= keep
+            self._string_start -= keep
+            if self._item_start is not None:
+                self._item_start -= keep
+
+    def feed(self, chunk: str) -> list[Any]:
+        if self.done or not chunk:
+            return []
+        self._text += chunk
+        text = self._text
+        stack = self._stack
+        items: list[Any] = []
+        i = self._pos
+        n = len(text)
+        while i < n and not self.done:
+            char = text[i]
+            i += 1
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start:i - 1]
+                continue
+
+            if not stack:
+                if char in "{[":
+                    stack.append(char)
+                    if char == "[" and self.key is None:
+                        self._array_depth = 1
+                continue
+
+            in_target = len(stack) == self._array_depth
+            if in_target and self._item_start is None and char not in _WHITESPACE and char not in ",]":
+                self._item_start = i - 1
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == ":":
+                if len(stack) == 1 and stack[0] == "{":
+                    self._current_key = self._last_string
+            elif char == ",":
+                if in_target and self._item_start is not None:
+                    self._emit(i - 1, items)
+                if len(stack) == 1:
+                    self._current_key = None
+            elif char in "{[":
+                stack.append(char)
+                if (
+                    char == "["
+                    and self._array_depth is None
+                    and self.key is not None
+                    and len(stack) == 2
+                    and stack[0] == "{"
+                    and self._current_key == self.key
+                ):
+                    self._array_depth = 2
+            elif char in "}]":
+                stack.pop()
+                if in_target:
+                    # The target array itself closed; a scalar last item ends here
+                    if self._item_start is not None:
+                        self._emit(i - 1, items)
+                    self._array_depth = -1
+                    self.done = True
+                elif len(stack) == self._array_depth and self._item_start is not None:
+                    # An object / array item just closed
+                    self._emit(i, items)
+                if not stack:
+                    self.done = True
+        self._pos = i
+        self._trim()
+        return items
+
+
+def iter_array_items(chunks: Iterable[str], key: str | None = "recommendations") -> Iterator[Any]:
+    """Yield elements of the target array (see `ArrayItemParser`) from a stream of text chunks."""
+    parser = ArrayItemParser(key)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+        if parser.done:
+            return
@@ -0,0 +1,382 @@
+"""Content-addressed LLM response cache.
+
+Byte-identical prompts (same provider, model, temperature and json_mode) are
+answered from cache instead of the network. Two tiers:
+
+- In-memory LRU (per worker process) for the hot set.
+- SQLite at {DATA_DIR}/llm_cache.db, shared by all workers and restarts.
+
+Caching is opt-in per calling function: only functions listed in the policy
+table (DEFAULT_CACHE_TTLS, overridable via LLM_CACHE_TTLS) are cached, each with
+its own TTL. Free-form outputs such as emails are deliberately left out.
+
+`get_or_call` takes an optional `validate(reply) -> bool`: replies that fail it
+(e.g. malformed JSON, see `structured_output.cache_validator`) are returned but
+never stored, and a cached reply that fails it is treated as a miss, so a bad
+answer is not replayed until its TTL runs out.
+
+Usage:
+    value = llm_cache.get_or_call(
+        "generate_questionnaire",
+        provider="openai", model="gpt-4o", temperature=0.4, json_mode=True,
+        prompt=prompt, call=lambda: _call_openai_json(prompt, model="gpt-4o"),
+    )
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Awaitable, Callable
+
+from config import (
+    LLM_CACHE_DB_PATH,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_TTLS,
+)
+
+# 按调用函数配置的 TTL（秒）；不在表中的函数不缓存
+DEFAULT_CACHE_TTLS: dict[str, int] = {
+    "generate_questionnaire": 24 * 3600,
+    "generate_next_question": 3600,
+    "generate_next_target_question": 3600,
+    "build_profile_from_answers": 3600,
+    "extract_profile_from_text": 7 * 24 * 3600,
+    "parse_text_to_profile": 7 * 24 * 3600,
+    "_extract_verified_info_from_search": 6 * 3600,
+    "_ai_score_and_analyze_candidates": 3600,
+    "extract_person_profile_from_web": 24 * 3600,
+}
+
+
+def _parse_ttl_overrides(raw: str) -> dict[str, int]:
+    """Parse "func=seconds,func2=0" into a dict (0 disables caching for func)."""
+    overrides: dict[str, int] = {}
+    for item in raw.split(","):
+        name, sep, value = item.partition("=")
+        if not sep or not name.strip():
+            continue
+        try:
+            overrides[name.strip()] = max(0, int(value.strip()))
+        except ValueError:
+            continue
+    return overrides
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    bypassed: int = 0
+    stores: int = 0
+    rejected: int = 0
+    evictions: int = 0
+    bytes_saved: int = 0
+
+    def to_dict(self) -> dict[str, int | float]:
+        data: dict[str, int | float] = asdict(self)
+        lookups = self.hits + self.misses
+        data["hit_rate"] = round(self.hits / lookups, 4) if lookups else 0.0
+        return data
+
+
+class LLMResponseCache:
+    """Two-tier (LRU + SQLite) cache for LLM responses - 线程安全"""
+
+    def __init__(
+        self,
+        *,
+        db_path: Path | None = None,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        ttls: dict[str, int] | None = None,
+        enabled: bool = LLM_CACHE_ENABLED,
+    ) -> None:
+        self._db_path = Path(db_path) if db_path is not None else LLM_CACHE_DB_PATH
+        self._max_entries = max(1, int(max_entries))
+        self._ttls = dict(DEFAULT_CACHE_TTLS if ttls is None else ttls)
+        self._enabled = enabled
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = Lock()
+        self._stats = CacheStats()
+        self._disk_ok = self._init_db()
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def enable(self) -> None:
+        self._enabled = True
+
+    def disable(self) -> None:
+        self._enabled = False
+
+    # ------------------------------------------------------------------
+    # Policy
+    # ------------------------------------------------------------------
+
+    def ttl_for(self, caller: str | None) -> int:
+        """TTL in seconds for `caller`; 0 means the caller is not cached."""
+        if not self._enabled or not caller:
+            return 0
+        return self._ttls.get(caller, 0)
+
+    def set_ttl(self, caller: str, ttl_seconds: int) -> None:
+        """Opt a function in (ttl > 0) or out (ttl == 0) at runtime."""
+        self._ttls[caller] = max(0, int(ttl_seconds))
+
+    @staticmethod
+    def make_key(
+        *,
+        provider: str,
+        model: str,
+        temperature: float | None,
+        json_mode: bool,
+        prompt: str | list[str],
+    ) -> str:
+        """Content address for a request (prompt parts are hashed, never stored in the key)."""
+        prompt_text = prompt if isinstance(prompt, str) else json.dumps(prompt, ensure_ascii=False)
+        prompt_hash = hashlib.sha256(prompt_text.encode("utf-8")).hexdigest()
+        raw = f"{provider}|{model}|{temperature}|{int(bool(json_mode))}|{prompt_hash}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self._db_path), timeout=5)
+
+    def _init_db(self) -> bool:
+        try:
+            self._db_path.parent.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS llm_cache (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        caller TEXT,
+                        created_at REAL NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                    """
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_expires ON llm_cache(expires_at)")
+            return True
+        except (sqlite3.Error, OSError) as e:
+            print(f"[LLMCache] Disk tier disabled: {e}")
+            return False
+
+    def _memory_put(self, key: str, value: str, expires_at: float) -> None:
+        with self._lock:
+            self._memory[key] = (value, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self._max_entries:
+                self._memory.popitem(last=False)
+                self._stats.evictions += 1
+
+    def _memory_get(self, key: str, now: float) -> str | None:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self._stats.hits += 1
+            self._stats.memory_hits += 1
+            self._stats.bytes_saved += len(value.encode("utf-8"))
+            return value
+
+    def _disk_get(self, key: str, now: float) -> str | None:
+        """Disk tier lookup (blocking SQLite read); counts the hit or the miss."""
+        row = None
+        if self._disk_ok:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute(
+                        "SELECT value, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?",
+                        (key, now),
+                    ).fetchone()
+            except sqlite3.Error as e:
+                print(f"[LLMCache] Disk read error: {e}")
+        if row is None:
+            with self._lock:
+                self._stats.misses += 1
+            return None
+        value, expires_at = row
+        self._memory_put(key, value, expires_at)
+        with self._lock:
+            self._stats.hits += 1
+            self._stats.disk_hits += 1
+            self._stats.bytes_saved += len(value.encode("utf-8"))
+        return value
+
+    def get(self, key: str) -> str | None:
+        """Return a cached value or None (expired entries count as misses)."""
+        now = time.time()
+        value = self._memory_get(key, now)
+        return value if value is not None else self._disk_get(key, now)
+
+    async def aget(self, key: str) -> str | None:
+        """Async `get`: memory hits stay on the loop, the SQLite read runs in a worker thread."""
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is not None:
+            return value
+        if not self._disk_ok:
+            return self._disk_get(key, now)
+        return await asyncio.to_thread(self._disk_get, key, now)
+
+    def _memory_set(self, key: str, value: str, expires_at: float) -> bool:
+        """Store in memory; return whether the disk write should also purge expired rows."""
+        self._memory_put(key, value, expires_at)
+        with self._lock:
+            self._stats.stores += 1
+            return self._stats.stores % 100 == 0
+
+    def _disk_set(self, key: str, value: str, caller: str, now: float, expires_at: float, purge: bool) -> None:
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, caller, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, value, caller, now, expires_at),
+                )
+                if purge:
+                    conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        except sqlite3.Error as e:
+            print(f"[LLMCache] Disk write error: {e}")
+
+    def set(self, key: str, value: str, *, ttl_seconds: int, caller: str = "") -> None:
+        if ttl_seconds <= 0 or not value:
+            return
+        now = time.time()
+        purge = self._memory_set(key, value, now + ttl_seconds)
+        if self._disk_ok:
+            self._disk_set(key, value, caller, now, now + ttl_seconds, purge)
+
+    async def aset(self, key: str, value: str, *, ttl_seconds: int, caller: str = "") -> None:
+        """Async `set`: the SQLite write runs in a worker thread."""
+        if ttl_seconds <= 0 or not value:
+            return
+        now = time.time()
+        purge = self._memory_set(key, value, now + ttl_seconds)
+        if self._disk_ok:
+            await asyncio.to_thread(self._disk_set, key, value, caller, now, now + ttl_seconds, purge)
+
+    def _key_for(
+        self,
+        caller: str | None,
+        *,
+        provider: str,
+        model: str,
+        temperature: float | None,
+        json_mode: bool,
+        prompt: str | list[str],
+    ) -> tuple[int, str]:
+        """Return (ttl, key) for a request; ttl == 0 means bypass."""
+        ttl = self.ttl_for(caller)
+        if ttl <= 0:
+            with self._lock:
+                self._stats.bypassed += 1
+            return 0, ""
+        key = self.make_key(
+            provider=provider,
+            model=model,
+            temperature=temperature,
+            json_mode=json_mode,
+            prompt=prompt,
+        )
+        return ttl, key
+
+    def _accept(self, value: str, validate: Callable[[str], bool] | None) -> bool:
+        """Whether `value` may be cached / served from cache."""
+        if validate is None or validate(value):
+            return True
+        with self._lock:
+            self._stats.rejected += 1
+        return False
+
+    def get_or_call(
+        self,
+        caller: str | None,
+        *,
+        provider: str,
+        model: str,
+        temperature: float | None,
+        json_mode: bool,
+        prompt: str | list[str],
+        call: Callable[[], str],
+        validate: Callable[[str], bool] | None = None,
+    ) -> str:
+        """Serve from cache when `caller` is opted in, otherwise (or on miss) run `call`."""
+        ttl, key = self._key_for(
+            caller, provider=provider, model=model, temperature=temperature, json_mode=json_mode, prompt=prompt
+        )
+        if ttl > 0:
+            cached = self.get(key)
+            if cached is not None and self._accept(cached, validate):
+                return cached
+        value = call()
+        if ttl > 0 and self._accept(value, validate):
+            self.set(key, value, ttl_seconds=ttl, caller=caller or "")
+        return value
+
+    async def aget_or_call(
+        self,
+        caller: str | None,
+        *,
+        provider: str,
+        model: str,
+        temperature: float | None,
+        json_mode: bool,
+        prompt: str | list[str],
+        call: Callable[[], Awaitable[str]],
+        validate: Callable[[str], bool] | None = None,
+    ) -> str:
+        """Async variant of get_or_call; the disk tier is read and written off the event loop."""
+        ttl, key = self._key_for(
+            caller, provider=provider, model=model, temperature=temperature, json_mode=json_mode, prompt=prompt
+        )
+        if ttl > 0:
+            cached = await self.aget(key)
+            if cached is not None and self._accept(cached, validate):
+                return cached
+        value = await call()
+        if ttl > 0 and self._accept(value, validate):
+            await self.aset(key, value, ttl_seconds=ttl, caller=caller or "")
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self._disk_ok:
+            try:
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM llm_cache")
+            except sqlite3.Error as e:
+                print(f"[LLMCache] Disk clear error: {e}")
+
+    def stats(self) -> dict[str, int | float]:
+        """Hit/miss and bytes-saved counters for this worker process."""
+        with self._lock:
+            data = self._stats.to_dict()
+            data["memory_entries"] = len(self._memory)
+        return data
+
+
+# 全局单例
+llm_cache = LLMResponseCache(ttls={**DEFAULT_CACHE_TTLS, **_parse_ttl_overrides(LLM_CACHE_TTLS)})
@@ -0,0 +1,131 @@
+"""Process-wide LLM client registry.
+
+Every provider client owns an HTTP connection pool, so building one per call
+pays a fresh TCP+TLS handshake each time. This module keeps one client per
+provider/model/api-key per worker process and hands the same instance to
+every call site (`src.email_agent`, `src.web_scraper`).
+
+- Thread-safe: Flask/gunicorn threads share the registry behind a lock.
+- Lazy: nothing is constructed until the first call needs it.
+- Fork-aware: clients inherited from a parent process are dropped, so each
+  gunicorn worker builds its own pool after fork instead of sharing sockets.
+- Async clients are additionally keyed by event loop, since their connection
+  pools cannot be shared across loops (see src.services.async_runtime).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from typing import Any, Callable, Hashable
+
+# Optional Google/Gemini dependencies (keep import-time light for tests/CI)
+try:
+    import google.generativeai as genai  # type: ignore
+except ModuleNotFoundError:  # pragma: no cover
+    genai = None  # type: ignore
+
+try:
+    from google import genai as genai_new  # type: ignore[attr-defined]
+except ModuleNotFoundError:  # pragma: no cover
+    genai_new = None  # type: ignore
+from openai import AsyncOpenAI, OpenAI
+
+
+class LLMClientRegistry:
+    """Thread-safe, fork-aware cache of provider clients."""
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._clients: dict[Hashable, Any] = {}
+        self._gemini_configured_key: str | None = None
+        self._pid = os.getpid()
+
+    def _check_pid(self) -> None:
+        """Drop clients inherited from a parent process (e.g. gunicorn preload)."""
+        if self._pid != os.getpid():
+            self.reset()
+
+    def reset(self) -> None:
+        """Forget every cached client; the next call rebuilds lazily."""
+        with self._lock:
+            self._clients = {}
+            self._gemini_configured_key = None
+            self._pid = os.getpid()
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Return the client cached under `key`, building it once with `factory`."""
+        self._check_pid()
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = factory()
+                self._clients[key] = client
+            return client
+
+    def openai(self, api_key: str) -> OpenAI:
+        """Shared synchronous OpenAI client for `api_key` (SDK retries off: see retry_policy)."""
+        return self.get_or_create(("openai", api_key), lambda: OpenAI(api_key=api_key, max_retries=0))
+
+    def async_openai(self, api_key: str) -> AsyncOpenAI:
+        """Shared AsyncOpenAI client for `api_key` on the running event loop."""
+        loop = asyncio.get_running_loop()
+        return self.get_or_create(("openai_async", api_key, loop), lambda: AsyncOpenAI(api_key=api_key, max_retries=0))
+
+    def configure_gemini(self, api_key: str) -> None:
+        """Run `genai.configure` once per process (and again only if the key changes)."""
+        if genai is None:
+            raise ModuleNotFoundError(
+                "google-generativeai is not installed. Install dependencies with `python -m pip install -r requirements.txt`."
+            )
+        self._check_pid()
+        if self._gemini_configured_key == api_key:
+            return
+        with self._lock:
+            if self._gemini_configured_key != api_key:
+                genai.configure(api_key=api_key)
+                # Models built against the old configuration are stale
+                self._clients = {k: v for k, v in self._clients.items() if k[0] != "gemini"}
+                self._gemini_configured_key = api_key
+
+    def gemini_model(self, api_key: str, model: str, *, json_mode: bool = False) -> Any:
+        """Shared `genai.GenerativeModel` for (model, json_mode)."""
+        self.configure_gemini(api_key)
+        generation_config = {"response_mime_type": "application/json"} if json_mode else None
+        return self.get_or_create(
+            ("gemini", model, json_mode),
+            lambda: genai.GenerativeModel(model, generation_config=generation_config),
+        )
+
+    def genai_client(self, api_key: str) -> Any:
+        """Shared `google.genai.Client` (used for Google Search grounding)."""
+        if genai_new is None:
+            raise ModuleNotFoundError(
+                "google-genai is not installed. Install dependencies with `python -m pip install -r requirements.txt`."
+            )
+        return self.get_or_create(("genai", api_key), lambda: genai_new.Client(api_key=api_key))
+
+    def async_genai_client(self, api_key: str) -> Any:
+        """Async surface (`client.aio`) of a google.genai client on the running event loop."""
+        if genai_new is None:
+            raise ModuleNotFoundError(
+                "google-genai is not installed. Install dependencies with `python -m pip install -r requirements.txt`."
+            )
+        loop = asyncio.get_running_loop()
+        # Keep the owning Client cached: dropping it closes the async transport too
+        client = self.get_or_create(
+            ("genai_async", api_key, loop),
+            lambda: genai_new.Client(api_key=api_key),
+        )
+        return client.aio
+
+
+# 全局单例（每个 worker 进程一份）
+llm_clients = LLMClientRegistry()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=llm_clients.reset)
@@ -28,6 +28,8 @@ except ModuleNotFoundError:  # pragma: no cover
 from openai import OpenAI
 
 from config import DEFAULT_MODEL, GEMINI_SEARCH_MODEL
+from src.services.cassette import cassette
+from src.services.llm_clients import llm_clients
 
 
 class LLMServiceError(Exception):
@@ -86,12 +88,10 @@ class GeminiService(BaseLLMService):
     def __init__(self, model: str = DEFAULT_MODEL, search_model: str = GEMINI_SEARCH_MODEL):
         self.model = model
         self.search_model = search_model
-        self._configured = False
+        self._api_key: str | None = None
     
     def _configure(self) -> None:
-        """Configure Gemini API (lazy initialization)."""
-        if self._configured:
-            return
+        """Configure Gemini API (lazy, shared with the process-wide client registry)."""
         if genai is None:
             raise LLMServiceError(
                 "google-generativeai is not installed. Install dependencies with `python -m pip install -r requirements.txt`."
@@ -99,8 +99,8 @@ class GeminiService(BaseLLMService):
         api_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
         if not api_key:
             raise LLMServiceError("GEMINI_API_KEY or GOOGLE_API_KEY environment variable not set")
-        genai.configure(api_key=api_key)
-        self._configured = True
+        llm_clients.configure_gemini(api_key)
+        self._api_key = api_key
     
     def call(self, prompt: str, *, json_mode: bool = False) -> str:
         """Call Gemini model."""
@@ -111,9 +111,12 @@ class GeminiService(BaseLLMService):
                 gen_config = genai.GenerationConfig(
                     response_mime_type="application/json"
                 )
-            model = genai.GenerativeModel(self.model)
-            response = model.generate_content(prompt, generation_config=gen_config)
-            return response.text
+            model = llm_clients.gemini_model(self._api_key, self.model)
+            return cassette.call(
+                "llm",
+                {"provider": "gemini", "model": self.model, "temperature": None, "json_mode": json_mode, "prompt": prompt},
+                lambda: model.generate_content(prompt, generation_config=gen_config).text,
+            )
         except Exception as e:
             raise LLMServiceError(f"Gemini call failed: {e}") from e
     
@@ -129,16 +132,19 @@ class GeminiService(BaseLLMService):
                     response_mime_type="application/json"
                 )
             
-            model = genai.GenerativeModel(self.search_model)
+            model = llm_clients.gemini_model(self._api_key, self.search_model)
             google_search_tool = genai.Tool(
                 google_search=protos.GoogleSearch()
             )
-            response = model.generate_content(
-                prompt,
-                tools=[google_search_tool],
-                generation_config=gen_config,
+            return cassette.call(
+                "gemini_search",
+                {"model": self.search_model, "json_mode": json_mode, "prompt": prompt},
+                lambda: model.generate_content(
+                    prompt,
+                    tools=[google_search_tool],
+                    generation_config=gen_config,
+                ).text,
             )
-            return response.text
         except Exception as e:
             raise LLMServiceError(f"Gemini search call failed: {e}") from e
 
@@ -148,16 +154,13 @@ class OpenAIService(BaseLLMService):
     
     def __init__(self, model: str = "gpt-4o"):
         self.model = model
-        self._client: OpenAI | None = None
     
     def _get_client(self) -> OpenAI:
-        """Get or create OpenAI client (lazy initialization)."""
-        if self._client is None:
-            api_key = os.environ.get("OPENAI_API_KEY")
-            if not api_key:
-                raise LLMServiceError("OPENAI_API_KEY environment variable not set")
-            self._client = OpenAI(api_key=api_key)
-        return self._client
+        """Get the shared OpenAI client (lazy, one pool per worker process)."""
+        api_key = os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            raise LLMServiceError("OPENAI_API_KEY environment variable not set")
+        return llm_clients.openai(api_key)
     
     def call(self, prompt: str, *, json_mode: bool = False) -> str:
         """Call OpenAI model."""
@@ -165,12 +168,19 @@ class OpenAIService(BaseLLMService):
             client = self._get_client()
             response_format = {"type": "json_object"} if json_mode else None
             
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                response_format=response_format,
+            def _send() -> str:
+                response = client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    response_format=response_format,
+                )
+                return response.choices[0].message.content or ""
+
+            return cassette.call(
+                "llm",
+                {"provider": "openai", "model": self.model, "temperature": None, "json_mode": json_mode, "prompt": prompt},
+                _send,
             )
-            return response.choices[0].message.content or ""
         except Exception as e:
             raise LLMServiceError(f"OpenAI call failed: {e}") from e
     
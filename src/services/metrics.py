@@ -0,0 +1,445 @@
+"""Per-call LLM instrumentation and Prometheus text exposition.
+
+Every provider call is wrapped in `llm_metrics.track(task, provider, model)`,
+which records:
+
+    llm_requests_total{task,provider,model,cache,outcome}        counter
+    llm_request_duration_seconds{task,provider,model,cache}      histogram (wall time)
+    llm_tokens_total{task,provider,model,kind=prompt|completion} counter (provider-reported usage)
+    llm_cost_usd_total{task,provider,model}                      counter (tokens x MODEL_PRICES)
+    llm_errors_total{task,provider,model,kind}                   counter
+
+`cache` is "miss" (network call), "hit" (response cache), "coalesced" (shared
+another caller's in-flight call) or "bypass" (uncached call types such as
+streams). Token usage is reported from inside the request via
+`record_usage(response.usage)`, which finds the active call through a
+context variable, so retries and hedges add up correctly.
+
+Multi-process: gunicorn workers do not share memory, so each worker's
+background thread flushes its cumulative series to SQLite at
+{DATA_DIR}/metrics.db every METRICS_FLUSH_INTERVAL seconds under a
+per-process id (the call path itself never touches SQLite); `/metrics` sums
+all processes' rows. Rows of exited workers are folded into one "retired"
+row per series, so counters never go backwards and worker restarts do not
+add copies of every series.
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Iterator
+
+from config import METRICS_DB_PATH, METRICS_FLUSH_INTERVAL, MODEL_PRICES
+from src.services.retry_policy import error_kind
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+# proc_id of the rows that accumulate the totals of exited workers
+RETIRED_PROC_ID = "retired"
+
+# USD per 1M tokens: (prompt, completion); unknown models cost 0
+DEFAULT_MODEL_PRICES: dict[str, tuple[float, float]] = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-5.1": (1.25, 10.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-2.0-flash": (0.10, 0.40),
+}
+
+_HELP = {
+    "llm_requests_total": ("counter", "LLM provider calls by cache status and outcome."),
+    "llm_request_duration_seconds": ("histogram", "Wall time of LLM calls, including retries."),
+    "llm_tokens_total": ("counter", "Provider-reported prompt/completion tokens."),
+    "llm_cost_usd_total": ("counter", "Estimated spend from token usage and MODEL_PRICES."),
+    "llm_errors_total": ("counter", "Failed LLM calls by error kind."),
+    "llm_structured_output_total": ("counter", "Structured LLM output parses by schema and outcome (ok/repaired/failed)."),
+    "llm_structured_repairs_total": ("counter", "Local repairs applied to structured LLM output, by schema and repair kind."),
+    "serpapi_requests_total": ("counter", "SerpAPI searches by query type, cache status (hit/miss) and outcome."),
+    "serpapi_request_duration_seconds": ("histogram", "Wall time of SerpAPI searches, including retries."),
+    "serpapi_errors_total": ("counter", "Failed SerpAPI searches by error kind."),
+}
+
+
+def _parse_prices(raw: str, base: dict[str, tuple[float, float]]) -> dict[str, tuple[float, float]]:
+    """Merge JSON overrides ({"gpt-4o": [2.5, 10]}) into `base`."""
+    if not raw.strip():
+        return base
+    try:
+        overrides = json.loads(raw)
+    except json.JSONDecodeError as e:
+        print(f"[Metrics] Ignoring invalid MODEL_PRICES: {e}")
+        return base
+    prices = dict(base)
+    for model, pair in (overrides or {}).items():
+        try:
+            prompt_price, completion_price = pair
+            prices[str(model)] = (float(prompt_price), float(completion_price))
+        except (TypeError, ValueError):
+            print(f"[Metrics] Ignoring invalid price for {model}")
+    return prices
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...], extra: tuple[str, str] | None = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _process_alive(proc_id: str) -> bool:
+    """Whether the worker that wrote `proc_id` ("{pid}-{suffix}") is still running on this host."""
+    try:
+        os.kill(int(proc_id.split("-", 1)[0]), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _sum_rows(rows) -> tuple[dict, dict]:
+    """Sum (name, labels JSON, value JSON) rows into counters and histograms."""
+    counters: dict = {}
+    histograms: dict = {}
+    for name, labels_json, value_json in rows:
+        key = (name, tuple(tuple(pair) for pair in json.loads(labels_json)))
+        value = json.loads(value_json)
+        if isinstance(value, list):
+            series = histograms.setdefault(key, [0.0] * len(value))
+            for i, v in enumerate(value):
+                series[i] += v
+        else:
+            counters[key] = counters.get(key, 0.0) + value
+    return counters, histograms
+
+
+class LLMCall:
+    """Mutable record of one in-progress call (filled in by the call path)."""
+
+    __slots__ = ("task", "provider", "model", "cache", "prompt_tokens", "completion_tokens")
+
+    def __init__(self, task: str, provider: str, model: str, cache: str) -> None:
+        self.task = task
+        self.provider = provider
+        self.model = model
+        self.cache = cache
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def add_usage(self, usage: Any) -> None:
+        """Add OpenAI `usage` or Gemini `usage_metadata` token counts."""
+        if usage is None:
+            return
+        prompt = getattr(usage, "prompt_tokens", None)
+        if prompt is None:
+            prompt = getattr(usage, "prompt_token_count", None)
+        completion = getattr(usage, "completion_tokens", None)
+        if completion is None:
+            completion = getattr(usage, "candidates_token_count", None)
+        self.prompt_tokens += int(prompt or 0)
+        self.completion_tokens += int(completion or 0)
+
+
+_current_call: ContextVar[LLMCall | None] = ContextVar("llm_metrics_call", default=None)
+
+
+def current_call() -> LLMCall | None:
+    """The call being tracked in this context, if any."""
+    return _current_call.get()
+
+
+def record_usage(usage: Any, call: LLMCall | None = None) -> None:
+    """Attribute provider-reported usage to `call` (default: the call active in this context)."""
+    call = call or _current_call.get()
+    if call is not None:
+        call.add_usage(usage)
+
+
+class MetricsRegistry:
+    """In-process counters/histograms + SQLite cross-worker aggregation - 线程安全"""
+
+    def __init__(
+        self,
+        *,
+        db_path: Path | None = None,
+        flush_interval: float = METRICS_FLUSH_INTERVAL,
+        prices: dict[str, tuple[float, float]] | None = None,
+    ) -> None:
+        self._db_path = Path(db_path) if db_path is not None else METRICS_DB_PATH
+        self._flush_interval = max(0.0, float(flush_interval))
+        self._prices = dict(DEFAULT_MODEL_PRICES if prices is None else prices)
+        self._lock = threading.Lock()
+        self._counters: dict[tuple[str, tuple[tuple[str, str], ...]], float] = {}
+        # (name, labels) -> [bucket counts..., +Inf count, sum]
+        self._histograms: dict[tuple[str, tuple[tuple[str, str], ...]], list[float]] = {}
+        self._pid = os.getpid()
+        self._proc_id = self._new_proc_id()
+        # A worker that has not flushed for this long (and whose pid is gone) has exited
+        self._stale_after = max(60.0, 5 * self._flush_interval)
+        self._flusher_pid: int | None = None
+        self._stop = threading.Event()
+        self._disk_ok = self._init_db()
+
+    @staticmethod
+    def _new_proc_id() -> str:
+        # pid alone can be reused by a later worker, which would overwrite older totals
+        return f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def _check_pid(self) -> None:
+        """A forked worker starts from zero under its own id (the parent keeps its rows)."""
+        if self._pid != os.getpid():
+            with self._lock:
+                self._counters = {}
+                self._histograms = {}
+                self._pid = os.getpid()
+                self._proc_id = self._new_proc_id()
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        prompt_price, completion_price = self._prices.get(model, (0.0, 0.0))
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+    def inc(self, name: str, labels: dict[str, str], value: float = 1.0) -> None:
+        self._check_pid()
+        self._ensure_flusher()
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, labels: dict[str, str], value: float) -> None:
+        self._check_pid()
+        self._ensure_flusher()
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = [0.0] * (len(LATENCY_BUCKETS) + 2)
+                self._histograms[key] = series
+            series[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+            series[-1] += value
+
+    def record_call(self, call: LLMCall, seconds: float, outcome: str, error_kind: str = "") -> None:
+        base = {"task": call.task, "provider": call.provider, "model": call.model}
+        self.inc("llm_requests_total", {**base, "cache": call.cache, "outcome": outcome})
+        self.observe("llm_request_duration_seconds", {**base, "cache": call.cache}, seconds)
+        if call.prompt_tokens:
+            self.inc("llm_tokens_total", {**base, "kind": "prompt"}, call.prompt_tokens)
+        if call.completion_tokens:
+            self.inc("llm_tokens_total", {**base, "kind": "completion"}, call.completion_tokens)
+        spent = self.cost(call.model, call.prompt_tokens, call.completion_tokens)
+        if spent:
+            self.inc("llm_cost_usd_total", base, spent)
+        if error_kind:
+            self.inc("llm_errors_total", {**base, "kind": error_kind})
+
+    @contextmanager
+    def track(self, task: str, provider: str, model: str, *, cache: str = "miss") -> Iterator[LLMCall]:
+        """Time one call; the yielded LLMCall is also the target of `record_usage()`."""
+        call = LLMCall(task or "other", provider, model, cache)
+        token = _current_call.set(call)
+        start = time.perf_counter()
+        outcome, kind = "ok", ""
+        try:
+            yield call
+        except BaseException as e:
+            # CancelledError (a losing hedge) is not a provider failure
+            if type(e).__name__ == "CancelledError":
+                outcome = "cancelled"
+            else:
+                outcome, kind = "error", error_kind(e)
+            raise
+        finally:
+            try:
+                _current_call.reset(token)
+            except ValueError:
+                # Context changed under us (e.g. generator finalised elsewhere)
+                pass
+            self.record_call(call, time.perf_counter() - start, outcome, kind)
+
+    # ------------------------------------------------------------------
+    # Cross-worker aggregation
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self._db_path), timeout=5)
+
+    def _init_db(self) -> bool:
+        try:
+            self._db_path.parent.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS metric_series (
+                        proc_id TEXT NOT NULL,
+                        name TEXT NOT NULL,
+                        labels TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        updated_at REAL NOT NULL,
+                        PRIMARY KEY (proc_id, name, labels)
+                    )
+                    """
+                )
+            return True
+        except (sqlite3.Error, OSError) as e:
+            print(f"[Metrics] Cross-worker aggregation disabled: {e}")
+            return False
+
+    def _ensure_flusher(self) -> None:
+        """Start this process's background flush thread (threads do not survive a fork)."""
+        if not self._disk_ok or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True).start()
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(max(0.05, self._flush_interval)):
+            self.flush()
+            self.compact()
+
+    def close(self) -> None:
+        """Stop the background flush thread after a final flush."""
+        self._stop.set()
+        self.flush()
+
+    def flush(self) -> None:
+        """Write this process's cumulative series to the shared database."""
+        self._check_pid()
+        if not self._disk_ok:
+            return
+        with self._lock:
+            rows = [
+                (self._proc_id, name, json.dumps(labels), json.dumps(value), time.time())
+                for (name, labels), value in self._counters.items()
+            ] + [
+                (self._proc_id, name, json.dumps(labels), json.dumps(series), time.time())
+                for (name, labels), series in self._histograms.items()
+            ]
+        if not rows:
+            return
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO metric_series (proc_id, name, labels, value, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+        except sqlite3.Error as e:
+            print(f"[Metrics] Flush error: {e}")
+
+    def compact(self) -> int:
+        """Fold the rows of exited workers into the retired rows; return how many workers were folded."""
+        if not self._disk_ok:
+            return 0
+        cutoff = time.time() - self._stale_after
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            print(f"[Metrics] Compact error: {e}")
+            return 0
+        conn.isolation_level = None
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            dead = [
+                proc_id
+                for proc_id, last_update in conn.execute(
+                    "SELECT proc_id, MAX(updated_at) FROM metric_series WHERE proc_id NOT IN (?, ?) GROUP BY proc_id",
+                    (RETIRED_PROC_ID, self._proc_id),
+                )
+                if last_update < cutoff and not _process_alive(proc_id)
+            ]
+            if dead:
+                procs = [*dead, RETIRED_PROC_ID]
+                placeholders = ",".join("?" for _ in procs)
+                counters, histograms = _sum_rows(
+                    conn.execute(f"SELECT name, labels, value FROM metric_series WHERE proc_id IN ({placeholders})", procs)
+                )
+                conn.execute(f"DELETE FROM metric_series WHERE proc_id IN ({placeholders})", procs)
+                now = time.time()
+                conn.executemany(
+                    "INSERT INTO metric_series (proc_id, name, labels, value, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (RETIRED_PROC_ID, name, json.dumps(labels), json.dumps(value), now)
+                        for (name, labels), value in [*counters.items(), *histograms.items()]
+                    ],
+                )
+            conn.execute("COMMIT")
+            return len(dead)
+        except sqlite3.Error as e:
+            print(f"[Metrics] Compact error: {e}")
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            return 0
+        finally:
+            conn.close()
+
+    def _collect(self) -> tuple[dict, dict]:
+        """Counters and histograms summed over every process (or just this one without a DB)."""
+        if not self._disk_ok:
+            with self._lock:
+                return dict(self._counters), {k: list(v) for k, v in self._histograms.items()}
+        self.flush()
+        try:
+            with self._connect() as conn:
+                rows = conn.execute("SELECT name, labels, value FROM metric_series").fetchall()
+        except sqlite3.Error as e:
+            print(f"[Metrics] Read error: {e}")
+            with self._lock:
+                return dict(self._counters), {k: list(v) for k, v in self._histograms.items()}
+        return _sum_rows(rows)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        counters, histograms = self._collect()
+        lines: list[str] = []
+        names = sorted({name for name, _ in counters} | {name for name, _ in histograms})
+        for name in names:
+            kind, help_text = _HELP.get(name, ("counter", ""))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (series_name, labels), value in sorted(counters.items()):
+                if series_name == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            for (series_name, labels), series in sorted(histograms.items()):
+                if series_name != name:
+                    continue
+                cumulative = 0.0
+                for bound, count in zip(LATENCY_BUCKETS, series):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', repr(bound)))} {_format_value(cumulative)}")
+                cumulative += series[len(LATENCY_BUCKETS)]
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {_format_value(cumulative)}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(round(series[-1], 6))}")
+                lines.append(f"{name}_count{_format_labels(labels)} {_format_value(cumulative)}")
+        return "\n".join(lines) + "\n"
+
+
+# 全局单例（每个 worker 进程一份，/metrics 通过 SQLite 汇总所有 worker）
+llm_metrics = MetricsRegistry(prices=_parse_prices(MODEL_PRICES, DEFAULT_MODEL_PRICES))
@@ -0,0 +1,288 @@
+"""Task-aware model routing.
+
+Each LLM call site (identified by its `caller=` name) maps to a task. Each task
+has a primary model, a fallback model and a latency budget:
+
+    questionnaire        cheap/fast model   (interactive, low difficulty)
+    profile_extract      cheap/fast model
+    deep_search_extract  cheap/fast model
+    candidate_scoring    default model
+    email / restyle      premium email model
+
+Latencies of real provider calls (cache hits excluded) are tracked per
+(task, model) over a sliding window. When the primary's p95 for a task exceeds
+that task's budget, the task is demoted to its fallback for a cool-down period.
+After the cool-down the primary is tried again with a fresh window.
+
+Provider is implied by the model name (`gemini-*` -> Gemini, otherwise OpenAI).
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Iterator
+
+from config import (
+    DEFAULT_MODEL,
+    MODEL_ROUTER_DEMOTION_SECONDS,
+    MODEL_ROUTER_MIN_SAMPLES,
+    MODEL_ROUTER_WINDOW,
+    MODEL_ROUTES,
+    OPENAI_DEFAULT_MODEL,
+    OPENAI_EMAIL_MODEL,
+    OPENAI_FAST_MODEL,
+    USE_OPENAI_AS_PRIMARY,
+    USE_OPENAI_FOR_EMAIL,
+)
+
+TASKS = (
+    "questionnaire",
+    "profile_extract",
+    "candidate_scoring",
+    "deep_search_extract",
+    "email",
+    "restyle",
+)
+
+# caller (函数名) -> task
+CALLER_TASKS: dict[str, str] = {
+    "generate_questionnaire": "questionnaire",
+    "generate_next_question": "questionnaire",
+    "generate_next_target_question": "questionnaire",
+    "build_profile_from_answers": "profile_extract",
+    "extract_profile_from_text": "profile_extract",
+    "parse_text_to_profile": "profile_extract",
+    "extract_person_profile_from_web": "profile_extract",
+    "_extract_verified_info_from_search": "deep_search_extract",
+    "_ai_score_and_analyze_candidates": "candidate_scoring",
+    "generate_email": "email",
+    "regenerate_email_with_style": "restyle",
+}
+
+
+def provider_for_model(model: str) -> str:
+    return "gemini" if model.lower().startswith("gemini") else "openai"
+
+
+@dataclass(frozen=True)
+class TaskRoute:
+    task: str
+    model: str
+    fallback_model: str
+    latency_budget_s: float
+
+
+def default_routes() -> dict[str, TaskRoute]:
+    """Routing table derived from the provider switches in config."""
+    if USE_OPENAI_AS_PRIMARY:
+        fast, default = OPENAI_FAST_MODEL, OPENAI_DEFAULT_MODEL
+    else:
+        fast = default = DEFAULT_MODEL
+    email = OPENAI_EMAIL_MODEL if USE_OPENAI_FOR_EMAIL else DEFAULT_MODEL
+    email_fallback = OPENAI_DEFAULT_MODEL if USE_OPENAI_FOR_EMAIL else DEFAULT_MODEL
+    routes = [
+        TaskRoute("questionnaire", fast, default, 4.0),
+        TaskRoute("profile_extract", fast, default, 8.0),
+        TaskRoute("deep_search_extract", fast, default, 8.0),
+        TaskRoute("candidate_scoring", default, fast, 20.0),
+        TaskRoute("email", email, email_fallback, 20.0),
+        TaskRoute("restyle", email, fast if USE_OPENAI_FOR_EMAIL else email_fallback, 15.0),
+    ]
+    return {route.task: route for route in routes}
+
+
+def _parse_route_overrides(raw: str, base: dict[str, TaskRoute]) -> dict[str, TaskRoute]:
+    """Apply JSON overrides ({"task": {"model": ..., "fallback_model": ..., "latency_budget_s": ...}})."""
+    if not raw.strip():
+        return base
+    try:
+        overrides = json.loads(raw)
+    except json.JSONDecodeError as e:
+        print(f"[ModelRouter] Ignoring invalid MODEL_ROUTES: {e}")
+        return base
+    routes = dict(base)
+    for task, spec in (overrides or {}).items():
+        if task not in routes or not isinstance(spec, dict):
+            continue
+        current = routes[task]
+        try:
+            routes[task] = TaskRoute(
+                task=task,
+                model=str(spec.get("model") or current.model),
+                fallback_model=str(spec.get("fallback_model") or current.fallback_model),
+                latency_budget_s=float(spec.get("latency_budget_s") or current.latency_budget_s),
+            )
+        except (TypeError, ValueError) as e:
+            print(f"[ModelRouter] Ignoring invalid route for {task}: {e}")
+    return routes
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class ModelRouter:
+    """Routing table + live latency tracking + demotion - 线程安全"""
+
+    def __init__(
+        self,
+        routes: dict[str, TaskRoute] | None = None,
+        *,
+        window: int = MODEL_ROUTER_WINDOW,
+        min_samples: int = MODEL_ROUTER_MIN_SAMPLES,
+        demotion_seconds: float = MODEL_ROUTER_DEMOTION_SECONDS,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._routes = dict(default_routes() if routes is None else routes)
+        self._window = max(1, int(window))
+        self._min_samples = max(1, int(min_samples))
+        self._demotion_seconds = demotion_seconds
+        self._latencies: dict[tuple[str, str], deque[float]] = {}
+        self._errors: dict[tuple[str, str], int] = {}
+        self._demoted_until: dict[str, float] = {}
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def task_for(caller: str | None) -> str | None:
+        return CALLER_TASKS.get(caller or "")
+
+    def route(self, task: str | None) -> TaskRoute | None:
+        return self._routes.get(task or "")
+
+    def set_route(self, route: TaskRoute) -> None:
+        with self._lock:
+            self._routes[route.task] = route
+            self._demoted_until.pop(route.task, None)
+
+    def is_demoted(self, task: str) -> bool:
+        with self._lock:
+            return self._is_demoted_locked(task)
+
+    def _is_demoted_locked(self, task: str) -> bool:
+        until = self._demoted_until.get(task)
+        if until is None:
+            return False
+        if time.monotonic() < until:
+            return True
+        # Cool-down over: give the primary a fresh window
+        del self._demoted_until[task]
+        route = self._routes.get(task)
+        if route is not None:
+            self._latencies.pop((task, route.model), None)
+            print(f"[ModelRouter] Re-promoting {route.model} for task '{task}'")
+        return False
+
+    def model_for(self, caller: str | None, default: str | None = None) -> str | None:
+        """Model to use for `caller` (fallback while its task is demoted); `default` if unrouted."""
+        task = self.task_for(caller)
+        route = self.route(task)
+        if route is None:
+            return default
+        return route.fallback_model if self.is_demoted(route.task) else route.model
+
+    def fallback_for(self, caller: str | None, model: str) -> str | None:
+        """Model to retry with after `model` failed for `caller` (None if there is none)."""
+        route = self.route(self.task_for(caller))
+        if route is None:
+            return None
+        for candidate in (route.fallback_model, route.model):
+            if candidate != model:
+                return candidate
+        return None
+
+    # ------------------------------------------------------------------
+    # Latency tracking
+    # ------------------------------------------------------------------
+
+    def record(self, caller: str | None, model: str, seconds: float, *, ok: bool = True) -> None:
+        """Record one provider call; may demote the task's primary model."""
+        task = self.task_for(caller) or "other"
+        key = (task, model)
+        with self._lock:
+            if not ok:
+                self._errors[key] = self._errors.get(key, 0) + 1
+                return
+            samples = self._latencies.get(key)
+            if samples is None:
+                samples = deque(maxlen=self._window)
+                self._latencies[key] = samples
+            samples.append(seconds)
+
+            route = self._routes.get(task)
+            if route is None or route.model != model or route.model == route.fallback_model:
+                return
+            if len(samples) < self._min_samples or self._is_demoted_locked(task):
+                return
+            p95 = _percentile(sorted(samples), 95)
+            if p95 > route.latency_budget_s:
+                self._demoted_until[task] = time.monotonic() + self._demotion_seconds
+                print(
+                    f"[ModelRouter] Demoting {model} for task '{task}': "
+                    f"p95 {p95:.2f}s > budget {route.latency_budget_s:.2f}s, using {route.fallback_model}"
+                )
+
+    @contextmanager
+    def measure(self, caller: str | None, model: str) -> Iterator[None]:
+        """Time a blocking provider call and record it (errors are counted, not timed)."""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.record(caller, model, time.perf_counter() - start, ok=False)
+            raise
+        self.record(caller, model, time.perf_counter() - start)
+
+    def percentile(self, caller: str | None, model: str, pct: float) -> float | None:
+        """Observed latency percentile for (caller's task, model); None until min_samples."""
+        task = self.task_for(caller) or "other"
+        with self._lock:
+            samples = self._latencies.get((task, model))
+            if samples is None or len(samples) < self._min_samples:
+                return None
+            return _percentile(sorted(samples), pct)
+
+    def latency(self, model: str, task: str | None = None) -> dict[str, float | int]:
+        """p50/p95 over the window for `model` (optionally restricted to one task)."""
+        with self._lock:
+            values = sorted(
+                v
+                for (t, m), samples in self._latencies.items()
+                if m == model and (task is None or t == task)
+                for v in samples
+            )
+            errors = sum(
+                n for (t, m), n in self._errors.items() if m == model and (task is None or t == task)
+            )
+        return {
+            "count": len(values),
+            "errors": errors,
+            "p50": round(_percentile(values, 50), 3),
+            "p95": round(_percentile(values, 95), 3),
+        }
+
+    def snapshot(self) -> dict:
+        """Routing table, demotions and per-model latency for the admin endpoint."""
+        with self._lock:
+            routes = {task: asdict(route) for task, route in self._routes.items()}
+            demoted = [task for task in list(self._demoted_until) if self._is_demoted_locked(task)]
+            models = {m for (_, m) in self._latencies} | {m for (_, m) in self._errors}
+        return {
+            "routes": routes,
+            "demoted": demoted,
+            "models": {model: self.latency(model) for model in sorted(models)},
+        }
+
+
+# 全局单例（每个 worker 进程一份）
+model_router = ModelRouter(_parse_route_overrides(MODEL_ROUTES, default_routes()))
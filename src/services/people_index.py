@@ -0,0 +1,332 @@
+"""Local people index (SQLite FTS5).
+
+Every LinkedIn profile a search path discovers (LinkedIn people search,
+profile URL lookups) is upserted into {DATA_DIR}/people_index.db with name,
+title, company, location, snippet, source URL and first/last-seen times.
+`find_target_recommendations` queries it before SerpAPI and only pays for a
+search when the index cannot fill `count` candidates seen within
+PEOPLE_INDEX_FRESH_DAYS.
+
+- One row per profile URL (normalized); re-discovering a profile refreshes
+  its fields and `last_seen`, `first_seen` never changes.
+- The terms of the search that found a profile are indexed with it (Google
+  matched them on the full profile page, which the snippet only excerpts).
+- Queries reuse the SerpAPI query string (`site:linkedin.com/in/ ("VP" OR
+  "Director") "M&A" -"intern"`): each quoted term / OR-group becomes an
+  AND-clause of an FTS5 query, exclusions become NOT, results rank by bm25.
+- Backfill from the JSON logs prompt_collector already wrote:
+
+      python -m src.services.people_index backfill [--logs-dir DIR]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import Any, Iterable
+
+from config import DATA_DIR, PEOPLE_INDEX_DB_PATH, PEOPLE_INDEX_ENABLED, PEOPLE_INDEX_FRESH_DAYS
+
+FIND_TARGET_LOGS_DIR = DATA_DIR / "find_target_logs"
+
+# `("A" OR "B")`, `-"C"`, `"D"` or a bare word, in query order
+_QUERY_TOKEN = re.compile(r'-?\([^()]*\)|-?"[^"]+"|\S+')
+_PHRASE = re.compile(r'"([^"]+)"')
+_LOCATION = re.compile(r"Location:\s*([^·|\n]+)")
+_EXPERIENCE = re.compile(r"Experience:\s*([^·|\n]+)")
+
+
+def normalize_profile_url(url: str) -> str:
+    """Canonical LinkedIn profile URL (no scheme variance, query, trailing slash, or country subdomain)."""
+    url = (url or "").strip().split("?", 1)[0].split("#", 1)[0].rstrip("/")
+    match = re.search(r"linkedin\.com/in/([^/]+)", url, re.IGNORECASE)
+    if not match:
+        return ""
+    return f"https://www.linkedin.com/in/{match.group(1)}"
+
+
+def split_position(position: str) -> tuple[str, str]:
+    """("VP", "Goldman Sachs") from "VP at Goldman Sachs" / "VP - Goldman Sachs" / "VP @ Goldman Sachs"."""
+    position = (position or "").strip()
+    for separator in (" at ", " @ ", " - ", " | "):
+        if separator in position:
+            title, company = position.rsplit(separator, 1)
+            return title.strip(), company.strip()
+    return position, ""
+
+
+def _phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _query_groups(query: str) -> list[tuple[bool, list[str]]]:
+    """(negated, phrases) per clause of a Google/SerpAPI query string."""
+    groups: list[tuple[bool, list[str]]] = []
+    for token in _QUERY_TOKEN.findall(query or ""):
+        negate = token.startswith("-")
+        body = token[1:] if negate else token
+        if body.lower().startswith("site:") or body.upper() in ("OR", "AND"):
+            continue
+        phrases = _PHRASE.findall(body) or [body.strip("()")]
+        phrases = [p.strip() for p in phrases if re.search(r"\w", p)]
+        if phrases:
+            groups.append((negate, phrases))
+    return groups
+
+
+def matched_terms(query: str) -> str:
+    """Positive terms of the search that returned a profile (Google matched them on the full page)."""
+    return " ".join(p for negate, phrases in _query_groups(query) if not negate for p in phrases)
+
+
+def fts_query_from_search(query: str) -> str:
+    """FTS5 MATCH expression equivalent to a Google/SerpAPI query string ("" if nothing to match)."""
+    clauses: list[str] = []
+    excludes: list[str] = []
+    for negate, phrases in _query_groups(query):
+        clause = "(" + " OR ".join(_phrase(p) for p in phrases) + ")"
+        (excludes if negate else clauses).append(clause)
+    if not clauses:
+        return ""
+    expression = " AND ".join(clauses)
+    for exclude in excludes:
+        expression += f" NOT {exclude}"
+    return expression
+
+
+class PeopleIndex:
+    """SQLite FTS5 index of discovered LinkedIn profiles shared by all workers - 线程安全"""
+
+    def __init__(
+        self,
+        *,
+        db_path: Path | None = None,
+        enabled: bool = PEOPLE_INDEX_ENABLED,
+        fresh_days: float = PEOPLE_INDEX_FRESH_DAYS,
+    ) -> None:
+        self._db_path = Path(db_path) if db_path is not None else PEOPLE_INDEX_DB_PATH
+        self._fresh_seconds = max(0.0, float(fresh_days)) * 86400
+        self._lock = Lock()
+        self._stats = {"upserts": 0, "queries": 0, "served": 0, "short": 0}
+        self._disk_ok = enabled and self._init_db()
+
+    @property
+    def enabled(self) -> bool:
+        return self._disk_ok
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self._db_path), timeout=5)
+
+    def _init_db(self) -> bool:
+        try:
+            self._db_path.parent.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(
+                    """
+                    CREATE TABLE IF NOT EXISTS people (
+                        id INTEGER PRIMARY KEY,
+                        url TEXT NOT NULL UNIQUE,
+                        name TEXT NOT NULL,
+                        title TEXT NOT NULL DEFAULT '',
+                        company TEXT NOT NULL DEFAULT '',
+                        location TEXT NOT NULL DEFAULT '',
+                        snippet TEXT NOT NULL DEFAULT '',
+                        matched TEXT NOT NULL DEFAULT '',
+                        source TEXT NOT NULL DEFAULT '',
+                        first_seen REAL NOT NULL,
+                        last_seen REAL NOT NULL,
+                        seen_count INTEGER NOT NULL DEFAULT 1
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_people_last_seen ON people(last_seen);
+                    CREATE VIRTUAL TABLE IF NOT EXISTS people_fts USING fts5(
+                        name, title, company, location, snippet, matched,
+                        content='people', content_rowid='id'
+                    );
+                    CREATE TRIGGER IF NOT EXISTS people_ai AFTER INSERT ON people BEGIN
+                        INSERT INTO people_fts(rowid, name, title, company, location, snippet, matched)
+                        VALUES (new.id, new.name, new.title, new.company, new.location, new.snippet, new.matched);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS people_au AFTER UPDATE ON people BEGIN
+                        INSERT INTO people_fts(people_fts, rowid, name, title, company, location, snippet, matched)
+                        VALUES ('delete', old.id, old.name, old.title, old.company, old.location, old.snippet, old.matched);
+                        INSERT INTO people_fts(rowid, name, title, company, location, snippet, matched)
+                        VALUES (new.id, new.name, new.title, new.company, new.location, new.snippet, new.matched);
+                    END;
+                    """
+                )
+            return True
+        except (sqlite3.Error, OSError) as e:
+            # sqlite3.OperationalError "no such module: fts5" on builds without FTS5
+            print(f"[PeopleIndex] Disabled: {e}")
+            return False
+
+    @staticmethod
+    def _row_from_person(person: dict[str, Any]) -> dict[str, str] | None:
+        url = normalize_profile_url(str(person.get("linkedin_url") or person.get("url") or ""))
+        name = str(person.get("name") or "").strip()
+        if not url or not name:
+            return None
+        evidence = person.get("evidence") or []
+        snippet = str(person.get("snippet") or (evidence[0] if isinstance(evidence, list) and evidence else evidence) or "")
+        title, company = split_position(str(person.get("title") or person.get("position") or ""))
+        company = str(person.get("company") or "").strip() or company
+        if not company:
+            match = _EXPERIENCE.search(snippet)
+            company = match.group(1).strip() if match else ""
+        location = str(person.get("location") or "").strip()
+        if not location:
+            match = _LOCATION.search(snippet)
+            location = match.group(1).strip() if match else ""
+        return {
+            "url": url,
+            "name": name,
+            "title": title,
+            "company": company,
+            "location": location,
+            "snippet": snippet.strip()[:500],
+        }
+
+    def add(
+        self,
+        people: Iterable[dict[str, Any]],
+        *,
+        source: str,
+        query: str = "",
+        seen_at: float | None = None,
+    ) -> int:
+        """
+        Upsert discovered profiles (dicts with name + linkedin_url); returns rows written.
+
+        `query` is the search that returned them: its terms are indexed with each
+        profile, since Google matched them on the full page, not just the snippet.
+        """
+        if not self.enabled:
+            return 0
+        rows = [row for row in map(self._row_from_person, people) if row is not None]
+        if not rows:
+            return 0
+        now = time.time() if seen_at is None else seen_at
+        terms = matched_terms(query)
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    """
+                    INSERT INTO people (url, name, title, company, location, snippet, matched, source, first_seen, last_seen)
+                    VALUES (:url, :name, :title, :company, :location, :snippet, :matched, :source, :seen, :seen)
+                    ON CONFLICT(url) DO UPDATE SET
+                        name = excluded.name,
+                        title = CASE WHEN excluded.title != '' THEN excluded.title ELSE people.title END,
+                        company = CASE WHEN excluded.company != '' THEN excluded.company ELSE people.company END,
+                        location = CASE WHEN excluded.location != '' THEN excluded.location ELSE people.location END,
+                        snippet = CASE WHEN excluded.snippet != '' THEN excluded.snippet ELSE people.snippet END,
+                        matched = CASE
+                            WHEN excluded.matched = '' OR instr(people.matched, excluded.matched) > 0 THEN people.matched
+                            WHEN people.matched = '' THEN excluded.matched
+                            ELSE substr(people.matched || char(10) || excluded.matched, -2000)
+                        END,
+                        source = excluded.source,
+                        first_seen = MIN(people.first_seen, excluded.first_seen),
+                        last_seen = MAX(people.last_seen, excluded.last_seen),
+                        seen_count = people.seen_count + 1
+                    """,
+                    [{**row, "matched": terms, "source": source, "seen": now} for row in rows],
+                )
+        except sqlite3.Error as e:
+            print(f"[PeopleIndex] Write error: {e}")
+            return 0
+        with self._lock:
+            self._stats["upserts"] += len(rows)
+        return len(rows)
+
+    def search(self, query: str, *, limit: int = 10, max_age_days: float | None = None) -> list[dict[str, Any]]:
+        """Fresh profiles matching a SerpAPI-style query, best bm25 match first."""
+        expression = fts_query_from_search(query)
+        if not self.enabled or not expression or limit <= 0:
+            return []
+        max_age = self._fresh_seconds if max_age_days is None else max(0.0, max_age_days) * 86400
+        try:
+            with self._connect() as conn:
+                conn.row_factory = sqlite3.Row
+                rows = conn.execute(
+                    """
+                    SELECT p.url, p.name, p.title, p.company, p.location, p.snippet, p.source,
+                           p.first_seen, p.last_seen
+                    FROM people_fts JOIN people p ON p.id = people_fts.rowid
+                    WHERE people_fts MATCH ? AND p.last_seen >= ?
+                    ORDER BY bm25(people_fts, 2.0, 4.0, 3.0, 1.0, 1.0, 0.5)
+                    LIMIT ?
+                    """,
+                    (expression, time.time() - max_age, int(limit)),
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"[PeopleIndex] Query error ({expression}): {e}")
+            return []
+        with self._lock:
+            self._stats["queries"] += 1
+            self._stats["served" if len(rows) >= limit else "short"] += 1
+        return [dict(row) for row in rows]
+
+    def backfill(self, logs_dir: Path | None = None) -> tuple[int, int]:
+        """Index LinkedIn profiles from prompt_collector's find_target logs; returns (files, rows)."""
+        logs_dir = Path(logs_dir) if logs_dir is not None else FIND_TARGET_LOGS_DIR
+        files = rows = 0
+        for path in sorted(logs_dir.glob("*/*.json")):
+            try:
+                record = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"[PeopleIndex] Skipping {path}: {e}")
+                continue
+            try:
+                seen_at = datetime.fromisoformat(record.get("timestamp", "")).timestamp()
+            except (TypeError, ValueError):
+                seen_at = path.stat().st_mtime
+            method = (record.get("metadata") or {}).get("method", "")
+            recommendations = [r for r in record.get("recommendations") or [] if isinstance(r, dict)]
+            files += 1
+            rows += self.add(recommendations, source=f"backfill:{method or 'find_target'}", seen_at=seen_at)
+        return files, rows
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            data: dict[str, Any] = dict(self._stats)
+        data["enabled"] = self.enabled
+        if self.enabled:
+            try:
+                with self._connect() as conn:
+                    data["people"], data["fresh"] = conn.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(last_seen >= ?), 0) FROM people",
+                        (time.time() - self._fresh_seconds,),
+                    ).fetchone()
+            except sqlite3.Error as e:
+                print(f"[PeopleIndex] Stats error: {e}")
+        return data
+
+
+# 全局单例
+people_index = PeopleIndex()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Local people index maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backfill = commands.add_parser("backfill", help="Index profiles from existing find_target logs")
+    backfill.add_argument("--logs-dir", type=Path, default=FIND_TARGET_LOGS_DIR)
+    commands.add_parser("stats", help="Print index statistics")
+    args = parser.parse_args(argv)
+
+    if args.command == "backfill":
+        files, rows = people_index.backfill(args.logs_dir)
+        print(f"[PeopleIndex] Backfilled {rows} profiles from {files} log files in {args.logs_dir}")
+    else:
+        print(json.dumps(people_index.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
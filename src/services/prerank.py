@@ -0,0 +1,144 @@
+"""Local lexical pre-ranking of search candidates (BM25).
+
+`_ai_score_and_analyze_candidates` used to send every SerpAPI candidate to the
+LLM, including obvious mismatches. Candidates are now ranked locally first
+and only the top PRERANK_TOP_K go to the LLM; the rest keep a score computed
+here, so scoring prompt tokens and latency shrink roughly by K/N.
+
+- Document: parsed position + search snippet (evidence) of each candidate.
+- Query: weighted terms from the preferences (target_role_titles, seniority,
+  group, sector, location) plus the sender's schools and past companies,
+  which surface shared-background candidates.
+- Score: BM25 (k1=1.2, b=0.75) over the candidate set, each term's
+  contribution multiplied by its weight.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any
+
+# 偏好字段 -> 查询词权重
+PREFERENCE_WEIGHTS: dict[str, float] = {
+    "target_role_titles": 3.0,
+    "seniority": 2.0,
+    "group": 2.0,
+    "sector": 1.5,
+    "location": 1.0,
+}
+SENDER_OVERLAP_WEIGHT = 1.0
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[&+][a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and at for from in of on or the to with by as is are was be".split()
+)
+# Too common in schools / employers to signal shared background
+_SENDER_STOPWORDS = _STOPWORDS | frozenset(
+    "university college school institute inc llc ltd co corp company group bachelor master "
+    "bs ba ms ma mba phd degree intern internship analyst present".split()
+)
+_YEAR = re.compile(r"^(19|20)\d\d$")
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in _TOKEN.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+def candidate_text(candidate: dict[str, Any]) -> str:
+    evidence = candidate.get("evidence") or []
+    if isinstance(evidence, str):
+        evidence = [evidence]
+    parts = [str(candidate.get("position") or ""), str(candidate.get("title") or "")]
+    parts.extend(str(e) for e in evidence if isinstance(e, str))
+    return " ".join(parts)
+
+
+def _values(value: Any) -> list[str]:
+    if isinstance(value, list):
+        return [str(v) for v in value if isinstance(v, (str, int, float))]
+    if isinstance(value, (str, int, float)) and str(value).strip():
+        return [str(value)]
+    return []
+
+
+def build_query(preferences: dict | None, sender_profile: dict | None) -> dict[str, float]:
+    """Query term -> weight (a term requested by several fields keeps its highest weight)."""
+    query: dict[str, float] = {}
+
+    def _add(tokens: list[str], weight: float) -> None:
+        for token in tokens:
+            query[token] = max(query.get(token, 0.0), weight)
+
+    prefs = preferences or {}
+    for key, weight in PREFERENCE_WEIGHTS.items():
+        for value in _values(prefs.get(key)):
+            _add(tokenize(value), weight)
+    sender = sender_profile or {}
+    for key in ("education", "experiences"):
+        for value in _values(sender.get(key))[:5]:
+            tokens = [t for t in tokenize(value) if t not in _SENDER_STOPWORDS and not _YEAR.match(t)]
+            _add(tokens, SENDER_OVERLAP_WEIGHT)
+    return query
+
+
+@dataclass
+class RankedCandidate:
+    index: int  # position in the input list
+    score: float
+    matched: list[str]  # query terms found in the candidate, by weight
+
+
+def bm25_scores(
+    documents: list[list[str]],
+    query: dict[str, float],
+    *,
+    k1: float = 1.2,
+    b: float = 0.75,
+) -> list[tuple[float, list[str]]]:
+    """Weighted BM25 score and matched terms of each tokenized document."""
+    n = len(documents)
+    if not n or not query:
+        return [(0.0, []) for _ in documents]
+    avg_len = sum(len(d) for d in documents) / n or 1.0
+    doc_freq: Counter = Counter()
+    for doc in documents:
+        doc_freq.update(set(doc) & query.keys())
+    results: list[tuple[float, list[str]]] = []
+    for doc in documents:
+        tf = Counter(doc)
+        norm = k1 * (1 - b + b * len(doc) / avg_len)
+        score = 0.0
+        matched: list[str] = []
+        for term, weight in query.items():
+            freq = tf.get(term, 0)
+            if not freq:
+                continue
+            idf = math.log(1 + (n - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+            score += weight * idf * freq * (k1 + 1) / (freq + norm)
+            matched.append(term)
+        matched.sort(key=lambda t: -query[t])
+        results.append((score, matched))
+    return results
+
+
+def prerank(
+    candidates: list[dict[str, Any]],
+    preferences: dict | None = None,
+    sender_profile: dict | None = None,
+) -> list[RankedCandidate]:
+    """Candidates ranked by local relevance, best first (input order breaks ties)."""
+    query = build_query(preferences, sender_profile)
+    scores = bm25_scores([tokenize(candidate_text(c)) for c in candidates], query)
+    ranked = [RankedCandidate(i, score, matched) for i, (score, matched) in enumerate(scores)]
+    ranked.sort(key=lambda r: (-r.score, r.index))
+    return ranked
+
+
+def local_match_score(score: float, best: float, *, low: int = 60, high: int = 75) -> int:
+    """Map a BM25 score onto the lower part of the LLM's 60-95 match_score range."""
+    if best <= 0:
+        return low
+    return low + round((high - low) * min(score, best) / best)
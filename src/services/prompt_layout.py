@@ -0,0 +1,128 @@
+"""Prompt layout: versioned static prefixes + per-builder accounting.
+
+Providers cache prompts by exact prefix (OpenAI automatic prompt caching,
+Gemini implicit caching). A prompt builder therefore puts everything that is
+identical across requests (system rules, style guide, output format) into a
+byte-stable `PromptPrefix` and appends the per-request data after it.
+
+Rules for prefixes:
+- Never interpolate request data into `PromptPrefix.text`.
+- Any edit to the text must bump `version` (tests pin the fingerprint), so a
+  changed prefix is visible in logs/reports instead of silently missing cache.
+
+`prompt_accounting` keeps, per builder, how many characters/estimated tokens
+were prefix (cacheable) vs suffix, plus the cached-token counts the provider
+actually reported.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+from dataclasses import dataclass
+from threading import Lock
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 chars/token); no tokenizer dependency."""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+@dataclass(frozen=True)
+class PromptPrefix:
+    """Static, versioned head of a prompt."""
+
+    name: str
+    version: str
+    text: str
+
+    @property
+    def fingerprint(self) -> str:
+        return hashlib.sha256(self.text.encode("utf-8")).hexdigest()[:12]
+
+    @property
+    def cache_key(self) -> str:
+        """Stable routing key for provider-side prompt caching."""
+        return f"{self.name}:{self.version}:{self.fingerprint}"
+
+
+@dataclass
+class _BuilderStats:
+    version: str = ""
+    fingerprint: str = ""
+    calls: int = 0
+    prefix_chars: int = 0
+    suffix_chars: int = 0
+    prefix_tokens_est: int = 0
+    suffix_tokens_est: int = 0
+    usage_calls: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+
+
+class PromptAccounting:
+    """Per-builder prefix/suffix accounting - 线程安全"""
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._builders: dict[str, _BuilderStats] = {}
+
+    def _stats(self, name: str) -> _BuilderStats:
+        stats = self._builders.get(name)
+        if stats is None:
+            stats = _BuilderStats()
+            self._builders[name] = stats
+        return stats
+
+    def record(self, prefix: PromptPrefix, suffix: str) -> None:
+        """Record one built prompt: `prefix` is cacheable, `suffix` is per request."""
+        with self._lock:
+            stats = self._stats(prefix.name)
+            stats.version = prefix.version
+            stats.fingerprint = prefix.fingerprint
+            stats.calls += 1
+            stats.prefix_chars += len(prefix.text)
+            stats.suffix_chars += len(suffix)
+            stats.prefix_tokens_est += estimate_tokens(prefix.text)
+            stats.suffix_tokens_est += estimate_tokens(suffix)
+
+    def record_usage(self, name: str, *, prompt_tokens: int, cached_tokens: int) -> None:
+        """Record provider-reported prompt/cached token counts for one request."""
+        with self._lock:
+            stats = self._stats(name)
+            stats.usage_calls += 1
+            stats.prompt_tokens += max(0, int(prompt_tokens or 0))
+            stats.cached_tokens += max(0, int(cached_tokens or 0))
+
+    def report(self) -> dict[str, dict[str, int | float | str]]:
+        """Per-builder totals plus cacheable / observed-cached ratios."""
+        with self._lock:
+            report: dict[str, dict[str, int | float | str]] = {}
+            for name, s in sorted(self._builders.items()):
+                total_chars = s.prefix_chars + s.suffix_chars
+                report[name] = {
+                    "version": s.version,
+                    "fingerprint": s.fingerprint,
+                    "calls": s.calls,
+                    "prefix_chars": s.prefix_chars,
+                    "suffix_chars": s.suffix_chars,
+                    "prefix_tokens_est": s.prefix_tokens_est,
+                    "suffix_tokens_est": s.suffix_tokens_est,
+                    "avg_prompt_chars": round(total_chars / s.calls, 1) if s.calls else 0.0,
+                    "cacheable_ratio": round(s.prefix_chars / total_chars, 4) if total_chars else 0.0,
+                    "usage_calls": s.usage_calls,
+                    "prompt_tokens": s.prompt_tokens,
+                    "cached_tokens": s.cached_tokens,
+                    "observed_cached_ratio": (
+                        round(s.cached_tokens / s.prompt_tokens, 4) if s.prompt_tokens else 0.0
+                    ),
+                }
+            return report
+
+    def reset(self) -> None:
+        with self._lock:
+            self._builders = {}
+
+
+# 全局单例
+prompt_accounting = PromptAccounting()
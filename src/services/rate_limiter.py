@@ -0,0 +1,389 @@
+"""Cross-worker token-bucket rate limiting for OpenAI, Gemini and SerpAPI.
+
+Gunicorn workers do not share memory, so per-process semaphores
+(`async_runtime`) cannot stop a burst across workers from tripping provider
+429s. Buckets therefore live in SQLite at {DATA_DIR}/rate_limits.db and are
+updated inside `BEGIN IMMEDIATE` transactions, which serialises all workers on
+the same host.
+
+Each provider, and each (provider, model) pair, has up to two buckets:
+
+    rpm   requests per minute (every call costs 1)
+    tpm   tokens per minute (prompt estimate + RATE_LIMIT_OUTPUT_TOKENS)
+
+Every call is charged to its provider's buckets (the account-wide limit,
+shared by all models) and to its model's buckets. A bucket holds at most one
+minute's worth and refills continuously. Limits are configured per provider
+and can be overridden per model with a "provider:model" key (see
+DEFAULT_RATE_LIMITS / config.RATE_LIMITS); a model without an override gets
+the provider's limits for its own buckets.
+
+Callers queue instead of failing: `acquire()` / `aacquire()` sleep until both
+buckets have room, up to `max_wait` seconds, then raise RateLimitTimeout.
+Queue depth and wait times are tracked per bucket (per worker process).
+
+If the database cannot be opened, buckets fall back to process memory.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable
+
+from config import (
+    RATE_LIMIT_DB_PATH,
+    RATE_LIMIT_ENABLED,
+    RATE_LIMIT_MAX_WAIT,
+    RATE_LIMIT_OUTPUT_TOKENS,
+    RATE_LIMITS,
+)
+from src.services.prompt_layout import estimate_tokens
+
+# provider (或 "provider:model") -> {"rpm": ..., "tpm": ...}；缺省的维度不限流
+DEFAULT_RATE_LIMITS: dict[str, dict[str, float]] = {
+    "openai": {"rpm": 500, "tpm": 200_000},
+    "gemini": {"rpm": 300, "tpm": 1_000_000},
+    "serpapi": {"rpm": 60},
+}
+
+
+class RateLimitTimeout(RuntimeError):
+    """No capacity became available within the caller's max wait."""
+
+
+def _parse_limit_overrides(raw: str, base: dict[str, dict[str, float]]) -> dict[str, dict[str, float]]:
+    """Merge JSON overrides ({"openai:gpt-4o": {"tpm": 30000}}) into `base`."""
+    if not raw.strip():
+        return base
+    try:
+        overrides = json.loads(raw)
+    except json.JSONDecodeError as e:
+        print(f"[RateLimiter] Ignoring invalid RATE_LIMITS: {e}")
+        return base
+    limits = {key: dict(spec) for key, spec in base.items()}
+    for key, spec in (overrides or {}).items():
+        if not isinstance(spec, dict):
+            continue
+        merged = limits.setdefault(str(key), {})
+        for dimension in ("rpm", "tpm"):
+            if dimension not in spec:
+                continue
+            try:
+                merged[dimension] = float(spec[dimension])
+            except (TypeError, ValueError):
+                print(f"[RateLimiter] Ignoring invalid {dimension} for {key}")
+    return limits
+
+
+@dataclass
+class BucketStats:
+    acquired: int = 0
+    waited: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    timeouts: int = 0
+    queue_depth: int = 0
+    peak_queue_depth: int = 0
+
+    def to_dict(self) -> dict[str, int | float]:
+        data: dict[str, int | float] = asdict(self)
+        data["wait_seconds"] = round(self.wait_seconds, 3)
+        data["max_wait_seconds"] = round(self.max_wait_seconds, 3)
+        data["avg_wait_seconds"] = round(self.wait_seconds / self.acquired, 3) if self.acquired else 0.0
+        return data
+
+
+class RateLimiter:
+    """SQLite-backed token buckets shared by all workers - 线程安全"""
+
+    def __init__(
+        self,
+        *,
+        db_path: Path | None = None,
+        limits: dict[str, dict[str, float]] | None = None,
+        enabled: bool = RATE_LIMIT_ENABLED,
+        max_wait: float = RATE_LIMIT_MAX_WAIT,
+        output_tokens: int = RATE_LIMIT_OUTPUT_TOKENS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._db_path = Path(db_path) if db_path is not None else RATE_LIMIT_DB_PATH
+        self._limits = dict(DEFAULT_RATE_LIMITS if limits is None else limits)
+        self.enabled = enabled
+        self._max_wait = max(0.0, float(max_wait))
+        self._output_tokens = max(0, int(output_tokens))
+        # Wall clock: bucket timestamps are compared across processes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._memory: dict[str, tuple[float, float]] = {}
+        self._stats: dict[str, BucketStats] = {}
+        self._disk_ok = self._init_db()
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+        return sqlite3.connect(str(self._db_path), timeout=5, isolation_level=None)
+
+    def _init_db(self) -> bool:
+        try:
+            self._db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = self._connect()
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS rate_buckets (
+                        key TEXT PRIMARY KEY,
+                        level REAL NOT NULL,
+                        updated_at REAL NOT NULL
+                    )
+                    """
+                )
+            finally:
+                conn.close()
+            return True
+        except (sqlite3.Error, OSError) as e:
+            print(f"[RateLimiter] Shared buckets disabled, using per-process memory: {e}")
+            return False
+
+    # ------------------------------------------------------------------
+    # Policy
+    # ------------------------------------------------------------------
+
+    def limits_for(self, provider: str, model: str = "") -> dict[str, float]:
+        """Effective {"rpm", "tpm"} for (provider, model); model keys override provider keys."""
+        limits = dict(self._limits.get(provider, {}))
+        if model:
+            limits.update(self._limits.get(f"{provider}:{model}", {}))
+        return {dim: value for dim, value in limits.items() if value and value > 0}
+
+    def estimate_cost(self, prompt: str | list[str] = "") -> int:
+        """Token cost charged up front for one LLM call."""
+        text = prompt if isinstance(prompt, str) else "".join(prompt)
+        return estimate_tokens(text) + self._output_tokens
+
+    @staticmethod
+    def _bucket_name(provider: str, model: str) -> str:
+        return f"{provider}:{model}" if model else provider
+
+    def _costs(self, provider: str, model: str, tokens: int) -> list[tuple[str, float, float]]:
+        """[(bucket key, capacity per minute, cost)] for one call."""
+        # Provider-wide buckets cap the whole account (all models together);
+        # a model's own buckets additionally cap that model
+        scopes = [(provider, self.limits_for(provider))]
+        if model:
+            scopes.append((self._bucket_name(provider, model), self.limits_for(provider, model)))
+        costs = []
+        for name, limits in scopes:
+            if "rpm" in limits:
+                costs.append((f"{name}:rpm", limits["rpm"], 1.0))
+            if "tpm" in limits and tokens > 0:
+                # A single oversized request may drain the bucket but must not wait forever
+                costs.append((f"{name}:tpm", limits["tpm"], min(float(tokens), limits["tpm"])))
+        return costs
+
+    @staticmethod
+    def _refill(level: float, updated_at: float, capacity: float, now: float) -> float:
+        elapsed = max(0.0, now - updated_at)
+        return min(capacity, level + elapsed * capacity / 60.0)
+
+    def _take_from(self, rows: dict[str, tuple[float, float]], costs, now: float) -> tuple[float, dict]:
+        """Return (seconds to wait, new levels); new levels are only meaningful when wait == 0."""
+        wait = 0.0
+        levels: dict[str, float] = {}
+        for key, capacity, cost in costs:
+            level, updated_at = rows.get(key, (capacity, now))
+            current = self._refill(level, updated_at, capacity, now)
+            if current >= cost:
+                levels[key] = current - cost
+            else:
+                wait = max(wait, (cost - current) * 60.0 / capacity)
+        return wait, levels
+
+    def _try_take(self, costs: list[tuple[str, float, float]]) -> float:
+        """Atomically take `costs` from all buckets, or return how long to wait first."""
+        if not self._disk_ok:
+            with self._lock:
+                now = self._clock()
+                wait, levels = self._take_from(self._memory, costs, now)
+                if wait <= 0:
+                    for key, level in levels.items():
+                        self._memory[key] = (level, now)
+                return wait
+
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            print(f"[RateLimiter] DB open error, not limiting this call: {e}")
+            return 0.0
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            keys = [key for key, _, _ in costs]
+            placeholders = ",".join("?" for _ in keys)
+            rows = {
+                key: (level, updated_at)
+                for key, level, updated_at in conn.execute(
+                    f"SELECT key, level, updated_at FROM rate_buckets WHERE key IN ({placeholders})", keys
+                )
+            }
+            now = self._clock()
+            wait, levels = self._take_from(rows, costs, now)
+            if wait <= 0:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO rate_buckets (key, level, updated_at) VALUES (?, ?, ?)",
+                    [(key, level, now) for key, level in levels.items()],
+                )
+            conn.execute("COMMIT")
+            return wait
+        except sqlite3.Error as e:
+            # Fail open: a broken limiter must not take the app down with it
+            print(f"[RateLimiter] DB error, not limiting this call: {e}")
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            return 0.0
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Acquire
+    # ------------------------------------------------------------------
+
+    def _bucket_stats(self, name: str) -> BucketStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = BucketStats()
+            self._stats[name] = stats
+        return stats
+
+    def _enter_queue(self, name: str) -> None:
+        with self._lock:
+            stats = self._bucket_stats(name)
+            stats.queue_depth += 1
+            stats.peak_queue_depth = max(stats.peak_queue_depth, stats.queue_depth)
+
+    def _leave_queue(self, name: str, waited: float, *, acquired: bool) -> None:
+        with self._lock:
+            stats = self._bucket_stats(name)
+            stats.queue_depth -= 1
+            if not acquired:
+                stats.timeouts += 1
+                return
+            stats.acquired += 1
+            if waited > 0:
+                stats.waited += 1
+                stats.wait_seconds += waited
+                stats.max_wait_seconds = max(stats.max_wait_seconds, waited)
+
+    def _prepare(self, provider: str, model: str, tokens: int, max_wait: float | None):
+        if not self.enabled:
+            return None
+        costs = self._costs(provider, model, tokens)
+        if not costs:
+            return None
+        return self._bucket_name(provider, model), costs, self._max_wait if max_wait is None else max_wait
+
+    def acquire(self, provider: str, *, model: str = "", tokens: int = 0, max_wait: float | None = None) -> float:
+        """Block until one request (and `tokens`) is available; return seconds waited."""
+        prepared = self._prepare(provider, model, tokens, max_wait)
+        if prepared is None:
+            return 0.0
+        name, costs, max_wait = prepared
+        start = time.monotonic()
+        self._enter_queue(name)
+        waited = 0.0
+        acquired = False
+        try:
+            while True:
+                wait = self._try_take(costs)
+                if wait <= 0:
+                    acquired = True
+                    return waited
+                if waited + wait > max_wait:
+                    raise RateLimitTimeout(
+                        f"[RateLimiter] {name}: no capacity within {max_wait:.1f}s (needs {wait:.1f}s more)"
+                    )
+                time.sleep(min(wait, 1.0))
+                waited = time.monotonic() - start
+        finally:
+            self._leave_queue(name, waited, acquired=acquired)
+
+    async def aacquire(
+        self, provider: str, *, model: str = "", tokens: int = 0, max_wait: float | None = None
+    ) -> float:
+        """Async variant of `acquire`: the SQLite transaction runs in a worker thread, waits use asyncio.sleep."""
+        prepared = self._prepare(provider, model, tokens, max_wait)
+        if prepared is None:
+            return 0.0
+        name, costs, max_wait = prepared
+        start = time.monotonic()
+        self._enter_queue(name)
+        waited = 0.0
+        acquired = False
+        try:
+            while True:
+                # BEGIN IMMEDIATE may wait on other workers' locks: keep it off the event loop
+                wait = await asyncio.to_thread(self._try_take, costs)
+                if wait <= 0:
+                    acquired = True
+                    return waited
+                if waited + wait > max_wait:
+                    raise RateLimitTimeout(
+                        f"[RateLimiter] {name}: no capacity within {max_wait:.1f}s (needs {wait:.1f}s more)"
+                    )
+                await asyncio.sleep(min(wait, 1.0))
+                waited = time.monotonic() - start
+        finally:
+            self._leave_queue(name, waited, acquired=acquired)
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+
+    def levels(self) -> dict[str, float]:
+        """Current (refilled) level of every known bucket, shared across workers."""
+        if self._disk_ok:
+            try:
+                conn = self._connect()
+                try:
+                    rows = conn.execute("SELECT key, level, updated_at FROM rate_buckets").fetchall()
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                print(f"[RateLimiter] DB read error: {e}")
+                rows = []
+        else:
+            with self._lock:
+                rows = [(key, level, updated_at) for key, (level, updated_at) in self._memory.items()]
+        now = self._clock()
+        result = {}
+        for key, level, updated_at in rows:
+            name, _, dimension = key.rpartition(":")
+            provider, _, model = name.partition(":")
+            capacity = self.limits_for(provider, model).get(dimension)
+            result[key] = round(self._refill(level, updated_at, capacity, now) if capacity else level, 1)
+        return dict(sorted(result.items()))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = {name: s.to_dict() for name, s in sorted(self._stats.items())}
+        return {
+            "enabled": self.enabled,
+            "shared": self._disk_ok,
+            "limits": self._limits,
+            "levels": self.levels(),
+            "queues": stats,
+        }
+
+
+# 全局单例（每个 worker 进程一份，令牌桶本身通过 SQLite 在 worker 间共享）
+rate_limiter = RateLimiter(limits=_parse_limit_overrides(RATE_LIMITS, DEFAULT_RATE_LIMITS))
@@ -0,0 +1,226 @@
+"""Server-side pagination cursors for "Load more" recommendations.
+
+`/api/find-recommendations` returns a `cursor` id with the first page. Passing
+it back with the same purpose / field / preferences fetches the next page
+without re-running the pipeline:
+
+- `pending`: candidates already scored but not shown yet (served first, no
+  LLM call);
+- `start`: SerpAPI result offset of the primary LinkedIn query, so the next
+  page requests only results the previous pages have not covered;
+- `shown`: dedupe keys (profile URL / name) of everyone shown to this user,
+  filtered out *before* scoring.
+
+Cursors live in {DATA_DIR}/recommendation_cursors.db so any gunicorn worker
+can continue a search, belong to one user, and expire after
+RECOMMENDATION_CURSOR_TTL. Every save is a compare-and-swap on a version
+number: of two concurrent "load more" requests on one cursor only the first
+save succeeds, so the same page is never handed out twice.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import secrets
+import sqlite3
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import Any
+
+from config import RECOMMENDATION_CURSOR_DB_PATH, RECOMMENDATION_CURSOR_TTL
+from src.services.people_index import normalize_profile_url
+
+
+def search_key(purpose: str, field_name: str, preferences: dict | None) -> str:
+    """Identity of a search: a cursor only continues the search it was created for."""
+    raw = json.dumps(
+        {
+            "purpose": " ".join((purpose or "").split()).lower(),
+            "field": " ".join((field_name or "").split()).lower(),
+            "preferences": preferences or {},
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def candidate_keys(candidate: dict[str, Any]) -> set[str]:
+    """Dedupe keys of a candidate: normalized profile URL and lowercased name."""
+    keys = {
+        normalize_profile_url(str(candidate.get("linkedin_url") or "")),
+        " ".join(str(candidate.get("name") or "").split()).lower(),
+    }
+    return keys - {""}
+
+
+@dataclass
+class RecommendationCursor:
+    cursor_id: str
+    user_id: str
+    search_key: str
+    start: int = 0  # next SerpAPI `start` offset of the primary query
+    pending: list[dict[str, Any]] = field(default_factory=list)  # scored, not shown yet
+    shown: list[str] = field(default_factory=list)  # candidate_keys of shown candidates
+    exhausted: bool = False  # SerpAPI has no further results for this search
+    version: int = 0  # bumped by every successful save; 0 = never saved
+
+    def is_shown(self, candidate: dict[str, Any]) -> bool:
+        return bool(candidate_keys(candidate) & set(self.shown))
+
+    def mark_shown(self, candidates: list[dict[str, Any]]) -> None:
+        shown = set(self.shown)
+        for candidate in candidates:
+            for key in sorted(candidate_keys(candidate) - shown):
+                shown.add(key)
+                self.shown.append(key)
+
+    @property
+    def has_more(self) -> bool:
+        return bool(self.pending) or not self.exhausted
+
+
+class RecommendationCursorStore:
+    """SQLite-backed cursor store shared by all workers - 线程安全"""
+
+    def __init__(
+        self,
+        *,
+        db_path: Path | None = None,
+        ttl: int = RECOMMENDATION_CURSOR_TTL,
+    ) -> None:
+        self._db_path = Path(db_path) if db_path is not None else RECOMMENDATION_CURSOR_DB_PATH
+        self._ttl = max(0, int(ttl))
+        self._lock = Lock()
+        self._stats = {"created": 0, "resumed": 0, "missing": 0, "saves": 0, "conflicts": 0}
+        self._disk_ok = self._init_db()
+
+    @property
+    def enabled(self) -> bool:
+        return self._disk_ok and self._ttl > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self._db_path), timeout=5)
+
+    def _init_db(self) -> bool:
+        try:
+            self._db_path.parent.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS recommendation_cursors (
+                        cursor_id TEXT PRIMARY KEY,
+                        user_id TEXT NOT NULL,
+                        search_key TEXT NOT NULL,
+                        state TEXT NOT NULL,
+                        version INTEGER NOT NULL DEFAULT 0,
+                        updated_at REAL NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                    """
+                )
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(recommendation_cursors)")}
+                if "version" not in columns:
+                    conn.execute("ALTER TABLE recommendation_cursors ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_recommendation_cursors_expires "
+                    "ON recommendation_cursors(expires_at)"
+                )
+            return True
+        except (sqlite3.Error, OSError) as e:
+            print(f"[RecommendationCursor] Disabled: {e}")
+            return False
+
+    def create(self, user_id: str, search_key: str, *, start: int = 0) -> RecommendationCursor:
+        """New cursor for `search_key` (persisted by `save`)."""
+        with self._lock:
+            self._stats["created"] += 1
+        return RecommendationCursor(
+            cursor_id=secrets.token_urlsafe(16),
+            user_id=user_id,
+            search_key=search_key,
+            start=max(0, int(start)),
+        )
+
+    def get(self, cursor_id: str, user_id: str, search_key: str) -> RecommendationCursor | None:
+        """The cursor, or None when unknown, expired, another user's, or for a different search."""
+        row = None
+        if self.enabled and cursor_id:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute(
+                        "SELECT state, version FROM recommendation_cursors "
+                        "WHERE cursor_id = ? AND user_id = ? AND search_key = ? AND expires_at > ?",
+                        (cursor_id, user_id, search_key, time.time()),
+                    ).fetchone()
+            except sqlite3.Error as e:
+                print(f"[RecommendationCursor] Read error: {e}")
+        with self._lock:
+            self._stats["resumed" if row else "missing"] += 1
+        if row is None:
+            return None
+        return RecommendationCursor(**{**json.loads(row[0]), "version": row[1]})
+
+    def save(self, cursor: RecommendationCursor) -> bool:
+        """
+        Persist `cursor` if nobody else saved it since it was read; each save extends its lifetime by the TTL.
+
+        Returns False on a conflict (another request advanced the cursor first); the
+        caller's page must then be discarded. Storage errors are logged and not conflicts.
+        """
+        if not self.enabled:
+            return True
+        now = time.time()
+        state = json.dumps({**asdict(cursor), "version": cursor.version + 1}, ensure_ascii=False)
+        with self._lock:
+            self._stats["saves"] += 1
+            purge = self._stats["saves"] % 100 == 0
+        try:
+            with self._connect() as conn:
+                if cursor.version == 0:
+                    saved = conn.execute(
+                        "INSERT OR IGNORE INTO recommendation_cursors "
+                        "(cursor_id, user_id, search_key, state, version, updated_at, expires_at) "
+                        "VALUES (?, ?, ?, ?, 1, ?, ?)",
+                        (cursor.cursor_id, cursor.user_id, cursor.search_key, state, now, now + self._ttl),
+                    ).rowcount
+                else:
+                    saved = conn.execute(
+                        "UPDATE recommendation_cursors SET state = ?, version = version + 1, updated_at = ?, "
+                        "expires_at = ? WHERE cursor_id = ? AND version = ?",
+                        (state, now, now + self._ttl, cursor.cursor_id, cursor.version),
+                    ).rowcount
+                if purge:
+                    conn.execute("DELETE FROM recommendation_cursors WHERE expires_at <= ?", (now,))
+        except sqlite3.Error as e:
+            print(f"[RecommendationCursor] Write error: {e}")
+            return True
+        if not saved:
+            with self._lock:
+                self._stats["conflicts"] += 1
+            return False
+        cursor.version += 1
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            data: dict[str, Any] = dict(self._stats)
+        data["enabled"] = self.enabled
+        if self.enabled:
+            try:
+                with self._connect() as conn:
+                    (data["active"],) = conn.execute(
+                        "SELECT COUNT(*) FROM recommendation_cursors WHERE expires_at > ?", (time.time(),)
+                    ).fetchone()
+            except sqlite3.Error as e:
+                print(f"[RecommendationCursor] Stats error: {e}")
+        return data
+
+
+# 全局单例
+recommendation_cursors = RecommendationCursorStore()
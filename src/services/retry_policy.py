@@ -0,0 +1,280 @@
+"""Shared retry policy for provider calls (OpenAI, Gemini, SerpAPI).
+
+A transient 429/503 half-way through a multi-step pipeline should cost one
+short pause, not the whole request. Every provider call in `src.email_agent`
+and `src.web_scraper` goes through `retry_policy.call()` / `acall()`:
+
+- Only transient errors are retried: HTTP 408/409/429/5xx, connection resets
+  and timeouts. Bad requests, auth errors, missing keys/modules and
+  unparseable responses fail immediately.
+- Delays grow exponentially (`base_delay * multiplier**n`, capped at
+  `max_delay`) with full jitter, so workers that failed together do not retry
+  together.
+- A server-sent `Retry-After` (or OpenAI's `retry-after-ms`) replaces the
+  computed delay.
+- The overall `deadline` bounds the whole sequence: a retry whose wait would
+  end past the deadline is not attempted.
+
+The OpenAI SDK's own retries are switched off in `llm_clients` so attempts are
+not multiplied. Per-operation counters (attempts, retries, outcomes by error
+kind, time slept) are exposed for the admin endpoint.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, TypeVar
+
+from config import (
+    RETRY_BASE_DELAY,
+    RETRY_DEADLINE,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_MAX_DELAY,
+)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = frozenset({408, 409, 425, 429, 500, 502, 503, 504})
+
+# Transport-level failures from httpx / requests / urllib, matched by class name
+# so optional SDKs need not be importable here
+_TRANSIENT_ERROR_NAMES = frozenset({
+    "APIConnectionError",
+    "APITimeoutError",
+    "ConnectError",
+    "ConnectTimeout",
+    "ReadTimeout",
+    "RemoteProtocolError",
+    "ReadError",
+    "ServiceUnavailable",
+    "DeadlineExceeded",
+    "ResourceExhausted",
+    "TooManyRequests",
+    "InternalServerError",
+    "ChunkedEncodingError",
+})
+
+
+def status_code_of(exc: BaseException) -> int | None:
+    """HTTP status carried by an SDK / urllib / requests exception, if any."""
+    for attr in ("status_code", "code", "status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int) and 100 <= value <= 599:
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def _headers_of(exc: BaseException) -> Any:
+    headers = getattr(exc, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+    return headers
+
+
+def retry_after_seconds(exc: BaseException) -> float | None:
+    """Server-requested wait from `retry-after-ms` / `Retry-After` (seconds or HTTP date)."""
+    headers = _headers_of(exc)
+    if headers is None:
+        return None
+    try:
+        raw_ms = headers.get("retry-after-ms")
+        if raw_ms is not None:
+            return max(0.0, float(raw_ms) / 1000)
+        raw = headers.get("retry-after")
+    except Exception:
+        return None
+    if raw is None:
+        return None
+    try:
+        return max(0.0, float(raw))
+    except (TypeError, ValueError):
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(str(raw))
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether `exc` is transient, i.e. the same request may succeed if repeated."""
+    if isinstance(exc, (ValueError, ModuleNotFoundError, TypeError, KeyError)):
+        # Config problems and unparseable responses (JSONDecodeError is a ValueError)
+        return False
+    status = status_code_of(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    if type(exc).__name__ in _TRANSIENT_ERROR_NAMES:
+        return True
+    # Sockets: ConnectionError, TimeoutError, urllib.error.URLError (no HTTP status)
+    return isinstance(exc, (ConnectionError, TimeoutError, OSError))
+
+
+def error_kind(exc: BaseException) -> str:
+    status = status_code_of(exc)
+    return f"http_{status}" if status is not None else type(exc).__name__
+
+
+@dataclass
+class RetryStats:
+    calls: int = 0
+    attempts: int = 0
+    retries: int = 0
+    successes: int = 0
+    failures: int = 0
+    gave_up_deadline: int = 0
+    retry_after_honoured: int = 0
+    sleep_seconds: float = 0.0
+    # attempt number (1-based) -> successes on that attempt
+    succeeded_on_attempt: Counter = field(default_factory=Counter)
+    errors: Counter = field(default_factory=Counter)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "successes": self.successes,
+            "failures": self.failures,
+            "gave_up_deadline": self.gave_up_deadline,
+            "retry_after_honoured": self.retry_after_honoured,
+            "sleep_seconds": round(self.sleep_seconds, 3),
+            "succeeded_on_attempt": {str(k): v for k, v in sorted(self.succeeded_on_attempt.items())},
+            "errors": dict(self.errors.most_common()),
+        }
+
+
+class RetryPolicy:
+    """Exponential backoff + full jitter + Retry-After + overall deadline - 线程安全"""
+
+    def __init__(
+        self,
+        *,
+        max_attempts: int = RETRY_MAX_ATTEMPTS,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+        multiplier: float = 2.0,
+        deadline: float = RETRY_DEADLINE,
+        rng: random.Random | None = None,
+    ) -> None:
+        self._max_attempts = max(1, int(max_attempts))
+        self._base_delay = max(0.0, float(base_delay))
+        self._max_delay = max(0.0, float(max_delay))
+        self._multiplier = max(1.0, float(multiplier))
+        self._deadline = max(0.0, float(deadline))
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._stats: dict[str, RetryStats] = {}
+
+    def _op_stats(self, name: str) -> RetryStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = RetryStats()
+            self._stats[name] = stats
+        return stats
+
+    def backoff(self, retry_number: int) -> float:
+        """Full-jitter delay before retry `retry_number` (1-based)."""
+        ceiling = min(self._max_delay, self._base_delay * self._multiplier ** (retry_number - 1))
+        with self._lock:
+            return self._rng.uniform(0, ceiling)
+
+    def _next_delay(
+        self, name: str, exc: BaseException, attempt: int, started: float, deadline: float
+    ) -> float | None:
+        """Record a failed attempt; return how long to sleep before retrying, or None to give up."""
+        with self._lock:
+            stats = self._op_stats(name)
+            stats.attempts += 1
+            stats.errors[error_kind(exc)] += 1
+        if not is_retryable(exc) or attempt >= self._max_attempts:
+            with self._lock:
+                self._op_stats(name).failures += 1
+            return None
+
+        server_wait = retry_after_seconds(exc)
+        delay = server_wait if server_wait is not None else self.backoff(attempt)
+        elapsed = time.monotonic() - started
+        if deadline and elapsed + delay >= deadline:
+            with self._lock:
+                stats = self._op_stats(name)
+                stats.gave_up_deadline += 1
+                stats.failures += 1
+            print(f"[Retry] {name}: giving up after attempt {attempt}, next wait {delay:.2f}s exceeds {deadline:.0f}s deadline")
+            return None
+
+        with self._lock:
+            stats = self._op_stats(name)
+            stats.retries += 1
+            stats.sleep_seconds += delay
+            if server_wait is not None:
+                stats.retry_after_honoured += 1
+        print(f"[Retry] {name}: attempt {attempt}/{self._max_attempts} failed ({error_kind(exc)}: {exc}), retrying in {delay:.2f}s")
+        return delay
+
+    def _start(self, name: str) -> None:
+        with self._lock:
+            self._op_stats(name).calls += 1
+
+    def _succeed(self, name: str, attempt: int) -> None:
+        with self._lock:
+            stats = self._op_stats(name)
+            stats.attempts += 1
+            stats.successes += 1
+            stats.succeeded_on_attempt[attempt] += 1
+
+    def call(self, name: str, func: Callable[[], T], *, deadline: float | None = None) -> T:
+        """Run blocking `func` with retries (sleeps the calling thread between attempts)."""
+        deadline = self._deadline if deadline is None else deadline
+        started = time.monotonic()
+        self._start(name)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = func()
+            except Exception as e:
+                delay = self._next_delay(name, e, attempt, started, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self._succeed(name, attempt)
+            return result
+
+    async def acall(
+        self, name: str, func: Callable[[], Awaitable[T]], *, deadline: float | None = None
+    ) -> T:
+        """Await `func()` with retries; `func` must return a fresh awaitable per attempt."""
+        deadline = self._deadline if deadline is None else deadline
+        started = time.monotonic()
+        self._start(name)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = await func()
+            except Exception as e:
+                delay = self._next_delay(name, e, attempt, started, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._succeed(name, attempt)
+            return result
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in sorted(self._stats.items())}
+
+
+# 全局单例（每个 worker 进程一份）
+retry_policy = RetryPolicy()
@@ -0,0 +1,268 @@
+"""Persistent SerpAPI result cache.
+
+SerpAPI is the most expensive per-request item (billed per search, 1-3 s
+each), and the same queries recur across users (`site:linkedin.com/in/
+"Goldman Sachs" "M&A" "New York"`). Every `serpapi_client.search` call is
+served from SQLite at {DATA_DIR}/serpapi_cache.db when an unexpired entry exists.
+
+- Keys are the normalized request parameters: `api_key` dropped, whitespace
+  collapsed, query lowercased (Google search is case-insensitive), params
+  sorted.
+- TTLs depend on the query type (DEFAULT_SERPAPI_TTLS, overridable via
+  SERPAPI_CACHE_TTLS): LinkedIn profile lookups change slowly, news quickly.
+  The type comes from the params, or from the caller when the params cannot
+  tell (deep-search queries are plain `engine=google` searches for a person's
+  recent activity and pass `kind="news"`).
+- Negative caching: a response without results ("no profile found") is kept
+  for SERPAPI_CACHE_NEGATIVE_TTL, so repeated misses stop costing a search.
+- SerpAPI error responses other than "no results" are never cached.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Mapping
+
+from config import (
+    SERPAPI_CACHE_DB_PATH,
+    SERPAPI_CACHE_ENABLED,
+    SERPAPI_CACHE_NEGATIVE_TTL,
+    SERPAPI_CACHE_TTLS,
+)
+from src.services.llm_cache import _parse_ttl_overrides
+
+# 按查询类型配置的 TTL（秒）；0 表示不缓存该类型
+DEFAULT_SERPAPI_TTLS: dict[str, int] = {
+    "linkedin_profile": 7 * 24 * 3600,
+    "news": 3 * 3600,
+    "google": 24 * 3600,
+    "default": 24 * 3600,
+}
+
+# Credentials / transport-only parameters that must not affect the key
+_IGNORED_PARAMS = frozenset({"api_key", "output", "async", "no_cache"})
+
+
+def query_type(params: Mapping[str, Any], kind: str | None = None) -> str:
+    """TTL class of a SerpAPI request; `kind` is the caller's own classification."""
+    if kind:
+        return kind
+    query = str(params.get("q", "")).lower()
+    if "site:linkedin.com/in" in query:
+        return "linkedin_profile"
+    engine = str(params.get("engine", "google")).lower()
+    if params.get("tbm") == "nws" or engine == "google_news":
+        return "news"
+    return engine
+
+
+def normalize_params(params: Mapping[str, Any]) -> dict[str, str]:
+    normalized: dict[str, str] = {}
+    for key, value in params.items():
+        if key in _IGNORED_PARAMS or value is None:
+            continue
+        text = " ".join(str(value).split())
+        normalized[key] = text.lower() if key == "q" else text
+    return dict(sorted(normalized.items()))
+
+
+def is_negative(data: Any) -> bool:
+    """A valid response that found nothing (cached with the negative TTL)."""
+    if not isinstance(data, dict):
+        return False
+    if data.get("error"):
+        return "hasn't returned any results" in str(data["error"])
+    return not (data.get("organic_results") or data.get("news_results"))
+
+
+@dataclass
+class SerpCacheStats:
+    hits: int = 0
+    negative_hits: int = 0
+    misses: int = 0
+    bypassed: int = 0
+    stores: int = 0
+    negative_stores: int = 0
+    hits_by_type: Counter = field(default_factory=Counter)
+    misses_by_type: Counter = field(default_factory=Counter)
+
+    def to_dict(self) -> dict[str, Any]:
+        data: dict[str, Any] = asdict(self)
+        lookups = self.hits + self.misses
+        data["hit_rate"] = round(self.hits / lookups, 4) if lookups else 0.0
+        data["hits_by_type"] = dict(self.hits_by_type)
+        data["misses_by_type"] = dict(self.misses_by_type)
+        return data
+
+
+class SerpAPICache:
+    """SQLite-backed SerpAPI response cache shared by all workers - 线程安全"""
+
+    def __init__(
+        self,
+        *,
+        db_path: Path | None = None,
+        ttls: dict[str, int] | None = None,
+        negative_ttl: int = SERPAPI_CACHE_NEGATIVE_TTL,
+        enabled: bool = SERPAPI_CACHE_ENABLED,
+    ) -> None:
+        self._db_path = Path(db_path) if db_path is not None else SERPAPI_CACHE_DB_PATH
+        self._ttls = dict(DEFAULT_SERPAPI_TTLS if ttls is None else ttls)
+        self._negative_ttl = max(0, int(negative_ttl))
+        self._enabled = enabled
+        self._lock = Lock()
+        self._stats = SerpCacheStats()
+        self._disk_ok = enabled and self._init_db()
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled and self._disk_ok
+
+    def ttl_for(self, params: Mapping[str, Any], *, negative: bool = False, kind: str | None = None) -> int:
+        ttl = self._ttls.get(query_type(params, kind), self._ttls.get("default", 0))
+        # A negative entry never outlives a positive one of the same type
+        return min(ttl, self._negative_ttl) if negative else ttl
+
+    @staticmethod
+    def make_key(params: Mapping[str, Any]) -> str:
+        raw = json.dumps(normalize_params(params), ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self._db_path), timeout=5)
+
+    def _init_db(self) -> bool:
+        try:
+            self._db_path.parent.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS serpapi_cache (
+                        key TEXT PRIMARY KEY,
+                        params TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        query_type TEXT NOT NULL,
+                        negative INTEGER NOT NULL,
+                        created_at REAL NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                    """
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_serpapi_cache_expires ON serpapi_cache(expires_at)")
+            return True
+        except (sqlite3.Error, OSError) as e:
+            print(f"[SerpAPICache] Disabled: {e}")
+            return False
+
+    def get(self, params: Mapping[str, Any], *, kind: str | None = None) -> dict | None:
+        """Cached response for `params`, or None (expired entries count as misses)."""
+        kind = query_type(params, kind)
+        if not self.enabled or self.ttl_for(params, kind=kind) <= 0:
+            with self._lock:
+                self._stats.bypassed += 1
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value, negative FROM serpapi_cache WHERE key = ? AND expires_at > ?",
+                    (self.make_key(params), time.time()),
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"[SerpAPICache] Read error: {e}")
+            row = None
+        with self._lock:
+            if row is None:
+                self._stats.misses += 1
+                self._stats.misses_by_type[kind] += 1
+                return None
+            self._stats.hits += 1
+            self._stats.hits_by_type[kind] += 1
+            if row[1]:
+                self._stats.negative_hits += 1
+        return json.loads(row[0])
+
+    def set(self, params: Mapping[str, Any], data: dict, *, kind: str | None = None) -> None:
+        if not self.enabled or not isinstance(data, dict):
+            return
+        negative = is_negative(data)
+        if data.get("error") and not negative:
+            return
+        ttl = self.ttl_for(params, negative=negative, kind=kind)
+        if ttl <= 0:
+            return
+        now = time.time()
+        with self._lock:
+            self._stats.stores += 1
+            if negative:
+                self._stats.negative_stores += 1
+            purge = self._stats.stores % 100 == 0
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO serpapi_cache "
+                    "(key, params, value, query_type, negative, created_at, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        self.make_key(params),
+                        json.dumps(normalize_params(params), ensure_ascii=False),
+                        json.dumps(data, ensure_ascii=False),
+                        query_type(params, kind),
+                        int(negative),
+                        now,
+                        now + ttl,
+                    ),
+                )
+                if purge:
+                    conn.execute("DELETE FROM serpapi_cache WHERE expires_at <= ?", (now,))
+        except sqlite3.Error as e:
+            print(f"[SerpAPICache] Write error: {e}")
+
+    def get_or_call(self, params: Mapping[str, Any], call: Callable[[], dict], *, kind: str | None = None) -> dict:
+        """Serve `params` from cache, otherwise run `call` and store its response."""
+        cached = self.get(params, kind=kind)
+        if cached is not None:
+            print(f"[SerpAPICache] Hit ({query_type(params, kind)}): {normalize_params(params).get('q', '')[:80]}")
+            return cached
+        data = call()
+        self.set(params, data, kind=kind)
+        return data
+
+    def clear(self) -> None:
+        if not self.enabled:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM serpapi_cache")
+        except sqlite3.Error as e:
+            print(f"[SerpAPICache] Clear error: {e}")
+
+    def stats(self) -> dict[str, Any]:
+        """Hit/miss counters for this worker plus entry counts on disk."""
+        with self._lock:
+            data = self._stats.to_dict()
+        data["enabled"] = self.enabled
+        if self.enabled:
+            try:
+                with self._connect() as conn:
+                    data["entries"], data["negative_entries"] = conn.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(negative), 0) FROM serpapi_cache WHERE expires_at > ?",
+                        (time.time(),),
+                    ).fetchone()
+            except sqlite3.Error as e:
+                print(f"[SerpAPICache] Stats error: {e}")
+        return data
+
+
+# 全局单例
+serpapi_cache = SerpAPICache(ttls={**DEFAULT_SERPAPI_TTLS, **_parse_ttl_overrides(SERPAPI_CACHE_TTLS)})
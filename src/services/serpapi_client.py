@@ -0,0 +1,178 @@
+"""Pooled SerpAPI client.
+
+Every SerpAPI request (LinkedIn profile lookups, LinkedIn people search, deep
+search) goes through `serpapi_client.search(params)`, which layers:
+
+    serpapi_cache -> retry_policy -> rate_limiter -> cassette -> pooled GET
+
+- One `requests.Session` per worker process with a keep-alive connection pool
+  (SERPAPI_POOL_SIZE connections), so repeated searches skip the TCP+TLS
+  handshake. Responses are requested gzip-compressed.
+- Connect and read timeouts are separate (SERPAPI_CONNECT_TIMEOUT /
+  SERPAPI_READ_TIMEOUT); a dead endpoint fails fast while slow searches still
+  get the full read budget.
+- Fork-aware like `llm_clients`: a session inherited from a parent process is
+  dropped, so gunicorn workers never share sockets.
+- Metrics: serpapi_requests_total{type,cache,outcome},
+  serpapi_request_duration_seconds{type,cache} and serpapi_errors_total{type,kind}
+  on `/metrics`.
+
+Errors are `requests` exceptions (all `OSError` subclasses; HTTP errors carry
+the status for `retry_policy`) or `json.JSONDecodeError` for a garbled body.
+A 200 response with an `{"error": ...}` body is returned as-is; callers that
+need results raise `SerpAPIError` for it (see `raise_for_error`).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Mapping
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import SERPAPI_CONNECT_TIMEOUT, SERPAPI_POOL_SIZE, SERPAPI_READ_TIMEOUT
+from src.services.cassette import cassette, redact_url
+from src.services.metrics import llm_metrics
+from src.services.rate_limiter import rate_limiter
+from src.services.retry_policy import error_kind, retry_policy
+from src.services.serpapi_cache import is_negative, query_type, serpapi_cache
+
+SERPAPI_ENDPOINT = "https://serpapi.com/search.json"
+
+
+class SerpAPIError(RuntimeError):
+    """SerpAPI answered with an error body (quota used up, invalid key, ...)."""
+
+
+def raise_for_error(data: dict) -> None:
+    """Raise `SerpAPIError` for an error body other than "no results"."""
+    if isinstance(data, dict) and data.get("error") and not is_negative(data):
+        raise SerpAPIError(str(data["error"]))
+
+
+def serpapi_key() -> str | None:
+    """Configured SerpAPI key (SERPAPI_KEY, or the legacy SERP_API_KEY)."""
+    return os.environ.get("SERPAPI_KEY") or os.environ.get("SERP_API_KEY")
+
+
+class SerpAPIClient:
+    """Keep-alive SerpAPI client shared by all threads of a worker - 线程安全"""
+
+    def __init__(
+        self,
+        *,
+        endpoint: str = SERPAPI_ENDPOINT,
+        pool_size: int = SERPAPI_POOL_SIZE,
+        connect_timeout: float = SERPAPI_CONNECT_TIMEOUT,
+        read_timeout: float = SERPAPI_READ_TIMEOUT,
+    ) -> None:
+        self.endpoint = endpoint
+        self.pool_size = max(1, int(pool_size))
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._lock = threading.Lock()
+        self._session: requests.Session | None = None
+        self._adapter: HTTPAdapter | None = None
+        self._pid = os.getpid()
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        # Retries are handled by retry_policy (with rate limiting between attempts)
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+        session.mount("https://", self._adapter)
+        session.mount("http://", self._adapter)
+        session.headers.update({"Accept": "application/json", "Accept-Encoding": "gzip, deflate"})
+        return session
+
+    @property
+    def session(self) -> requests.Session:
+        if self._pid != os.getpid():
+            # Inherited from a parent process (e.g. gunicorn preload): never reuse its sockets
+            self.reset()
+        with self._lock:
+            if self._session is None:
+                self._session = self._new_session()
+            return self._session
+
+    def reset(self) -> None:
+        """Drop the pooled session; the next request opens a fresh pool."""
+        with self._lock:
+            inherited = self._pid != os.getpid()
+            session, self._session, self._adapter = self._session, None, None
+            self._pid = os.getpid()
+        if session is not None and not inherited:
+            session.close()
+
+    def url_for(self, params: Mapping[str, Any]) -> str:
+        return f"{self.endpoint}?{urlencode(params)}"
+
+    def search(self, params: Mapping[str, Any], *, timeout: float | None = None, kind: str | None = None) -> dict:
+        """
+        Run one SerpAPI search and return the decoded JSON body.
+
+        `params` are the SerpAPI query parameters; `api_key` is filled in from the
+        environment when missing. `timeout` overrides the read timeout only.
+        Served from `serpapi_cache` when possible; `kind` overrides the query type
+        (cache TTL tier and metrics label) derived from `params`.
+        """
+        params = dict(params)
+        if not params.get("api_key"):
+            params["api_key"] = serpapi_key() or ""
+        url = self.url_for(params)
+        read_timeout = self.read_timeout if timeout is None else timeout
+
+        def _send() -> dict:
+            response = self.session.get(url, timeout=(self.connect_timeout, read_timeout))
+            response.raise_for_status()
+            return response.json()
+
+        def _attempt() -> dict:
+            rate_limiter.acquire("serpapi")
+            return cassette.call("serpapi", {"url": redact_url(url)}, _send)
+
+        fetched = False
+
+        def _call() -> dict:
+            nonlocal fetched
+            fetched = True
+            return retry_policy.call("serpapi", _attempt)
+
+        start = time.perf_counter()
+        outcome, kind = "ok", ""
+        try:
+            return serpapi_cache.get_or_call(params, _call, kind=kind)
+        except BaseException as e:
+            outcome, kind = "error", error_kind(e)
+            raise
+        finally:
+            labels = {"type": query_type(params, kind), "cache": "miss" if fetched else "hit"}
+            llm_metrics.inc("serpapi_requests_total", {**labels, "outcome": outcome})
+            llm_metrics.observe("serpapi_request_duration_seconds", labels, time.perf_counter() - start)
+            if kind:
+                llm_metrics.inc("serpapi_errors_total", {"type": labels["type"], "kind": kind})
+
+    def stats(self) -> dict[str, Any]:
+        """Connection pool usage for this worker (requests vs. connections opened)."""
+        data: dict[str, Any] = {
+            "pool_size": self.pool_size,
+            "connect_timeout": self.connect_timeout,
+            "read_timeout": self.read_timeout,
+            "connections_opened": 0,
+            "requests_sent": 0,
+        }
+        adapter = self._adapter
+        if adapter is not None:
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is not None:
+                    data["connections_opened"] += pool.num_connections
+                    data["requests_sent"] += pool.num_requests
+        return data
+
+
+# 全局单例（每个 worker 进程一份）
+serpapi_client = SerpAPIClient()
@@ -0,0 +1,178 @@
+"""Single-flight request coalescing.
+
+Concurrent callers asking for the same thing (same cohort hitting
+/api/find-recommendations, a double-clicked "Generate") share one in-flight
+call instead of each paying for it. Only *in-flight* work is shared; once the
+call finishes the key is forgotten (persistent reuse is the job of
+src.services.llm_cache).
+
+Two entry points on the same group:
+- `do(key, call)`: blocking callables, coalesced across threads (SerpAPI helpers).
+- `ado(key, call)`: coroutine factories, coalesced on the running event loop
+  (LLM helpers on the async runtime).
+
+Timeouts are per key: the caller that starts a key sets how long the shared
+call may take, and every joiner additionally bounds its own wait.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import threading
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+from config import LLM_SINGLE_FLIGHT_TIMEOUT, SERPAPI_SINGLE_FLIGHT_TIMEOUT
+
+T = TypeVar("T")
+
+
+def make_flight_key(*parts: Any) -> str:
+    """Stable digest of arbitrary JSON-able key parts (prompts are hashed, not kept)."""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class FlightStats:
+    leaders: int = 0
+    coalesced: int = 0
+    timeouts: int = 0
+    errors: int = 0
+
+
+class SingleFlight:
+    """Coalesce identical concurrent calls - 线程安全"""
+
+    def __init__(self, name: str, *, timeout: float | None = None) -> None:
+        self.name = name
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._inflight: dict[Hashable, concurrent.futures.Future] = {}
+        self._inflight_async: dict[tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Task] = {}
+        self._waiters: dict[asyncio.Task, int] = {}
+        self._stats = FlightStats()
+
+    def _effective_timeout(self, timeout: float | None) -> float | None:
+        timeout = self._timeout if timeout is None else timeout
+        return timeout if timeout and timeout > 0 else None
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            setattr(self._stats, field, getattr(self._stats, field) + 1)
+
+    def do(self, key: Hashable, call: Callable[[], T], *, timeout: float | None = None) -> T:
+        """Run `call` once per in-flight `key`; concurrent callers wait for and share its result.
+
+        Joiners that wait longer than `timeout` get TimeoutError (the leader's own
+        call is bounded by its transport timeout, since a thread cannot be interrupted).
+        """
+        timeout = self._effective_timeout(timeout)
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = concurrent.futures.Future()
+                self._inflight[key] = future
+                self._stats.leaders += 1
+            else:
+                self._stats.coalesced += 1
+
+        if leader:
+            try:
+                future.set_result(call())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            self._count("timeouts")
+            raise TimeoutError(f"[SingleFlight:{self.name}] timed out after {timeout}s") from None
+        except Exception:
+            if leader:
+                self._count("errors")
+            raise
+
+    async def ado(
+        self,
+        key: Hashable,
+        call: Callable[[], Awaitable[T]],
+        *,
+        timeout: float | None = None,
+    ) -> T:
+        """Async variant of `do`: the shared call runs as one task on the current loop.
+
+        The first caller's `timeout` bounds the shared task itself (it is cancelled
+        on expiry); later joiners also stop waiting after their own `timeout`.
+        Cancelling one waiter never cancels the shared task for the others, but once
+        the last waiter is cancelled (e.g. a losing hedge) the shared task is too.
+        """
+        timeout = self._effective_timeout(timeout)
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        with self._lock:
+            task = self._inflight_async.get(flight_key)
+            leader = task is None
+            if leader:
+                coro = call()
+                task = loop.create_task(asyncio.wait_for(coro, timeout) if timeout else coro)
+                self._inflight_async[flight_key] = task
+                self._stats.leaders += 1
+            else:
+                self._stats.coalesced += 1
+            self._waiters[task] = self._waiters.get(task, 0) + 1
+
+        if leader:
+            def _forget(_: asyncio.Task) -> None:
+                with self._lock:
+                    if self._inflight_async.get(flight_key) is task:
+                        del self._inflight_async[flight_key]
+
+            task.add_done_callback(_forget)
+
+        try:
+            if leader or not timeout:
+                return await asyncio.shield(task)
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            self._count("timeouts")
+            raise TimeoutError(f"[SingleFlight:{self.name}] timed out after {timeout}s") from None
+        except asyncio.CancelledError:
+            with self._lock:
+                abandoned = self._waiters.get(task) == 1 and not task.done()
+            if abandoned:
+                task.cancel()
+            raise
+        except Exception:
+            if leader:
+                self._count("errors")
+            raise
+        finally:
+            with self._lock:
+                remaining = self._waiters.get(task, 1) - 1
+                if remaining > 0:
+                    self._waiters[task] = remaining
+                else:
+                    self._waiters.pop(task, None)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            data = asdict(self._stats)
+            data["in_flight"] = len(self._inflight) + len(self._inflight_async)
+        return data
+
+
+# 全局单例（每个 worker 进程一份）
+llm_flight = SingleFlight("llm", timeout=LLM_SINGLE_FLIGHT_TIMEOUT)
+serpapi_flight = SingleFlight("serpapi", timeout=SERPAPI_SINGLE_FLIGHT_TIMEOUT)
+
+
+def single_flight_stats() -> dict[str, dict[str, int]]:
+    return {flight.name: flight.stats() for flight in (llm_flight, serpapi_flight)}
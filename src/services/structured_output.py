@@ -0,0 +1,505 @@
+"""Schema validation with local repair for structured (JSON) LLM output.
+
+A malformed-but-recoverable answer used to mean a hard-coded fallback or a
+whole extra LLM call. `structured_output.parse(content, SCHEMA)` instead:
+
+1. parses the text, repairing it locally if needed: JSON embedded in prose or
+   fences, trailing commas, and truncated output (cut back to the last
+   complete array element, then the open brackets are closed);
+2. validates it against a declared schema, fixing what it safely can: key
+   casing (`matchScore`, `Match Score` -> `match_score`), string <-> list,
+   numeric strings, a lone object where a list is expected, and a top-level
+   array wrapped in an object (or the reverse).
+
+Unknown keys are kept. Items of an object list that lack a required field are
+dropped. `SchemaError` (a ValueError) is raised only when nothing usable is
+left. Outcomes (ok / repaired / failed) and repair kinds go to `llm_metrics`.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from src.services.json_extract import extract_json
+from src.services.metrics import llm_metrics
+
+# Field kinds
+STR = "str"
+INT = "int"
+BOOL = "bool"
+STR_LIST = "str_list"
+OBJECT = "object"
+OBJECT_LIST = "object_list"
+
+_TRUE = {"true", "yes", "y", "1"}
+_FALSE = {"false", "no", "n", "0", ""}
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+class SchemaError(ValueError):
+    """Structured output could not be parsed or repaired into the schema."""
+
+
+@dataclass(frozen=True)
+class Field:
+    kind: str
+    required: bool = False
+    # Filled in when the key is missing or cannot be coerced (None = leave absent)
+    default: Any = None
+    schema: "Schema | None" = None
+
+
+@dataclass(frozen=True)
+class Schema:
+    name: str
+    fields: dict[str, Field]
+    # Top-level JSON array of `fields` objects instead of one object
+    array: bool = False
+    min_items: int = 0
+
+
+def _canonical(key: str) -> str:
+    return re.sub(r"[^0-9a-z]", "", str(key).lower())
+
+
+# ----------------------------------------------------------------------
+# Text repair
+# ----------------------------------------------------------------------
+
+def _strip_trailing_commas(text: str) -> str:
+    out: list[str] = []
+    in_string = escape = False
+    n = len(text)
+    for i, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == ",":
+            j = i + 1
+            while j < n and text[j] in " \t\r\n":
+                j += 1
+            if j < n and text[j] in "}]":
+                continue
+        out.append(char)
+    return "".join(out)
+
+
+def _json_region(text: str) -> str:
+    """From the first bracket up to a closing code fence, for JSON that does not parse yet."""
+    start = min((i for i in (text.find("{"), text.find("[")) if i != -1), default=-1)
+    if start == -1:
+        return text
+    region = text[start:]
+    fence = region.find("```")
+    return region[:fence].rstrip() if fence != -1 else region.rstrip()
+
+
+def _close_truncated(text: str) -> str | None:
+    """
+    Cut unterminated JSON back to its last complete array element (or object
+    member, outside arrays) and close the open brackets; None if the JSON is
+    not truncated or nothing is left.
+    """
+    start = min((i for i in (text.find("{"), text.find("[")) if i != -1), default=-1)
+    if start == -1:
+        return None
+    stack: list[str] = []
+    in_string = escape = False
+    cut: tuple[int, tuple[str, ...]] | None = None
+
+    def _mark(pos: int) -> None:
+        nonlocal cut
+        # Never keep a half-finished object that is an element of an array
+        if "[" in stack and "{" in stack[stack.index("[") + 1:]:
+            return
+        cut = (pos, tuple(stack))
+
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append(char)
+        elif char in "}]":
+            if not stack:
+                break
+            stack.pop()
+            if not stack:
+                # Complete, so not a truncation problem
+                return None
+            _mark(i + 1)
+        elif char == "," and stack:
+            _mark(i)
+    if cut is None:
+        return None
+    pos, open_brackets = cut
+    closers = "".join("}" if b == "{" else "]" for b in reversed(open_brackets))
+    return text[start:pos] + closers
+
+
+def repair_json(text: str) -> tuple[Any, list[str]]:
+    """Parse `text`, repairing it if needed; returns (data, repairs applied)."""
+    try:
+        return json.loads(text), []
+    except (json.JSONDecodeError, TypeError):
+        if not isinstance(text, str):
+            raise SchemaError(f"Expected text, got {type(text).__name__}") from None
+
+    repairs: list[str] = []
+    candidate = extract_json(text)
+    if candidate == text:
+        candidate = _json_region(text)
+    if candidate != text:
+        repairs.append("extracted")
+        try:
+            return json.loads(candidate), repairs
+        except json.JSONDecodeError:
+            pass
+
+    without_commas = _strip_trailing_commas(candidate)
+    if without_commas != candidate:
+        repairs.append("trailing_commas")
+        try:
+            return json.loads(without_commas), repairs
+        except json.JSONDecodeError:
+            pass
+
+    closed = _close_truncated(without_commas)
+    if closed is not None:
+        try:
+            data = json.loads(closed)
+        except json.JSONDecodeError:
+            pass
+        else:
+            return data, [*repairs, "truncated"]
+    raise SchemaError(f"Unparseable JSON: {text[:120]!r}")
+
+
+# ----------------------------------------------------------------------
+# Validation / coercion
+# ----------------------------------------------------------------------
+
+class _NotCoercible(Exception):
+    """Value cannot be coerced to the field kind."""
+
+
+def _coerce(value: Any, spec: Field, repairs: list[str]) -> Any:
+    kind = spec.kind
+    if kind == STR:
+        if isinstance(value, str):
+            return value
+        if isinstance(value, list):
+            repairs.append("list_to_str")
+            return "; ".join(str(v).strip() for v in value if isinstance(v, (str, int, float)) and str(v).strip())
+        if isinstance(value, (int, float, bool)):
+            repairs.append("coerced")
+            return str(value)
+        raise _NotCoercible
+    if kind == INT:
+        if isinstance(value, bool):
+            raise _NotCoercible
+        if isinstance(value, int):
+            return value
+        if isinstance(value, float):
+            return int(round(value))
+        if isinstance(value, str):
+            match = _NUMBER.search(value)
+            if match:
+                repairs.append("coerced")
+                return int(round(float(match.group())))
+        raise _NotCoercible
+    if kind == BOOL:
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().lower()
+        if text in _TRUE or text in _FALSE:
+            repairs.append("coerced")
+            return text in _TRUE
+        raise _NotCoercible
+    if kind == STR_LIST:
+        if isinstance(value, str):
+            repairs.append("str_to_list")
+            return [value.strip()] if value.strip() else []
+        if isinstance(value, list):
+            items = [v if isinstance(v, str) else str(v) for v in value if isinstance(v, (str, int, float))]
+            if len(items) != len(value):
+                repairs.append("coerced")
+            return items
+        raise _NotCoercible
+    if kind == OBJECT:
+        if isinstance(value, dict):
+            return _validate_object(value, spec.schema, repairs) if spec.schema else value
+        raise _NotCoercible
+    if kind == OBJECT_LIST:
+        if isinstance(value, dict):
+            repairs.append("object_to_list")
+            value = [value]
+        if not isinstance(value, list):
+            raise _NotCoercible
+        return _validate_items(value, spec.schema, repairs)
+    return value
+
+
+def _validate_items(items: list, schema: Schema | None, repairs: list[str]) -> list:
+    if schema is None:
+        return items
+    valid = []
+    for item in items:
+        if not isinstance(item, dict):
+            repairs.append("dropped_item")
+            continue
+        try:
+            valid.append(_validate_object(item, schema, repairs))
+        except SchemaError:
+            repairs.append("dropped_item")
+    return valid
+
+
+def _validate_object(data: dict, schema: Schema, repairs: list[str]) -> dict:
+    by_canonical = {_canonical(name): name for name in schema.fields}
+    result: dict[str, Any] = {}
+    for key, value in data.items():
+        name = key if key in schema.fields else by_canonical.get(_canonical(key))
+        if name is None:
+            result[key] = value
+            continue
+        if name != key:
+            repairs.append("key_case")
+            if name in data:
+                # The correctly spelled key wins
+                continue
+        result[name] = value
+
+    for name, spec in schema.fields.items():
+        value = result.get(name)
+        if value is None:
+            if spec.required:
+                raise SchemaError(f"{schema.name}: missing required '{name}'")
+            if spec.default is not None:
+                result[name] = _copy_default(spec.default)
+            continue
+        try:
+            result[name] = _coerce(value, spec, repairs)
+        except _NotCoercible:
+            if spec.required:
+                raise SchemaError(f"{schema.name}: '{name}' is not a valid {spec.kind}") from None
+            repairs.append("invalid_field")
+            if spec.default is not None:
+                result[name] = _copy_default(spec.default)
+            else:
+                result.pop(name, None)
+    return result
+
+
+def _copy_default(value: Any) -> Any:
+    return list(value) if isinstance(value, list) else dict(value) if isinstance(value, dict) else value
+
+
+def validate(data: Any, schema: Schema, repairs: list[str] | None = None) -> Any:
+    """Validate / coerce parsed JSON against `schema` (appends applied repairs to `repairs`)."""
+    repairs = [] if repairs is None else repairs
+    if schema.array:
+        if isinstance(data, dict):
+            lists = [v for v in data.values() if isinstance(v, list)]
+            if len(lists) != 1:
+                raise SchemaError(f"{schema.name}: expected a JSON array")
+            repairs.append("unwrapped")
+            data = lists[0]
+        if not isinstance(data, list):
+            raise SchemaError(f"{schema.name}: expected a JSON array")
+        items = _validate_items(data, schema, repairs)
+        if len(items) < schema.min_items:
+            raise SchemaError(f"{schema.name}: {len(items)} valid items, need {schema.min_items}")
+        return items
+
+    if isinstance(data, list):
+        list_fields = [name for name, spec in schema.fields.items() if spec.kind == OBJECT_LIST]
+        if len(data) == 1 and isinstance(data[0], dict) and len(list_fields) != 1:
+            repairs.append("unwrapped")
+            data = data[0]
+        elif len(list_fields) == 1:
+            repairs.append("wrapped")
+            data = {list_fields[0]: data}
+    if not isinstance(data, dict):
+        raise SchemaError(f"{schema.name}: expected a JSON object")
+    return _validate_object(data, schema, repairs)
+
+
+# ----------------------------------------------------------------------
+# Declared schemas
+# ----------------------------------------------------------------------
+
+QUESTIONNAIRE = Schema(
+    "questionnaire",
+    {
+        "question": Field(STR, required=True),
+        "options": Field(STR_LIST, required=True),
+    },
+    array=True,
+    min_items=1,
+)
+
+PROFILE = Schema(
+    "profile",
+    {
+        "name": Field(STR),
+        "summary": Field(STR),
+        "education": Field(STR_LIST, default=[]),
+        "experiences": Field(STR_LIST, default=[]),
+        "skills": Field(STR_LIST, default=[]),
+        "projects": Field(STR_LIST, default=[]),
+    },
+)
+
+SCORED_CANDIDATE = Schema(
+    "scored_candidate",
+    {
+        "id": Field(STR),
+        "name": Field(STR),
+        "linkedin_url": Field(STR),
+        "match_score": Field(INT),
+        "match_reason": Field(STR),
+        "common_interests": Field(STR),
+        "outreach_angle": Field(STR),
+        "response_likelihood": Field(STR),
+    },
+)
+
+SCORED_CANDIDATES = Schema(
+    "scored_candidates",
+    {"scored_candidates": Field(OBJECT_LIST, default=[], schema=SCORED_CANDIDATE)},
+)
+
+RECOMMENDATION = Schema(
+    "recommendation",
+    {
+        "name": Field(STR, required=True),
+        "position": Field(STR),
+        "field": Field(STR),
+        "linkedin_url": Field(STR),
+        "match_score": Field(INT),
+        "match_reason": Field(STR),
+        "common_interests": Field(STR),
+        "evidence": Field(STR_LIST),
+        "sources": Field(STR_LIST),
+        "uncertainty": Field(STR),
+    },
+)
+
+RECOMMENDATIONS = Schema(
+    "recommendations",
+    {"recommendations": Field(OBJECT_LIST, default=[], schema=RECOMMENDATION)},
+)
+
+DEEP_SEARCH = Schema(
+    "deep_search",
+    {
+        "person_confirmed": Field(BOOL, default=False),
+        "recent_projects": Field(STR_LIST, default=[]),
+        "key_experiences": Field(STR_LIST, default=[]),
+        "recent_news": Field(STR_LIST, default=[]),
+        "verified_facts": Field(STR_LIST, default=[]),
+    },
+)
+
+
+@dataclass
+class _SchemaStats:
+    ok: int = 0
+    repaired: int = 0
+    failed: int = 0
+    repairs: Counter = field(default_factory=Counter)
+
+
+# 各调用函数（llm_cache 的 caller）的回复 schema
+CALLER_SCHEMAS: dict[str, Schema] = {
+    "extract_profile_from_text": PROFILE,
+    "parse_text_to_profile": PROFILE,
+    "build_profile_from_answers": PROFILE,
+    "generate_questionnaire": QUESTIONNAIRE,
+    "_ai_score_and_analyze_candidates": SCORED_CANDIDATES,
+    "_extract_verified_info_from_search": DEEP_SEARCH,
+    "find_target_recommendations": RECOMMENDATIONS,
+}
+
+
+def cache_validator(caller: str | None, json_mode: bool) -> Callable[[str], bool] | None:
+    """
+    `validate` for llm_cache: a JSON reply is cached only if it parses (after local
+    repair) and fits the caller's schema, when it has one. Text replies are not checked.
+    """
+    if not json_mode:
+        return None
+    schema = CALLER_SCHEMAS.get(caller or "")
+
+    def _valid(content: str) -> bool:
+        try:
+            data, _ = repair_json(content)
+            if schema is not None:
+                validate(data, schema)
+        except SchemaError:
+            return False
+        return True
+
+    return _valid
+
+
+class StructuredOutput:
+    """Parse + repair + validate entry point with per-schema counters - 线程安全"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stats: dict[str, _SchemaStats] = {}
+
+    def _record(self, schema: str, outcome: str, repairs: list[str]) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(schema, _SchemaStats())
+            setattr(stats, outcome, getattr(stats, outcome) + 1)
+            stats.repairs.update(repairs)
+        llm_metrics.inc("llm_structured_output_total", {"schema": schema, "outcome": outcome})
+        for repair in sorted(set(repairs)):
+            llm_metrics.inc("llm_structured_repairs_total", {"schema": schema, "repair": repair})
+
+    def parse(self, content: str, schema: Schema) -> Any:
+        """Parsed, repaired and validated `content`; raises SchemaError if unrecoverable."""
+        try:
+            data, repairs = repair_json(content)
+            data = validate(data, schema, repairs)
+        except SchemaError as e:
+            print(f"[Schema] {schema.name}: {e}")
+            self._record(schema.name, "failed", [])
+            raise
+        if repairs:
+            print(f"[Schema] {schema.name}: repaired ({', '.join(sorted(set(repairs)))})")
+        self._record(schema.name, "repaired" if repairs else "ok", repairs)
+        return data
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            return {
+                name: {"ok": s.ok, "repaired": s.repaired, "failed": s.failed, "repairs": dict(s.repairs.most_common())}
+                for name, s in sorted(self._stats.items())
+            }
+
+
+# 全局单例（每个 worker 进程一份）
+structured_output = StructuredOutput()
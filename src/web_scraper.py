@@ -8,12 +8,19 @@ import re
 from dataclasses import dataclass
 from urllib.parse import quote_plus
 
-import google.generativeai as genai
 import requests
 from bs4 import BeautifulSoup
 from openai import OpenAI
 
 from config import DEFAULT_MODEL, USE_OPENAI_AS_PRIMARY, OPENAI_DEFAULT_MODEL
+from src.services.cassette import cassette
+from src.services.llm_cache import llm_cache
+from src.services.llm_clients import llm_clients
+from src.services.metrics import llm_metrics, record_usage
+from src.services.model_router import model_router, provider_for_model
+from src.services.rate_limiter import rate_limiter
+from src.services.retry_policy import retry_policy
+from src.services.structured_output import cache_validator
 
 
 @dataclass
@@ -52,7 +59,7 @@ class WebScraper:
 
     def __init__(self, timeout: int = 15):
         self.timeout = timeout
-        self.session = requests.Session()
+        self.session = cassette.mount(requests.Session())
         self.session.headers.update(self.HEADERS)
 
     def search_person(self, name: str, field: str, max_results: int = 5) -> list[WebSearchResult]:
@@ -197,40 +204,108 @@ class WebScraper:
         return combined_text, sources
 
 
-def _configure_gemini() -> None:
-    """Configure Gemini API with the API key from environment."""
+def _gemini_api_key() -> str:
+    """Return the Gemini API key from environment."""
     api_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
     if not api_key:
         raise ValueError(
             "Gemini API key not found. Please set GEMINI_API_KEY or GOOGLE_API_KEY environment variable."
         )
-    genai.configure(api_key=api_key)
+    return api_key
 
 
 def _get_openai_client() -> OpenAI:
-    """Get or create OpenAI client."""
+    """Get the shared OpenAI client for this worker process."""
     api_key = os.environ.get("OPENAI_API_KEY")
     if not api_key:
         raise ValueError("OPENAI_API_KEY environment variable is required")
-    return OpenAI(api_key=api_key)
+    return llm_clients.openai(api_key)
 
 
-def _call_openai_json(prompt: str, *, model: str = OPENAI_DEFAULT_MODEL) -> str:
+def _call_gemini_json(prompt: str, *, model: str = DEFAULT_MODEL, caller: str | None = None) -> str:
+    """Call Gemini in JSON mode and return the response text."""
+    def _send() -> str:
+        gemini_model = llm_clients.gemini_model(_gemini_api_key(), model, json_mode=True)
+        response = gemini_model.generate_content(prompt)
+        record_usage(getattr(response, "usage_metadata", None))
+        return response.text
+
+    def _request() -> str:
+        rate_limiter.acquire("gemini", model=model, tokens=rate_limiter.estimate_cost(prompt))
+        with model_router.measure(caller, model):
+            return cassette.call(
+                "llm",
+                {"provider": "gemini", "model": model, "temperature": None, "json_mode": True, "prompt": prompt},
+                _send,
+            )
+
+    task = model_router.task_for(caller) or caller or "other"
+    with llm_metrics.track(task, "gemini", model, cache="hit") as metrics_call:
+        def _timed_call() -> str:
+            metrics_call.cache = "miss"
+            return retry_policy.call("gemini", _request)
+
+        return llm_cache.get_or_call(
+            caller,
+            provider="gemini",
+            model=model,
+            temperature=None,
+            json_mode=True,
+            prompt=prompt,
+            call=_timed_call,
+            validate=cache_validator(caller, json_mode=True),
+        )
+
+
+def _call_openai_json(
+    prompt: str,
+    *,
+    model: str = OPENAI_DEFAULT_MODEL,
+    caller: str | None = None,
+) -> str:
     """Call OpenAI chat completion and return the response text."""
-    client = _get_openai_client()
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": "You are a concise assistant that returns strict JSON only."},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.4,
-        response_format={"type": "json_object"},
-    )
-    content = response.choices[0].message.content
-    if not content:
-        raise RuntimeError("OpenAI response did not contain any content")
-    return content
+    def _send() -> str:
+        client = _get_openai_client()
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are a concise assistant that returns strict JSON only."},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.4,
+            response_format={"type": "json_object"},
+        )
+        record_usage(getattr(response, "usage", None))
+        content = response.choices[0].message.content
+        if not content:
+            raise RuntimeError("OpenAI response did not contain any content")
+        return content
+
+    def _request() -> str:
+        rate_limiter.acquire("openai", model=model, tokens=rate_limiter.estimate_cost(prompt))
+        with model_router.measure(caller, model):
+            return cassette.call(
+                "llm",
+                {"provider": "openai", "model": model, "temperature": 0.4, "json_mode": True, "prompt": prompt},
+                _send,
+            )
+
+    task = model_router.task_for(caller) or caller or "other"
+    with llm_metrics.track(task, "openai", model, cache="hit") as metrics_call:
+        def _timed_call() -> str:
+            metrics_call.cache = "miss"
+            return retry_policy.call("openai", _request)
+
+        return llm_cache.get_or_call(
+            caller,
+            provider="openai",
+            model=model,
+            temperature=0.4,
+            json_mode=True,
+            prompt=prompt,
+            call=_timed_call,
+            validate=cache_validator(caller, json_mode=True),
+        )
 
 
 def extract_person_profile_from_web(
@@ -276,18 +351,16 @@ Important:
 Return JSON only."""
 
     try:
-        # Use OpenAI or Gemini based on configuration
-        if USE_OPENAI_AS_PRIMARY:
-            content = _call_openai_json(prompt)
+        # Model comes from the task router (provider follows the model name)
+        routed_model = model_router.model_for(
+            "extract_person_profile_from_web",
+            default=OPENAI_DEFAULT_MODEL if USE_OPENAI_AS_PRIMARY else model,
+        )
+        if provider_for_model(routed_model) == "openai":
+            content = _call_openai_json(prompt, model=routed_model, caller="extract_person_profile_from_web")
             source_name = "OpenAI Knowledge Base"
         else:
-            _configure_gemini()
-            gemini_model = genai.GenerativeModel(
-                model,
-                generation_config={"response_mime_type": "application/json"}
-            )
-            response = gemini_model.generate_content(prompt)
-            content = response.text
+            content = _call_gemini_json(prompt, model=routed_model, caller="extract_person_profile_from_web")
             source_name = "Gemini AI Knowledge Base"
         
         if not content:
@@ -370,13 +443,7 @@ def _extract_from_scraped_text(
     if USE_OPENAI_AS_PRIMARY:
         content = _call_openai_json(prompt)
     else:
-        _configure_gemini()
-        gemini_model = genai.GenerativeModel(
-            model,
-            generation_config={"response_mime_type": "application/json"}
-        )
-        response = gemini_model.generate_content(prompt)
-        content = response.text
+        content = _call_gemini_json(prompt, model=model)
     
     if not content:
         raise RuntimeError("LLM response did not contain any content")
@@ -1,11 +1,67 @@
 """测试配置和共享 Fixtures。"""
 
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+# 测试绝不能写工作区的 data/：llm_cache / rate_limiter / metrics 等模块级单例
+# 在 import 时就按 config 打开 SQLite，所以必须在导入 config / src 之前改 DATA_DIR
+_DATA_PATH_FILES = {
+    "DB_PATH": "app.db",
+    "LLM_CACHE_DB_PATH": "llm_cache.db",
+    "RATE_LIMIT_DB_PATH": "rate_limits.db",
+    "METRICS_DB_PATH": "metrics.db",
+    "SERPAPI_CACHE_DB_PATH": "serpapi_cache.db",
+    "PEOPLE_INDEX_DB_PATH": "people_index.db",
+    "RECOMMENDATION_CURSOR_DB_PATH": "recommendation_cursors.db",
+    "CASSETTE_DIR": "cassettes",
+    "USERS_DIR": "users",
+    "DATA_DIR_PROMPTS": "prompt_logs",
+}
+_SESSION_DATA_DIR = Path(tempfile.mkdtemp(prefix="test-data-"))
+
+
+def _remove_session_data_dir() -> None:
+    # 先停掉 llm_metrics 的后台 flush 线程，否则它会在删掉的目录里重建空库
+    metrics = sys.modules.get("src.services.metrics")
+    if metrics is not None:
+        metrics.llm_metrics.close()
+    shutil.rmtree(_SESSION_DATA_DIR, ignore_errors=True)
+
+
+atexit.register(_remove_session_data_dir)
+os.environ["DATA_DIR"] = str(_SESSION_DATA_DIR)
+for _name in _DATA_PATH_FILES:
+    os.environ.pop(_name, None)
+
 import pytest
 from unittest.mock import MagicMock
 
 from src.models import SenderProfile, ReceiverProfile, Recommendation
 
 
+# ============================================================================
+# Data Directory
+# ============================================================================
+
+@pytest.fixture(autouse=True)
+def isolated_data_dir(tmp_path, monkeypatch):
+    """把 DATA_DIR 和各 *_DB_PATH 指到 tmp_path（config 以及 from config import 过它们的模块）。"""
+    paths = {"DATA_DIR": tmp_path, **{name: tmp_path / file for name, file in _DATA_PATH_FILES.items()}}
+    for name, path in paths.items():
+        monkeypatch.setenv(name, str(path))
+    for module_name, module in list(sys.modules.items()):
+        if module_name not in ("config", "app") and not module_name.startswith("src."):
+            continue
+        for name, path in paths.items():
+            if hasattr(module, name):
+                monkeypatch.setattr(module, name, path)
+    return tmp_path
+
+
 # ============================================================================
 # Mock Services
 # ============================================================================
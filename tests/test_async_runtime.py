@@ -0,0 +1,134 @@
+"""AsyncRuntime 单元测试。"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import pytest
+
+from src.services.async_runtime import AsyncRuntime
+
+
+def test_run_returns_coroutine_result():
+    runtime = AsyncRuntime()
+
+    async def add(a: int, b: int) -> int:
+        await asyncio.sleep(0)
+        return a + b
+
+    assert runtime.run(add(1, 2)) == 3
+    # The loop is reused between calls
+    loop = runtime.loop
+    assert runtime.run(add(2, 3)) == 5
+    assert runtime.loop is loop
+
+
+def test_run_from_runtime_thread_raises():
+    runtime = AsyncRuntime()
+
+    async def nested() -> None:
+        async def inner() -> int:
+            return 1
+
+        runtime.run(inner())
+
+    with pytest.raises(RuntimeError):
+        runtime.run(nested())
+
+
+def test_provider_semaphore_bounds_concurrency():
+    runtime = AsyncRuntime(concurrency={"openai": 2})
+    in_flight = 0
+    peak = 0
+
+    async def call() -> None:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+    async def main() -> None:
+        await asyncio.gather(*(runtime.limited("openai", call) for _ in range(6)))
+
+    runtime.run(main())
+    assert peak == 2
+
+
+def test_to_thread_runs_blocking_function():
+    runtime = AsyncRuntime()
+
+    async def main() -> list[int]:
+        return await asyncio.gather(*(runtime.to_thread("serpapi", pow, i, 2) for i in range(4)))
+
+    assert runtime.run(main()) == [0, 1, 4, 9]
+
+
+def test_cancelled_to_thread_keeps_its_slot_until_the_thread_finishes():
+    runtime = AsyncRuntime({"serpapi": 1})
+    release = threading.Event()
+    started: list[str] = []
+
+    def blocking(name: str) -> str:
+        started.append(name)
+        if name == "abandoned":
+            release.wait(5)
+        return name
+
+    async def main() -> str:
+        abandoned = asyncio.ensure_future(runtime.to_thread("serpapi", blocking, "abandoned"))
+        await asyncio.sleep(0.05)
+        abandoned.cancel()
+        later = asyncio.ensure_future(runtime.to_thread("serpapi", blocking, "later"))
+        await asyncio.sleep(0.1)
+        # The abandoned thread is still running, so the later call must wait for the slot
+        assert started == ["abandoned"]
+        release.set()
+        return await later
+
+    assert runtime.run(main()) == "later"
+    assert started == ["abandoned", "later"]
+
+
+def test_iterate_yields_async_generator_items():
+    runtime = AsyncRuntime()
+
+    async def chunks():
+        for text in ("Hel", "lo"):
+            await asyncio.sleep(0)
+            yield text
+
+    assert list(runtime.iterate(chunks())) == ["Hel", "lo"]
+
+
+def test_iterate_propagates_producer_errors():
+    runtime = AsyncRuntime()
+
+    async def failing():
+        yield "partial"
+        raise ValueError("boom")
+
+    received = []
+    with pytest.raises(ValueError):
+        for item in runtime.iterate(failing()):
+            received.append(item)
+    assert received == ["partial"]
+
+
+def test_closing_iterator_early_stops_producer():
+    runtime = AsyncRuntime()
+    closed = threading.Event()
+
+    async def endless():
+        try:
+            while True:
+                await asyncio.sleep(0.001)
+                yield 1
+        finally:
+            closed.set()
+
+    it = runtime.iterate(endless())
+    assert next(it) == 1
+    it.close()
+    assert closed.wait(1)
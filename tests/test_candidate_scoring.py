@@ -0,0 +1,88 @@
+"""候选人分批并发评分测试：共享前缀、按 id 合并、单批超时回退默认分数。"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import time
+
+import pytest
+
+from src import email_agent
+
+
+def _candidates(n: int) -> list[dict]:
+    return [
+        {"name": f"Person {i}", "position": "VP", "linkedin_url": f"https://www.linkedin.com/in/p{i}", "match_score": 75}
+        for i in range(n)
+    ]
+
+
+@pytest.fixture
+def scoring(monkeypatch):
+    monkeypatch.setattr(email_agent, "PRERANK_TOP_K", 0)
+    monkeypatch.setattr(email_agent, "SCORING_BATCH_SIZE", 5)
+    monkeypatch.setattr(email_agent, "SCORING_BATCH_TIMEOUT", 0.5)
+    prompts: list[str] = []
+
+    async def fake_llm(prompt, **kwargs):
+        prompts.append(prompt)
+        rows = re.findall(r"\[id: (c\d+)\] Person (\d+)", prompt)
+        if any(number == "7" for _, number in rows):
+            await asyncio.sleep(2)  # this batch misses its deadline
+        await asyncio.sleep(0.1)
+        items = [
+            {"id": cid, "name": f"Person {number}", "match_score": 60 + int(number), "match_reason": f"r{number}"}
+            for cid, number in rows
+            if number != "3"  # the model drops one entry
+        ]
+        return json.dumps({"scored_candidates": items[::-1]})  # ...and reorders the rest
+
+    monkeypatch.setattr(email_agent, "_acall_llm", fake_llm)
+    return prompts
+
+
+def _score(candidates):
+    async def main():
+        start = time.perf_counter()
+        result = await email_agent._aai_score_and_analyze_candidates(candidates, purpose="chat", field="Finance")
+        return result, time.perf_counter() - start
+
+    return asyncio.run(main())
+
+
+def test_batches_run_concurrently_with_shared_prefix(scoring):
+    result, elapsed = _score(_candidates(12))
+    assert len(scoring) == 3
+    assert elapsed < 1.0  # ~ one batch (plus the timed-out one's deadline), not three in a row
+    prefixes = {p.split("CANDIDATES:")[0] for p in scoring}
+    assert len(prefixes) == 1
+
+
+def test_merge_by_id_ignores_order_and_defaults_missing(scoring):
+    result, _ = _score(_candidates(12))
+    by_name = {c["name"]: c for c in result}
+    for i in (0, 1, 2, 4, 10, 11):
+        assert by_name[f"Person {i}"]["match_score"] == 60 + i
+        assert by_name[f"Person {i}"]["match_reason"] == f"r{i}"
+    # Dropped by the model, or in the timed-out batch: default score, no reason
+    for i in (3, 5, 6, 7, 8, 9):
+        assert by_name[f"Person {i}"]["match_score"] == 75
+        assert "match_reason" not in by_name[f"Person {i}"]
+    assert len({c["id"] for c in result}) == 12
+
+
+def test_name_fallback_when_model_omits_ids(monkeypatch):
+    monkeypatch.setattr(email_agent, "PRERANK_TOP_K", 0)
+    monkeypatch.setattr(email_agent, "SCORING_BATCH_SIZE", 0)
+
+    async def fake_llm(prompt, **kwargs):
+        return json.dumps({"scored_candidates": [
+            {"name": "Person 1", "match_score": 91},
+            {"linkedin_url": "https://linkedin.com/in/p0/", "match_score": 88},
+        ]})
+
+    monkeypatch.setattr(email_agent, "_acall_llm", fake_llm)
+    result, _ = _score(_candidates(2))
+    assert [(c["name"], c["match_score"]) for c in result] == [("Person 1", 91), ("Person 0", 88)]
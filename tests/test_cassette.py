@@ -0,0 +1,141 @@
+"""Cassette（录制 / 回放）单元测试。"""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.services import cassette as cassette_module
+from src.services.cassette import Cassette, CassetteMiss, redact_url
+from src.services.metrics import LLMCall, _current_call
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded: list[float] = []
+    monkeypatch.setattr(cassette_module.time, "sleep", recorded.append)
+    return recorded
+
+
+def _request(prompt: str = "hi") -> dict:
+    return {"provider": "openai", "model": "gpt-4o", "temperature": 0.4, "json_mode": True, "prompt": prompt}
+
+
+def test_off_mode_passes_through_without_writing(tmp_path):
+    cassette = Cassette(tmp_path, mode="off")
+    assert cassette.call("llm", _request(), lambda: "live") == "live"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_record_then_replay_without_calling_provider(tmp_path):
+    calls: list[str] = []
+
+    def provider() -> str:
+        calls.append("called")
+        return '{"ok": true}'
+
+    assert Cassette(tmp_path, mode="record").call("llm", _request(), provider) == '{"ok": true}'
+    replay = Cassette(tmp_path, mode="replay")
+    assert replay.call("llm", _request(), provider) == '{"ok": true}'
+    assert calls == ["called"]
+    assert replay.stats()["kinds"]["llm"] == {"replayed": 1}
+
+
+def test_replay_miss_raises_instead_of_calling_network(tmp_path):
+    replay = Cassette(tmp_path, mode="replay")
+    with pytest.raises(CassetteMiss):
+        replay.call("llm", _request("never recorded"), lambda: pytest.fail("network call in replay"))
+    assert replay.stats()["kinds"]["llm"] == {"misses": 1}
+
+
+def test_replay_injects_fixed_and_scaled_latency(tmp_path, sleeps):
+    Cassette(tmp_path, mode="record").save("llm", _request(), "text", latency_s=2.0)
+
+    Cassette(tmp_path, mode="replay").call("llm", _request(), lambda: "")
+    Cassette(tmp_path, mode="replay", latency_ms=50, latency_scale=0.5).call("llm", _request(), lambda: "")
+    assert sleeps == [pytest.approx(1.05)]
+
+
+def test_usage_is_recorded_and_replayed_into_current_call(tmp_path):
+    def provider() -> str:
+        _current_call.get().add_usage(type("Usage", (), {"prompt_tokens": 12, "completion_tokens": 3})())
+        return "text"
+
+    for mode, func in (("record", provider), ("replay", lambda: "")):
+        call = LLMCall("email", "openai", "gpt-4o", "miss")
+        token = _current_call.set(call)
+        try:
+            Cassette(tmp_path, mode=mode).call("llm", _request(), func)
+        finally:
+            _current_call.reset(token)
+        assert (call.prompt_tokens, call.completion_tokens) == (12, 3)
+
+
+def test_async_call_and_stream_round_trip(tmp_path):
+    async def provider() -> list:
+        return ["text", ["https://example.com"]]
+
+    async def stream():
+        for chunk in ("Hello", ", ", "world"):
+            yield chunk
+
+    async def run(cassette: Cassette) -> tuple:
+        result = await cassette.acall("gemini_search", {"prompt": "p"}, provider)
+        chunks = [chunk async for chunk in cassette.astream("llm_stream", {"prompt": "p"}, stream)]
+        return result, chunks
+
+    recorded = asyncio.run(run(Cassette(tmp_path, mode="record")))
+    replayed = asyncio.run(run(Cassette(tmp_path, mode="replay")))
+    assert recorded == replayed == (["text", ["https://example.com"]], ["Hello", ", ", "world"])
+
+
+def test_redact_url_drops_credentials():
+    url = "https://serpapi.com/search.json?engine=google&q=a+b&api_key=SECRET"
+    assert redact_url(url) == "https://serpapi.com/search.json?engine=google&q=a+b"
+    assert Cassette.make_key("serpapi", {"url": redact_url(url)}) == Cassette.make_key(
+        "serpapi", {"url": redact_url(url.replace("SECRET", "OTHER"))}
+    )
+
+
+def test_mounted_session_records_and_replays_http(tmp_path, monkeypatch):
+    def fake_send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.headers["Content-Type"] = "text/html; charset=utf-8"
+        response._content = "<p>héllo</p>".encode("utf-8")
+        response.encoding = "utf-8"
+        return response
+
+    monkeypatch.setattr(HTTPAdapter, "send", fake_send)
+    recording = Cassette(tmp_path, mode="record").mount(requests.Session())
+    assert recording.get("https://example.com/page", timeout=1).text == "<p>héllo</p>"
+
+    def no_network(self, request, **kwargs):
+        pytest.fail("network call in replay")
+
+    monkeypatch.setattr(HTTPAdapter, "send", no_network)
+    replaying = Cassette(tmp_path, mode="replay").mount(requests.Session())
+    response = replaying.get("https://example.com/page", timeout=1)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/html; charset=utf-8"
+    assert response.text == "<p>héllo</p>"
+    with pytest.raises(CassetteMiss):
+        replaying.get("https://example.com/other", timeout=1)
+
+
+def test_llm_service_replays_without_network(tmp_path, monkeypatch):
+    from src.services import llm_service
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    request = {"provider": "openai", "model": "gpt-4o", "temperature": None, "json_mode": True, "prompt": "hi"}
+    Cassette(tmp_path, mode="record").call("llm", request, lambda: '{"ok": true}')
+    monkeypatch.setattr(llm_service, "cassette", Cassette(tmp_path, mode="replay"))
+
+    service = llm_service.OpenAIService(model="gpt-4o")
+    assert service.call("hi", json_mode=True) == '{"ok": true}'
+    with pytest.raises(llm_service.LLMServiceError, match="No llm recording"):
+        service.call("never recorded", json_mode=True)
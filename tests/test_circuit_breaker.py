@@ -0,0 +1,210 @@
+"""CircuitBreaker / BreakerRegistry 单元测试。"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+
+from src.services import circuit_breaker as cb_module
+from src.services.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    BreakerRegistry,
+    CircuitBreaker,
+    is_provider_failure,
+)
+from src.services.rate_limiter import RateLimitTimeout
+from src.services.structured_output import SchemaError
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = _Clock()
+    monkeypatch.setattr(cb_module.time, "monotonic", fake)
+    return fake
+
+
+def _breaker(**kwargs) -> CircuitBreaker:
+    params = dict(window=10, min_calls=4, failure_rate=0.5, cooldown=30, half_open_max_calls=1, degraded_rate=0.25)
+    params.update(kwargs)
+    return CircuitBreaker("stage", **params)
+
+
+def test_opens_once_failure_rate_reached(clock):
+    breaker = _breaker()
+    breaker.record_failure("boom")
+    breaker.record_failure("boom")
+    breaker.record_failure("boom")
+    # Below min_calls: still closed
+    assert breaker.state == CLOSED
+    breaker.record_success()
+    breaker.record_failure("boom")
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    snap = breaker.snapshot()
+    assert snap["rejected"] == 1
+    assert snap["opened"] == 1
+    assert snap["last_error"] == "boom"
+    assert snap["retry_in_s"] == 30
+
+
+def test_half_open_probe_success_closes(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now += 31
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    # Only one probe at a time
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["window_calls"] == 1
+
+
+def test_half_open_probe_failure_reopens(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record_failure()
+    clock.now += 31
+    assert breaker.allow()
+    breaker.record_failure("still down")
+    assert breaker.state == OPEN
+    clock.now += 10
+    assert not breaker.allow()
+
+
+def test_release_returns_probe_slot(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record_failure()
+    clock.now += 31
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_registry_orders_by_health(clock):
+    registry = BreakerRegistry(window=10, min_calls=4, failure_rate=0.5, cooldown=30, degraded_rate=0.25)
+    # "a" is open, "b" is degraded (1 of 4 failed), "c" is healthy
+    for _ in range(4):
+        registry.get("a").record_failure()
+    for ok in (True, True, True, False):
+        (registry.get("b").record_success if ok else registry.get("b").record_failure)()
+    registry.get("c").record_success()
+
+    assert registry.order(["a", "b", "c", "d"]) == ["c", "d", "b", "a"]
+    assert set(registry.snapshot()) == {"a", "b", "c", "d"}
+
+    registry.reset("a")
+    assert registry.get("a").state == CLOSED
+    assert registry.order(["a", "b", "c"]) == ["a", "c", "b"]
+
+
+def test_find_target_skips_open_stage(monkeypatch, clock):
+    from src import email_agent
+
+    registry = BreakerRegistry(window=10, min_calls=1, failure_rate=0.5, cooldown=30)
+    monkeypatch.setattr(email_agent, "stage_breakers", registry)
+    calls = []
+
+    async def failing():
+        calls.append("failing")
+        raise ConnectionError("down")
+
+    async def ok():
+        calls.append("ok")
+        return [{"name": "A"}]
+
+    async def main():
+        first = await email_agent._arun_find_target_stage("serpapi", failing)
+        second = await email_agent._arun_find_target_stage("serpapi", failing)
+        third = await email_agent._arun_find_target_stage("gemini_search", ok)
+        return first, second, third
+
+    first, second, third = asyncio.run(main())
+    assert first is None and second is None
+    assert third == [{"name": "A"}]
+    # The second serpapi attempt was rejected by the open breaker without running
+    assert calls == ["failing", "ok"]
+    assert registry.get("serpapi").state == OPEN
+
+
+def test_provider_failures_vs_bad_answers():
+    assert is_provider_failure(ConnectionError("reset"))
+    assert is_provider_failure(TimeoutError("slow"))
+    assert is_provider_failure(RateLimitTimeout("no capacity"))
+    assert not is_provider_failure(SchemaError("bad json"))
+    assert not is_provider_failure(json.JSONDecodeError("x", "doc", 0))
+    assert not is_provider_failure(KeyError("recommendations"))
+
+
+def test_bad_answers_do_not_open_breaker(monkeypatch, clock):
+    from src import email_agent
+
+    registry = BreakerRegistry(window=10, min_calls=1, failure_rate=0.5, cooldown=30)
+    monkeypatch.setattr(email_agent, "stage_breakers", registry)
+
+    async def malformed():
+        raise SchemaError("not JSON")
+
+    async def main():
+        return [await email_agent._arun_find_target_stage("text_only", malformed) for _ in range(3)]
+
+    assert asyncio.run(main()) == [None, None, None]
+    assert registry.get("text_only").state == CLOSED
+
+
+def test_last_resort_stage_bypasses_open_breaker(monkeypatch, clock):
+    from src import email_agent
+
+    registry = BreakerRegistry(window=10, min_calls=1, failure_rate=0.5, cooldown=30)
+    monkeypatch.setattr(email_agent, "stage_breakers", registry)
+    registry.get("text_only").record_failure("down")
+    assert registry.get("text_only").state == OPEN
+
+    async def ok():
+        return [{"name": "A"}]
+
+    async def main():
+        skipped = await email_agent._arun_find_target_stage("text_only", ok)
+        forced = await email_agent._arun_find_target_stage("text_only", ok, bypass_breaker=True)
+        return skipped, forced
+
+    assert asyncio.run(main()) == (None, [{"name": "A"}])
+
+
+def test_serpapi_error_bodies_open_breaker_but_no_results_do_not(monkeypatch, clock):
+    from src import email_agent
+
+    registry = BreakerRegistry(window=10, min_calls=2, failure_rate=0.5, cooldown=30)
+    monkeypatch.setattr(email_agent, "stage_breakers", registry)
+    monkeypatch.setattr(email_agent, "serpapi_key", lambda: "test-key")
+    response = {"error": "Google hasn't returned any results for this query."}
+    monkeypatch.setattr(email_agent.serpapi_client, "search", lambda params: dict(response))
+
+    async def search(query):
+        return email_agent._search_linkedin_via_serpapi(query=query, raise_errors=True) or None
+
+    async def main(queries):
+        return [await email_agent._arun_find_target_stage("serpapi", lambda q=q: search(q)) for q in queries]
+
+    assert asyncio.run(main(["empty 1", "empty 2"])) == [None, None]
+    assert registry.get("serpapi").state == CLOSED
+
+    response = {"error": "Your account has run out of searches."}
+    assert asyncio.run(main(["quota 1", "quota 2"])) == [None, None]
+    assert registry.get("serpapi").state == OPEN
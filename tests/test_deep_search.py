@@ -0,0 +1,119 @@
+"""深度搜索并发查询测试：共享时限、到达即去重合并、结果足够即提前返回。"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from src import email_agent
+from src.services.single_flight import SingleFlight
+
+
+@pytest.fixture
+def fake_search(monkeypatch):
+    """Per-query (delay, results) table served in place of SerpAPI."""
+    table: dict[str, tuple[float, list[dict]]] = {}
+    started: list[str] = []
+
+    def fetch(query: str, api_key: str, max_results: int) -> list[dict]:
+        started.append(query)
+        delay, results = table[query]
+        time.sleep(delay)
+        if isinstance(results, Exception):
+            raise results
+        return results
+
+    monkeypatch.setattr(email_agent, "_fetch_deep_search_results", fetch)
+    monkeypatch.setattr(email_agent, "serpapi_flight", SingleFlight("serpapi"))
+    return table, started
+
+
+def _result(link: str, **extra) -> dict:
+    return {"title": link, "snippet": "", "link": link, "date": "", **extra}
+
+
+def _gather(queries, **kwargs) -> tuple[list[dict], float]:
+    """Results and the time until they were returned (abandoned threads finish afterwards)."""
+    async def main():
+        start = time.perf_counter()
+        results = await email_agent._agather_deep_search_results(queries, "key", 5, **kwargs)
+        return results, time.perf_counter() - start
+
+    return asyncio.run(main())
+
+
+def test_queries_run_concurrently_and_dedupe_by_url(fake_search):
+    table, started = fake_search
+    table["a"] = (0.2, [_result("https://www.x.com/1"), _result("https://x.com/2")])
+    table["b"] = (0.2, [_result("https://x.com/1/", is_news=True), _result("https://x.com/3")])
+    table["c"] = (0.05, [_result("https://x.com/2#top"), _result("https://x.com/4")])
+
+    results, elapsed = _gather(["a", "b", "c"], deadline=5, min_results=0)
+
+    assert sorted(started) == ["a", "b", "c"]
+    assert elapsed < 0.35
+    # Query order + rank, regardless of arrival; the first query's copy of a URL wins
+    assert [r["link"] for r in results] == [
+        "https://www.x.com/1", "https://x.com/2", "https://x.com/3", "https://x.com/4",
+    ]
+    assert "is_news" not in results[0]
+
+
+def test_returns_early_once_enough_results(fake_search):
+    table, _ = fake_search
+    table["fast"] = (0.0, [_result(f"https://x.com/{i}") for i in range(3)])
+    table["slow"] = (1.0, [_result("https://x.com/slow")])
+
+    results, elapsed = _gather(["fast", "slow"], deadline=5, min_results=3)
+    assert elapsed < 0.5
+    assert len(results) == 3
+
+
+def test_shared_deadline_and_errors(fake_search):
+    table, _ = fake_search
+    table["ok"] = (0.0, [_result("https://x.com/ok")])
+    table["broken"] = (0.0, ConnectionError("down"))
+    table["hung"] = (1.0, [_result("https://x.com/late")])
+
+    results, elapsed = _gather(["ok", "broken", "hung"], deadline=0.2, min_results=0)
+    assert elapsed < 0.6
+    assert [r["link"] for r in results] == ["https://x.com/ok"]
+
+
+def test_deep_context_uses_all_queries(fake_search, monkeypatch):
+    table, started = fake_search
+    queries = email_agent._build_deep_search_queries("Ada Lovelace", "CTO", "Analytical")
+    assert len(queries) == 3
+    for i, query in enumerate(queries):
+        table[query] = (0.0, [_result(f"https://x.com/{i}"), _result("https://x.com/shared")])
+    seen = {}
+
+    async def extract(**kwargs):
+        seen.update(kwargs)
+        return email_agent.ReceiverDeepSearchResult(
+            recent_projects=[], key_experiences=[], recent_news=[],
+            verified_facts=[], sources=[], raw_search_results="",
+        )
+
+    monkeypatch.setenv("SERPAPI_KEY", "key")
+    monkeypatch.setattr(email_agent, "_aextract_verified_info_from_search", extract)
+    result = asyncio.run(email_agent.asearch_receiver_deep_context("Ada Lovelace", "CTO", "Analytical"))
+
+    assert sorted(started) == sorted(queries)
+    assert result.sources == ["https://x.com/0", "https://x.com/shared", "https://x.com/1", "https://x.com/2"]
+    assert seen["search_results"].count("Source: https://x.com/shared") == 1
+
+
+def test_deep_search_requests_use_the_news_cache_tier(monkeypatch):
+    seen = []
+
+    def search(params, *, kind=None):
+        seen.append((params["engine"], kind))
+        return {"news_results": [{"title": "t", "link": "https://example.com/a"}]}
+
+    monkeypatch.setattr(email_agent.serpapi_client, "search", search)
+    results = email_agent._fetch_deep_search_results("Jane Doe Goldman Sachs", "key", 5)
+    assert [r["link"] for r in results] == ["https://example.com/a"]
+    assert seen == [("google", "news")]
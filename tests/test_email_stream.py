@@ -0,0 +1,52 @@
+"""astream_email / stream_email 单元测试。"""
+
+from __future__ import annotations
+
+import pytest
+
+from src import email_agent
+
+
+class _Collector:
+    def __init__(self):
+        self.records: list[dict] = []
+
+    def record_generate_email(self, **kwargs):
+        self.records.append(kwargs)
+
+
+@pytest.fixture
+def collector(monkeypatch):
+    collector = _Collector()
+    monkeypatch.setattr(email_agent, "PROMPT_COLLECTOR_AVAILABLE", True)
+    monkeypatch.setattr(email_agent, "prompt_collector", collector)
+    monkeypatch.setattr(email_agent, "USE_OPENAI_FOR_EMAIL", True)
+    return collector
+
+
+def test_stream_email_forwards_chunks_and_records_final_text(monkeypatch, collector, sample_sender, sample_receiver):
+    async def fake_stream(system_content, user_content, *, model, temperature, prefix=None):
+        for text in ("Subject: Hi\n\n", "Dear Dr. Ng,", " thanks.\n"):
+            yield text
+
+    monkeypatch.setattr(email_agent, "_astream_openai_chat", fake_stream)
+
+    chunks = list(email_agent.stream_email(sample_sender, sample_receiver, "ask for a chat", session_id="s1"))
+
+    assert chunks == ["Subject: Hi\n\n", "Dear Dr. Ng,", " thanks.\n"]
+    assert len(collector.records) == 1
+    record = collector.records[0]
+    assert record["session_id"] == "s1"
+    assert record["output"] == "Subject: Hi\n\nDear Dr. Ng, thanks."
+
+
+def test_stream_email_does_not_record_failed_stream(monkeypatch, collector, sample_sender, sample_receiver):
+    async def failing_stream(system_content, user_content, *, model, temperature, prefix=None):
+        yield "Subject:"
+        raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(email_agent, "_astream_openai_chat", failing_stream)
+
+    with pytest.raises(RuntimeError):
+        list(email_agent.stream_email(sample_sender, sample_receiver, "goal", session_id="s1"))
+    assert collector.records == []
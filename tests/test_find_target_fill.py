@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import pytest
+
+from src import email_agent
+from src.services.circuit_breaker import BreakerRegistry
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Only the SerpAPI and text-only stages enabled, with all I/O stubbed."""
+    state = {"serpapi": [], "llm": [], "prompts": [], "search_counts": []}
+
+    def find_candidates(*, preferences, field, purpose, count, paging, raise_errors):
+        state["search_counts"].append(count)
+        return [dict(c) for c in state["serpapi"]]
+
+    async def score(*, candidates, **kwargs):
+        return [{**c, "match_score": 90} for c in candidates]
+
+    async def call_llm(prompt, **kwargs):
+        state["prompts"].append(prompt)
+        return json.dumps({"recommendations": state["llm"]})
+
+    async def no_web_context(*args, **kwargs):
+        return "", []
+
+    monkeypatch.setattr(email_agent, "stage_breakers", BreakerRegistry())
+    monkeypatch.setattr(email_agent, "serpapi_key", lambda: "test-key")
+    monkeypatch.setattr(email_agent, "USE_GEMINI_SEARCH", False)
+    monkeypatch.setattr(email_agent, "USE_OPENAI_RECOMMENDATIONS", False)
+    monkeypatch.setattr(email_agent, "_find_linkedin_candidates", find_candidates)
+    monkeypatch.setattr(email_agent, "_aai_score_and_analyze_candidates", score)
+    monkeypatch.setattr(email_agent, "_acall_llm", call_llm)
+    monkeypatch.setattr(email_agent, "_agather_recommendation_web_context", no_web_context)
+    monkeypatch.setattr(email_agent, "_lookup_linkedin_batch", lambda lookups: [None] * len(lookups))
+    return state
+
+
+def _find(count):
+    return asyncio.run(email_agent.afind_target_recommendations("coffee chat", "Investment Banking", count=count))
+
+
+def test_few_serpapi_profiles_are_kept_and_topped_up(pipeline):
+    pipeline["serpapi"] = [
+        {"name": "Alice Chen", "linkedin_url": "https://www.linkedin.com/in/alice-chen"},
+        {"name": "Bob Li", "linkedin_url": "https://www.linkedin.com/in/bob-li"},
+    ]
+    pipeline["llm"] = [
+        {"name": "alice  chen", "position": "VP at Goldman Sachs"},  # duplicate of a real profile
+        {"name": "Carol Wu", "position": "Associate at Evercore"},
+        {"name": "Dan Park", "position": "Analyst at Lazard"},
+        {"name": "Erin Ma", "position": "Analyst at PJT"},
+    ]
+
+    results = _find(4)
+
+    assert [r["name"] for r in results] == ["Alice Chen", "Bob Li", "Carol Wu", "Dan Park"]
+    # The real profiles keep their scores and URLs
+    assert results[0]["linkedin_url"] == "https://www.linkedin.com/in/alice-chen"
+    assert results[0]["match_score"] == 90
+    # The text-only stage was asked for the shortfall only, excluding the names already found
+    (prompt,) = pipeline["prompts"]
+    assert "list of 2 people" in prompt
+    assert "do NOT include these people again): Alice Chen; Bob Li" in prompt
+
+
+def test_enough_serpapi_profiles_skip_later_stages(pipeline):
+    pipeline["serpapi"] = [
+        {"name": f"Person {i}", "linkedin_url": f"https://www.linkedin.com/in/person-{i}"} for i in range(5)
+    ]
+
+    results = _find(3)
+
+    assert [r["name"] for r in results] == ["Person 0", "Person 1", "Person 2"]
+    assert pipeline["prompts"] == []
+
+
+def test_no_serpapi_profiles_fall_through_without_exclusions(pipeline):
+    pipeline["llm"] = [{"name": "Carol Wu", "position": "Associate at Evercore"}]
+
+    results = _find(3)
+
+    assert [r["name"] for r in results] == ["Carol Wu"]
+    (prompt,) = pipeline["prompts"]
+    assert "list of 3 people" in prompt
+    assert "do NOT include" not in prompt
@@ -0,0 +1,104 @@
+"""HedgePolicy 单元测试。"""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from src.services.hedging import HedgePolicy
+
+
+def _policy(**kwargs) -> HedgePolicy:
+    return HedgePolicy(enabled=True, max_rate=kwargs.pop("max_rate", 1.0), window=10, min_delay=0.0, **kwargs)
+
+
+def _answer(value: str, delay: float, log: list[str] | None = None):
+    async def call() -> str:
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if log is not None:
+                log.append(f"cancelled:{value}")
+            raise
+        return value
+
+    return call
+
+
+def test_fast_primary_does_not_hedge():
+    policy = _policy()
+    result = asyncio.run(policy.race("questionnaire", _answer("primary", 0), _answer("secondary", 0), delay=0.05))
+
+    assert result == "primary"
+    stats = policy.stats()["questionnaire"]
+    assert stats["calls"] == 1 and stats["hedged"] == 0
+
+
+def test_stalled_primary_loses_to_hedge_and_is_cancelled():
+    policy = _policy()
+    log: list[str] = []
+
+    result = asyncio.run(
+        policy.race("questionnaire", _answer("primary", 5, log), _answer("secondary", 0.01), delay=0.01)
+    )
+
+    assert result == "secondary"
+    assert log == ["cancelled:primary"]
+    stats = policy.stats()["questionnaire"]
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1 and stats["hedge_win_rate"] == 1.0
+    # Latency of the won call (hedge delay + secondary), not a time saving
+    assert 0 < stats["hedge_win_latency_seconds"] < 1
+
+
+def test_invalid_response_does_not_win():
+    policy = _policy()
+
+    result = asyncio.run(
+        policy.race(
+            "profile_extract",
+            _answer("{bad json", 0.02),
+            _answer('{"ok": true}', 0.05),
+            delay=0.01,
+            is_valid=lambda text: text.startswith('{"'),
+        )
+    )
+
+    assert result == '{"ok": true}'
+
+
+def test_hedge_rate_cap_suppresses_hedges():
+    policy = _policy(max_rate=0.1)  # 1 hedge per 10 calls
+
+    async def main() -> list[str]:
+        results = []
+        for _ in range(3):
+            results.append(
+                await policy.race("questionnaire", _answer("primary", 0.03), _answer("secondary", 0), delay=0.01)
+            )
+        return results
+
+    assert asyncio.run(main()) == ["secondary", "primary", "primary"]
+    stats = policy.stats()["questionnaire"]
+    assert stats["hedged"] == 1 and stats["suppressed"] == 2
+
+
+def test_both_failing_raises_first_error():
+    policy = _policy()
+
+    async def fail() -> str:
+        await asyncio.sleep(0.02)
+        raise RuntimeError("primary down")
+
+    async def fail_later() -> str:
+        await asyncio.sleep(0.03)
+        raise RuntimeError("secondary down")
+
+    with pytest.raises(RuntimeError, match="primary down"):
+        asyncio.run(policy.race("email", fail, fail_later, delay=0.01))
+    assert policy.stats()["email"]["both_failed"] == 1
+
+
+def test_disabled_policy_has_no_secondary():
+    assert HedgePolicy(enabled=False).secondary_model("openai") is None
+    assert _policy(secondary_models={"openai": "gemini-2.0-flash"}).secondary_model("openai") == "gemini-2.0-flash"
@@ -0,0 +1,80 @@
+"""json_extract 单元测试：单遍 JSON 提取 + 流式数组解析。"""
+
+from __future__ import annotations
+
+import json
+
+from src.services.json_extract import ArrayItemParser, balanced_end, extract_json, iter_array_items
+
+
+def test_extracts_fenced_block_first():
+    text = 'Example: {"not": "this"}\n```json\n{"recommendations": []}\n```\nDone.'
+    assert extract_json(text) == '{"recommendations": []}'
+
+
+def test_extracts_object_from_prose():
+    text = 'Sure! Here you go: {"a": {"b": [1, 2]}, "c": "x"} Hope that helps {}'
+    assert json.loads(extract_json(text)) == {"a": {"b": [1, 2]}, "c": "x"}
+
+
+def test_braces_inside_strings_are_ignored():
+    text = 'Answer: {"note": "use } and { freely", "quote": "say \\"}\\""} trailing }'
+    assert json.loads(extract_json(text)) == {"note": "use } and { freely", "quote": 'say "}"'}
+
+
+def test_skips_unparseable_candidate_and_finds_next():
+    text = "Template {name} is filled below.\n{\"name\": \"Ada\"}"
+    assert json.loads(extract_json(text)) == {"name": "Ada"}
+
+
+def test_returns_text_when_no_json():
+    assert extract_json("no json here") == "no json here"
+    assert extract_json('{"unterminated": [1, 2') == '{"unterminated": [1, 2'
+
+
+def test_balanced_end():
+    text = 'x{"a": "]}", "b": [{}]}y'
+    assert text[1:balanced_end(text, 1)] == '{"a": "]}", "b": [{}]}'
+    assert balanced_end('{"a": 1', 0) is None
+
+
+def _chunks(text: str, size: int) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_array_items_are_emitted_as_soon_as_they_close():
+    payload = {
+        "summary": "two people, {braces} and \"quotes\"",
+        "recommendations": [{"name": "Ada", "tags": ["x]", "y"]}, {"name": "Grace", "nested": {"k": [1]}}],
+        "after": [1, 2],
+    }
+    text = "```json\n" + json.dumps(payload) + "\n```"
+    parser = ArrayItemParser("recommendations")
+    first_end = text.index('"Grace"')
+    assert parser.feed(text[:first_end]) == [{"name": "Ada", "tags": ["x]", "y"]}]
+    assert parser.feed(text[first_end:]) == [{"name": "Grace", "nested": {"k": [1]}}]
+    assert parser.done
+
+
+def test_array_items_any_chunking():
+    payload = {"recommendations": [{"i": i, "s": "a,b]}" * i} for i in range(20)]}
+    text = "Here:\n" + json.dumps(payload, indent=2)
+    for size in (1, 3, 7, 64, len(text)):
+        assert list(iter_array_items(_chunks(text, size))) == payload["recommendations"]
+
+
+def test_top_level_array_and_scalars():
+    assert list(iter_array_items(_chunks('[1, "two", null, {"x": 3}]', 2), key=None)) == [1, "two", None, {"x": 3}]
+
+
+def test_missing_key_yields_nothing():
+    assert list(iter_array_items(['{"other": [1, 2]}'])) == []
+
+
+def test_parser_buffer_stays_small():
+    item = json.dumps({"name": "x" * 50})
+    parser = ArrayItemParser()
+    parser.feed('{"recommendations": [')
+    for _ in range(1000):
+        assert len(parser.feed(item + ", ")) == 1
+    assert len(parser._text) < 200
@@ -0,0 +1,90 @@
+"""LinkedIn URL 批量解析测试：并发、去重、保持输入顺序。"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from src import email_agent
+
+
+@pytest.fixture
+def fake_lookup(monkeypatch):
+    calls: list[tuple[str, str, str]] = []
+    active = {"now": 0, "max": 0}
+    lock = threading.Lock()
+
+    def lookup(name: str, company: str = "", additional_context: str = "") -> str | None:
+        with lock:
+            calls.append((name, company, additional_context))
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+        time.sleep(0.1)
+        with lock:
+            active["now"] -= 1
+        if name == "Nobody":
+            return None
+        if name == "Broken":
+            raise RuntimeError("boom")
+        return f"https://www.linkedin.com/in/{name.lower().replace(' ', '-')}"
+
+    monkeypatch.setenv("SERPAPI_KEY", "key")
+    monkeypatch.setattr(email_agent, "_lookup_linkedin_via_serpapi", lookup)
+    monkeypatch.setattr(email_agent, "PROVIDER_CONCURRENCY", {"serpapi": 3})
+    return calls, active
+
+
+def test_batch_is_concurrent_deduped_and_ordered(fake_lookup):
+    calls, active = fake_lookup
+    lookups = [
+        ("Ada Lovelace", "Analytical", "Math"),
+        ("Nobody", "", ""),
+        ("ada  lovelace", "analytical", "math"),
+        ("Grace Hopper", "Navy", ""),
+        ("Broken", "", ""),
+        ("Alan Turing", "", ""),
+    ]
+    start = time.perf_counter()
+    results = email_agent._lookup_linkedin_batch(lookups)
+    elapsed = time.perf_counter() - start
+
+    assert results == [
+        "https://www.linkedin.com/in/ada-lovelace",
+        None,
+        "https://www.linkedin.com/in/ada-lovelace",
+        "https://www.linkedin.com/in/grace-hopper",
+        None,
+        "https://www.linkedin.com/in/alan-turing",
+    ]
+    assert len(calls) == 5
+    assert active["max"] == 3
+    assert elapsed < 0.35
+
+
+def test_batch_without_api_key_skips_lookups(fake_lookup, monkeypatch):
+    calls, _ = fake_lookup
+    monkeypatch.delenv("SERPAPI_KEY")
+    monkeypatch.delenv("SERP_API_KEY", raising=False)
+    assert email_agent._lookup_linkedin_batch([("Ada Lovelace", "", "")]) == [None]
+    assert calls == []
+
+
+def test_normalize_only_looks_up_missing_urls(fake_lookup):
+    calls, _ = fake_lookup
+    items = [
+        {"name": "Ada Lovelace", "position": "Engineer at Analytical", "field": "Math"},
+        {"name": "Grace Hopper", "linkedin_url": "https://www.linkedin.com/in/grace-hopper-1"},
+        {"name": "Nobody", "position": "CTO at Acme"},
+    ]
+    recs = email_agent._normalize_recommendations(items)
+
+    assert sorted(calls) == [("Ada Lovelace", "Analytical", "Math"), ("Nobody", "Acme", "")]
+    assert recs[0]["linkedin_url"] == "https://www.linkedin.com/in/ada-lovelace"
+    assert recs[1]["linkedin_url"] == "https://www.linkedin.com/in/grace-hopper-1"
+    assert recs[2]["linkedin_url"] == email_agent._generate_linkedin_search_url("Nobody", "Acme")
+    assert list(recs[0])[0] == "id"
+    assert recs[0]["id"] == email_agent._generate_recommendation_id(
+        "Ada Lovelace", "Engineer at Analytical", recs[0]["linkedin_url"]
+    )
@@ -0,0 +1,175 @@
+"""LLMResponseCache 单元测试。"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+from src.services.llm_cache import LLMResponseCache, _parse_ttl_overrides
+
+
+def _make_cache(tmp_path, **kwargs) -> LLMResponseCache:
+    return LLMResponseCache(
+        db_path=tmp_path / "llm_cache.db",
+        ttls=kwargs.pop("ttls", {"generate_questionnaire": 60}),
+        enabled=True,
+        **kwargs,
+    )
+
+
+def _call_counter():
+    calls: list[int] = []
+
+    def call() -> str:
+        calls.append(1)
+        return '{"ok": true}'
+
+    return calls, call
+
+
+def test_opted_in_caller_is_served_from_cache(tmp_path):
+    cache = _make_cache(tmp_path)
+    calls, call = _call_counter()
+    kwargs = dict(provider="openai", model="gpt-4o", temperature=0.4, json_mode=True, prompt="p")
+
+    first = cache.get_or_call("generate_questionnaire", call=call, **kwargs)
+    second = cache.get_or_call("generate_questionnaire", call=call, **kwargs)
+
+    assert first == second == '{"ok": true}'
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["bytes_saved"] == len('{"ok": true}')
+
+
+def test_unlisted_caller_bypasses_cache(tmp_path):
+    cache = _make_cache(tmp_path)
+    calls, call = _call_counter()
+    kwargs = dict(provider="openai", model="gpt-4o", temperature=0.7, json_mode=False, prompt="p")
+
+    cache.get_or_call("generate_email", call=call, **kwargs)
+    cache.get_or_call("generate_email", call=call, **kwargs)
+
+    assert len(calls) == 2
+    assert cache.stats()["bypassed"] == 2
+
+
+def test_key_depends_on_model_temperature_and_json_mode():
+    base = dict(provider="openai", model="gpt-4o", temperature=0.4, json_mode=True, prompt="p")
+    key = LLMResponseCache.make_key(**base)
+
+    assert key == LLMResponseCache.make_key(**base)
+    assert key != LLMResponseCache.make_key(**{**base, "model": "gpt-4o-mini"})
+    assert key != LLMResponseCache.make_key(**{**base, "temperature": 0.7})
+    assert key != LLMResponseCache.make_key(**{**base, "json_mode": False})
+    assert key != LLMResponseCache.make_key(**{**base, "prompt": "q"})
+
+
+def test_disk_tier_is_shared_between_instances(tmp_path):
+    calls, call = _call_counter()
+    kwargs = dict(provider="gemini", model="gemini-2.0-flash", temperature=None, json_mode=True, prompt="p")
+
+    _make_cache(tmp_path).get_or_call("generate_questionnaire", call=call, **kwargs)
+    other_worker = _make_cache(tmp_path)
+    other_worker.get_or_call("generate_questionnaire", call=call, **kwargs)
+
+    assert len(calls) == 1
+    assert other_worker.stats()["disk_hits"] == 1
+
+
+def test_async_disk_tier_runs_off_the_event_loop(tmp_path):
+    kwargs = dict(provider="openai", model="gpt-4o", temperature=0.4, json_mode=True, prompt="p")
+    _make_cache(tmp_path).set(LLMResponseCache.make_key(**kwargs), "cached", ttl_seconds=60)
+    cache = _make_cache(tmp_path)
+    disk_threads = []
+    for name in ("_disk_get", "_disk_set"):
+        original = getattr(cache, name)
+
+        def wrapped(*args, _original=original):
+            disk_threads.append(threading.get_ident())
+            return _original(*args)
+
+        setattr(cache, name, wrapped)
+
+    async def call() -> str:
+        return "fresh"
+
+    async def main() -> tuple[int, str, str, str]:
+        hit = await cache.aget_or_call("generate_questionnaire", call=call, **kwargs)
+        miss = await cache.aget_or_call("generate_questionnaire", call=call, **{**kwargs, "prompt": "q"})
+        memory_hit = await cache.aget_or_call("generate_questionnaire", call=call, **kwargs)
+        return threading.get_ident(), hit, miss, memory_hit
+
+    loop_thread, hit, miss, memory_hit = asyncio.run(main())
+    assert (hit, miss, memory_hit) == ("cached", "fresh", "cached")
+    # Disk hit, disk miss and disk write each ran in a worker thread; the memory hit never touched disk
+    assert len(disk_threads) == 3
+    assert loop_thread not in disk_threads
+    assert cache.stats()["disk_hits"] == 1 and cache.stats()["memory_hits"] == 1
+
+
+def test_replies_failing_validation_are_not_cached(tmp_path):
+    cache = _make_cache(tmp_path)
+    kwargs = dict(provider="openai", model="gpt-4o", temperature=0.4, json_mode=True, prompt="p")
+    replies = iter(["not json", '{"ok": true}'])
+    calls = []
+
+    def call() -> str:
+        calls.append(1)
+        return next(replies)
+
+    def is_json(reply: str) -> bool:
+        return reply.startswith("{")
+
+    assert cache.get_or_call("generate_questionnaire", call=call, validate=is_json, **kwargs) == "not json"
+    # The malformed reply was not stored: the next call goes to the network and its valid reply is cached
+    assert cache.get_or_call("generate_questionnaire", call=call, validate=is_json, **kwargs) == '{"ok": true}'
+    assert cache.get_or_call("generate_questionnaire", call=call, validate=is_json, **kwargs) == '{"ok": true}'
+    assert len(calls) == 2
+    assert cache.stats()["rejected"] == 1
+
+
+def test_cached_reply_failing_validation_is_a_miss(tmp_path):
+    cache = _make_cache(tmp_path)
+    kwargs = dict(provider="openai", model="gpt-4o", temperature=0.4, json_mode=True, prompt="p")
+    cache.set(LLMResponseCache.make_key(**kwargs), "not json", ttl_seconds=60)
+
+    async def call() -> str:
+        return '{"ok": true}'
+
+    async def main() -> list[str]:
+        return [
+            await cache.aget_or_call("generate_questionnaire", call=call, validate=lambda r: r != "not json", **kwargs)
+            for _ in range(2)
+        ]
+
+    assert asyncio.run(main()) == ['{"ok": true}', '{"ok": true}']
+    assert cache.get(LLMResponseCache.make_key(**kwargs)) == '{"ok": true}'
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = _make_cache(tmp_path)
+    cache.set("k", "value", ttl_seconds=60)
+    cache._memory["k"] = ("value", time.time() - 1)
+
+    with cache._connect() as conn:
+        conn.execute("UPDATE llm_cache SET expires_at = ?", (time.time() - 1,))
+
+    assert cache.get("k") is None
+
+
+def test_lru_evicts_oldest_entry(tmp_path):
+    cache = _make_cache(tmp_path, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key, ttl_seconds=60)
+
+    assert list(cache._memory) == ["b", "c"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_parse_ttl_overrides():
+    assert _parse_ttl_overrides("generate_email=600, parse_text_to_profile=0,bad,x=y") == {
+        "generate_email": 600,
+        "parse_text_to_profile": 0,
+    }
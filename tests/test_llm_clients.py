@@ -0,0 +1,66 @@
+"""LLMClientRegistry 单元测试。"""
+
+from __future__ import annotations
+
+import threading
+
+from src.services import llm_clients as llm_clients_module
+from src.services.llm_clients import LLMClientRegistry
+
+
+class _FakeOpenAI:
+    instances = 0
+
+    def __init__(self, api_key: str, max_retries: int = 2):
+        type(self).instances += 1
+        self.api_key = api_key
+        self.max_retries = max_retries
+
+
+def test_openai_client_is_reused_per_api_key(monkeypatch):
+    monkeypatch.setattr(llm_clients_module, "OpenAI", _FakeOpenAI)
+    _FakeOpenAI.instances = 0
+    registry = LLMClientRegistry()
+
+    first = registry.openai("key-a")
+    second = registry.openai("key-a")
+    other = registry.openai("key-b")
+
+    assert first is second
+    assert other is not first
+    assert _FakeOpenAI.instances == 2
+    # Retries are owned by src.services.retry_policy, not the SDK
+    assert first.max_retries == 0
+
+
+def test_get_or_create_builds_once_under_concurrency():
+    registry = LLMClientRegistry()
+    calls: list[int] = []
+
+    def factory():
+        calls.append(1)
+        return object()
+
+    results: list[object] = []
+    threads = [
+        threading.Thread(target=lambda: results.append(registry.get_or_create("k", factory)))
+        for _ in range(16)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+
+
+def test_clients_are_dropped_after_fork(monkeypatch):
+    monkeypatch.setattr(llm_clients_module, "OpenAI", _FakeOpenAI)
+    registry = LLMClientRegistry()
+    parent_client = registry.openai("key-a")
+
+    # Simulate running in a forked child process
+    registry._pid = -1
+
+    assert registry.openai("key-a") is not parent_client
@@ -0,0 +1,174 @@
+"""MetricsRegistry（LLM 调用指标 + /metrics 汇总）单元测试。"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.services.llm_cache import LLMResponseCache
+from src.services.metrics import RETIRED_PROC_ID, MetricsRegistry, _parse_prices, record_usage
+from src.services.single_flight import SingleFlight
+
+
+def _registry(tmp_path, **kwargs) -> MetricsRegistry:
+    params = dict(db_path=tmp_path / "metrics.db", flush_interval=3600, prices={"gpt-4o": (2.0, 10.0)})
+    params.update(kwargs)
+    return MetricsRegistry(**params)
+
+
+def test_track_records_usage_latency_and_cost(tmp_path):
+    registry = _registry(tmp_path)
+    with registry.track("email", "openai", "gpt-4o") as call:
+        # Reported from deep inside the request via the context variable
+        record_usage(SimpleNamespace(prompt_tokens=1000, completion_tokens=200))
+    assert (call.prompt_tokens, call.completion_tokens) == (1000, 200)
+
+    text = registry.render()
+    labels = 'model="gpt-4o",provider="openai",task="email"'
+    assert 'llm_requests_total{cache="miss",model="gpt-4o",outcome="ok",provider="openai",task="email"} 1' in text
+    assert f'llm_tokens_total{{kind="prompt",{labels}}} 1000' in text
+    assert f'llm_tokens_total{{kind="completion",{labels}}} 200' in text
+    # 1000 * 2 / 1M + 200 * 10 / 1M
+    assert f"llm_cost_usd_total{{{labels}}} 0.004" in text
+    assert f'llm_request_duration_seconds_bucket{{cache="miss",{labels},le="+Inf"}} 1' in text
+    assert f'llm_request_duration_seconds_count{{cache="miss",{labels}}} 1' in text
+    assert "# TYPE llm_request_duration_seconds histogram" in text
+
+
+def test_errors_and_gemini_usage(tmp_path):
+    registry = _registry(tmp_path)
+    with pytest.raises(ConnectionError):
+        with registry.track("profile_extract", "gemini", "gemini-2.5-flash"):
+            record_usage(SimpleNamespace(prompt_token_count=50, candidates_token_count=5))
+            raise ConnectionError("reset")
+    text = registry.render()
+    assert 'outcome="error"' in text
+    assert 'llm_errors_total{kind="ConnectionError",model="gemini-2.5-flash"' in text
+    assert 'kind="prompt",model="gemini-2.5-flash",provider="gemini",task="profile_extract"} 50' in text
+
+
+def test_workers_are_summed_through_shared_db(tmp_path):
+    worker_a = _registry(tmp_path)
+    worker_b = _registry(tmp_path)
+    for worker in (worker_a, worker_a, worker_b):
+        with worker.track("questionnaire", "openai", "gpt-4o-mini", cache="hit"):
+            pass
+    worker_a.flush()
+    # Either worker can serve the scrape
+    text = worker_b.render()
+    assert 'llm_requests_total{cache="hit",model="gpt-4o-mini",outcome="ok",provider="openai",task="questionnaire"} 3' in text
+
+
+def test_calls_never_flush_on_the_calling_thread(tmp_path):
+    registry = _registry(tmp_path, flush_interval=0.05)
+    flush_threads = []
+    original = registry.flush
+
+    def flush() -> None:
+        original()
+        flush_threads.append(threading.get_ident())
+
+    registry.flush = flush
+    with registry.track("email", "openai", "gpt-4o"):
+        pass
+    assert flush_threads == []
+    deadline = time.monotonic() + 5
+    while not flush_threads and time.monotonic() < deadline:
+        time.sleep(0.01)
+    registry._stop.set()
+    assert flush_threads and threading.get_ident() not in flush_threads
+    with registry._connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM metric_series").fetchone()[0] > 0
+
+
+def _rows_by_proc(registry) -> dict[str, int]:
+    with registry._connect() as conn:
+        return dict(conn.execute("SELECT proc_id, COUNT(*) FROM metric_series GROUP BY proc_id").fetchall())
+
+
+def test_exited_workers_are_folded_into_retired_rows(tmp_path):
+    live = _registry(tmp_path)
+    for generation in range(2):
+        # A worker that has since exited (its pid no longer exists) and stopped flushing
+        dead = _registry(tmp_path)
+        dead._proc_id = f"999999999-gen{generation}"
+        for _ in range(2):
+            with dead.track("questionnaire", "openai", "gpt-4o-mini"):
+                pass
+        dead.flush()
+        with dead._connect() as conn:
+            conn.execute("UPDATE metric_series SET updated_at = 0 WHERE proc_id = ?", (dead._proc_id,))
+        assert live.compact() == 1
+    with live.track("questionnaire", "openai", "gpt-4o-mini"):
+        pass
+    live.flush()
+
+    # One retired copy of each series however many workers exited; the live worker is untouched
+    rows = _rows_by_proc(live)
+    assert set(rows) == {RETIRED_PROC_ID, live._proc_id}
+    assert rows[RETIRED_PROC_ID] == rows[live._proc_id]
+    text = live.render()
+    assert 'llm_requests_total{cache="miss",model="gpt-4o-mini",outcome="ok",provider="openai",task="questionnaire"} 5' in text
+    assert 'llm_request_duration_seconds_count{cache="miss",model="gpt-4o-mini",provider="openai",task="questionnaire"} 5' in text
+    # Recently flushed workers are never folded
+    assert live.compact() == 0
+
+
+def test_memory_only_when_db_unavailable(tmp_path):
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    registry = MetricsRegistry(db_path=blocker / "metrics.db", flush_interval=0)
+    with registry.track("email", "openai", "gpt-4o"):
+        pass
+    assert "llm_requests_total" in registry.render()
+
+
+def test_cache_status_through_cache_and_single_flight(tmp_path):
+    """Mirrors src.email_agent._acoalesced_llm_call: miss, then hit, and coalesced joiners."""
+    registry = _registry(tmp_path)
+    cache = LLMResponseCache(db_path=tmp_path / "cache.db", ttls={"generate_questionnaire": 60})
+    flight = SingleFlight("test")
+
+    async def one_call(release: asyncio.Event) -> str:
+        with registry.track("questionnaire", "openai", "gpt-4o-mini", cache="coalesced") as call:
+            async def network() -> str:
+                call.cache = "miss"
+                await release.wait()
+                return "{}"
+
+            async def lookup() -> str:
+                call.cache = "hit"
+                return await cache.aget_or_call(
+                    "generate_questionnaire", provider="openai", model="gpt-4o-mini",
+                    temperature=0.4, json_mode=True, prompt="p", call=network,
+                )
+
+            return await flight.ado("key", lookup)
+
+    async def main() -> None:
+        release = asyncio.Event()
+        leader = asyncio.ensure_future(one_call(release))
+        await asyncio.sleep(0)
+        joiner = asyncio.ensure_future(one_call(release))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(leader, joiner)
+        await one_call(release)
+
+    asyncio.run(main())
+    text = registry.render()
+    for cache_status in ("miss", "coalesced", "hit"):
+        assert f'llm_requests_total{{cache="{cache_status}",model="gpt-4o-mini"' in text
+
+
+def test_label_escaping_and_price_overrides(tmp_path):
+    registry = _registry(tmp_path)
+    with registry.track('odd"task\n', "openai", "m"):
+        pass
+    assert 'task="odd\\"task\\n"' in registry.render()
+    prices = _parse_prices('{"gpt-4o": [1, 2], "bad": "x"}', {"gpt-4o": (2.5, 10.0)})
+    assert prices == {"gpt-4o": (1.0, 2.0)}
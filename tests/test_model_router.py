@@ -0,0 +1,82 @@
+"""ModelRouter 单元测试。"""
+
+from __future__ import annotations
+
+from src.services.model_router import (
+    CALLER_TASKS,
+    TASKS,
+    ModelRouter,
+    TaskRoute,
+    _parse_route_overrides,
+    provider_for_model,
+)
+
+
+def _router(**kwargs) -> ModelRouter:
+    routes = {
+        "questionnaire": TaskRoute("questionnaire", "fast-model", "big-model", 1.0),
+    }
+    return ModelRouter(routes, window=kwargs.pop("window", 10), min_samples=kwargs.pop("min_samples", 3), **kwargs)
+
+
+def test_callers_map_to_known_tasks():
+    assert set(CALLER_TASKS.values()) <= set(TASKS)
+    assert ModelRouter.task_for("generate_next_question") == "questionnaire"
+    assert ModelRouter.task_for("find_target_recommendations") is None
+
+
+def test_model_for_uses_route_or_default():
+    router = _router()
+    assert router.model_for("generate_questionnaire") == "fast-model"
+    assert router.model_for("find_target_recommendations", default="gpt-4o") == "gpt-4o"
+
+
+def test_latency_regression_demotes_to_fallback():
+    router = _router()
+    for _ in range(3):
+        router.record("generate_questionnaire", "fast-model", 0.2)
+    assert router.model_for("generate_questionnaire") == "fast-model"
+
+    for _ in range(3):
+        router.record("generate_questionnaire", "fast-model", 5.0)
+
+    assert router.is_demoted("questionnaire")
+    assert router.model_for("generate_questionnaire") == "big-model"
+    assert router.snapshot()["demoted"] == ["questionnaire"]
+
+
+def test_primary_is_retried_after_cooldown():
+    router = _router(demotion_seconds=0)
+    for _ in range(3):
+        router.record("generate_questionnaire", "fast-model", 5.0)
+
+    # Cool-down of 0s: the primary comes back with a fresh window
+    assert router.model_for("generate_questionnaire") == "fast-model"
+    assert router.latency("fast-model", "questionnaire")["count"] == 0
+
+
+def test_latency_percentiles_and_errors():
+    router = _router(min_samples=100)
+    for seconds in (0.1, 0.2, 0.3, 0.4, 1.0):
+        router.record("generate_questionnaire", "fast-model", seconds)
+    router.record("generate_questionnaire", "fast-model", 9.9, ok=False)
+
+    stats = router.latency("fast-model")
+    assert stats["count"] == 5 and stats["errors"] == 1
+    assert stats["p50"] == 0.3 and stats["p95"] == 1.0
+
+
+def test_fallback_for_skips_failed_model():
+    router = _router()
+    assert router.fallback_for("generate_questionnaire", "fast-model") == "big-model"
+    assert router.fallback_for("generate_questionnaire", "big-model") == "fast-model"
+    assert router.fallback_for("unrouted", "fast-model") is None
+
+
+def test_route_overrides_from_json():
+    base = {"email": TaskRoute("email", "gpt-4o", "gpt-4o", 20.0)}
+    routes = _parse_route_overrides('{"email": {"model": "gemini-2.0-flash", "latency_budget_s": 5}, "nope": {}}', base)
+    assert routes["email"] == TaskRoute("email", "gemini-2.0-flash", "gpt-4o", 5.0)
+    assert _parse_route_overrides("not json", base) == base
+    assert provider_for_model("gemini-2.0-flash") == "gemini"
+    assert provider_for_model("gpt-4o-mini") == "openai"
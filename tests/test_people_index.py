@@ -0,0 +1,104 @@
+"""people_index 单元测试：FTS5 人物索引、查询转换、回填与本地优先找人。"""
+
+from __future__ import annotations
+
+import json
+import time
+
+import pytest
+
+from src import email_agent
+from src.services.people_index import PeopleIndex, fts_query_from_search, normalize_profile_url
+
+
+@pytest.fixture
+def index(tmp_path) -> PeopleIndex:
+    return PeopleIndex(db_path=tmp_path / "people.db", fresh_days=30)
+
+
+def _person(slug: str, name: str, position: str, snippet: str = "") -> dict:
+    return {"name": name, "position": position, "linkedin_url": f"https://uk.linkedin.com/in/{slug}/?trk=x", "snippet": snippet}
+
+
+def test_matched_terms_drop_operators_and_exclusions():
+    from src.services.people_index import matched_terms
+
+    assert matched_terms('site:linkedin.com/in/ ("VP" OR "Director") "M&A" -"intern"') == "VP Director M&A"
+
+
+def test_query_translation():
+    query = 'site:linkedin.com/in/ ("Vice President" OR "Director") "M&A" "New York" -"intern"'
+    assert fts_query_from_search(query) == (
+        '("Vice President" OR "Director") AND ("M&A") AND ("New York") NOT ("intern")'
+    )
+    assert fts_query_from_search("site:linkedin.com/in/") == ""
+    assert normalize_profile_url("http://de.linkedin.com/in/ada-l/?x=1#top") == "https://www.linkedin.com/in/ada-l"
+
+
+def test_upsert_and_ranked_search(index):
+    index.add([
+        _person("ada", "Ada Lovelace", "Vice President at Goldman Sachs", "Location: New York · M&A coverage"),
+        _person("alan", "Alan Turing", "Director - Morgan Stanley", "Location: London"),
+        _person("grace", "Grace Hopper", "Intern at Goldman Sachs", "Location: New York"),
+    ], source="test", seen_at=time.time() - 100)
+    index.add([_person("ada", "Ada Lovelace", "", "")], source="again")
+
+    hits = index.search('site:linkedin.com/in/ ("Vice President" OR "Director") -"intern"', limit=5)
+    assert {h["name"] for h in hits} == {"Ada Lovelace", "Alan Turing"}
+    ada = next(h for h in hits if h["name"] == "Ada Lovelace")
+    # Empty fields on re-discovery keep the stored values
+    assert (ada["title"], ada["company"], ada["location"]) == ("Vice President", "Goldman Sachs", "New York")
+    assert ada["url"] == "https://www.linkedin.com/in/ada"
+    assert ada["first_seen"] < ada["last_seen"]
+
+    assert [h["name"] for h in index.search('"New York" "M&A"')] == ["Ada Lovelace"]
+
+
+def test_stale_profiles_are_not_served(index):
+    index.add([_person("old", "Old Timer", "Partner at Lazard")], source="test", seen_at=time.time() - 40 * 86400)
+    assert index.search('"Partner"') == []
+    assert len(index.search('"Partner"', max_age_days=60)) == 1
+    assert index.stats()["people"] == 1 and index.stats()["fresh"] == 0
+
+
+def test_backfill_from_find_target_logs(index, tmp_path):
+    day = tmp_path / "logs" / "2026-10-01"
+    day.mkdir(parents=True)
+    (day / "120000_abc.json").write_text(json.dumps({
+        "timestamp": "2026-10-01T12:00:00+00:00",
+        "metadata": {"method": "serpapi_direct_with_ai_scoring"},
+        "recommendations": [
+            {"name": "Ada Lovelace", "position": "VP at Evercore", "linkedin_url": "https://www.linkedin.com/in/ada"},
+            {"name": "No Profile", "linkedin_url": "https://www.linkedin.com/search/results/people/?keywords=x"},
+        ],
+    }))
+    (day / "broken.json").write_text("{")
+    assert index.backfill(tmp_path / "logs") == (1, 1)
+    assert index.search('"Evercore"', max_age_days=10_000)[0]["source"] == "backfill:serpapi_direct_with_ai_scoring"
+
+
+def test_local_index_fills_before_serpapi(index, monkeypatch):
+    monkeypatch.setattr(email_agent, "people_index", index)
+    calls = []
+
+    def serpapi(preferences, field, purpose, count, paging=None, raise_errors=False):
+        calls.append(count)
+        return [{"name": "Remote", "linkedin_url": "https://www.linkedin.com/in/ada", "position": "VP"}]
+
+    monkeypatch.setattr(email_agent, "_search_linkedin_via_serpapi", serpapi)
+    prefs = {"target_role_titles": ["Vice President"]}
+    query = email_agent._build_serpapi_search_query(prefs, "Finance", "")
+    assert '"Finance"' in query  # not in the profiles' own text, matched via the indexed query terms
+    index.add([_person("ada", "Ada Lovelace", "Vice President at Evercore"),
+               _person("bob", "Bob Stone", "Vice President at Lazard")], source="test", query=query)
+    index.add([_person("eve", "Eve Park", "Vice President at Pfizer")], source="test", query='"Vice President" "Pharma"')
+
+    served = email_agent._find_linkedin_candidates(prefs, "Finance", "", count=2)
+    assert calls == [] and {c["name"] for c in served} == {"Ada Lovelace", "Bob Stone"}
+    assert served[0]["position"].startswith("Vice President at ")
+
+    merged = email_agent._find_linkedin_candidates(prefs, "Finance", "", count=3)
+    assert calls == [3]
+    # SerpAPI and local candidates are merged and ordered by the same prerank score before truncating,
+    # so the local "Vice President" outranks the remote "VP" instead of trailing it
+    assert [c["name"] for c in merged] == ["Bob Stone", "Remote"]
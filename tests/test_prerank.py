@@ -0,0 +1,81 @@
+"""prerank 单元测试：BM25 本地预排序，以及只把前 K 个候选人交给 LLM。"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+from src import email_agent
+from src.services.prerank import bm25_scores, build_query, local_match_score, prerank, tokenize
+
+
+def _candidate(name: str, position: str, snippet: str = "") -> dict:
+    return {
+        "name": name,
+        "position": position,
+        "linkedin_url": f"https://www.linkedin.com/in/{name.lower().replace(' ', '-')}",
+        "evidence": [snippet] if snippet else [],
+        "match_score": 75,
+    }
+
+
+CANDIDATES = [
+    _candidate("Ann Intern", "Summer Intern at Lidl", "Retail operations"),
+    _candidate("Bo Vp", "Vice President, M&A at Evercore", "New York · M&A advisory for TMT"),
+    _candidate("Cy Assoc", "Associate at Evercore", "Healthcare M&A, Stanford alum"),
+    _candidate("Di Chef", "Chef", "Cooking"),
+]
+PREFERENCES = {"target_role_titles": ["Vice President"], "group": "M&A", "sector": "TMT", "location": "New York"}
+SENDER = {"education": ["Stanford University, BS 2021"], "experiences": ["Analyst at Lazard (2021-2023)"]}
+
+
+def test_tokenize_keeps_finance_terms():
+    assert tokenize("VP, M&A / S&T at J.P. Morgan") == ["vp", "m&a", "s&t", "j", "p", "morgan"]
+
+
+def test_query_weights_and_sender_overlap():
+    query = build_query(PREFERENCES, SENDER)
+    assert query["vice"] == 3.0 and query["m&a"] == 2.0 and query["tmt"] == 1.5
+    assert query["stanford"] == 1.0 and query["lazard"] == 1.0
+    # Generic school / year / role words are not shared background
+    assert not {"university", "2021", "analyst"} & query.keys()
+
+
+def test_bm25_prefers_rare_and_heavier_terms():
+    docs = [["m&a", "vp"], ["m&a"], ["chef"]]
+    scores = bm25_scores(docs, {"vp": 3.0, "m&a": 1.0})
+    assert scores[0][0] > scores[1][0] > scores[2][0] == 0.0
+    assert scores[0][1] == ["vp", "m&a"]
+
+
+def test_prerank_order_and_local_scores():
+    ranked = prerank(CANDIDATES, PREFERENCES, SENDER)
+    assert [CANDIDATES[r.index]["name"] for r in ranked] == ["Bo Vp", "Cy Assoc", "Ann Intern", "Di Chef"]
+    assert local_match_score(ranked[0].score, ranked[0].score) == 75
+    assert local_match_score(0.0, ranked[0].score) == 60
+
+
+def test_only_top_k_candidates_reach_the_llm(monkeypatch):
+    prompts = []
+
+    async def fake_llm(prompt, **kwargs):
+        prompts.append(prompt)
+        return json.dumps({"scored_candidates": [
+            {"name": "Bo Vp", "match_score": 90, "match_reason": "VP in M&A"},
+            {"name": "Cy Assoc", "match_score": 80, "match_reason": "Shared school"},
+        ]})
+
+    monkeypatch.setattr(email_agent, "_acall_llm", fake_llm)
+    monkeypatch.setattr(email_agent, "PRERANK_TOP_K", 2)
+    candidates = [dict(c) for c in CANDIDATES]
+    result = asyncio.run(email_agent._aai_score_and_analyze_candidates(
+        candidates, sender_profile=SENDER, preferences=PREFERENCES, purpose="coffee chat", field="Finance",
+    ))
+
+    assert len(prompts) == 1
+    assert "Bo Vp" in prompts[0] and "Cy Assoc" in prompts[0]
+    assert "Ann Intern" not in prompts[0] and "Di Chef" not in prompts[0]
+    assert [c["name"] for c in result] == ["Bo Vp", "Cy Assoc", "Ann Intern", "Di Chef"]
+    assert [c["match_score"] for c in result[:2]] == [90, 80]
+    assert all(60 <= c["match_score"] <= 75 and "ranked locally" in c["match_reason"] for c in result[2:])
+    assert all(c.get("id") for c in result)
@@ -0,0 +1,57 @@
+"""Prompt prefix layout / accounting 单元测试。"""
+
+from __future__ import annotations
+
+from src.email_agent import (
+    EMAIL_SYSTEM_PREFIX,
+    RESTYLE_SYSTEM_PREFIX,
+    ReceiverProfile,
+    SenderProfile,
+    build_prompt,
+)
+from src.services.prompt_layout import PromptAccounting, PromptPrefix, estimate_tokens
+
+# Editing a prefix must come with a version bump; update the pin together with it.
+PINNED_PREFIXES = {
+    "build_prompt": ("v2", "4635e0d29caa"),
+    "regenerate_email_with_style": ("v2", "e18efc372f0e"),
+}
+
+
+def test_prefix_fingerprints_are_pinned_to_versions():
+    for prefix in (EMAIL_SYSTEM_PREFIX, RESTYLE_SYSTEM_PREFIX):
+        assert (prefix.version, prefix.fingerprint) == PINNED_PREFIXES[prefix.name]
+
+
+def test_build_prompt_system_message_is_byte_stable(sample_sender, sample_receiver, minimal_sender, minimal_receiver):
+    plain = build_prompt(sample_sender, sample_receiver, "ask for a chat")
+    templated = build_prompt(minimal_sender, minimal_receiver, "other goal", template="Hi {name}, ...")
+
+    assert plain[0]["content"] == templated[0]["content"] == EMAIL_SYSTEM_PREFIX.text
+    assert sample_sender.name in plain[1]["content"]
+    assert sample_sender.name not in plain[0]["content"]
+    assert "<template>" in templated[1]["content"]
+
+
+def test_accounting_reports_cacheable_share():
+    accounting = PromptAccounting()
+    prefix = PromptPrefix(name="demo", version="v1", text="x" * 300)
+
+    accounting.record(prefix, "y" * 100)
+    accounting.record(prefix, "y" * 100)
+    accounting.record_usage("demo", prompt_tokens=100, cached_tokens=75)
+
+    report = accounting.report()["demo"]
+    assert report["calls"] == 2
+    assert report["prefix_chars"] == 600 and report["suffix_chars"] == 200
+    assert report["prefix_tokens_est"] == 2 * estimate_tokens("x" * 300)
+    assert report["cacheable_ratio"] == 0.75
+    assert report["observed_cached_ratio"] == 0.75
+    assert report["fingerprint"] == prefix.fingerprint
+
+
+def test_prefix_cache_key_changes_with_text():
+    a = PromptPrefix(name="demo", version="v1", text="rules")
+    b = PromptPrefix(name="demo", version="v1", text="rules!")
+    assert a.cache_key != b.cache_key
+    assert a.cache_key.startswith("demo:v1:")
@@ -0,0 +1,114 @@
+"""LinkedIn 搜索查询规划测试：互补查询、并发执行、按 URL 去重、凑够人数即停止。"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from src import email_agent
+
+
+PREFS = {
+    "target_role_titles": ["Associate", "Vice President"],
+    "bank_tier": "eb",
+    "location": "New York",
+}
+
+
+def test_plan_covers_firms_titles_and_location():
+    queries = email_agent._plan_serpapi_search_queries(PREFS, "Finance", "", max_queries=10)
+    assert queries[0] == email_agent._build_serpapi_search_query(PREFS, "Finance", "")
+    assert any('"Evercore"' in q and '"Lazard"' not in q for q in queries)
+    assert any('"Lazard"' in q and '"Evercore"' not in q for q in queries)
+    assert any('"Associate"' in q and '"Vice President"' not in q for q in queries)
+    assert any('"New York"' not in q for q in queries)
+    assert len(queries) == len(set(queries)) == 7
+    assert len(email_agent._plan_serpapi_search_queries(PREFS, "Finance", "", max_queries=3)) == 3
+
+
+def test_single_query_plan_uses_plain_search(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        email_agent, "_search_linkedin_via_serpapi",
+        lambda preferences, field, purpose, count, paging=None, raise_errors=False: calls.append(count) or [],
+    )
+    assert email_agent._search_linkedin_planned({"seniority": "VP"}, "Finance", "", 5) == []
+    assert calls == [5]
+
+
+@pytest.fixture
+def fake_search(monkeypatch):
+    issued: list[str] = []
+    lock = threading.Lock()
+
+    def search(preferences, field, purpose, count, *, query=None, paging=None, raise_errors=False):
+        with lock:
+            index = len(issued)
+            issued.append(query)
+        time.sleep(0.05)
+        if index == 1:
+            raise ConnectionError("down")
+        # Every query finds one shared profile and two of its own
+        slug = f"q{index}"
+        return [
+            {"name": "Shared", "linkedin_url": "https://www.linkedin.com/in/shared/"},
+            {"name": f"{slug}-a", "linkedin_url": f"https://www.linkedin.com/in/{slug}-a"},
+            {"name": f"{slug}-b", "linkedin_url": f"https://uk.linkedin.com/in/{slug}-b"},
+        ]
+
+    monkeypatch.setattr(email_agent, "_search_linkedin_via_serpapi", search)
+    monkeypatch.setattr(email_agent, "SERPAPI_PLANNER_CONCURRENCY", 2)
+    return issued
+
+
+def test_fanout_dedupes_and_stops_once_count_is_reached(fake_search):
+    results = email_agent._search_linkedin_planned(PREFS, "Finance", "", count=4)
+    names = [r["name"] for r in results]
+    assert len(names) == 4 and names.count("Shared") == 1
+    assert names[:3] == ["Shared", "q0-a", "q0-b"]
+    # 2 in flight at a time: the failing query is replaced, then enough profiles are in
+    assert 2 < len(fake_search) < len(email_agent._plan_serpapi_search_queries(PREFS, "Finance", ""))
+
+
+def test_all_queries_failing_raises_for_the_breaker(monkeypatch):
+    def search(*args, **kwargs):
+        raise TimeoutError("slow")
+
+    monkeypatch.setattr(email_agent, "_search_linkedin_via_serpapi", search)
+    with pytest.raises(TimeoutError):
+        email_agent._search_linkedin_planned(PREFS, "Finance", "", count=4, raise_errors=True)
+    assert email_agent._search_linkedin_planned(PREFS, "Finance", "", count=4) == []
+
+
+def test_primary_paging_is_only_taken_from_a_completed_primary_query(monkeypatch):
+    primary = email_agent._plan_serpapi_search_queries(PREFS, "Finance", "")[0]
+    release, finished = threading.Event(), threading.Event()
+
+    def search(preferences, field, purpose, count, *, query=None, paging=None, raise_errors=False):
+        if query == primary:
+            release.wait(5)
+        else:
+            time.sleep(0.05)
+        paging.update(start=20, organic=20)
+        if query == primary:
+            finished.set()
+        slug = "primary" if query == primary else f"q{abs(hash(query))}"
+        return [{"name": f"{slug}-{i}", "linkedin_url": f"https://www.linkedin.com/in/{slug}-{i}"} for i in range(2)]
+
+    monkeypatch.setattr(email_agent, "_search_linkedin_via_serpapi", search)
+    monkeypatch.setattr(email_agent, "SERPAPI_PLANNER_CONCURRENCY", 2)
+
+    # The second query alone fills the page; the primary query is still running
+    paging: dict = {}
+    assert len(email_agent._search_linkedin_planned(PREFS, "Finance", "", count=2, paging=paging)) == 2
+    release.set()
+    assert finished.wait(5)
+    time.sleep(0.05)
+    assert paging == {}
+
+    # Once the primary query is part of the page, its paging is reported
+    paging = {}
+    email_agent._search_linkedin_planned(PREFS, "Finance", "", count=4, paging=paging)
+    assert paging == {"start": 20, "organic": 20}
@@ -0,0 +1,187 @@
+"""RateLimiter（跨 worker 令牌桶）单元测试。"""
+
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from src.services.rate_limiter import (
+    DEFAULT_RATE_LIMITS,
+    RateLimiter,
+    RateLimitTimeout,
+    _parse_limit_overrides,
+)
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _limiter(tmp_path, clock, **kwargs) -> RateLimiter:
+    params = dict(
+        db_path=tmp_path / "rate_limits.db",
+        limits={"openai": {"rpm": 2, "tpm": 1200}, "openai:gpt-4o": {"tpm": 600}, "serpapi": {"rpm": 60}},
+        max_wait=0,
+        output_tokens=0,
+        clock=clock,
+    )
+    params.update(kwargs)
+    return RateLimiter(**params)
+
+
+def test_requests_per_minute_shared_across_instances(tmp_path):
+    clock = _Clock()
+    # Two instances on one database behave like two gunicorn workers
+    worker_a = _limiter(tmp_path, clock)
+    worker_b = _limiter(tmp_path, clock)
+
+    worker_a.acquire("openai", model="gpt-4o-mini")
+    worker_b.acquire("openai", model="gpt-4o-mini")
+    with pytest.raises(RateLimitTimeout):
+        worker_a.acquire("openai", model="gpt-4o-mini")
+
+    # rpm=2 refills one request every 30s
+    clock.now += 30
+    worker_b.acquire("openai", model="gpt-4o-mini")
+    assert worker_a.snapshot()["queues"]["openai:gpt-4o-mini"]["timeouts"] == 1
+
+
+def test_model_override_limits_tokens(tmp_path):
+    clock = _Clock()
+    limiter = _limiter(tmp_path, clock)
+    assert limiter.limits_for("openai", "gpt-4o") == {"rpm": 2, "tpm": 600}
+
+    limiter.acquire("openai", model="gpt-4o", tokens=500)
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire("openai", model="gpt-4o", tokens=500)
+    # Other models are not limited by gpt-4o's override, only by the provider-wide budget
+    limiter.acquire("openai", model="gpt-4o-mini", tokens=700)
+    assert limiter.levels()["openai:tpm"] == 0
+
+
+def test_provider_bucket_caps_all_models_together(tmp_path):
+    limiter = _limiter(tmp_path, _Clock())
+    # openai rpm=2 is an account limit: spreading calls over models does not raise it
+    limiter.acquire("openai", model="gpt-4o")
+    limiter.acquire("openai", model="gpt-4o-mini")
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire("openai", model="gpt-5.1")
+    levels = limiter.levels()
+    assert levels["openai:rpm"] == 0
+    assert levels["openai:gpt-4o:rpm"] == 1
+
+
+def test_oversized_request_is_capped_to_bucket_size(tmp_path):
+    limiter = _limiter(tmp_path, _Clock())
+    limiter.acquire("openai", model="gpt-4o", tokens=10_000)
+    assert limiter.levels()["openai:gpt-4o:tpm"] == 0
+
+
+def test_waiters_queue_until_capacity(tmp_path):
+    limiter = _limiter(tmp_path, time.time, limits={"serpapi": {"rpm": 120}}, max_wait=5)
+    # Drain the bucket, then a waiter needs up to 0.5s for the next token
+    for _ in range(120):
+        limiter.acquire("serpapi")
+    waited = limiter.acquire("serpapi")
+    assert 0 < waited < 2
+    stats = limiter.snapshot()["queues"]["serpapi"]
+    assert stats["waited"] == 1
+    assert stats["queue_depth"] == 0
+    assert stats["max_wait_seconds"] > 0
+
+
+def test_async_acquire_waits_without_blocking_loop(tmp_path):
+    limiter = _limiter(tmp_path, time.time, limits={"gemini": {"rpm": 120}}, max_wait=5)
+    for _ in range(120):
+        limiter.acquire("gemini", model="gemini-2.5-flash")
+    ticks = 0
+
+    async def ticker() -> None:
+        nonlocal ticks
+        for _ in range(5):
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    async def main() -> float:
+        waited, _ = await asyncio.gather(limiter.aacquire("gemini", model="gemini-2.5-flash"), ticker())
+        return waited
+
+    assert asyncio.run(main()) > 0
+    assert ticks == 5
+
+
+def test_async_acquire_runs_sqlite_off_the_loop(tmp_path):
+    limiter = _limiter(tmp_path, time.time, limits={"gemini": {"rpm": 120}})
+    # Another worker holds the write lock on the shared database
+    blocker = sqlite3.connect(str(tmp_path / "rate_limits.db"), isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    ticks = 0
+
+    async def ticker() -> None:
+        nonlocal ticks
+        for _ in range(10):
+            await asyncio.sleep(0.02)
+            ticks += 1
+        blocker.execute("COMMIT")
+
+    async def acquire() -> int:
+        await limiter.aacquire("gemini")
+        return ticks
+
+    async def main() -> int:
+        ticks_at_acquire, _ = await asyncio.gather(acquire(), ticker())
+        return ticks_at_acquire
+
+    try:
+        ticks_at_acquire = asyncio.run(main())
+    finally:
+        blocker.close()
+    # The loop kept running while the acquire waited on the lock, which it got after the COMMIT
+    assert ticks_at_acquire == 10
+    assert limiter.snapshot()["queues"]["gemini"]["acquired"] == 1
+
+
+def test_concurrent_threads_never_exceed_bucket(tmp_path):
+    clock = _Clock()
+    limiter = _limiter(tmp_path, clock, limits={"serpapi": {"rpm": 10}})
+    granted = []
+    lock = threading.Lock()
+
+    def worker() -> None:
+        try:
+            limiter.acquire("serpapi")
+        except RateLimitTimeout:
+            return
+        with lock:
+            granted.append(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(25)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(granted) == 10
+
+
+def test_disabled_and_unlimited_providers_pass_through(tmp_path):
+    limiter = _limiter(tmp_path, _Clock(), enabled=False)
+    for _ in range(5):
+        assert limiter.acquire("openai", model="gpt-4o") == 0.0
+    limiter = _limiter(tmp_path, _Clock())
+    for _ in range(5):
+        assert limiter.acquire("unknown-provider") == 0.0
+
+
+def test_parse_limit_overrides():
+    limits = _parse_limit_overrides('{"openai:gpt-4o": {"tpm": 30000}, "serpapi": {"rpm": "x"}}', DEFAULT_RATE_LIMITS)
+    assert limits["openai:gpt-4o"] == {"tpm": 30000.0}
+    assert limits["serpapi"] == DEFAULT_RATE_LIMITS["serpapi"]
+    assert _parse_limit_overrides("not json", DEFAULT_RATE_LIMITS) is DEFAULT_RATE_LIMITS
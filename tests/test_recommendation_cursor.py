@@ -0,0 +1,254 @@
+import asyncio
+import threading
+
+import pytest
+
+from src import email_agent
+from src.services.serpapi_client import SerpAPIError
+from src.services.recommendation_cursor import (
+    RecommendationCursor,
+    RecommendationCursorStore,
+    candidate_keys,
+    search_key,
+)
+
+
+def _person(i):
+    return {"name": f"Person {i}", "linkedin_url": f"https://www.linkedin.com/in/person-{i}"}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = RecommendationCursorStore(db_path=tmp_path / "cursors.db", ttl=3600)
+    monkeypatch.setattr(email_agent, "recommendation_cursors", store)
+    return store
+
+
+def test_search_key_ignores_case_and_whitespace_but_not_preferences():
+    key = search_key("Coffee chat", "Investment  Banking", {"location": "NYC"})
+    assert key == search_key(" coffee chat", "investment banking", {"location": "NYC"})
+    assert key != search_key("coffee chat", "investment banking", {"location": "SF"})
+
+
+def test_candidate_keys_normalize_url_and_name():
+    keys = candidate_keys({"name": " Alice  Chen ", "linkedin_url": "https://uk.linkedin.com/in/alice/?trk=x"})
+    assert keys == {"alice chen", "https://www.linkedin.com/in/alice"}
+
+
+def test_cursor_round_trip_is_scoped_to_user_and_search(store):
+    key = search_key("coffee chat", "IB", {})
+    cursor = store.create("user-1", key, start=20)
+    cursor.mark_shown([_person(1)])
+    cursor.pending = [{**_person(2), "match_score": 80}]
+    store.save(cursor)
+
+    loaded = store.get(cursor.cursor_id, "user-1", key)
+    assert loaded == cursor
+    assert loaded.is_shown({"name": "person 1"})
+    assert store.get(cursor.cursor_id, "user-2", key) is None
+    assert store.get(cursor.cursor_id, "user-1", search_key("coffee chat", "PE", {})) is None
+    assert store.stats()["active"] == 1
+
+
+def test_expired_cursor_is_not_returned(tmp_path):
+    store = RecommendationCursorStore(db_path=tmp_path / "cursors.db", ttl=1)
+    cursor = store.create("u", "k")
+    store.save(cursor)
+    assert store.get(cursor.cursor_id, "u", "k") is not None
+    with store._connect() as conn:
+        conn.execute("UPDATE recommendation_cursors SET expires_at = 0")
+    assert store.get(cursor.cursor_id, "u", "k") is None
+
+
+class _EmptyIndex:
+    def search(self, query, *, limit):
+        return []
+
+
+@pytest.fixture
+def pipeline(store, monkeypatch):
+    # start -> (organic result count or None when nothing was fetched, parsed profiles) or an error to raise
+    state = {"pages": {}, "starts": [], "scored": []}
+
+    def search(preferences, field, purpose, count, *, start=0, paging=None, raise_errors=False):
+        state["starts"].append(start)
+        page = state["pages"].get(start, (0, []))
+        if isinstance(page, Exception):
+            raise page
+        organic, profiles = page
+        if organic is not None:
+            paging.update(start=start + count, organic=organic)
+        return [dict(c) for c in profiles]
+
+    async def score(*, candidates, **kwargs):
+        state["scored"].append([c["name"] for c in candidates])
+        return [{**c, "match_score": 90 - int(c["name"].split()[-1])} for c in candidates]
+
+    monkeypatch.setattr(email_agent, "people_index", _EmptyIndex())
+    monkeypatch.setattr(email_agent, "_search_linkedin_via_serpapi", search)
+    monkeypatch.setattr(email_agent, "_aai_score_and_analyze_candidates", score)
+    return state
+
+
+def _more(cursor, count):
+    return asyncio.run(email_agent.afind_more_recommendations("coffee chat", "IB", cursor=cursor, count=count))
+
+
+def test_next_page_fetches_only_the_next_serpapi_page_and_skips_shown(store, pipeline):
+    first_page = [_person(i) for i in range(3)]
+    cursor = email_agent.open_recommendation_cursor(
+        "u", "coffee chat", "IB", {}, first_page, serpapi_paging={"start": 6, "organic": 6}
+    )
+    assert cursor.start == 6
+    # Page at start=6 repeats an already-shown person
+    pipeline["pages"][6] = (20, [_person(1), _person(3), _person(4), _person(5), _person(6)])
+
+    page = _more(cursor, 2)
+
+    assert [r["name"] for r in page] == ["Person 3", "Person 4"]
+    assert pipeline["starts"] == [6]
+    # Shown people are never re-scored; extra scored people wait in the cursor
+    assert pipeline["scored"] == [["Person 3", "Person 4", "Person 5", "Person 6"]]
+    assert [c["name"] for c in cursor.pending] == ["Person 5", "Person 6"]
+    assert cursor.start == 26
+
+    # The next page is served from already-scored candidates: no search, no scoring
+    page = _more(cursor, 2)
+    assert [r["name"] for r in page] == ["Person 5", "Person 6"]
+    assert pipeline["starts"] == [6]
+    assert len(pipeline["scored"]) == 1
+    assert cursor.has_more
+
+
+def test_first_page_without_primary_query_starts_at_zero(store, pipeline):
+    # e.g. served from the people index or an LLM stage: nothing of the primary query was fetched
+    cursor = email_agent.open_recommendation_cursor("u", "coffee chat", "IB", {}, [_person(0)], serpapi_paging={})
+    assert cursor.start == 0
+    pipeline["pages"][0] = (20, [_person(0), _person(1)])
+
+    assert [r["name"] for r in _more(cursor, 1)] == ["Person 1"]
+    assert pipeline["starts"] == [0]
+
+
+def test_only_an_empty_google_page_exhausts_the_cursor(store, pipeline):
+    cursor = email_agent.open_recommendation_cursor(
+        "u", "coffee chat", "IB", {}, [_person(0)], serpapi_paging={"start": 10, "organic": 10}
+    )
+    # No parseable profiles on this page, but Google has results: keep paging
+    pipeline["pages"][10] = (20, [])
+
+    assert _more(cursor, 5) == []
+    assert pipeline["starts"] == [10, 30]
+    assert cursor.exhausted and not cursor.has_more
+    assert pipeline["scored"] == []
+
+
+def test_failed_request_keeps_offset_and_pagination(store, pipeline):
+    cursor = email_agent.open_recommendation_cursor(
+        "u", "coffee chat", "IB", {}, [_person(0)], serpapi_paging={"start": 10, "organic": 10}
+    )
+    # No API key: the search returns without fetching a page
+    pipeline["pages"][10] = (None, [])
+
+    assert _more(cursor, 5) == []
+    assert pipeline["starts"] == [10]
+    assert cursor.start == 10 and not cursor.exhausted and cursor.has_more
+
+    # A SerpAPI error body (e.g. quota used up) is raised by the search
+    pipeline["pages"][10] = SerpAPIError("Your account has run out of searches.")
+    assert _more(cursor, 5) == []
+    assert cursor.start == 10 and not cursor.exhausted
+
+    pipeline["pages"][10] = (20, [_person(1)])
+    assert [r["name"] for r in _more(cursor, 5)] == ["Person 1"]
+
+
+@pytest.mark.parametrize(
+    "key, response, expected",
+    [
+        (None, None, {}),
+        ("k", {"error": "Invalid API key."}, {}),
+        ("k", {"error": "Google hasn't returned any results for this query."}, {"start": 40, "organic": 0}),
+        ("k", {"organic_results": [{"link": "https://example.com/jobs", "title": "Jobs"}]}, {"start": 40, "organic": 1}),
+    ],
+)
+def test_search_reports_paging_only_for_completed_requests(monkeypatch, key, response, expected):
+    monkeypatch.setattr(email_agent, "serpapi_key", lambda: key)
+    monkeypatch.setattr(email_agent.serpapi_client, "search", lambda params: dict(response))
+    paging: dict = {}
+    results = email_agent._search_linkedin_via_serpapi({}, "IB", "", 10, query=f"q {key} {response}", start=20, paging=paging)
+    assert results == []
+    assert paging == expected
+
+
+def test_concurrent_saves_of_one_cursor_conflict(store):
+    cursor = store.create("u", "k")
+    assert store.save(cursor) and cursor.version == 1
+
+    # Two "load more" requests read the same state
+    first = store.get(cursor.cursor_id, "u", "k")
+    second = store.get(cursor.cursor_id, "u", "k")
+    first.start, second.start = 20, 20
+    assert store.save(first)
+    assert not store.save(second)
+
+    assert store.get(cursor.cursor_id, "u", "k").version == 2
+    # A fresh cursor id is never overwritten by a second "first" save
+    assert not store.save(RecommendationCursor(cursor_id=cursor.cursor_id, user_id="u", search_key="k"))
+    assert store.stats()["conflicts"] == 2
+
+
+def test_expired_cursors_are_purged_every_hundred_saves(store):
+    expired = store.create("u", "k")
+    store.save(expired)
+    with store._connect() as conn:
+        conn.execute("UPDATE recommendation_cursors SET expires_at = 0 WHERE cursor_id = ?", (expired.cursor_id,))
+    cursor = store.create("u", "k")
+    store.save(cursor)
+    for _ in range(97):
+        assert store.save(cursor)
+    with store._connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM recommendation_cursors").fetchone()[0] == 2
+    store.save(cursor)  # 100th save
+    with store._connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM recommendation_cursors").fetchone()[0] == 1
+
+
+def test_cursor_ignores_a_primary_query_that_finishes_after_the_early_break(store, pipeline, monkeypatch):
+    prefs = {"location": "New York"}  # plans a second query without the location
+    primary = email_agent._build_serpapi_search_query(prefs, "IB", "coffee chat")
+    release, finished = threading.Event(), threading.Event()
+    page_search = email_agent._search_linkedin_via_serpapi
+
+    def search(preferences, field, purpose, count, *, query=None, start=0, paging=None, raise_errors=False):
+        if query is None:  # "load more" pages the primary query
+            return page_search(preferences, field, purpose, count, start=start, paging=paging)
+        if query == primary:
+            release.wait(5)
+        paging.update(start=20, organic=20)
+        if query == primary:
+            finished.set()
+            return [_person(9)]
+        return [_person(1), _person(2)]
+
+    monkeypatch.setattr(email_agent, "_search_linkedin_via_serpapi", search)
+    paging: dict = {}
+    first_page = email_agent._search_linkedin_planned(prefs, "IB", "coffee chat", 2, paging=paging)
+    assert [c["name"] for c in first_page] == ["Person 1", "Person 2"]
+    release.set()
+    assert finished.wait(5)
+
+    cursor = email_agent.open_recommendation_cursor("u", "coffee chat", "IB", prefs, first_page, serpapi_paging=paging)
+    # The primary query's first page was never served: "load more" starts from it
+    assert cursor.start == 0
+    pipeline["pages"][0] = (20, [_person(9), _person(3)])
+    page = asyncio.run(
+        email_agent.afind_more_recommendations("coffee chat", "IB", preferences=prefs, cursor=cursor, count=2)
+    )
+    assert [r["name"] for r in page] == ["Person 3", "Person 9"]
+    assert pipeline["starts"] == [0]
+
+
+def test_incomplete_paging_does_not_seed_the_cursor(store):
+    cursor = email_agent.open_recommendation_cursor("u", "coffee chat", "IB", {}, [], serpapi_paging={"start": 20})
+    assert cursor.start == 0
@@ -0,0 +1,139 @@
+"""RetryPolicy 单元测试。"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import urllib.error
+from email.message import Message
+
+import pytest
+
+from src.services import retry_policy as retry_module
+from src.services.retry_policy import RetryPolicy, is_retryable, retry_after_seconds
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code: int, headers: dict | None = None) -> None:
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = type("Resp", (), {"headers": headers or {}})()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded: list[float] = []
+    monkeypatch.setattr(retry_module.time, "sleep", recorded.append)
+    return recorded
+
+
+def _policy(**kwargs) -> RetryPolicy:
+    params = dict(max_attempts=3, base_delay=1.0, max_delay=8.0, deadline=60, rng=random.Random(0))
+    params.update(kwargs)
+    return RetryPolicy(**params)
+
+
+def test_success_on_first_attempt_does_not_retry(sleeps):
+    policy = _policy()
+    assert policy.call("openai", lambda: "ok") == "ok"
+    assert sleeps == []
+    stats = policy.stats()["openai"]
+    assert stats["attempts"] == 1 and stats["retries"] == 0
+    assert stats["succeeded_on_attempt"] == {"1": 1}
+
+
+def test_retries_transient_error_then_succeeds(sleeps):
+    policy = _policy()
+    outcomes = [_StatusError(503), ConnectionResetError("reset"), "ok"]
+
+    def call():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert policy.call("gemini", call) == "ok"
+    assert len(sleeps) == 2
+    # Full jitter: each delay is within [0, base * 2**n]
+    assert 0 <= sleeps[0] <= 1.0 and 0 <= sleeps[1] <= 2.0
+    stats = policy.stats()["gemini"]
+    assert stats["retries"] == 2
+    assert stats["errors"] == {"http_503": 1, "ConnectionResetError": 1}
+    assert stats["succeeded_on_attempt"] == {"3": 1}
+
+
+def test_non_retryable_errors_fail_immediately(sleeps):
+    policy = _policy()
+    for error in (_StatusError(400), ValueError("missing key"), json.JSONDecodeError("x", "", 0)):
+        with pytest.raises(type(error)):
+            policy.call("openai", lambda error=error: (_ for _ in ()).throw(error))
+    assert sleeps == []
+    assert policy.stats()["openai"]["failures"] == 3
+
+
+def test_gives_up_after_max_attempts(sleeps):
+    policy = _policy(max_attempts=2)
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise _StatusError(429)
+
+    with pytest.raises(_StatusError):
+        policy.call("serpapi", call)
+    assert len(calls) == 2
+    assert len(sleeps) == 1
+
+
+def test_retry_after_header_is_honoured(sleeps):
+    policy = _policy()
+    outcomes = [_StatusError(429, {"retry-after": "3"}), "ok"]
+
+    def call():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert policy.call("openai", call) == "ok"
+    assert sleeps == [3.0]
+    assert policy.stats()["openai"]["retry_after_honoured"] == 1
+
+
+def test_deadline_stops_retries(sleeps):
+    policy = _policy(deadline=5)
+
+    def call():
+        raise _StatusError(429, {"retry-after": "10"})
+
+    with pytest.raises(_StatusError):
+        policy.call("openai", call)
+    assert sleeps == []
+    assert policy.stats()["openai"]["gave_up_deadline"] == 1
+
+
+def test_async_call_retries(monkeypatch):
+    policy = _policy(base_delay=0.001)
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise TimeoutError("slow")
+        return "ok"
+
+    assert asyncio.run(policy.acall("gemini_search", call)) == "ok"
+    assert policy.stats()["gemini_search"]["retries"] == 1
+
+
+def test_classification_helpers():
+    headers = Message()
+    headers["Retry-After"] = "2"
+    http_error = urllib.error.HTTPError("https://serpapi.com", 503, "busy", headers, None)
+    assert is_retryable(http_error)
+    assert retry_after_seconds(http_error) == 2.0
+    assert is_retryable(urllib.error.URLError("dns"))
+    assert not is_retryable(urllib.error.HTTPError("https://serpapi.com", 401, "no", Message(), None))
+    assert not is_retryable(RuntimeError("empty response"))
+    assert retry_after_seconds(_StatusError(429, {"retry-after-ms": "250"})) == 0.25
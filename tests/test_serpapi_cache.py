@@ -0,0 +1,87 @@
+"""SerpAPICache 单元测试。"""
+
+from __future__ import annotations
+
+import time
+
+from src.services import serpapi_cache as cache_module
+from src.services.serpapi_cache import SerpAPICache, is_negative, normalize_params, query_type
+
+LOOKUP = {"engine": "google", "q": 'site:linkedin.com/in/ "Jane Doe" "Goldman Sachs"', "api_key": "K1", "num": "3"}
+RESULTS = {"organic_results": [{"link": "https://www.linkedin.com/in/jane-doe", "title": "Jane Doe"}]}
+
+
+def _cache(tmp_path, **kwargs) -> SerpAPICache:
+    params = dict(
+        db_path=tmp_path / "serp.db",
+        ttls={"linkedin_profile": 3600, "news": 60, "google": 600, "default": 600},
+        negative_ttl=120,
+    )
+    params.update(kwargs)
+    return SerpAPICache(**params)
+
+
+def test_key_ignores_api_key_case_and_whitespace():
+    other = {**LOOKUP, "api_key": "K2", "q": '  SITE:linkedin.com/in/  "jane doe"   "Goldman Sachs" '}
+    assert SerpAPICache.make_key(LOOKUP) == SerpAPICache.make_key(other)
+    assert "api_key" not in normalize_params(LOOKUP)
+    assert SerpAPICache.make_key(LOOKUP) != SerpAPICache.make_key({**LOOKUP, "num": "10"})
+
+
+def test_query_types_and_ttls(tmp_path):
+    cache = _cache(tmp_path)
+    assert query_type(LOOKUP) == "linkedin_profile"
+    assert query_type({"engine": "google", "q": "x", "tbm": "nws"}) == "news"
+    assert query_type({"engine": "google", "q": "x"}) == "google"
+    assert query_type({"engine": "google", "q": "x"}, "news") == "news"
+    assert cache.ttl_for({"engine": "google", "q": "x"}, kind="news") == 60
+    assert cache.ttl_for(LOOKUP) == 3600
+    assert cache.ttl_for(LOOKUP, negative=True) == 120
+    assert cache.ttl_for({"engine": "bing", "q": "x"}) == 600
+
+
+def test_hit_is_shared_across_instances(tmp_path):
+    calls: list[int] = []
+
+    def fetch() -> dict:
+        calls.append(1)
+        return RESULTS
+
+    assert _cache(tmp_path).get_or_call(LOOKUP, fetch) == RESULTS
+    other_worker = _cache(tmp_path)
+    assert other_worker.get_or_call({**LOOKUP, "api_key": "K2"}, fetch) == RESULTS
+    assert calls == [1]
+    stats = other_worker.stats()
+    assert stats["hits"] == 1 and stats["hit_rate"] == 1.0
+    assert stats["hits_by_type"] == {"linkedin_profile": 1}
+    assert stats["entries"] == 1
+
+
+def test_negative_results_are_cached_with_short_ttl(tmp_path, monkeypatch):
+    cache = _cache(tmp_path)
+    empty = {"search_metadata": {"status": "Success"}, "organic_results": []}
+    assert is_negative(empty)
+    assert is_negative({"error": "Google hasn't returned any results for this query."})
+    cache.set(LOOKUP, empty)
+    assert cache.get(LOOKUP) == empty
+    assert cache.stats()["negative_hits"] == 1
+
+    now = time.time()
+    monkeypatch.setattr(cache_module.time, "time", lambda: now + 121)
+    assert cache.get(LOOKUP) is None
+
+
+def test_errors_are_not_cached_and_disabled_cache_bypasses(tmp_path):
+    cache = _cache(tmp_path)
+    cache.set(LOOKUP, {"error": "Invalid API key."})
+    assert cache.get(LOOKUP) is None
+
+    disabled = _cache(tmp_path, enabled=False)
+    assert disabled.get_or_call(LOOKUP, lambda: RESULTS) == RESULTS
+    assert disabled.stats()["bypassed"] == 1
+
+
+def test_zero_ttl_type_is_not_cached(tmp_path):
+    cache = _cache(tmp_path, ttls={"linkedin_profile": 0, "default": 600})
+    cache.set(LOOKUP, RESULTS)
+    assert cache.get(LOOKUP) is None
@@ -0,0 +1,112 @@
+"""serpapi_client 单元测试：keep-alive 连接复用、分离的超时、缓存与指标。"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from src.services import serpapi_client as client_module
+from src.services.metrics import MetricsRegistry
+from src.services.serpapi_cache import SerpAPICache
+from src.services.serpapi_client import SerpAPIClient
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    connections: set = set()
+    paths: list = []
+    status = 200
+
+    def do_GET(self):
+        type(self).connections.add(self.client_address)
+        type(self).paths.append(self.path)
+        body = json.dumps({"organic_results": [{"link": "https://x.com", "path": self.path}]}).encode()
+        gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+        if gzipped:
+            body = gzip.compress(body)
+        self.send_response(type(self).status)
+        self.send_header("Content-Type", "application/json")
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.connections = set()
+    _Handler.paths = []
+    _Handler.status = 200
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/search.json"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def client(server, monkeypatch, tmp_path):
+    monkeypatch.setattr(client_module, "serpapi_cache", SerpAPICache(enabled=False))
+    monkeypatch.setattr(client_module, "llm_metrics", MetricsRegistry(db_path=tmp_path / "metrics.db"))
+    monkeypatch.setattr(client_module.rate_limiter, "acquire", lambda *a, **k: 0.0)
+    return SerpAPIClient(endpoint=server, pool_size=2, connect_timeout=1, read_timeout=2)
+
+
+def test_connections_are_reused(client, server):
+    for i in range(5):
+        data = client.search({"engine": "google", "q": f"query {i}", "api_key": "SECRET"})
+        assert data["organic_results"][0]["link"] == "https://x.com"
+    assert len(_Handler.connections) == 1
+    stats = client.stats()
+    assert stats["connections_opened"] == 1 and stats["requests_sent"] == 5
+    assert "q=query+4" in _Handler.paths[-1]
+
+
+def test_http_errors_raise_with_status(client):
+    _Handler.status = 503
+    with pytest.raises(requests.HTTPError) as info:
+        client.search({"q": "x", "api_key": "k"})
+    assert info.value.response.status_code == 503
+    assert isinstance(info.value, OSError)
+
+
+def test_cache_hits_skip_the_network_and_are_labelled(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(client_module, "serpapi_cache", SerpAPICache(db_path=tmp_path / "serp.db"))
+    params = {"engine": "google", "q": "site:linkedin.com/in/ \"Ada\"", "api_key": "k"}
+    first = client.search(params)
+    second = client.search({**params, "api_key": "other"})
+    assert first == second and len(_Handler.paths) == 1
+    rendered = client_module.llm_metrics.render()
+    assert 'serpapi_requests_total{cache="miss",outcome="ok",type="linkedin_profile"} 1' in rendered
+    assert 'serpapi_requests_total{cache="hit",outcome="ok",type="linkedin_profile"} 1' in rendered
+
+
+def test_separate_connect_and_read_timeouts(client, monkeypatch):
+    seen = {}
+
+    class _Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {}
+
+    def fake_get(url, timeout):
+        seen["timeout"] = timeout
+        return _Response()
+
+    monkeypatch.setattr(client.session, "get", fake_get)
+    client.search({"q": "a", "api_key": "k"})
+    assert seen["timeout"] == (1, 2)
+    client.search({"q": "b", "api_key": "k"}, timeout=10)
+    assert seen["timeout"] == (1, 10)
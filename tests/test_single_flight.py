@@ -0,0 +1,143 @@
+"""SingleFlight 单元测试。"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.services.single_flight import SingleFlight, make_flight_key
+
+
+def test_concurrent_threads_share_one_call():
+    flight = SingleFlight("test")
+    calls: list[int] = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def call() -> list[str]:
+        calls.append(1)
+        started.set()
+        release.wait(1)
+        return ["result"]
+
+    results: list[list[str]] = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", call)))
+    leader.start()
+    started.wait(1)
+    joiners = [threading.Thread(target=lambda: results.append(flight.do("k", call))) for _ in range(3)]
+    for t in joiners:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in [leader, *joiners]:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [["result"]] * 4
+    stats = flight.stats()
+    assert stats["leaders"] == 1 and stats["coalesced"] == 3 and stats["in_flight"] == 0
+
+
+def test_sync_joiner_times_out():
+    flight = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow() -> str:
+        started.set()
+        release.wait(1)
+        return "late"
+
+    leader = threading.Thread(target=lambda: flight.do("k", slow))
+    leader.start()
+    started.wait(1)
+    with pytest.raises(TimeoutError):
+        flight.do("k", slow, timeout=0.01)
+    release.set()
+    leader.join()
+    assert flight.stats()["timeouts"] == 1
+
+
+def test_async_callers_share_one_task_and_key_is_released():
+    flight = SingleFlight("test")
+    calls: list[int] = []
+
+    async def call() -> str:
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def main() -> list[str]:
+        first = await asyncio.gather(*(flight.ado("k", call) for _ in range(5)))
+        second = await flight.ado("k", call)
+        return [*first, second]
+
+    assert asyncio.run(main()) == ["answer"] * 6
+    assert len(calls) == 2  # the finished key is not reused
+    assert flight.stats()["coalesced"] == 4
+
+
+def test_async_leader_timeout_cancels_shared_call():
+    flight = SingleFlight("test")
+
+    async def hang() -> str:
+        await asyncio.sleep(10)
+        return "never"
+
+    async def main() -> None:
+        results = await asyncio.gather(
+            flight.ado("k", hang, timeout=0.01),
+            flight.ado("k", hang),
+            return_exceptions=True,
+        )
+        assert all(isinstance(r, TimeoutError) for r in results)
+
+    asyncio.run(main())
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_async_errors_propagate_to_all_waiters():
+    flight = SingleFlight("test")
+
+    async def boom() -> str:
+        await asyncio.sleep(0)
+        raise ValueError("bad")
+
+    async def main() -> list:
+        return await asyncio.gather(*(flight.ado("k", boom) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(r, ValueError) for r in asyncio.run(main()))
+    assert flight.stats()["errors"] == 1
+
+
+def test_make_flight_key_is_stable():
+    assert make_flight_key("a", 1, {"x": 2}) == make_flight_key("a", 1, {"x": 2})
+    assert make_flight_key("a", 1) != make_flight_key("a", 2)
+
+
+def test_async_shared_call_is_cancelled_with_its_last_waiter():
+    flight = SingleFlight("test")
+    cancelled: list[bool] = []
+
+    async def hang() -> str:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return "never"
+
+    async def main() -> None:
+        waiter = asyncio.ensure_future(flight.ado("k", hang))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert cancelled == [True]
+    assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,103 @@
+"""structured_output 单元测试：结构化输出的校验与本地修复。"""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from src.services.structured_output import (
+    DEEP_SEARCH,
+    PROFILE,
+    QUESTIONNAIRE,
+    RECOMMENDATIONS,
+    SCORED_CANDIDATES,
+    SchemaError,
+    StructuredOutput,
+    cache_validator,
+    repair_json,
+)
+
+
+@pytest.fixture
+def parser() -> StructuredOutput:
+    return StructuredOutput()
+
+
+def test_valid_output_passes_unchanged(parser):
+    content = json.dumps({"recommendations": [{"name": "Ada", "match_score": 90, "extra": 1}]})
+    assert parser.parse(content, RECOMMENDATIONS) == {
+        "recommendations": [{"name": "Ada", "match_score": 90, "extra": 1}]
+    }
+    assert parser.stats()["recommendations"]["ok"] == 1
+
+
+def test_trailing_commas_and_fences_are_repaired():
+    data, repairs = repair_json('```json\n{"skills": ["a", "b",], "name": "X",}\n```')
+    assert data == {"skills": ["a", "b"], "name": "X"}
+    assert repairs == ["extracted", "trailing_commas"]
+
+
+def test_truncated_array_keeps_complete_items(parser):
+    full = json.dumps({"recommendations": [{"name": "Ada"}, {"name": "Grace", "position": "CTO"}]})
+    truncated = full[: full.index('"position"') + 5]
+    assert parser.parse(truncated, RECOMMENDATIONS) == {"recommendations": [{"name": "Ada"}]}
+    assert parser.stats()["recommendations"]["repairs"]["truncated"] == 1
+
+
+def test_truncated_object_keeps_complete_members():
+    data, repairs = repair_json('{"name": "X", "skills": ["python", "sq')
+    assert data == {"name": "X", "skills": ["python"]}
+    assert "truncated" in repairs
+
+
+def test_key_casing_and_type_coercion(parser):
+    content = json.dumps({
+        "Recommendations": [
+            {"Name": "Ada", "matchScore": "85%", "Evidence": "one source", "sources": ["a", 2, {"x": 1}]},
+            {"position": "no name, dropped"},
+        ]
+    })
+    result = parser.parse(content, RECOMMENDATIONS)
+    assert result == {
+        "recommendations": [{"name": "Ada", "match_score": 85, "evidence": ["one source"], "sources": ["a", "2"]}]
+    }
+    assert {"key_case", "coerced", "str_to_list", "dropped_item"} <= set(parser.stats()["recommendations"]["repairs"])
+
+
+def test_questionnaire_is_unwrapped_from_json_mode_object(parser):
+    content = json.dumps({"questions": [{"question": "Q?", "options": "A"}]})
+    assert parser.parse(content, QUESTIONNAIRE) == [{"question": "Q?", "options": ["A"]}]
+
+
+def test_bare_array_is_wrapped_for_list_schemas(parser):
+    content = json.dumps([{"name": "Ada", "match_score": 88}])
+    assert parser.parse(content, SCORED_CANDIDATES) == {"scored_candidates": [{"name": "Ada", "match_score": 88}]}
+
+
+def test_defaults_and_bool_coercion(parser):
+    result = parser.parse('{"person_confirmed": "false", "recent_news": "Raised a fund"}', DEEP_SEARCH)
+    assert result["person_confirmed"] is False
+    assert result["recent_news"] == ["Raised a fund"]
+    assert result["verified_facts"] == []
+
+    profile = parser.parse('{"name": "X", "skills": null}', PROFILE)
+    assert profile["skills"] == [] and profile["education"] == []
+
+
+def test_unrecoverable_output_raises(parser):
+    with pytest.raises(SchemaError):
+        parser.parse("I could not find anyone, sorry.", RECOMMENDATIONS)
+    with pytest.raises(SchemaError):
+        parser.parse(json.dumps([{"question": "no options"}]), QUESTIONNAIRE)
+    assert parser.stats()["questionnaire"]["failed"] == 1
+
+
+def test_cache_validator_checks_json_and_the_callers_schema():
+    assert cache_validator("generate_email", json_mode=False) is None
+    plain_json = cache_validator("generate_next_question", json_mode=True)
+    assert plain_json('{"done": false}') and not plain_json("Sorry, I cannot help")
+
+    questionnaire = cache_validator("generate_questionnaire", json_mode=True)
+    assert questionnaire(json.dumps([{"question": "Q?", "options": ["a", "b"]}]))
+    assert not questionnaire(json.dumps([{"question": "no options"}]))